@@ -6,19 +6,44 @@ app/
 ├── config/              # 配置模块
 │   ├── settings.py      # 全局配置
 │   └── database.py      # 数据库连接
+├── core/                # 基础设施
+│   ├── application.py   # 应用工厂（create_app）
+│   ├── container.py     # 服务容器与路由依赖
+│   ├── engine_ipc.py    # 引擎进程 IPC（Unix socket）
+│   ├── quote_shm.py     # 共享内存行情快照（跨进程只读）
+│   ├── serialization.py # JSON序列化
+│   └── startup.py       # 分阶段启动与就绪状态
 ├── models/              # 数据模型
-│   └── schemas.py       # Pydantic模型
+│   ├── schemas.py       # Pydantic模型
+│   └── quote.py         # 紧凑行情记录
 ├── auth/                # 认证模块
 │   └── utils.py         # 认证工具
 ├── services/            # 服务层
+│   ├── engine.py            # 交易引擎（实时状态与远程调用入口）
+│   ├── symbol_registry.py   # 股票代码与元数据缓存
 │   ├── longbridge_sdk.py    # 长桥SDK封装
+│   ├── context_pool.py      # 多用户长桥连接池
+│   ├── quote_mux.py         # 行情推送多路复用
+│   ├── connection_supervisor.py # 长桥连接心跳与重连
+│   ├── rate_limiter.py      # API限流
+│   ├── quote_coalescer.py   # 行情请求合并
 │   ├── smart_trader.py      # 智能预测交易
+│   ├── prediction_index.py  # 当日预测排名索引
 │   ├── trading_strategy.py  # 交易策略
+│   ├── order_manager.py     # 订单管理（成交回报）
+│   ├── order_sync.py        # 订单历史增量同步
+│   ├── position_ledger.py   # 内存持仓账本
+│   ├── exit_engine.py       # 止盈止损引擎
+│   ├── portfolio.py         # 账户估值
+│   ├── market_calendar.py   # 美股交易日历
+│   ├── trade_scheduler.py   # 自动交易任务调度
 │   ├── acceleration.py      # 加速度计算
+│   ├── market_snapshot.py   # 市场数据快照
 │   ├── test_mode.py         # 测试模式
-│   ├── task_queue.py        # 任务队列
+│   ├── task_queue.py        # 任务队列（优先级、持久化）
 │   └── sse.py               # SSE推送
 └── routers/             # 路由模块
+    ├── health.py        # 健康检查路由
     ├── auth.py          # 认证路由
     ├── stocks.py        # 股票路由
     ├── trades.py        # 交易路由
@@ -1,23 +1,28 @@
 """
 认证相关工具函数
 """
+import asyncio
+import logging
 import pymysql
-import bcrypt
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from typing import Optional
 from fastapi import HTTPException, status, Cookie, Request, Depends
 from jose import JWTError, jwt
 import secrets
+import time
 
 from app.config.settings import (
     SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES, 
-    REFRESH_TOKEN_EXPIRE_DAYS
+    REFRESH_TOKEN_EXPIRE_DAYS, AUTH_USER_CACHE_TTL, AUTH_REVOKED_REFRESH_SECONDS
 )
 from app.config.database import get_db_connection
 
+logger = logging.getLogger(__name__)
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """验证密码"""
+    import bcrypt
     password_bytes = plain_password.encode('utf-8')
     if len(password_bytes) > 72:
         password_bytes = password_bytes[:72]
@@ -26,6 +31,7 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 
 def get_password_hash(password: str) -> str:
     """获取密码哈希"""
+    import bcrypt
     password_bytes = password.encode('utf-8')
     if len(password_bytes) > 72:
         password_bytes = password_bytes[:72]
@@ -40,6 +46,7 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     else:
         expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
+    to_encode.setdefault("jti", secrets.token_hex(8))  # 令牌标识，注销时按此拒绝
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 
@@ -49,8 +56,143 @@ def create_refresh_token() -> str:
     return secrets.token_urlsafe(32)
 
 
+# ---------- 已认证用户缓存 ----------
+# 令牌解码结果按令牌缓存到过期时间；用户记录按 (user_id, username) 缓存 AUTH_USER_CACHE_TTL 秒，
+# 用户变更或注销时失效。注销的令牌（jti）在本进程立即拒绝，并写入 revoked_tokens 表；
+# 每个请求（不论是否命中用户缓存）都按本进程的已注销列表检查 jti，列表每 AUTH_REVOKED_REFRESH_SECONDS 秒
+# 从 revoked_tokens 表刷新，其他进程注销的令牌最迟在刷新间隔后被拒绝
+TOKEN_CACHE_MAX = 4096
+_token_cache = {}  # {令牌: 解码后的 payload}
+_user_cache = {}  # {(user_id, username): (用户记录, 过期时间)}
+_revoked_tokens = {}  # {jti: 令牌过期时间戳}
+_revoked_refresh = {'next_at': 0.0}  # 下次从数据库刷新已注销列表的时间（monotonic）
+_auth_cache_stats = {'hits': 0, 'misses': 0, 'revoked': 0, 'revoked_refreshes': 0}
+
+
+def _decode_token(token: str) -> Optional[dict]:
+    """解码并校验访问令牌（签名只校验一次，结果缓存到令牌过期）"""
+    payload = _token_cache.get(token)
+    if payload is not None:
+        if payload.get('exp', 0) > time.time():
+            return payload
+        del _token_cache[token]
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+    if len(_token_cache) >= TOKEN_CACHE_MAX:
+        _token_cache.clear()
+    _token_cache[token] = payload
+    return payload
+
+
+def _load_principal(user_id: Optional[int], username: str) -> Optional[dict]:
+    """查询用户记录"""
+    conn = get_db_connection()
+    cursor = conn.cursor(pymysql.cursors.DictCursor)
+    try:
+        if user_id:
+            cursor.execute("SELECT * FROM users WHERE id = %s AND username = %s", (user_id, username))
+        else:
+            cursor.execute("SELECT * FROM users WHERE username = %s", (username,))
+        return cursor.fetchone()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def _load_revoked_tokens() -> dict:
+    """查询未过期的已注销令牌，返回 {jti: 令牌过期时间戳}"""
+    conn = get_db_connection()
+    cursor = conn.cursor(pymysql.cursors.DictCursor)
+    try:
+        cursor.execute("SELECT jti, expires_at FROM revoked_tokens WHERE expires_at > %s", (datetime.utcnow(),))
+        return {row['jti']: row['expires_at'].replace(tzinfo=timezone.utc).timestamp() for row in cursor.fetchall()}
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def _purge_revoked_cache():
+    now = time.time()
+    for key in [key for key, exp in _revoked_tokens.items() if exp <= now]:
+        del _revoked_tokens[key]
+
+
+async def _refresh_revoked_tokens():
+    """到期时从 revoked_tokens 表刷新本进程的已注销列表（同一时刻只有一个请求查询，失败时保留现有列表）"""
+    now = time.monotonic()
+    if now < _revoked_refresh['next_at']:
+        return
+    _revoked_refresh['next_at'] = now + AUTH_REVOKED_REFRESH_SECONDS
+    try:
+        revoked = await asyncio.to_thread(_load_revoked_tokens)
+    except Exception as e:
+        logger.warning(f"刷新已注销令牌列表失败: {e}")
+        return
+    _purge_revoked_cache()
+    _revoked_tokens.update(revoked)
+    _auth_cache_stats['revoked_refreshes'] += 1
+
+
+def invalidate_user_cache(user_id: Optional[int] = None):
+    """使已认证用户缓存失效（user_id 为空时全部失效），用户信息变更后调用"""
+    if user_id is None:
+        _user_cache.clear()
+        return
+    for key in [key for key in _user_cache if key[0] == user_id]:
+        del _user_cache[key]
+
+
+def _persist_revoked(jti: str, user_id: Optional[int], expires_at: float):
+    """写入已注销令牌，并清理已过期的记录"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            "INSERT IGNORE INTO revoked_tokens (jti, user_id, expires_at) VALUES (%s, %s, %s)",
+            (jti, user_id, datetime.utcfromtimestamp(expires_at))
+        )
+        cursor.execute("DELETE FROM revoked_tokens WHERE expires_at <= %s", (datetime.utcnow(),))
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+async def revoke_token(token: str):
+    """注销访问令牌：本进程立即拒绝，并记录到 revoked_tokens 表供其他进程刷新"""
+    payload = _decode_token(token)
+    if payload is None:
+        return
+    _token_cache.pop(token, None)
+    invalidate_user_cache(payload.get('user_id'))
+    jti = payload.get('jti')
+    if not jti:
+        return  # 旧令牌不带 jti，只能等待过期
+
+    expires_at = payload.get('exp', time.time())
+    _purge_revoked_cache()
+    _revoked_tokens[jti] = expires_at
+
+    try:
+        await asyncio.to_thread(_persist_revoked, jti, payload.get('user_id'), expires_at)
+    except Exception as e:
+        # 本进程仍拒绝该令牌，其他进程在令牌过期前可能仍接受
+        logger.error(f"记录已注销令牌失败: {e}")
+
+
+def get_auth_cache_stats() -> dict:
+    return {
+        'users': len(_user_cache),
+        'tokens': len(_token_cache),
+        'revoked_tokens': len(_revoked_tokens),
+        **_auth_cache_stats
+    }
+
+
 async def get_current_user(request: Request, access_token: Optional[str] = Cookie(None)) -> dict:
-    """获取当前登录用户"""
+    """获取当前登录用户（命中已认证用户缓存时不查询数据库）"""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="未认证",
@@ -65,34 +207,36 @@ async def get_current_user(request: Request, access_token: Optional[str] = Cooki
         else:
             raise credentials_exception
 
-    try:
-        payload = jwt.decode(access_token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        user_id: int = payload.get("user_id")
-        if username is None:
-            raise credentials_exception
-    except JWTError:
+    payload = _decode_token(access_token)
+    if payload is None:
         raise credentials_exception
+    username: str = payload.get("sub")
+    user_id: int = payload.get("user_id")
+    jti: Optional[str] = payload.get("jti")
+    if username is None:
+        raise credentials_exception
+    if jti:
+        await _refresh_revoked_tokens()
+        if jti in _revoked_tokens:
+            _auth_cache_stats['revoked'] += 1
+            raise credentials_exception
 
-    conn = get_db_connection()
-    cursor = conn.cursor(pymysql.cursors.DictCursor)
-    
-    try:
-        if user_id:
-            cursor.execute("SELECT * FROM users WHERE id = %s AND username = %s", (user_id, username))
-        else:
-            cursor.execute("SELECT * FROM users WHERE username = %s", (username,))
-        user = cursor.fetchone()
-    finally:
-        cursor.close()
-        conn.close()
+    key = (user_id, username)
+    cached = _user_cache.get(key)
+    if cached is not None and time.monotonic() < cached[1]:
+        _auth_cache_stats['hits'] += 1
+        return dict(cached[0])
 
+    _auth_cache_stats['misses'] += 1
+    user = await asyncio.to_thread(_load_principal, user_id, username)
     if user is None:
+        _user_cache.pop(key, None)
         raise credentials_exception
 
     # 移除密码字段
     user.pop('password', None)
-    return user
+    _user_cache[key] = (user, time.monotonic() + AUTH_USER_CACHE_TTL)
+    return dict(user)
 
 
 async def get_current_active_user(current_user: dict):
@@ -102,8 +246,22 @@ async def get_current_active_user(current_user: dict):
     return current_user
 
 
+# 测试模式开关缓存（信号检查等高频路径避免每次查询数据库），配置更新时失效
+TEST_MODE_CACHE_TTL = 5.0
+_test_mode_cache = {'value': False, 'expires_at': 0.0}
+
+
+def invalidate_test_mode_cache():
+    """使测试模式缓存失效（更新 system_config 后调用）"""
+    _test_mode_cache['expires_at'] = 0.0
+
+
 def is_test_mode() -> bool:
-    """检查是否处于测试模式（从数据库配置读取）"""
+    """检查是否处于测试模式（从数据库配置读取，缓存 TEST_MODE_CACHE_TTL 秒）"""
+    now = time.monotonic()
+    if now < _test_mode_cache['expires_at']:
+        return _test_mode_cache['value']
+
     try:
         conn = get_db_connection()
         cursor = conn.cursor(pymysql.cursors.DictCursor)
@@ -112,12 +270,15 @@ def is_test_mode() -> bool:
         cursor.close()
         conn.close()
 
-        if result and result['config_value'].lower() == 'true':
-            return True
-        return False
+        value = bool(result and result['config_value'].lower() == 'true')
     except Exception:
+        # 读取失败不缓存，下次调用重试
         return False
 
+    _test_mode_cache['value'] = value
+    _test_mode_cache['expires_at'] = now + TEST_MODE_CACHE_TTL
+    return value
+
 
 def load_user_longbridge_config(user_id: int) -> dict:
     """加载用户的长桥配置"""
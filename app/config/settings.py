@@ -4,7 +4,6 @@
 import os
 import secrets
 from dotenv import load_dotenv
-from passlib.context import CryptContext
 
 # 加载环境变量
 load_dotenv()
@@ -29,6 +28,52 @@ LONGBRIDGE_CONFIG = {
     'trade_ws_url': 'wss://openapi-trade.longbridgeapp.com'
 }
 
+# 实时行情请求合并配置
+QUOTE_CACHE_TTL = float(os.getenv('QUOTE_CACHE_TTL', 1.0))  # 单只股票行情缓存时间（秒）
+QUOTE_COALESCE_WINDOW_MS = float(os.getenv('QUOTE_COALESCE_WINDOW_MS', 5))  # 请求合并窗口（毫秒）
+QUOTE_MAX_CONCURRENT_BATCHES = int(os.getenv('QUOTE_MAX_CONCURRENT_BATCHES', 5))  # 同时在途的行情批次数
+
+# 多用户长桥连接池（每组凭证一对行情/交易连接）
+LONGBRIDGE_MAX_CONTEXTS = int(os.getenv('LONGBRIDGE_MAX_CONTEXTS', 8))  # 不含全局默认连接
+LONGBRIDGE_CONTEXT_IDLE_TIMEOUT = float(os.getenv('LONGBRIDGE_CONTEXT_IDLE_TIMEOUT', 1800.0))  # 空闲淘汰时间（秒）
+LONGBRIDGE_CONTEXT_WAIT_TIMEOUT = float(os.getenv('LONGBRIDGE_CONTEXT_WAIT_TIMEOUT', 10.0))  # 连接全部在使用时等待名额（秒）
+
+# 长桥连接守护：心跳间隔与重连退避（秒）
+SDK_HEARTBEAT_INTERVAL = float(os.getenv('SDK_HEARTBEAT_INTERVAL', 30.0))
+SDK_RECONNECT_BACKOFF_BASE = float(os.getenv('SDK_RECONNECT_BACKOFF_BASE', 1.0))
+SDK_RECONNECT_BACKOFF_MAX = float(os.getenv('SDK_RECONNECT_BACKOFF_MAX', 60.0))
+
+# 分阶段启动：单个阶段超时（秒），超时记为失败，依赖它的阶段跳过
+STARTUP_STAGE_TIMEOUT = float(os.getenv('STARTUP_STAGE_TIMEOUT', 60.0))
+
+# 多 worker 部署：standalone=单进程（默认），engine=引擎进程（持有长桥连接与实时状态），
+# api=无状态 API worker（通过 Unix socket 调用引擎进程）
+ENGINE_ROLE = os.getenv('ENGINE_ROLE', 'standalone')
+ENGINE_SOCKET = os.getenv('ENGINE_SOCKET', '/tmp/quant_engine.sock')
+ENGINE_RPC_TIMEOUT = float(os.getenv('ENGINE_RPC_TIMEOUT', 30.0))  # 单次引擎调用超时（秒）
+
+# 共享内存行情快照：引擎进程写入，本机其他进程直接读取
+QUOTE_SHM_NAME = os.getenv('QUOTE_SHM_NAME', 'quant_quotes')
+QUOTE_SHM_SLOTS = int(os.getenv('QUOTE_SHM_SLOTS', 1024))  # 槽位数（可发布的股票数上限）
+QUOTE_SHM_MAX_AGE = float(os.getenv('QUOTE_SHM_MAX_AGE', 5.0))  # 读取方采用快照的最长时效（秒），更旧的行情仍向引擎请求
+
+# 异步任务队列配置
+TASK_QUEUE_WORKERS = int(os.getenv('TASK_QUEUE_WORKERS', 4))  # 工作协程数
+TASK_QUEUE_THREADS = int(os.getenv('TASK_QUEUE_THREADS', 4))  # 同步任务线程池大小
+TASK_QUEUE_MAXSIZE = int(os.getenv('TASK_QUEUE_MAXSIZE', 1000))  # 每个优先级通道的容量上限
+
+# 账户估值配置
+PORTFOLIO_MARK_INTERVAL = float(os.getenv('PORTFOLIO_MARK_INTERVAL', 2.0))  # 持仓估值刷新间隔（秒）
+PORTFOLIO_RECONCILE_INTERVAL = float(os.getenv('PORTFOLIO_RECONCILE_INTERVAL', 60.0))  # 与长桥账户对账间隔（秒）
+
+# 订单历史同步间隔（秒），推送之外的兜底增量同步
+ORDER_SYNC_INTERVAL = float(os.getenv('ORDER_SYNC_INTERVAL', 60.0))
+
+# 自动交易任务调度配置
+PREDICTION_LEAD_MINUTES = int(os.getenv('PREDICTION_LEAD_MINUTES', 30))  # 开盘前多久运行每日预测（分钟）
+OPEN_BUY_GRACE_MINUTES = int(os.getenv('OPEN_BUY_GRACE_MINUTES', 15))  # 开盘买入最多允许延迟（分钟），超过则标记错过
+TASK_LEASE_SECONDS = int(os.getenv('TASK_LEASE_SECONDS', 120))  # 任务租约时长（秒），执行中定期续约，过期视为执行实例已中断
+
 # 大模型API配置
 LLM_CONFIG = {
     'enabled': False,
@@ -46,9 +91,13 @@ SECRET_KEY = os.getenv('SECRET_KEY', secrets.token_urlsafe(32))
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24  # 24小时
 REFRESH_TOKEN_EXPIRE_DAYS = 7
+# 已认证用户缓存时长（秒）：期间同一用户的请求不查询 users 表
+AUTH_USER_CACHE_TTL = float(os.getenv('AUTH_USER_CACHE_TTL', 30.0))
+# 已注销令牌列表的刷新间隔（秒）：每个请求都按本进程的列表检查，其他进程注销的令牌最迟在此时长后被拒绝
+AUTH_REVOKED_REFRESH_SECONDS = float(os.getenv('AUTH_REVOKED_REFRESH_SECONDS', 5.0))
 
-# 密码加密配置
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# 密码加密配置（passlib 导入较慢，首次访问 pwd_context 时创建，见模块末尾 __getattr__）
+_pwd_context = None
 
 # 汇率配置
 EXCHANGE_RATES = {
@@ -182,3 +231,13 @@ def classify_symbol_type(symbol: str, security_type_hint=None) -> str:
         return 'STOCK'
     
     return 'STOCK'
+
+
+def __getattr__(name):
+    global _pwd_context
+    if name == 'pwd_context':
+        if _pwd_context is None:
+            from passlib.context import CryptContext
+            _pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+        return _pwd_context
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,79 @@
+"""
+应用工厂
+- create_app() 创建 FastAPI 应用并注册路由、静态文件
+- 生命周期持有服务容器：启动时在后台执行启动阶段，关闭时倒序停止，服务只创建一次
+"""
+import logging
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import RedirectResponse
+from fastapi.staticfiles import StaticFiles
+
+from .container import ServiceContainer
+from .serialization import FastJSONResponse
+
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """应用生命周期：启动阶段在后台执行，服务立即开始接受请求（就绪状态见 /ready）"""
+    services: ServiceContainer = app.state.services
+    logger.info("美股量化交易系统启动中...")
+    services.start()
+
+    yield
+
+    logger.info("系统正在关闭...")
+    await services.stop()
+
+
+def create_app(services: ServiceContainer = None, static_dir: str = "static") -> FastAPI:
+    """创建应用（services 为空时新建服务容器）"""
+    from app.routers import (
+        health_router, auth_router, stocks_router, trades_router,
+        positions_router, config_router, monitoring_router,
+        smart_trade_router, longbridge_router, market_data_router
+    )
+
+    app = FastAPI(
+        title="美股量化交易系统",
+        description="基于长桥SDK的量化交易系统，支持智能预测和自动交易",
+        version="2.0.0",
+        lifespan=lifespan,
+        default_response_class=FastJSONResponse
+    )
+    app.state.services = services or ServiceContainer()
+
+    # 配置CORS
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    # 注册路由
+    app.include_router(health_router)
+    app.include_router(auth_router)
+    app.include_router(stocks_router)
+    app.include_router(trades_router)
+    app.include_router(positions_router)
+    app.include_router(config_router)
+    app.include_router(monitoring_router)
+    app.include_router(smart_trade_router)
+    app.include_router(longbridge_router)
+    app.include_router(market_data_router)
+
+    @app.get("/")
+    async def root():
+        """根路径重定向到静态页面"""
+        return RedirectResponse(url="/static/index.html")
+
+    # 挂载静态文件（必须在最后）
+    app.mount("/static", StaticFiles(directory=static_dir, html=True), name="static")
+
+    return app
@@ -0,0 +1,177 @@
+"""
+应用服务容器
+- 由应用工厂为每个应用创建一次，挂在 app.state.services 上，路由通过 Depends 获取
+- 各服务在首次访问时解析并缓存（模块此时才导入），之后始终返回同一实例
+- 启动阶段、预热和关闭由容器内的 StartupManager 统一调度并计时
+- role 决定部署角色：standalone 单进程；engine 为引擎进程（额外启动 IPC 服务）；
+  api 为无状态 worker，engine 为引擎客户端，不连接长桥、不运行后台服务
+"""
+from functools import cached_property
+
+from fastapi import Request
+
+from app.config.database import get_db_connection
+from app.config.settings import (
+    ENGINE_ROLE, ENGINE_RPC_TIMEOUT, ENGINE_SOCKET, QUOTE_SHM_NAME, QUOTE_SHM_SLOTS, STARTUP_STAGE_TIMEOUT
+)
+from .startup import StartupManager, register_service_stages
+
+ROLE_STANDALONE = 'standalone'
+ROLE_ENGINE = 'engine'
+ROLE_API = 'api'
+
+# 容器提供的服务名（与属性名一致）
+SERVICE_NAMES = (
+    'sdk', 'context_pool', 'connection_supervisor', 'quote_mux', 'symbol_registry', 'market_snapshot',
+    'position_ledger', 'exit_engine', 'order_manager', 'order_sync', 'portfolio',
+    'trading_strategy', 'smart_trader', 'task_queue', 'trade_scheduler', 'engine', 'engine_server',
+    'quote_snapshot', 'quote_reader',
+)
+
+
+class ServiceContainer:
+    """应用级服务集合与生命周期"""
+
+    def __init__(self, stage_timeout: float = STARTUP_STAGE_TIMEOUT, role: str = ENGINE_ROLE):
+        if role not in (ROLE_STANDALONE, ROLE_ENGINE, ROLE_API):
+            raise ValueError(f"未知的部署角色: {role}")
+        self.role = role
+        self.db = get_db_connection  # 数据库连接工厂
+        self.lifecycle = StartupManager(stage_timeout)
+        register_service_stages(self.lifecycle, self)
+
+    # ---------- 服务 ----------
+
+    @cached_property
+    def sdk(self):
+        from app.services.longbridge_sdk import longbridge_sdk
+        return longbridge_sdk
+
+    @cached_property
+    def context_pool(self):
+        from app.services.context_pool import context_pool
+        return context_pool
+
+    @cached_property
+    def connection_supervisor(self):
+        from app.services.connection_supervisor import connection_supervisor
+        return connection_supervisor
+
+    @cached_property
+    def quote_mux(self):
+        from app.services.quote_mux import quote_mux
+        return quote_mux
+
+    @cached_property
+    def symbol_registry(self):
+        from app.services.symbol_registry import symbol_registry
+        return symbol_registry
+
+    @cached_property
+    def market_snapshot(self):
+        from app.services.market_snapshot import market_snapshot
+        return market_snapshot
+
+    @cached_property
+    def position_ledger(self):
+        from app.services.position_ledger import position_ledger
+        return position_ledger
+
+    @cached_property
+    def exit_engine(self):
+        from app.services.exit_engine import exit_engine
+        return exit_engine
+
+    @cached_property
+    def order_manager(self):
+        from app.services.order_manager import order_manager
+        return order_manager
+
+    @cached_property
+    def order_sync(self):
+        from app.services.order_sync import order_sync
+        return order_sync
+
+    @cached_property
+    def portfolio(self):
+        from app.services.portfolio import portfolio_service
+        return portfolio_service
+
+    @cached_property
+    def trading_strategy(self):
+        from app.services.trading_strategy import trading_strategy
+        return trading_strategy
+
+    @cached_property
+    def smart_trader(self):
+        from app.services.smart_trader import smart_trader
+        return smart_trader
+
+    @cached_property
+    def task_queue(self):
+        from app.services.task_queue import task_queue
+        return task_queue
+
+    @cached_property
+    def trade_scheduler(self):
+        from app.services.trade_scheduler import trade_scheduler
+        return trade_scheduler
+
+    @cached_property
+    def engine(self):
+        """交易引擎（api 角色为 IPC 客户端，接口相同）"""
+        if self.role == ROLE_API:
+            from .engine_ipc import EngineClient
+            return EngineClient(ENGINE_SOCKET, ENGINE_RPC_TIMEOUT)
+        from app.services.engine import trading_engine
+        trading_engine.attach(self)
+        return trading_engine
+
+    @cached_property
+    def engine_server(self):
+        from .engine_ipc import EngineServer
+        return EngineServer(self.engine, ENGINE_SOCKET)
+
+    @cached_property
+    def quote_snapshot(self):
+        """共享内存行情快照写入方（引擎进程 / 单进程）"""
+        from .quote_shm import QuoteSnapshotWriter
+        return QuoteSnapshotWriter(QUOTE_SHM_NAME, QUOTE_SHM_SLOTS)
+
+    @cached_property
+    def quote_reader(self):
+        """共享内存行情快照读取方（首次读取时连接）"""
+        from .quote_shm import QuoteSnapshotReader
+        return QuoteSnapshotReader(QUOTE_SHM_NAME)
+
+    # ---------- 生命周期 ----------
+
+    def start(self):
+        """后台执行启动阶段，立即返回"""
+        self.lifecycle.start()
+
+    async def stop(self):
+        await self.lifecycle.stop()
+
+    def get_stats(self) -> dict:
+        return {
+            'role': self.role,
+            **self.lifecycle.get_stats(),
+            'resolved': [name for name in SERVICE_NAMES if name in self.__dict__]
+        }
+
+
+# ---------- 路由依赖 ----------
+
+def get_services(request: Request) -> ServiceContainer:
+    return request.app.state.services
+
+
+def get_engine(request: Request):
+    """交易引擎（单进程为本进程引擎，api worker 为引擎客户端）"""
+    return request.app.state.services.engine
+
+
+def get_sdk(request: Request):
+    """全局长桥连接（以容器中的实例为准，不在路由模块导入时绑定）"""
+    return request.app.state.services.sdk
@@ -0,0 +1,234 @@
+"""
+引擎进程 IPC（Unix socket，按行分隔的 JSON）
+- 请求 {"id": 1, "method": "market.quotes", "params": {...}}，响应 {"id": 1, "result": ...} 或 {"id": 1, "error": "..."}
+- 一个连接上可同时有多个请求在途，按 id 对应响应
+- method 为 "events" 时该连接转为事件流，服务端逐行推送 {"event": "<SSE 消息文本>"}，客户端断开即取消订阅
+"""
+import asyncio
+import itertools
+import json
+import logging
+import os
+from typing import AsyncIterator, Dict, List, Optional
+
+from .serialization import dumps_text
+
+logger = logging.getLogger(__name__)
+
+STREAM_LIMIT = 16 * 1024 * 1024  # 单行上限（行情快照可能较大）
+
+
+class EngineError(RuntimeError):
+    """引擎端执行失败或不可达"""
+
+
+class EngineServer:
+    """引擎进程内的 IPC 服务端"""
+
+    def __init__(self, engine, path: str):
+        self.engine = engine
+        self.path = path
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._connections = set()
+
+        # 统计
+        self.requests = 0
+        self.errors = 0
+        self.streams = 0
+
+    async def start(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)  # 上次未正常退出留下的 socket 文件
+        self._server = await asyncio.start_unix_server(self._handle, path=self.path, limit=STREAM_LIMIT)
+        logger.info(f"引擎 IPC 已监听: {self.path}")
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            for task in list(self._connections):
+                task.cancel()
+            await asyncio.gather(*self._connections, return_exceptions=True)
+            await self._server.wait_closed()
+            self._server = None
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        task = asyncio.current_task()
+        self._connections.add(task)
+        write_lock = asyncio.Lock()
+        pending = set()
+
+        async def send(message: dict):
+            async with write_lock:
+                writer.write(dumps_text(message).encode() + b'\n')
+                await writer.drain()
+
+        async def respond(request: dict):
+            self.requests += 1
+            try:
+                result = await self.engine.call(request['method'], **(request.get('params') or {}))
+                await send({'id': request.get('id'), 'result': result})
+            except Exception as e:
+                self.errors += 1
+                await send({'id': request.get('id'), 'error': str(e) or type(e).__name__})
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                request = json.loads(line)
+                if request.get('method') == 'events':
+                    await self._stream_events(request.get('params') or {}, send)
+                    break
+                request_task = asyncio.create_task(respond(request))
+                pending.add(request_task)
+                request_task.add_done_callback(pending.discard)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"引擎 IPC 连接异常: {e}")
+        finally:
+            for request_task in list(pending):
+                request_task.cancel()
+            writer.close()
+            self._connections.discard(task)
+
+    async def _stream_events(self, params: dict, send):
+        self.streams += 1
+        events = self.engine.events(params.get('symbols'))
+        try:
+            async for message in events:
+                await send({'event': message})
+        finally:
+            await events.aclose()
+            self.streams -= 1
+
+    def get_stats(self) -> dict:
+        return {
+            'path': self.path,
+            'connections': len(self._connections),
+            'streams': self.streams,
+            'requests': self.requests,
+            'errors': self.errors
+        }
+
+
+class EngineClient:
+    """API worker 端的引擎客户端，接口与 TradingEngine 相同（call / events）"""
+
+    def __init__(self, path: str, timeout: float = 30.0):
+        self.path = path
+        self.timeout = timeout
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._read_task: Optional[asyncio.Task] = None
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._ids = itertools.count(1)
+        self._connect_lock = asyncio.Lock()
+
+        # 统计
+        self.calls = 0
+        self.failures = 0
+        self.connects = 0
+
+    async def connect(self):
+        """建立（或复用）请求连接"""
+        if self._writer is not None and not self._writer.is_closing():
+            return
+        async with self._connect_lock:
+            if self._writer is not None and not self._writer.is_closing():
+                return
+            try:
+                self._reader, self._writer = await asyncio.open_unix_connection(self.path, limit=STREAM_LIMIT)
+            except OSError as e:
+                raise EngineError(f"无法连接引擎进程 {self.path}: {e}") from e
+            self.connects += 1
+            self._read_task = asyncio.create_task(self._read_loop(self._reader, self._writer))
+
+    async def _read_loop(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                message = json.loads(line)
+                future = self._pending.pop(message.get('id'), None)
+                if future is None or future.done():
+                    continue
+                if 'error' in message:
+                    future.set_exception(EngineError(message['error']))
+                else:
+                    future.set_result(message.get('result'))
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            # 连接断开：在途请求全部失败，下次调用重新连接
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(EngineError("引擎连接已断开"))
+            self._pending.clear()
+            writer.close()
+            if self._writer is writer:
+                self._writer = None
+
+    async def call(self, method: str, **params):
+        self.calls += 1
+        await self.connect()
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        try:
+            self._writer.write(dumps_text({'id': request_id, 'method': method, 'params': params}).encode() + b'\n')
+            await self._writer.drain()
+            return await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            self.failures += 1
+            raise EngineError(f"引擎调用超时: {method}")
+        except EngineError:
+            self.failures += 1
+            raise
+        except (ConnectionError, AttributeError) as e:
+            self.failures += 1
+            raise EngineError(f"引擎连接已断开: {e}")
+        finally:
+            self._pending.pop(request_id, None)
+
+    async def events(self, symbols: Optional[List[str]] = None) -> AsyncIterator[str]:
+        """订阅事件流（独立连接，迭代结束或取消时断开）"""
+        try:
+            reader, writer = await asyncio.open_unix_connection(self.path, limit=STREAM_LIMIT)
+        except OSError as e:
+            raise EngineError(f"无法连接引擎进程 {self.path}: {e}") from e
+        try:
+            writer.write(dumps_text({'method': 'events', 'params': {'symbols': symbols}}).encode() + b'\n')
+            await writer.drain()
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                yield json.loads(line)['event']
+        finally:
+            writer.close()
+
+    async def close(self):
+        if self._read_task is not None:
+            self._read_task.cancel()
+            await asyncio.gather(self._read_task, return_exceptions=True)
+            self._read_task = None
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def get_stats(self) -> dict:
+        return {
+            'path': self.path,
+            'connected': self._writer is not None and not self._writer.is_closing(),
+            'in_flight': len(self._pending),
+            'calls': self.calls,
+            'failures': self.failures,
+            'connects': self.connects
+        }
@@ -0,0 +1,249 @@
+"""
+共享内存行情快照（跨进程只读）
+- 引擎进程（或单进程部署的本进程）把最新行情写入 multiprocessing.shared_memory，
+  本机其他进程（API worker、回测、监控）直接读取，不再向券商请求
+- 固定槽位：每只股票首次发布时分配一个槽位，之后原地覆盖；槽位用尽时新股票不再发布
+- 每个槽位一个序号（seqlock）：写入前序号加一（奇数表示写入中），写完再加一；
+  读取方读序号 -> 读数据 -> 再读序号，两次相同且为偶数才采用，否则重试。写方不加锁，读方不阻塞写方
+- 单写多读：只允许一个进程写入；读取通过 struct.unpack_from 直接解析共享内存，不复制整个缓冲区
+
+内存布局（小端）:
+    头部 HEADER_SIZE 字节: magic(8s) capacity(I) count(I) created_ms(q)
+    槽位 × capacity:      seq(Q) symbol(24s) price(d) change_pct(d) volume(q) acceleration(d) ts(q)
+"""
+import logging
+import struct
+import time
+from multiprocessing import resource_tracker, shared_memory
+from typing import Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'QSNAP001'
+HEADER = struct.Struct('<8sIIq')
+HEADER_SIZE = 64
+SEQ = struct.Struct('<Q')
+DATA = struct.Struct('<24sddqdq')
+SLOT_SIZE = SEQ.size + DATA.size
+SYMBOL_BYTES = 24
+COUNT_OFFSET = 12  # 头部 count 字段偏移
+
+READ_RETRIES = 100  # 读到写入中的槽位时的最大重试次数
+REOPEN_INTERVAL = 5.0  # 读取方检查写入方是否重建共享内存的最小间隔（秒）
+
+_owned = set()  # 本进程作为写入方创建的共享内存名
+
+
+def _now_ms() -> int:
+    return time.time_ns() // 1_000_000
+
+
+class QuoteSnapshotWriter:
+    """共享内存行情快照写入方（每台机器只应有一个写入进程）"""
+
+    def __init__(self, name: str, capacity: int = 1024):
+        self.name = name
+        self.capacity = capacity
+        self._shm: Optional[shared_memory.SharedMemory] = None
+        self._slots: Dict[str, int] = {}
+
+        # 统计
+        self.publishes = 0
+        self.dropped = 0
+
+    @property
+    def active(self) -> bool:
+        return self._shm is not None
+
+    def start(self):
+        """创建共享内存（同名的残留段先删除）"""
+        if self._shm is not None:
+            return
+        size = HEADER_SIZE + SLOT_SIZE * self.capacity
+        try:
+            self._shm = shared_memory.SharedMemory(self.name, create=True, size=size)
+        except FileExistsError:
+            stale = shared_memory.SharedMemory(self.name)  # 上次未正常退出留下的共享内存
+            stale.close()
+            stale.unlink()
+            self._shm = shared_memory.SharedMemory(self.name, create=True, size=size)
+        buf = self._shm.buf
+        buf[:size] = bytes(size)
+        HEADER.pack_into(buf, 0, MAGIC, self.capacity, 0, _now_ms())
+        self._slots.clear()
+        _owned.add(self.name)
+        logger.info(f"共享内存行情快照已创建: {self.name}（{self.capacity} 个槽位）")
+
+    def stop(self):
+        if self._shm is None:
+            return
+        shm, self._shm = self._shm, None
+        _owned.discard(self.name)
+        shm.close()
+        try:
+            shm.unlink()
+        except FileNotFoundError:
+            pass
+
+    def publish(self, symbol: str, price: float, change_pct: float, volume: int = 0,
+                acceleration: Optional[float] = None, ts: int = 0) -> bool:
+        """
+        发布一只股票的最新行情（symbol 为标准化代码）
+        acceleration 为空时沿用槽位中已有的加速度（推送行情不计算加速度）
+        """
+        shm = self._shm
+        if shm is None:
+            return False
+        buf = shm.buf
+        index = self._slots.get(symbol)
+        is_new = index is None
+        if is_new:
+            if len(self._slots) >= self.capacity:
+                self.dropped += 1
+                return False
+            index = len(self._slots)
+        offset = HEADER_SIZE + index * SLOT_SIZE
+        if acceleration is None:
+            acceleration = 0.0 if is_new else DATA.unpack_from(buf, offset + SEQ.size)[4]
+
+        seq = SEQ.unpack_from(buf, offset)[0]
+        SEQ.pack_into(buf, offset, seq + 1)  # 奇数：写入中
+        DATA.pack_into(buf, offset + SEQ.size, symbol.encode()[:SYMBOL_BYTES], float(price), float(change_pct),
+                       int(volume), float(acceleration), ts or _now_ms())
+        SEQ.pack_into(buf, offset, seq + 2)
+
+        if is_new:
+            # 槽位内容完整后再增加 count，读取方看到的新槽位总是已写入
+            self._slots[symbol] = index
+            struct.pack_into('<I', buf, COUNT_OFFSET, len(self._slots))
+        self.publishes += 1
+        return True
+
+    def publish_quote(self, quote, acceleration: Optional[float] = None) -> bool:
+        """发布 Quote 记录"""
+        return self.publish(quote.symbol, quote.price, quote.change_pct, quote.volume, acceleration, quote.ts)
+
+    def get_stats(self) -> dict:
+        return {
+            'name': self.name,
+            'active': self.active,
+            'capacity': self.capacity,
+            'symbols': len(self._slots),
+            'publishes': self.publishes,
+            'dropped': self.dropped
+        }
+
+
+class QuoteSnapshotReader:
+    """共享内存行情快照读取方（任意本机进程）"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._shm: Optional[shared_memory.SharedMemory] = None
+        self._created_ms = 0
+        self._index: Dict[str, int] = {}
+        self._checked_at = 0.0
+
+        # 统计
+        self.reads = 0
+        self.hits = 0
+        self.retries = 0
+
+    def _attach(self) -> bool:
+        """连接写入方的共享内存；写入方重建过共享内存时切换到新的段"""
+        now = time.monotonic()
+        if self._shm is not None and now - self._checked_at < REOPEN_INTERVAL:
+            return True
+        self._checked_at = now
+        try:
+            shm = shared_memory.SharedMemory(self.name)
+        except FileNotFoundError:
+            self.close()
+            return False
+        if self.name not in _owned:
+            # 只读方不负责删除共享内存，避免进程退出时被 resource_tracker 清理
+            resource_tracker.unregister(shm._name, 'shared_memory')
+        magic, _, _, created_ms = HEADER.unpack_from(shm.buf, 0)
+        if magic != MAGIC:
+            shm.close()
+            self.close()
+            return False
+        if self._shm is not None and created_ms == self._created_ms:
+            shm.close()
+            return True
+        self.close()
+        self._shm, self._created_ms = shm, created_ms
+        return True
+
+    def _slot(self, symbol: str) -> Optional[int]:
+        index = self._index.get(symbol)
+        if index is not None:
+            return index
+        # 写入方新增了槽位：只扫描尚未建立索引的部分
+        buf = self._shm.buf
+        count = struct.unpack_from('<I', buf, COUNT_OFFSET)[0]
+        for i in range(len(self._index), count):
+            raw = DATA.unpack_from(buf, HEADER_SIZE + i * SLOT_SIZE + SEQ.size)[0]
+            self._index[raw.rstrip(b'\0').decode()] = i
+        return self._index.get(symbol)
+
+    def _read_slot(self, index: int) -> Optional[tuple]:
+        buf = self._shm.buf
+        offset = HEADER_SIZE + index * SLOT_SIZE
+        for _ in range(READ_RETRIES):
+            seq = SEQ.unpack_from(buf, offset)[0]
+            if not seq & 1:
+                data = DATA.unpack_from(buf, offset + SEQ.size)
+                if SEQ.unpack_from(buf, offset)[0] == seq:
+                    return data
+            self.retries += 1
+        return None
+
+    def get(self, symbol: str, max_age: Optional[float] = None) -> Optional[dict]:
+        """读取一只股票的最新行情（标准化代码）；超过 max_age 秒未更新视为未命中"""
+        self.reads += 1
+        if not self._attach():
+            return None
+        index = self._slot(symbol)
+        if index is None:
+            return None
+        data = self._read_slot(index)
+        if data is None:
+            return None
+        _, price, change_pct, volume, acceleration, ts = data
+        if max_age is not None and _now_ms() - ts > max_age * 1000:
+            return None
+        self.hits += 1
+        return {
+            'symbol': symbol,
+            'price': price,
+            'change_pct': change_pct,
+            'volume': volume,
+            'acceleration': acceleration,
+            'ts': ts
+        }
+
+    def get_many(self, symbols: Iterable[str], max_age: Optional[float] = None) -> Dict[str, dict]:
+        """批量读取，只返回命中的股票"""
+        quotes = {}
+        for symbol in symbols:
+            quote = self.get(symbol, max_age)
+            if quote is not None:
+                quotes[symbol] = quote
+        return quotes
+
+    def close(self):
+        if self._shm is not None:
+            self._shm.close()
+            self._shm = None
+        self._index.clear()
+
+    def get_stats(self) -> dict:
+        return {
+            'name': self.name,
+            'attached': self._shm is not None,
+            'symbols': len(self._index),
+            'reads': self.reads,
+            'hits': self.hits,
+            'retries': self.retries
+        }
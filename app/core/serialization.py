@@ -0,0 +1,72 @@
+"""
+高性能 JSON 序列化
+- 优先使用 orjson（原生支持 datetime/date，C 实现）
+- 未安装 orjson 时回退到标准库 json
+- 统一处理 DictCursor 返回的 Decimal/timedelta/bytes 等类型
+"""
+import json
+import logging
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
+
+
+def _default(obj: Any) -> Any:
+    """序列化 JSON 原生不支持的类型（Decimal 最常见，放在最前面）"""
+    if isinstance(obj, Decimal):
+        # DECIMAL 列统一输出 float，避免逐个检查指数带来的开销
+        return float(obj)
+    if isinstance(obj, (datetime, date, time)):
+        return obj.isoformat()
+    if isinstance(obj, timedelta):
+        return obj.total_seconds()
+    if isinstance(obj, (bytes, bytearray)):
+        return obj.decode('utf-8', errors='replace')
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    to_dict = getattr(obj, 'to_dict', None)
+    if callable(to_dict):
+        return to_dict()
+    # 兜底：与原先 json.dumps(default=str) 的行为保持一致
+    return str(obj)
+
+
+if ORJSON_AVAILABLE:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+    def dumps(obj: Any) -> bytes:
+        """序列化为 UTF-8 JSON 字节串"""
+        return orjson.dumps(obj, default=_default, option=_ORJSON_OPTIONS)
+else:
+    def dumps(obj: Any) -> bytes:
+        """序列化为 UTF-8 JSON 字节串"""
+        return json.dumps(
+            obj, default=_default, ensure_ascii=False, separators=(',', ':')
+        ).encode('utf-8')
+
+
+def dumps_text(obj: Any) -> str:
+    """序列化为 JSON 字符串（用于 SSE 等文本通道）"""
+    return dumps(obj).decode('utf-8')
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    高性能 JSON 响应
+    路由直接返回该响应时可跳过 FastAPI 的 jsonable_encoder 遍历
+    """
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,336 @@
+"""
+分阶段启动
+- 应用生命周期只登记并调度启动阶段，不等待完成，HTTP 服务立即可以响应存活检查
+- 各阶段按依赖关系在后台并发执行（无依赖的阶段同时开始），全部必需阶段完成后即报告就绪，
+  非必需阶段（缓存预热）可在就绪后继续执行
+- 阶段失败或超时只影响依赖它的阶段（标记为跳过），不阻塞其他阶段
+- 关闭时按启动顺序倒序执行各阶段的停止函数
+- 分别记录启动（至就绪）、预热（至全部阶段结束）和关闭耗时
+- 可能随时中断或恢复的外部依赖（如 API worker 依赖的引擎进程）登记为实时检查，每次就绪检查时探测
+"""
+import asyncio
+import logging
+import time
+from typing import TYPE_CHECKING, Awaitable, Callable, Dict, Iterable, List, Optional
+
+from app.config.settings import STARTUP_STAGE_TIMEOUT
+
+if TYPE_CHECKING:
+    from .container import ServiceContainer
+
+logger = logging.getLogger(__name__)
+
+STAGE_PENDING = 'PENDING'
+STAGE_RUNNING = 'RUNNING'
+STAGE_DONE = 'DONE'
+STAGE_FAILED = 'FAILED'
+STAGE_SKIPPED = 'SKIPPED'
+
+READY_CHECK_TIMEOUT = 2.0  # 单项实时就绪检查的超时（秒）
+
+
+class Stage:
+    """一个启动阶段"""
+
+    __slots__ = ('name', 'start', 'stop', 'after', 'required', 'status', 'error', 'duration_ms', 'stop_ms')
+
+    def __init__(self, name: str, start: Callable[[], Awaitable], stop: Optional[Callable[[], Awaitable]] = None,
+                 after: Iterable[str] = (), required: bool = True):
+        self.name = name
+        self.start = start
+        self.stop = stop
+        self.after = tuple(after)
+        self.required = required
+        self.status = STAGE_PENDING
+        self.error: Optional[str] = None
+        self.duration_ms: Optional[float] = None
+        self.stop_ms: Optional[float] = None
+
+
+class StartupManager:
+    """启动阶段调度与就绪状态"""
+
+    def __init__(self, stage_timeout: float = STARTUP_STAGE_TIMEOUT):
+        self.stage_timeout = stage_timeout
+        self._stages: Dict[str, Stage] = {}
+        self._checks: Dict[str, Callable[[], Awaitable]] = {}
+        self._started: List[str] = []  # 开始执行的顺序，关闭时倒序停止
+        self._task: Optional[asyncio.Task] = None
+        self._settled = asyncio.Event()  # 就绪或启动结束
+        self._started_at: Optional[float] = None
+        self.ready_ms: Optional[float] = None  # 启动：至全部必需阶段完成
+        self.boot_ms: Optional[float] = None  # 预热：至全部阶段结束
+        self.shutdown_ms: Optional[float] = None
+
+    def add(self, name: str, start: Callable[[], Awaitable], stop: Optional[Callable[[], Awaitable]] = None,
+            after: Iterable[str] = (), required: bool = True):
+        """登记启动阶段（依赖的阶段须先登记；同名阶段覆盖）"""
+        after = tuple(after)
+        for dep in after:
+            if dep not in self._stages:
+                raise ValueError(f"启动阶段 {name} 依赖未登记的阶段 {dep}")
+        self._stages[name] = Stage(name, start, stop, after, required)
+
+    def add_check(self, name: str, check: Callable[[], Awaitable]):
+        """登记实时就绪检查（每次 probe 时执行，抛出异常或超时视为未就绪）"""
+        self._checks[name] = check
+
+    @property
+    def ready(self) -> bool:
+        return self._task is not None and all(
+            stage.status == STAGE_DONE for stage in self._stages.values() if stage.required
+        )
+
+    def start(self) -> asyncio.Task:
+        """在后台开始执行全部阶段，立即返回"""
+        if self._task is None:
+            for stage in self._stages.values():
+                stage.status, stage.error, stage.duration_ms, stage.stop_ms = STAGE_PENDING, None, None, None
+            self._started.clear()
+            self._settled = asyncio.Event()
+            self.ready_ms = self.boot_ms = self.shutdown_ms = None
+            self._started_at = time.monotonic()
+            self._task = asyncio.create_task(self._run())
+        return self._task
+
+    async def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """等待就绪（或启动结束），返回是否就绪"""
+        if self._task is None:
+            return False
+        try:
+            await asyncio.wait_for(self._settled.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self.ready
+
+    async def stop(self):
+        """取消未完成的启动，按启动顺序倒序停止已开始的阶段"""
+        stopping_at = time.monotonic()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for name in reversed(self._started):
+            stage = self._stages[name]
+            if stage.stop is None:
+                continue
+            started_at = time.monotonic()
+            try:
+                await stage.stop()
+            except Exception as e:
+                logger.error(f"停止 {name} 失败: {e}")
+            stage.stop_ms = round((time.monotonic() - started_at) * 1000, 1)
+        self._started.clear()
+        self.shutdown_ms = (time.monotonic() - stopping_at) * 1000
+        logger.info(f"系统关闭完成，耗时 {self.shutdown_ms:.0f}ms")
+
+    async def _run(self):
+        finished = {name: asyncio.Event() for name in self._stages}
+
+        async def run(stage: Stage):
+            for dep in stage.after:
+                await finished[dep].wait()
+            if all(self._stages[dep].status == STAGE_DONE for dep in stage.after):
+                await self._run_stage(stage)
+            else:
+                stage.status = STAGE_SKIPPED
+                logger.warning(f"启动阶段 {stage.name} 跳过：依赖未完成")
+            finished[stage.name].set()
+            if self.ready_ms is None and self.ready:
+                self.ready_ms = (time.monotonic() - self._started_at) * 1000
+                self._settled.set()
+                logger.info(f"系统启动完成，耗时 {self.ready_ms:.0f}ms")
+
+        try:
+            await asyncio.gather(*(run(stage) for stage in self._stages.values()))
+        finally:
+            self._settled.set()
+        self.boot_ms = (time.monotonic() - self._started_at) * 1000
+        if self.ready:
+            logger.info(f"启动预热完成，耗时 {self.boot_ms:.0f}ms")
+        else:
+            failed = [s.name for s in self._stages.values() if s.status != STAGE_DONE and s.required]
+            logger.error(f"系统启动未就绪，未完成阶段: {failed}")
+
+    async def _run_stage(self, stage: Stage):
+        stage.status = STAGE_RUNNING
+        self._started.append(stage.name)
+        started_at = time.monotonic()
+        try:
+            await asyncio.wait_for(stage.start(), self.stage_timeout)
+            stage.status = STAGE_DONE
+        except asyncio.TimeoutError:
+            stage.status = STAGE_FAILED
+            stage.error = f"超时（{self.stage_timeout:.0f}秒）"
+            logger.error(f"启动阶段 {stage.name} 超时")
+        except Exception as e:
+            stage.status = STAGE_FAILED
+            stage.error = str(e) or type(e).__name__
+            logger.error(f"启动阶段 {stage.name} 失败: {e}")
+        finally:
+            stage.duration_ms = round((time.monotonic() - started_at) * 1000, 1)
+
+    async def probe(self, timeout: float = READY_CHECK_TIMEOUT) -> dict:
+        """执行实时就绪检查，返回启动阶段状态与检查结果（两者都通过才就绪）"""
+        stats = self.get_stats()
+        checks = {}
+
+        async def run(name: str, check: Callable[[], Awaitable]):
+            try:
+                await asyncio.wait_for(check(), timeout)
+                checks[name] = {'ok': True, 'error': None}
+            except asyncio.TimeoutError:
+                checks[name] = {'ok': False, 'error': f"超时（{timeout:.0f}秒）"}
+            except Exception as e:
+                checks[name] = {'ok': False, 'error': str(e) or type(e).__name__}
+
+        await asyncio.gather(*(run(name, check) for name, check in self._checks.items()))
+        stats['checks'] = checks
+        stats['ready'] = stats['ready'] and all(check['ok'] for check in checks.values())
+        return stats
+
+    def get_stats(self) -> dict:
+        def ms(value):
+            return round(value, 1) if value is not None else None
+
+        return {
+            'ready': self.ready,
+            'timings': {'start_ms': ms(self.ready_ms), 'warmup_ms': ms(self.boot_ms), 'shutdown_ms': ms(self.shutdown_ms)},
+            'stages': {
+                stage.name: {
+                    'status': stage.status, 'required': stage.required, 'duration_ms': stage.duration_ms,
+                    'stop_ms': stage.stop_ms, 'error': stage.error
+                }
+                for stage in self._stages.values()
+            }
+        }
+
+
+# ---------- 服务启动阶段 ----------
+
+def load_system_config():
+    """补齐默认系统配置，并从 system_config 表加载长桥配置"""
+    import pymysql.cursors
+    from app.config.database import get_db_connection
+    from app.config.settings import LONGBRIDGE_CONFIG, ensure_default_system_configs
+
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor(pymysql.cursors.DictCursor)
+        if ensure_default_system_configs(cursor):
+            conn.commit()
+        cursor.execute("""
+            SELECT config_key, config_value FROM system_config
+            WHERE config_key IN (
+                'longbridge_app_key', 'longbridge_app_secret', 'longbridge_access_token',
+                'longbridge_http_url', 'longbridge_quote_ws_url', 'longbridge_trade_ws_url'
+            )
+        """)
+        configs = cursor.fetchall()
+        cursor.close()
+    finally:
+        conn.close()
+
+    for config in configs:
+        key = config['config_key'].replace('longbridge_', '', 1)
+        value = config['config_value']
+        # 凭证允许清空，地址为空时保留默认值
+        if key in ('app_key', 'app_secret', 'access_token') or value:
+            LONGBRIDGE_CONFIG[key] = value
+
+    if LONGBRIDGE_CONFIG['app_key']:
+        logger.info(f"从数据库加载长桥配置: app_key={LONGBRIDGE_CONFIG['app_key'][:8]}...")
+
+
+def register_service_stages(manager: StartupManager, services: 'ServiceContainer'):
+    """登记交易系统各服务的启动阶段（服务由容器在阶段执行时解析，模块此时才导入）"""
+    from .container import ROLE_API, ROLE_ENGINE
+
+    async def system_config():
+        try:
+            await asyncio.to_thread(load_system_config)
+        except Exception as e:
+            # 数据库暂不可用时使用环境变量中的配置继续启动
+            logger.warning(f"从数据库加载系统配置失败: {e}")
+
+    async def engine_link():
+        # 引擎进程可能晚于 API worker 启动或中途重启：启动时只尝试连接一次，
+        # 是否可达由实时就绪检查反映，引擎恢复后 /ready 随之恢复
+        try:
+            await services.engine.call('connection.status')
+        except Exception as e:
+            logger.warning(f"引擎进程暂不可达: {e}")
+
+    if services.role == ROLE_API:
+        # 无状态 API worker：长桥连接（含用户连接池）、行情、监控、调度等都在引擎进程中
+        manager.add('system_config', system_config)
+        manager.add('engine_link', engine_link, lambda: services.engine.close(), required=False)
+        manager.add_check('engine', lambda: services.engine.call('connection.status'))
+        return
+
+    async def broker():
+        # 连接失败时由连接守护按指数退避重连（不切换到模拟数据）
+        await services.sdk.connect()
+        await services.connection_supervisor.start()
+
+    async def stop_broker():
+        await services.connection_supervisor.stop()
+        services.sdk.close()
+
+    async def exits():
+        services.exit_engine.attach(services.position_ledger)
+        services.exit_engine.attach_orders(services.order_manager)
+        await services.exit_engine.start()
+
+    async def quotes():
+        await services.quote_mux.start()
+        services.exit_engine.attach_quotes(services.quote_mux)
+
+    async def orders():
+        services.order_manager.attach(services.sdk)
+        services.order_sync.attach(services.order_manager)
+        await services.order_sync.start()
+
+    async def portfolio():
+        services.portfolio.attach(services.order_manager, services.position_ledger)
+        await services.portfolio.start()
+
+    async def quote_snapshot():
+        services.quote_snapshot.start()
+        services.quote_mux.attach_snapshot(services.quote_snapshot)
+
+    async def stop_quote_snapshot():
+        services.quote_mux.attach_snapshot(None)
+        services.quote_snapshot.stop()
+
+    async def task_queue():
+        # 先注册持久化任务的处理函数，启动时才能恢复上次未完成的任务
+        services.order_manager.attach_queue(services.task_queue)
+        await services.task_queue.start()
+
+    async def strategy_config():
+        await asyncio.gather(services.trading_strategy.load_config(), services.smart_trader.load_config())
+
+    manager.add('system_config', system_config)
+    manager.add('broker', broker, stop_broker, after=['system_config'])
+    manager.add('symbols', lambda: services.symbol_registry.warm_up(), after=['broker'], required=False)
+    manager.add('ledger', lambda: services.position_ledger.start(), lambda: services.position_ledger.stop())
+    manager.add('exit_engine', exits, lambda: services.exit_engine.stop(), after=['ledger'])
+    manager.add('quotes', quotes, lambda: services.quote_mux.stop(), after=['broker', 'exit_engine'])
+    manager.add('quote_snapshot', quote_snapshot, stop_quote_snapshot, required=False)
+    manager.add('orders', orders, lambda: services.order_sync.stop(), after=['broker'])
+    manager.add('portfolio', portfolio, lambda: services.portfolio.stop(), after=['orders', 'ledger'])
+    manager.add('strategy_config', strategy_config)
+    manager.add('task_queue', task_queue, lambda: services.task_queue.stop())
+    manager.add('scheduler', lambda: services.trade_scheduler.start(), lambda: services.trade_scheduler.stop(),
+                after=['strategy_config', 'broker', 'task_queue'])
+    manager.add('context_pool', lambda: services.context_pool.start(), lambda: services.context_pool.stop(),
+                after=['system_config'])
+
+    if services.role == ROLE_ENGINE:
+        # 其他阶段全部完成后才接受 API worker 的调用，关闭时最先停止
+        manager.add('engine_ipc', lambda: services.engine_server.start(), lambda: services.engine_server.stop(),
+                    after=['broker', 'exit_engine', 'quotes', 'orders', 'portfolio', 'scheduler', 'context_pool'])
@@ -1,2 +1,3 @@
 # 数据模型模块
 from .schemas import *
+from .quote import Quote
@@ -0,0 +1,68 @@
+"""
+紧凑行情记录
+- __slots__ 存储，时间戳为整数毫秒，单条行情内存约为等价 dict + ISO 字符串的 1/4
+- 实现只读 Mapping 接口（quote['price'] / quote.get(...) / dict(quote)），原有按键读取的代码无需修改
+- ISO 时间字符串只在接口序列化（to_dict）时生成
+"""
+import time
+from collections.abc import Mapping
+from datetime import datetime
+
+_FIELDS = ('symbol', 'price', 'prev_close', 'change_pct', 'volume', 'timestamp')
+
+
+class Quote(Mapping):
+    """单只股票的实时行情"""
+
+    __slots__ = ('symbol', 'price', 'prev_close', 'change_pct', 'volume', 'ts')
+
+    def __init__(self, symbol: str, price: float, prev_close: float, change_pct: float,
+                 volume: int = 0, ts: int = 0):
+        self.symbol = symbol
+        self.price = price
+        self.prev_close = prev_close
+        self.change_pct = change_pct
+        self.volume = volume
+        self.ts = ts or time.time_ns() // 1_000_000  # 毫秒时间戳
+
+    @classmethod
+    def from_price(cls, symbol: str, price: float, prev_close: float, volume: int = 0, ts: int = 0) -> 'Quote':
+        """按最新价和昨收计算涨跌幅"""
+        change_pct = ((price - prev_close) / prev_close) * 100 if prev_close > 0 else 0.0
+        return cls(symbol, price, prev_close, change_pct, volume, ts)
+
+    def with_symbol(self, symbol: str) -> 'Quote':
+        """同一行情换成调用方使用的代码（共享缓存中的记录不修改）"""
+        if symbol == self.symbol:
+            return self
+        return Quote(symbol, self.price, self.prev_close, self.change_pct, self.volume, self.ts)
+
+    @property
+    def timestamp(self) -> str:
+        return datetime.fromtimestamp(self.ts / 1000).isoformat()
+
+    # ---------- Mapping 接口 ----------
+
+    def __getitem__(self, key: str):
+        if key in _FIELDS:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(_FIELDS)
+
+    def __len__(self) -> int:
+        return len(_FIELDS)
+
+    def to_dict(self) -> dict:
+        return {
+            'symbol': self.symbol,
+            'price': self.price,
+            'prev_close': self.prev_close,
+            'change_pct': self.change_pct,
+            'volume': self.volume,
+            'timestamp': self.timestamp
+        }
+
+    def __repr__(self) -> str:
+        return f"Quote({self.symbol} {self.price} {self.change_pct:+.2f}%)"
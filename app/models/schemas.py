@@ -26,6 +26,18 @@ class Trade(BaseModel):
     message: Optional[str] = None
 
 
+class OrderIntent(BaseModel):
+    symbol: str
+    side: str  # BUY / SELL
+    price: float  # 当前报价，用于风控和数量计算
+    quantity: Optional[int] = None  # 为空时买入按 buy_amount 计算，卖出为全部持仓
+    acceleration: Optional[float] = 0
+
+
+class BatchOrderRequest(BaseModel):
+    orders: List[OrderIntent]
+
+
 class Position(BaseModel):
     id: Optional[int] = None
     symbol: str
@@ -8,3 +8,4 @@ from .monitoring import router as monitoring_router
 from .smart_trade import router as smart_trade_router
 from .longbridge import router as longbridge_router
 from .market_data import router as market_data_router
+from .health import router as health_router
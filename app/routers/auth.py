@@ -8,11 +8,12 @@ import re
 
 from app.models.schemas import LoginRequest, RegisterRequest
 from app.config.database import get_db_connection
-from app.config.settings import REFRESH_TOKEN_EXPIRE_DAYS, ACCESS_TOKEN_EXPIRE_MINUTES, LONGBRIDGE_CONFIG
+from app.config.settings import REFRESH_TOKEN_EXPIRE_DAYS, ACCESS_TOKEN_EXPIRE_MINUTES
+from app.core.container import get_engine
 from app.auth.utils import (
     verify_password, get_password_hash, 
     create_access_token, create_refresh_token,
-    get_current_user, load_user_longbridge_config
+    get_current_user, load_user_longbridge_config, revoke_token
 )
 from fastapi import Depends
 
@@ -69,7 +70,7 @@ async def register(request: RegisterRequest):
 
 
 @router.post("/login")
-async def login(request: LoginRequest, response: Response):
+async def login(request: LoginRequest, response: Response, engine=Depends(get_engine)):
     """用户登录"""
     conn = get_db_connection()
     cursor = conn.cursor(pymysql.cursors.DictCursor)
@@ -109,25 +110,18 @@ async def login(request: LoginRequest, response: Response):
             samesite="lax", secure=False
         )
         
-        # 登录成功后加载用户的长桥配置到全局变量
+        # 登录成功后由引擎预热用户的长桥连接（连接池按凭证复用，不覆盖全局配置）
         user_lb_config = load_user_longbridge_config(user['id'])
-        if user_lb_config.get('app_key'):
-            LONGBRIDGE_CONFIG['app_key'] = user_lb_config['app_key']
-        if user_lb_config.get('app_secret'):
-            LONGBRIDGE_CONFIG['app_secret'] = user_lb_config['app_secret']
-        if user_lb_config.get('access_token'):
-            LONGBRIDGE_CONFIG['access_token'] = user_lb_config['access_token']
-        
-        # 如果用户有完整配置，尝试重新连接SDK
         if user_lb_config.get('app_key') and user_lb_config.get('app_secret') and user_lb_config.get('access_token'):
-            try:
-                from app.services.longbridge_sdk import longbridge_sdk, LONGBRIDGE_AVAILABLE
-                longbridge_sdk.use_real_sdk = LONGBRIDGE_AVAILABLE
-                # 异步连接SDK（不阻塞登录）
-                import asyncio
-                asyncio.create_task(longbridge_sdk.connect())
-            except Exception:
-                pass  # 忽略SDK连接失败
+            async def warm_up():
+                try:
+                    await engine.call('account.connect', user_id=user['id'])
+                except Exception:
+                    pass  # 忽略SDK连接失败
+
+            # 异步连接SDK（不阻塞登录）
+            import asyncio
+            asyncio.create_task(warm_up())
         
         return {
             "code": 0,
@@ -143,7 +137,15 @@ async def login(request: LoginRequest, response: Response):
 
 @router.post("/logout")
 async def logout(request: Request, response: Response):
-    """用户登出"""
+    """用户登出（访问令牌同时注销，已认证用户缓存失效）"""
+    access_token = request.cookies.get("access_token")
+    if not access_token:
+        auth_header = request.headers.get("Authorization")
+        if auth_header and auth_header.startswith("Bearer "):
+            access_token = auth_header.split(" ")[1]
+    if access_token:
+        await revoke_token(access_token)
+    
     # 从cookie获取refresh_token并从数据库删除
     refresh_token = request.cookies.get("refresh_token")
     if refresh_token:
@@ -3,12 +3,12 @@
 """
 from fastapi import APIRouter, Depends
 import pymysql
-import httpx
 import logging
 
 from app.config.database import get_db_connection
 from app.config.settings import CONFIG_DEFINITIONS, ensure_default_system_configs
-from app.auth.utils import get_current_user
+from app.auth.utils import get_current_user, invalidate_test_mode_cache
+from app.core.container import get_engine
 
 router = APIRouter(prefix="/api/config", tags=["配置"])
 logger = logging.getLogger(__name__)
@@ -43,7 +43,7 @@ async def get_config(current_user: dict = Depends(get_current_user)):
 
 
 @router.put("")
-async def update_config(config: dict, current_user: dict = Depends(get_current_user)):
+async def update_config(config: dict, current_user: dict = Depends(get_current_user), engine=Depends(get_engine)):
     """更新系统配置"""
     conn = get_db_connection()
     cursor = conn.cursor()
@@ -61,10 +61,10 @@ async def update_config(config: dict, current_user: dict = Depends(get_current_u
         """, (config_key, str(config_value)))
         
         conn.commit()
+        invalidate_test_mode_cache()
         
-        # 更新交易策略配置
-        from app.services.trading_strategy import trading_strategy
-        await trading_strategy.load_config()
+        # 更新交易策略配置；智能交易配置只在变更时重新加载（状态接口直接读取内存）
+        await engine.call('config.reload', smart=config_key.startswith(('smart_', 'llm_')))
         
         return {"code": 0, "message": "配置已更新"}
     finally:
@@ -95,6 +95,7 @@ async def get_llm_models(current_user: dict = Depends(get_current_user)):
                 if not ollama_url:
                     ollama_url = 'http://localhost:11434'
                 
+                import httpx
                 async with httpx.AsyncClient(timeout=10.0) as client:
                     response = await client.get(f"{ollama_url}/api/tags")
                     if response.status_code == 200:
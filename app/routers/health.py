@@ -0,0 +1,25 @@
+"""
+健康检查路由
+- /health：存活检查，进程能处理请求即返回（启动阶段尚未完成时也返回）
+- /ready：就绪检查，全部必需启动阶段完成且实时检查（如引擎进程可达）通过时返回 200，否则 503
+"""
+from fastapi import APIRouter, Depends
+
+from app.core.container import ServiceContainer, get_services
+from app.core.serialization import FastJSONResponse
+
+router = APIRouter(tags=["健康检查"])
+
+
+@router.get("/health")
+async def health():
+    """存活检查"""
+    return {"code": 0, "status": "ok"}
+
+
+@router.get("/ready")
+async def ready(services: ServiceContainer = Depends(get_services)):
+    """就绪检查（附各启动阶段状态与耗时、实时检查结果）"""
+    stats = await services.lifecycle.probe()
+    return FastJSONResponse({"code": 0 if stats['ready'] else 1, "data": stats},
+                            status_code=200 if stats['ready'] else 503)
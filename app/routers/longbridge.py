@@ -8,7 +8,8 @@ import pymysql
 from app.config.database import get_db_connection
 from app.config.settings import LONGBRIDGE_CONFIG
 from app.auth.utils import get_current_user, load_user_longbridge_config
-from app.services.longbridge_sdk import longbridge_sdk, LONGBRIDGE_AVAILABLE
+from app.services.longbridge_sdk import LONGBRIDGE_AVAILABLE
+from app.core.container import get_engine
 from app.models.schemas import LongBridgeConfigUpdate
 
 logger = logging.getLogger(__name__)
@@ -17,7 +18,7 @@ router = APIRouter(prefix="/api/longbridge", tags=["长桥SDK"])
 
 
 @router.get("/config")
-async def get_longbridge_config(current_user: dict = Depends(get_current_user)):
+async def get_longbridge_config(current_user: dict = Depends(get_current_user), engine=Depends(get_engine)):
     """获取长桥配置（用户级）"""
     user_id = current_user['id']
     
@@ -31,10 +32,13 @@ async def get_longbridge_config(current_user: dict = Depends(get_current_user)):
         user_config.get('access_token')
     )
     
-    # 如果用户有配置，显示用户配置；否则显示全局配置状态
-    app_key = user_config.get('app_key') or LONGBRIDGE_CONFIG.get('app_key', '')
-    app_secret = user_config.get('app_secret') or LONGBRIDGE_CONFIG.get('app_secret', '')
-    access_token = user_config.get('access_token') or LONGBRIDGE_CONFIG.get('access_token', '')
+    # 只显示用户自己的凭证，系统凭证不返回给用户
+    app_key = user_config.get('app_key') or ''
+    app_secret = user_config.get('app_secret') or ''
+    access_token = user_config.get('access_token') or ''
+    
+    # 用户自己的连接状态（无个人凭证时为全局连接），只读取不新建连接
+    status = await engine.call('account.status', user_id=user_id)
     
     return {
         "code": 0,
@@ -44,16 +48,18 @@ async def get_longbridge_config(current_user: dict = Depends(get_current_user)):
             "has_secret": bool(app_secret),
             "has_token": bool(access_token),
             "http_url": LONGBRIDGE_CONFIG['http_url'],
-            "is_connected": longbridge_sdk.is_connected,
-            "use_real_sdk": longbridge_sdk.use_real_sdk,
+            "is_connected": status['is_connected'],
+            "use_real_sdk": status['use_real_sdk'],
             "sdk_available": LONGBRIDGE_AVAILABLE,
-            "is_configured": is_configured
+            "is_configured": is_configured,
+            "uses_system_connection": status['configured'] and not is_configured  # 未配置个人凭证，使用系统配置的全局连接
         }
     }
 
 
 @router.post("/config")
-async def update_longbridge_config(config: LongBridgeConfigUpdate, current_user: dict = Depends(get_current_user)):
+async def update_longbridge_config(config: LongBridgeConfigUpdate, current_user: dict = Depends(get_current_user),
+                                   engine=Depends(get_engine)):
     """更新长桥配置（保存到用户配置表）"""
     user_id = current_user['id']
     conn = get_db_connection()
@@ -63,13 +69,10 @@ async def update_longbridge_config(config: LongBridgeConfigUpdate, current_user:
         updates = []
         if config.app_key:
             updates.append(('longbridge_app_key', config.app_key))
-            LONGBRIDGE_CONFIG['app_key'] = config.app_key
         if config.app_secret:
             updates.append(('longbridge_app_secret', config.app_secret))
-            LONGBRIDGE_CONFIG['app_secret'] = config.app_secret
         if config.access_token:
             updates.append(('longbridge_access_token', config.access_token))
-            LONGBRIDGE_CONFIG['access_token'] = config.access_token
         
         # 保存到用户配置表（user_config）
         for key, value in updates:
@@ -81,22 +84,13 @@ async def update_longbridge_config(config: LongBridgeConfigUpdate, current_user:
         
         conn.commit()
         
-        # 重新连接SDK
-        longbridge_sdk.use_real_sdk = (
-            LONGBRIDGE_AVAILABLE and 
-            LONGBRIDGE_CONFIG.get('app_key') and 
-            LONGBRIDGE_CONFIG.get('app_secret') and 
-            LONGBRIDGE_CONFIG.get('access_token')
-        )
-        await longbridge_sdk.connect()
+        # 只切换该用户的连接，其他用户的连接和全局配置不受影响
+        result = await engine.call('account.connect', user_id=user_id)
         
         return {
             "code": 0, 
             "message": "长桥配置已更新",
-            "data": {
-                "use_real_sdk": longbridge_sdk.use_real_sdk,
-                "is_connected": longbridge_sdk.is_connected
-            }
+            "data": result['data'] if result['code'] == 0 else {"use_real_sdk": False, "is_connected": False}
         }
     finally:
         cursor.close()
@@ -104,11 +98,14 @@ async def update_longbridge_config(config: LongBridgeConfigUpdate, current_user:
 
 
 @router.post("/sync-watchlist")
-async def sync_watchlist(current_user: dict = Depends(get_current_user)):
+async def sync_watchlist(current_user: dict = Depends(get_current_user), engine=Depends(get_engine)):
     """同步自选股"""
     conn = None
     try:
-        watchlist = await longbridge_sdk.get_watchlist()
+        result = await engine.call('account.watchlist', user_id=current_user['id'])
+        if result['code'] != 0:
+            return result
+        watchlist = result['data']
         
         if not watchlist:
             return {"code": 0, "message": "无自选股数据", "data": []}
@@ -150,10 +147,19 @@ async def sync_watchlist(current_user: dict = Depends(get_current_user)):
 
 
 @router.post("/sync-positions")
-async def sync_positions(current_user: dict = Depends(get_current_user)):
+async def sync_positions(current_user: dict = Depends(get_current_user), engine=Depends(get_engine)):
     """同步持仓"""
     try:
-        positions = await longbridge_sdk.get_stock_positions()
+        result = await engine.call('account.positions', user_id=current_user['id'])
+        if result['code'] != 0:
+            return result
+        positions = result['data']
         return {"code": 0, "message": f"同步完成，共{len(positions)}个持仓", "data": positions}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/connection")
+async def get_connection_status(current_user: dict = Depends(get_current_user), engine=Depends(get_engine)):
+    """全局长桥连接状态（状态变迁、心跳、重连耗时）"""
+    return {"code": 0, "data": await engine.call('connection.status')}
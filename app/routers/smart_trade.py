@@ -1,73 +1,29 @@
 """
 智能交易路由
 """
-from fastapi import APIRouter, HTTPException, Depends
-import pymysql
+from fastapi import APIRouter, HTTPException, Depends, Query
 
 from app.config.database import get_db_connection
+from app.core.serialization import FastJSONResponse
 from app.auth.utils import get_current_user
-from app.services.smart_trader import smart_trader
+from app.core.container import get_engine
+from app.models.schemas import BatchOrderRequest
 
 router = APIRouter(prefix="/api/smart-trade", tags=["智能交易"])
 
 
 @router.get("/status")
-async def get_smart_trade_status(current_user: dict = Depends(get_current_user)):
-    """获取智能交易状态"""
+async def get_smart_trade_status(current_user: dict = Depends(get_current_user), engine=Depends(get_engine)):
+    """获取智能交易状态（预测排名与当天交易统计来自内存索引）"""
     try:
-        await smart_trader.load_config()
-        status = smart_trader.get_status()
-        
-        predictions = []
-        trade_stats = {'total_trades': 0, 'buy_count': 0, 'sell_count': 0}
-        
-        conn = get_db_connection()
-        cursor = conn.cursor(pymysql.cursors.DictCursor)
-        
-        try:
-            cursor.execute("""
-                SELECT symbol, predicted_return, confidence_score, technical_score, 
-                       llm_score, llm_recommendation, llm_analysis, actual_return
-                FROM stock_predictions
-                WHERE prediction_date = CURDATE()
-                ORDER BY technical_score DESC
-                LIMIT 10
-            """)
-            predictions = cursor.fetchall()
-        except Exception:
-            # stock_predictions 表可能不存在
-            pass
-        
-        try:
-            cursor.execute("""
-                SELECT 
-                    COUNT(*) as total_trades,
-                    SUM(CASE WHEN action = 'BUY' THEN 1 ELSE 0 END) as buy_count,
-                    SUM(CASE WHEN action = 'SELL' THEN 1 ELSE 0 END) as sell_count
-                FROM trades
-                WHERE DATE(trade_time) = CURDATE()
-            """)
-            trade_stats = cursor.fetchone() or trade_stats
-        except Exception:
-            pass
-        
-        cursor.close()
-        conn.close()
-        
-        return {
-            "code": 0,
-            "data": {
-                "status": status,
-                "today_predictions": predictions,
-                "today_stats": trade_stats
-            }
-        }
+        return {"code": 0, "data": await engine.call('smart.status')}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.post("/config")
-async def update_smart_trade_config(config: dict, current_user: dict = Depends(get_current_user)):
+async def update_smart_trade_config(config: dict, current_user: dict = Depends(get_current_user),
+                                    engine=Depends(get_engine)):
     """更新智能交易配置"""
     try:
         conn = get_db_connection()
@@ -103,7 +59,7 @@ async def update_smart_trade_config(config: dict, current_user: dict = Depends(g
         cursor.close()
         conn.close()
         
-        await smart_trader.load_config()
+        await engine.call('smart.reload_config')
         
         return {"code": 0, "message": "智能交易配置已更新"}
     except Exception as e:
@@ -111,99 +67,74 @@ async def update_smart_trade_config(config: dict, current_user: dict = Depends(g
 
 
 @router.post("/run-prediction")
-async def run_prediction(current_user: dict = Depends(get_current_user)):
+async def run_prediction(current_user: dict = Depends(get_current_user), engine=Depends(get_engine)):
     """运行股票预测"""
     try:
-        await smart_trader.load_config()
-        predictions = await smart_trader.run_daily_prediction()
+        predictions = await engine.call('smart.run_prediction')
         return {"code": 0, "data": predictions[:10], "message": f"预测完成，共{len(predictions)}只股票"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.post("/execute-buy")
-async def execute_smart_buy(current_user: dict = Depends(get_current_user)):
-    """手动执行智能买入"""
-    from app.services.smart_trader import smart_trader
-    from app.services.trading_strategy import trading_strategy
+async def execute_smart_buy(limit: int = Query(1, ge=1, le=20), current_user: dict = Depends(get_current_user),
+                            engine=Depends(get_engine)):
+    """手动执行智能买入（limit 只推荐股票并发下单）"""
+    try:
+        return await engine.call('smart.execute_buy', limit=limit)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/execute-batch")
+async def execute_batch_orders(request: BatchOrderRequest, current_user: dict = Depends(get_current_user),
+                               engine=Depends(get_engine)):
+    """批量下单：统一风控检查后并发提交，交易记录一次写入"""
+    if not request.orders:
+        return {"code": 1, "message": "下单列表为空"}
     
     try:
-        # 获取智能推荐的股票
-        recommendations = await smart_trader.get_top_recommendations(limit=1)
-        
-        if not recommendations:
-            return {"code": 1, "message": "当前没有合适的买入推荐"}
-        
-        top_pick = recommendations[0]
-        symbol = top_pick.get('symbol')
-        price = top_pick.get('price', 0)
-        
-        if not symbol or price <= 0:
-            return {"code": 1, "message": "推荐股票数据无效"}
-        
-        # 执行买入
-        result = await trading_strategy.execute_buy(
-            symbol=symbol,
-            price=price,
-            acceleration=top_pick.get('acceleration', 0)
-        )
-        
-        if result.get('success'):
-            return {
-                "code": 0, 
-                "message": f"智能买入已执行: {symbol}",
-                "data": result
-            }
-        else:
-            return {"code": 1, "message": result.get('message', '买入失败')}
-            
+        intents = [
+            {'symbol': o.symbol, 'side': o.side, 'price': o.price,
+             'quantity': o.quantity, 'acceleration': o.acceleration or 0}
+            for o in request.orders
+        ]
+        result = await engine.call('orders.execute_batch', intents=intents)
+        return {
+            "code": 0 if result.get('success') else 1,
+            "message": f"已提交 {result['submitted']}/{len(request.orders)} 笔订单",
+            "data": result
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/schedule")
+async def get_trade_schedule(limit: int = Query(20, ge=1, le=100), current_user: dict = Depends(get_current_user),
+                             engine=Depends(get_engine)):
+    """获取自动交易任务（盘前预测 / 开盘买入）及执行延迟"""
+    try:
+        return {"code": 0, "data": await engine.call('scheduler.schedule', limit=limit)}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/predictions")
-async def get_predictions(days: int = 7, current_user: dict = Depends(get_current_user)):
-    """获取预测历史"""
-    conn = get_db_connection()
-    cursor = conn.cursor(pymysql.cursors.DictCursor)
-    
+async def get_predictions(days: int = 7, current_user: dict = Depends(get_current_user), engine=Depends(get_engine)):
+    """获取预测历史（引擎进程的预测索引缓存，预测更新、跨日或缓存超时后重新查询）"""
     try:
-        cursor.execute("""
-            SELECT * FROM stock_predictions 
-            WHERE prediction_date >= DATE_SUB(CURDATE(), INTERVAL %s DAY)
-            ORDER BY prediction_date DESC, technical_score DESC
-            LIMIT 100
-        """, (days,))
-        predictions = cursor.fetchall()
-        return {"code": 0, "data": predictions}
+        predictions = await engine.call('smart.predictions', days=days)
+        return FastJSONResponse({"code": 0, "data": predictions})
     except Exception:
         # 表可能不存在
         return {"code": 0, "data": []}
-    finally:
-        cursor.close()
-        conn.close()
 
 
 @router.get("/prediction-accuracy")
-async def get_prediction_accuracy(current_user: dict = Depends(get_current_user)):
-    """获取预测准确率统计"""
-    conn = get_db_connection()
-    cursor = conn.cursor(pymysql.cursors.DictCursor)
-    
+async def get_prediction_accuracy(current_user: dict = Depends(get_current_user), engine=Depends(get_engine)):
+    """获取预测准确率统计（引擎进程的预测索引缓存，预测更新、跨日或缓存超时后重新查询）"""
     try:
-        cursor.execute("""
-            SELECT 
-                COUNT(*) as total,
-                SUM(CASE WHEN predicted_return > 0 AND actual_return > 0 THEN 1
-                         WHEN predicted_return < 0 AND actual_return < 0 THEN 1
-                         ELSE 0 END) as correct,
-                AVG(predicted_return) as avg_predicted,
-                AVG(actual_return) as avg_actual
-            FROM stock_predictions
-            WHERE actual_return IS NOT NULL
-            AND prediction_date >= DATE_SUB(CURDATE(), INTERVAL 30 DAY)
-        """)
-        stats = cursor.fetchone()
+        stats = await engine.call('smart.prediction_accuracy', days=30)
         
         if stats and stats['total'] and stats['total'] > 0:
             accuracy = (stats['correct'] / stats['total'] * 100)
@@ -232,6 +163,3 @@ async def get_prediction_accuracy(current_user: dict = Depends(get_current_user)
                 "avg_actual_return": 0
             }
         }
-    finally:
-        cursor.close()
-        conn.close()
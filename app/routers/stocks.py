@@ -5,8 +5,9 @@ from fastapi import APIRouter, HTTPException, Depends
 import pymysql
 
 from app.config.database import get_db_connection
-from app.config.settings import classify_symbol_type
+from app.core.serialization import FastJSONResponse
 from app.auth.utils import get_current_user
+from app.services.symbol_registry import symbol_registry
 
 router = APIRouter(prefix="/api/stocks", tags=["股票"])
 
@@ -20,7 +21,7 @@ async def get_stocks(current_user: dict = Depends(get_current_user)):
     try:
         cursor.execute("SELECT * FROM stocks ORDER BY group_order ASC, id DESC")
         stocks = cursor.fetchall()
-        return {"code": 0, "data": stocks}
+        return FastJSONResponse({"code": 0, "data": stocks})
     finally:
         cursor.close()
         conn.close()
@@ -40,7 +41,7 @@ async def add_stock(stock: dict, current_user: dict = Depends(get_current_user))
         if not symbol:
             raise HTTPException(status_code=400, detail="股票代码不能为空")
         
-        stock_type = classify_symbol_type(symbol)
+        stock_type = symbol_registry.register(symbol, name=name).stock_type
         
         cursor.execute(
             """INSERT INTO stocks (symbol, name, stock_type, group_name, is_active) 
@@ -1,12 +1,16 @@
 """
 交易记录路由
 """
-from fastapi import APIRouter, Depends
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Query
 import pymysql
 
 from app.config.database import get_db_connection
+from app.core.serialization import FastJSONResponse
 from app.auth.utils import get_current_user, is_test_mode
-from app.services.longbridge_sdk import longbridge_sdk
+from app.core.container import get_engine
+from app.services.order_sync import order_sync
 
 router = APIRouter(tags=["交易"])
 
@@ -24,17 +28,38 @@ async def get_trades(current_user: dict = Depends(get_current_user)):
             (test_mode,)
         )
         trades = cursor.fetchall()
-        return {"code": 0, "data": trades}
+        return FastJSONResponse({"code": 0, "data": trades})
     finally:
         cursor.close()
         conn.close()
 
 
 @router.get("/api/orders")
-async def get_orders(current_user: dict = Depends(get_current_user)):
-    """获取历史订单"""
+async def get_orders(
+    symbol: Optional[str] = None,
+    status: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    current_user: dict = Depends(get_current_user)
+):
+    """获取历史订单（本地 orders 表，增量同步自长桥）"""
     try:
-        orders = await longbridge_sdk.get_history_orders(days=90, limit=100)
-        return {"code": 0, "data": orders}
+        orders = order_sync.list_orders(symbol=symbol, status=status, limit=limit)
+        return FastJSONResponse({"code": 0, "data": orders})
     except Exception as e:
         return {"code": 0, "data": [], "message": str(e)}
+
+
+@router.get("/api/orders/today-stats")
+async def get_today_order_stats(current_user: dict = Depends(get_current_user)):
+    """当日已成交订单统计"""
+    try:
+        return {"code": 0, "data": order_sync.today_stats(), "sync": order_sync.get_stats()}
+    except Exception as e:
+        return {"code": 0, "data": {}, "message": str(e)}
+
+
+@router.get("/api/orders/book")
+async def get_order_book(active_only: bool = False, current_user: dict = Depends(get_current_user),
+                         engine=Depends(get_engine)):
+    """获取内存订单簿（含成交进度与逐单延迟）"""
+    return {"code": 0, **await engine.call('orders.book', active_only=active_only)}
@@ -1,8 +1,39 @@
 # 服务层模块
-from .test_mode import TestModePriceManager, test_mode_price_manager
-from .longbridge_sdk import LongBridgeSDK, longbridge_sdk, LONGBRIDGE_AVAILABLE
-from .acceleration import AccelerationCalculator, acceleration_calculator
-from .smart_trader import SmartPredictionTrader, smart_trader
-from .trading_strategy import TradingStrategy, trading_strategy
-from .task_queue import AsyncTaskQueue, task_queue
-from .sse import sse_clients, notify_sse_clients
+# 按需导入：首次访问 app.services.<名称> 时才加载对应子模块（长桥SDK、httpx 等依赖较重，不在导入包时加载）
+import importlib
+
+_EXPORTS = {
+    'TestModePriceManager': 'test_mode', 'test_mode_price_manager': 'test_mode',
+    'TokenBucketLimiter': 'rate_limiter', 'rate_limiters': 'rate_limiter',
+    'QuoteCoalescer': 'quote_coalescer',
+    'SymbolRegistry': 'symbol_registry', 'symbol_registry': 'symbol_registry',
+    'LongBridgeSDK': 'longbridge_sdk', 'longbridge_sdk': 'longbridge_sdk', 'LONGBRIDGE_AVAILABLE': 'longbridge_sdk',
+    'LongBridgeContextPool': 'context_pool', 'context_pool': 'context_pool', 'LongBridgeNotConfigured': 'context_pool',
+    'LongBridgePoolExhausted': 'context_pool',
+    'QuoteMultiplexer': 'quote_mux', 'quote_mux': 'quote_mux',
+    'ConnectionSupervisor': 'connection_supervisor', 'connection_supervisor': 'connection_supervisor',
+    'AccelerationCalculator': 'acceleration', 'acceleration_calculator': 'acceleration',
+    'MarketSnapshot': 'market_snapshot', 'market_snapshot': 'market_snapshot',
+    'PredictionIndex': 'prediction_index', 'prediction_index': 'prediction_index',
+    'SmartPredictionTrader': 'smart_trader', 'smart_trader': 'smart_trader',
+    'TradingStrategy': 'trading_strategy', 'trading_strategy': 'trading_strategy',
+    'PositionLedger': 'position_ledger', 'position_ledger': 'position_ledger',
+    'ExitEngine': 'exit_engine', 'exit_engine': 'exit_engine',
+    'OrderManager': 'order_manager', 'order_manager': 'order_manager',
+    'OrderHistorySync': 'order_sync', 'order_sync': 'order_sync',
+    'PortfolioService': 'portfolio', 'portfolio_service': 'portfolio',
+    'TradeScheduler': 'trade_scheduler', 'trade_scheduler': 'trade_scheduler',
+    'AsyncTaskQueue': 'task_queue', 'task_queue': 'task_queue',
+    'sse_clients': 'sse', 'notify_sse_clients': 'sse',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f'.{module_name}', __name__), name)
+    globals()[name] = value
+    return value
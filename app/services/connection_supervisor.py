@@ -0,0 +1,155 @@
+"""
+长桥连接守护
+- 真实模式下定期心跳检查行情/交易连接，失败后按指数退避（带随机抖动）重连，直到恢复
+- 连接失败不会切换到模拟数据：断线期间下单被拒绝、行情返回不可用
+- 重连成功后 SDK 自动重新订阅交易推送和全部行情推送，并与行情多路复用对齐
+- 记录状态变迁和重连耗时，供监控接口查看
+"""
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from typing import Optional
+
+from app.config.settings import SDK_HEARTBEAT_INTERVAL, SDK_RECONNECT_BACKOFF_BASE, SDK_RECONNECT_BACKOFF_MAX
+
+logger = logging.getLogger(__name__)
+
+STATE_MOCK = 'MOCK'  # 未配置真实SDK
+STATE_CONNECTING = 'CONNECTING'
+STATE_CONNECTED = 'CONNECTED'
+STATE_RECONNECTING = 'RECONNECTING'
+
+
+class ConnectionSupervisor:
+    """全局长桥连接的心跳与重连"""
+
+    def __init__(self, heartbeat_interval: float = SDK_HEARTBEAT_INTERVAL,
+                 backoff_base: float = SDK_RECONNECT_BACKOFF_BASE,
+                 backoff_max: float = SDK_RECONNECT_BACKOFF_MAX,
+                 heartbeat_timeout: float = 5.0):
+        self.heartbeat_interval = heartbeat_interval
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.heartbeat_timeout = heartbeat_timeout
+        self.state = STATE_CONNECTING
+        self._task: Optional[asyncio.Task] = None
+        self._transitions = deque(maxlen=50)
+        self._latencies = deque(maxlen=50)  # 重连耗时（毫秒）
+
+        # 统计
+        self.heartbeats = 0
+        self.heartbeat_failures = 0
+        self.reconnects = 0
+        self.attempts = 0
+
+    @staticmethod
+    def _sdk():
+        from .longbridge_sdk import longbridge_sdk
+        return longbridge_sdk
+
+    def _transition(self, state: str, reason: str = ''):
+        if state == self.state:
+            return
+        self._transitions.append({'from': self.state, 'to': state, 'at': time.time(), 'reason': reason})
+        logger.info(f"长桥连接状态: {self.state} -> {state} {reason}")
+        self.state = state
+
+    def backoff_delay(self, attempt: int) -> float:
+        """第 attempt 次失败后的等待时间：指数增长，上限 backoff_max，乘以 [0.5, 1) 随机抖动"""
+        delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return delay * random.uniform(0.5, 1.0)
+
+    async def reconnect(self, sdk, reason: str = '') -> float:
+        """重连直到成功，返回耗时（毫秒）"""
+        started = time.monotonic()
+        self._transition(STATE_RECONNECTING, reason)
+        attempt = 0
+        while True:
+            self.attempts += 1
+            if await sdk.connect():
+                break
+            delay = self.backoff_delay(attempt)
+            logger.warning(f"长桥重连失败（第 {attempt + 1} 次），{delay:.1f}s 后重试: {sdk.last_error}")
+            attempt += 1
+            await asyncio.sleep(delay)
+
+        latency_ms = (time.monotonic() - started) * 1000
+        self._latencies.append(latency_ms)
+        self.reconnects += 1
+        self._transition(STATE_CONNECTED, f'重连耗时 {latency_ms:.0f}ms')
+
+        # SDK 已按记录的订阅集合重新订阅，这里再与多路复用的期望集合对齐一次
+        from .quote_mux import quote_mux
+        try:
+            await quote_mux.flush()
+        except Exception as e:
+            logger.warning(f"重连后行情订阅对齐失败: {e}")
+        return latency_ms
+
+    async def check(self):
+        """一次检查：未连接时重连，已连接时心跳"""
+        sdk = self._sdk()
+        if not sdk.use_real_sdk:
+            self._transition(STATE_MOCK, '未配置真实SDK')
+            return
+        if not sdk.is_connected:
+            await self.reconnect(sdk, sdk.last_error or '未连接')
+            return
+
+        self.heartbeats += 1
+        if await sdk.heartbeat(self.heartbeat_timeout):
+            self._transition(STATE_CONNECTED)
+            return
+        self.heartbeat_failures += 1
+        sdk.mark_disconnected(sdk.last_error or '心跳失败')
+        await self.reconnect(sdk, f'心跳失败: {sdk.last_error}')
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.check()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"长桥连接检查失败: {e}")
+            await asyncio.sleep(self.heartbeat_interval)
+
+    def get_stats(self) -> dict:
+        sdk = self._sdk()
+        latencies = list(self._latencies)
+        return {
+            'state': self.state,
+            'running': self._task is not None,
+            'use_real_sdk': bool(sdk.use_real_sdk),
+            'is_connected': sdk.is_connected,
+            'last_error': sdk.last_error,
+            'heartbeats': self.heartbeats,
+            'heartbeat_failures': self.heartbeat_failures,
+            'reconnects': self.reconnects,
+            'attempts': self.attempts,
+            'reconnect_ms': {
+                'last': round(latencies[-1], 1) if latencies else None,
+                'avg': round(sum(latencies) / len(latencies), 1) if latencies else None,
+                'max': round(max(latencies), 1) if latencies else None
+            },
+            'transitions': list(self._transitions)[-10:]
+        }
+
+
+# 全局实例
+connection_supervisor = ConnectionSupervisor()
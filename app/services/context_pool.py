@@ -0,0 +1,332 @@
+"""
+多用户长桥连接池
+- 按凭证（app_key / app_secret / access_token / 接入地址）区分连接，凭证相同的用户共享同一对行情/交易连接
+- 连接在用户首次使用时创建；超过空闲时间或超过连接数上限（按最近使用淘汰）时关闭
+- 请求通过 use() 持有连接，持有期间不会被淘汰关闭：达到上限时只淘汰无人持有的连接，
+  全部连接都在使用时等待空出名额，超时返回连接池已满（LongBridgePoolExhausted），
+  实际打开的连接数（含连接中、等待延迟关闭的连接）不超过上限
+- 新建连接在锁外进行，同一凭证的并发请求共享同一次连接，慢连接不阻塞其他凭证
+- 凭证与全局配置相同、或未配置个人凭证的用户使用全局默认连接（后台服务共用，不参与淘汰）；
+  全局连接只使用系统配置的凭证，系统也未配置时返回未配置（LongBridgeNotConfigured）
+- 用户更新凭证只影响自己的连接，不覆盖全局配置、不断开其他用户
+"""
+import asyncio
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Dict, Optional, Set
+
+from app.config.settings import (LONGBRIDGE_CONFIG, LONGBRIDGE_MAX_CONTEXTS, LONGBRIDGE_CONTEXT_IDLE_TIMEOUT,
+                                 LONGBRIDGE_CONTEXT_WAIT_TIMEOUT)
+from app.auth.utils import load_user_longbridge_config
+from .longbridge_sdk import LONGBRIDGE_AVAILABLE, LongBridgeSDK
+
+logger = logging.getLogger(__name__)
+
+_URL_KEYS = ('http_url', 'quote_ws_url', 'trade_ws_url')
+
+
+def credential_key(config: dict) -> Optional[str]:
+    """凭证指纹；凭证不完整时返回 None"""
+    if not (config.get('app_key') and config.get('app_secret') and config.get('access_token')):
+        return None
+    raw = '\n'.join(str(config.get(k) or '') for k in ('app_key', 'app_secret', 'access_token', *_URL_KEYS))
+    return hashlib.sha256(raw.encode()).hexdigest()[:16]
+
+
+class LongBridgeNotConfigured(RuntimeError):
+    """用户未配置长桥凭证，系统也没有配置全局凭证"""
+
+
+class LongBridgePoolExhausted(RuntimeError):
+    """连接数达到上限且全部连接都在使用，等待超时"""
+
+
+class PooledContext:
+    """连接池中的一组连接"""
+
+    __slots__ = ('key', 'sdk', 'created_at', 'last_used', 'users', 'leases', 'closing')
+
+    def __init__(self, key: str, sdk: LongBridgeSDK):
+        self.key = key
+        self.sdk = sdk
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.users = set()
+        self.leases = 0  # 正在使用的请求数
+        self.closing = False  # 已移出连接池，等待最后一个请求结束后关闭
+
+
+class LongBridgeContextPool:
+    """按用户凭证复用的长桥连接池"""
+
+    def __init__(self, max_contexts: int = LONGBRIDGE_MAX_CONTEXTS,
+                 idle_timeout: float = LONGBRIDGE_CONTEXT_IDLE_TIMEOUT,
+                 sdk_factory: Callable[[dict], LongBridgeSDK] = LongBridgeSDK,
+                 wait_timeout: float = LONGBRIDGE_CONTEXT_WAIT_TIMEOUT):
+        self.max_contexts = max_contexts
+        self.idle_timeout = idle_timeout
+        self.wait_timeout = wait_timeout
+        self._sdk_factory = sdk_factory
+        self._contexts: 'OrderedDict[str, PooledContext]' = OrderedDict()  # 按最近使用排序
+        self._connecting: Dict[str, asyncio.Future] = {}  # 正在新建的连接（占用名额）
+        self._retiring: Set[PooledContext] = set()  # 已移出连接池、等待请求结束后关闭（仍占用名额）
+        self._slot_freed = asyncio.Event()
+        self._user_configs: Dict[int, dict] = {}
+        self._task: Optional[asyncio.Task] = None
+
+        # 统计
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.default_uses = 0
+        self.waits = 0
+        self.exhausted = 0
+
+    # ---------- 凭证 ----------
+
+    async def _user_config(self, user_id: int) -> dict:
+        """用户凭证（缓存，更新配置时失效）；接入地址未配置时沿用全局配置"""
+        config = self._user_configs.get(user_id)
+        if config is None:
+            user_config = await asyncio.to_thread(load_user_longbridge_config, user_id)
+            config = {k: v for k, v in user_config.items() if v}
+            for k in _URL_KEYS:
+                if not config.get(k) and LONGBRIDGE_CONFIG.get(k):
+                    config[k] = LONGBRIDGE_CONFIG[k]
+            self._user_configs[user_id] = config
+        return config
+
+    def invalidate_user(self, user_id: int):
+        """用户凭证变更：下次使用时重新加载（旧连接若无人使用则随空闲淘汰）"""
+        self._user_configs.pop(user_id, None)
+        for ctx in self._contexts.values():
+            ctx.users.discard(user_id)
+
+    # ---------- 获取连接 ----------
+
+    @staticmethod
+    def _default_sdk() -> LongBridgeSDK:
+        from .longbridge_sdk import longbridge_sdk
+        return longbridge_sdk
+
+    async def _resolve(self, user_id: Optional[int]) -> tuple:
+        """用户使用的 (凭证, 连接指纹)；指纹为 None 表示使用全局默认连接"""
+        if user_id is None:
+            return {}, None
+        config = await self._user_config(user_id)
+        key = credential_key(config)
+        default_key = credential_key(LONGBRIDGE_CONFIG)
+        if key is None or key == default_key:
+            if default_key is None:
+                raise LongBridgeNotConfigured('未配置长桥凭证，请先在系统设置中配置')
+            return config, None
+        return config, key
+
+    async def uses_default(self, user_id: Optional[int]) -> bool:
+        """用户是否使用全局默认连接（未配置时抛出 LongBridgeNotConfigured）"""
+        _, key = await self._resolve(user_id)
+        return key is None
+
+    async def get(self, user_id: Optional[int]) -> LongBridgeSDK:
+        """用户对应的 SDK 实例，首次使用时创建并连接（不持有连接，请求中使用 use()）"""
+        sdk, _ = await self._acquire(user_id, lease=False)
+        return sdk
+
+    @asynccontextmanager
+    async def use(self, user_id: Optional[int]) -> AsyncIterator[LongBridgeSDK]:
+        """在请求期间持有用户对应的 SDK 实例，持有期间连接不会被淘汰关闭"""
+        sdk, ctx = await self._acquire(user_id, lease=True)
+        try:
+            yield sdk
+        finally:
+            if ctx is not None:
+                ctx.leases -= 1
+                if ctx.leases == 0:
+                    if ctx.closing:
+                        self._retiring.discard(ctx)
+                        self._close(ctx, '延迟关闭')
+                    self._notify_slot()
+
+    async def _acquire(self, user_id: Optional[int], lease: bool) -> tuple:
+        """返回 (sdk, 连接池条目)；lease=True 时在任何等待之前登记持有，避免连接中途被关闭"""
+        config, key = await self._resolve(user_id)
+        if key is None:
+            self.default_uses += 1
+            return self._default_sdk(), None
+
+        ctx = self._touch(key, user_id, lease)
+        if ctx is not None:
+            self.hits += 1
+            if not ctx.sdk.is_connected:
+                # 上次连接失败或已断开：重连（失败时保持真实模式，请求返回不可用）
+                await ctx.sdk.connect()
+            return ctx.sdk, (ctx if lease else None)
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.wait_timeout
+        while True:
+            pending = self._connecting.get(key)
+            if pending is not None:
+                # 同一凭证正在连接：等待那次连接完成后复用
+                await asyncio.shield(pending)
+            else:
+                self._evict_idle()
+                if self._reserve_slot():
+                    break
+                await self._wait_slot(deadline)
+            ctx = self._touch(key, user_id, lease)
+            if ctx is not None:
+                self.hits += 1
+                return ctx.sdk, (ctx if lease else None)
+
+        # 检查与登记之间没有 await，事件循环内无需加锁；连接期间不占用任何锁，不阻塞其他凭证
+        self.misses += 1
+        future = loop.create_future()
+        self._connecting[key] = future
+        try:
+            sdk = self._sdk_factory(dict(config))
+            await sdk.connect()
+            ctx = PooledContext(key, sdk)
+            ctx.users.add(user_id)
+            if lease:
+                ctx.leases += 1
+            self._contexts[key] = ctx
+        finally:
+            # 失败时等待者重新检查并自行连接，名额归还给其他凭证
+            del self._connecting[key]
+            future.set_result(None)
+            self._notify_slot()
+        logger.info(f"长桥连接池新建连接: key={key} 当前 {self._open_count()}/{self.max_contexts}")
+        return sdk, (ctx if lease else None)
+
+    def _touch(self, key: str, user_id: int, lease: bool = False) -> Optional[PooledContext]:
+        ctx = self._contexts.get(key)
+        if ctx is not None:
+            ctx.last_used = time.monotonic()
+            ctx.users.add(user_id)
+            if lease:
+                ctx.leases += 1
+            self._contexts.move_to_end(key)
+        return ctx
+
+    async def status(self, user_id: int) -> dict:
+        """用户连接状态（只读取已有连接，不创建、不连接）"""
+        try:
+            _, key = await self._resolve(user_id)
+        except LongBridgeNotConfigured:
+            return {'configured': False, 'is_connected': False, 'use_real_sdk': False}
+        if key is None:
+            sdk = self._default_sdk()
+            return {'configured': True, 'is_connected': sdk.is_connected, 'use_real_sdk': sdk.use_real_sdk}
+        ctx = self._contexts.get(key)
+        if ctx is None:
+            return {'configured': True, 'is_connected': False, 'use_real_sdk': LONGBRIDGE_AVAILABLE}
+        return {'configured': True, 'is_connected': ctx.sdk.is_connected, 'use_real_sdk': ctx.sdk.use_real_sdk}
+
+    # ---------- 淘汰 ----------
+
+    def _close(self, ctx: PooledContext, reason: str):
+        self.evictions += 1
+        logger.info(f"长桥连接池关闭连接: key={ctx.key} ({reason})")
+        ctx.sdk.close()
+
+    def _retire(self, ctx: PooledContext, reason: str):
+        """关闭已移出连接池的连接；仍有请求持有时等最后一个请求结束后再关闭"""
+        if ctx.leases:
+            ctx.closing = True
+            self._retiring.add(ctx)
+            logger.info(f"长桥连接池延迟关闭连接: key={ctx.key} ({reason}，{ctx.leases} 个请求使用中)")
+        else:
+            self._close(ctx, reason)
+
+    def _open_count(self) -> int:
+        """实际打开（或正在打开）的连接数"""
+        return len(self._contexts) + len(self._connecting) + len(self._retiring)
+
+    def _reserve_slot(self) -> bool:
+        """为新连接腾出名额：按最近使用淘汰无人持有的连接；全部在使用时返回 False"""
+        while self._open_count() >= self.max_contexts:
+            key = next((k for k, ctx in self._contexts.items() if not ctx.leases), None)
+            if key is None:
+                return False
+            self._close(self._contexts.pop(key), '连接数达到上限')
+        return True
+
+    def _notify_slot(self):
+        """唤醒等待名额的请求（连接释放、关闭或新建结束时）"""
+        self._slot_freed.set()
+        self._slot_freed = asyncio.Event()
+
+    async def _wait_slot(self, deadline: float):
+        remaining = deadline - asyncio.get_running_loop().time()
+        if remaining > 0:
+            self.waits += 1
+            try:
+                await asyncio.wait_for(self._slot_freed.wait(), remaining)
+                return
+            except asyncio.TimeoutError:
+                pass
+        self.exhausted += 1
+        raise LongBridgePoolExhausted(f'长桥连接数已达上限（{self.max_contexts}），请稍后重试')
+
+    def _evict_idle(self) -> int:
+        now = time.monotonic()
+        idle = [key for key, ctx in self._contexts.items()
+                if not ctx.leases and now - ctx.last_used >= self.idle_timeout]
+        for key in idle:
+            self._close(self._contexts.pop(key), '空闲超时')
+        if idle:
+            self._notify_slot()
+        return len(idle)
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        while self._contexts:
+            _, ctx = self._contexts.popitem(last=False)
+            self._retire(ctx, '服务停止')
+
+    async def _run(self):
+        """定期关闭空闲连接"""
+        interval = max(1.0, min(60.0, self.idle_timeout / 4))
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                self._evict_idle()
+            except Exception as e:
+                logger.error(f"长桥连接池清理失败: {e}")
+
+    def get_stats(self) -> dict:
+        now = time.monotonic()
+        return {
+            'running': self._task is not None,
+            'contexts': len(self._contexts),
+            'connecting': len(self._connecting),
+            'retiring': len(self._retiring),
+            'max_contexts': self.max_contexts,
+            'users': sum(len(ctx.users) for ctx in self._contexts.values()),
+            'in_use': sum(ctx.leases for ctx in self._contexts.values()),
+            'oldest_idle_seconds': round(max((now - ctx.last_used for ctx in self._contexts.values()), default=0), 1),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'default_uses': self.default_uses,
+            'waits': self.waits,
+            'exhausted': self.exhausted
+        }
+
+
+# 全局实例
+context_pool = LongBridgeContextPool()
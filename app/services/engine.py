@@ -0,0 +1,408 @@
+"""
+交易引擎
+- 汇集依赖进程内状态的操作：监控开关、行情快照与加速度历史、SSE 事件、智能交易（LLM 缓存）、
+  订单簿、调度任务、账户估值、长桥连接状态、用户长桥连接池（各用户的持仓、自选股）
+- 单进程部署时路由直接调用本进程的引擎；多 worker 部署时只有引擎进程持有这些状态，
+  API worker 通过 Unix socket 调用（见 app/core/engine_ipc.py），接口相同：await engine.call(方法名, **参数)
+- 返回值均为可 JSON 序列化的数据
+"""
+import asyncio
+import logging
+from typing import AsyncIterator, List, Optional
+
+import pymysql
+
+from app.config.database import get_db_connection
+from app.auth.utils import invalidate_test_mode_cache, is_test_mode
+from app.core.serialization import dumps_text
+from .acceleration import acceleration_calculator
+from .sse import sse_clients
+
+logger = logging.getLogger(__name__)
+
+EVENT_HEARTBEAT_INTERVAL = 30.0  # SSE 心跳间隔（秒）
+
+
+def _active_symbols() -> list:
+    """股票池中启用的股票"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT symbol FROM stocks WHERE is_active = 1")
+        return [row[0] for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+        conn.close()
+
+
+class TradingEngine:
+    """持有实时状态的交易引擎"""
+
+    # 可远程调用的方法：方法名 -> 实现（不在表中的名称一律拒绝）
+    METHODS = {
+        'monitoring.start': 'start_monitoring',
+        'monitoring.stop': 'stop_monitoring',
+        'monitoring.status': 'monitoring_status',
+        'market.snapshot': 'market_snapshot',
+        'market.quotes': 'quotes',
+        'market.klines': 'klines',
+        'config.reload': 'reload_config',
+        'smart.status': 'smart_status',
+        'smart.reload_config': 'reload_smart_config',
+        'smart.run_prediction': 'run_prediction',
+        'smart.execute_buy': 'execute_smart_buy',
+        'smart.predictions': 'prediction_history',
+        'smart.prediction_accuracy': 'prediction_accuracy',
+        'orders.execute_batch': 'execute_batch',
+        'orders.book': 'order_book',
+        'scheduler.schedule': 'schedule',
+        'portfolio.get': 'portfolio',
+        'connection.status': 'connection_status',
+        'account.status': 'account_status',
+        'account.connect': 'connect_account',
+        'account.positions': 'account_positions',
+        'account.watchlist': 'account_watchlist',
+    }
+
+    def __init__(self):
+        self.is_monitoring = False
+        self._services = None
+
+    def attach(self, services):
+        """绑定服务容器（引擎使用容器中的服务实例）"""
+        self._services = services
+
+    @property
+    def services(self):
+        if self._services is None:
+            from app.core.container import ServiceContainer
+            self._services = ServiceContainer()
+        return self._services
+
+    async def call(self, method: str, **params):
+        """按方法名调用（本进程与 IPC 共用的入口）"""
+        name = self.METHODS.get(method)
+        if name is None:
+            raise ValueError(f"未知的引擎方法: {method}")
+        result = getattr(self, name)(**params)
+        if asyncio.iscoroutine(result):
+            result = await result
+        return result
+
+    # ---------- 监控 ----------
+
+    async def start_monitoring(self, buy_amount: Optional[str] = None) -> dict:
+        services = self.services
+        if self.is_monitoring:
+            return {"code": 0, "message": "监控已在运行中"}
+
+        # 如果传入了 buy_amount，先更新配置
+        if buy_amount:
+            conn = get_db_connection()
+            cursor = conn.cursor()
+            cursor.execute("""
+                UPDATE system_config SET config_value = %s WHERE config_key = 'buy_amount'
+            """, (buy_amount,))
+            conn.commit()
+            cursor.close()
+            conn.close()
+            logger.info(f"更新买入金额配置: {buy_amount}")
+
+        strategy = services.trading_strategy
+        await strategy.load_config()
+        await services.task_queue.start()
+
+        # 订阅股票池行情推送，行情接口直接命中推送缓存
+        services.quote_mux.set_symbols('monitoring', await asyncio.to_thread(_active_symbols))
+        self.is_monitoring = True
+
+        return {
+            "code": 0,
+            "message": "监控已启动",
+            "data": {
+                "is_test_mode": is_test_mode(),
+                "profit_target": strategy.profit_target,
+                "buy_amount": strategy.buy_amount
+            }
+        }
+
+    async def stop_monitoring(self) -> dict:
+        self.is_monitoring = False
+        await self.services.task_queue.stop()
+        self.services.quote_mux.unsubscribe('monitoring')
+        return {"code": 0, "message": "监控已停止"}
+
+    def monitoring_status(self) -> dict:
+        from .rate_limiter import rate_limiters
+
+        services = self.services
+        strategy = services.trading_strategy
+        test_mode = is_test_mode()
+        return {
+            "is_monitoring": self.is_monitoring,
+            "is_test_mode": test_mode,
+            "test_mode": test_mode,  # 前端兼容字段
+            "config": {
+                "profit_target": strategy.profit_target,
+                "buy_amount": strategy.buy_amount,
+                "max_concurrent_positions": strategy.max_concurrent_positions
+            },
+            "top_accelerating": acceleration_calculator.get_top_accelerating(5),
+            "rate_limits": rate_limiters.get_stats(),
+            "orders": services.order_manager.get_stats(),
+            "position_ledger": services.position_ledger.get_stats(),
+            "task_queue": services.task_queue.get_stats(),
+            "portfolio": services.portfolio.get_stats(),
+            "order_sync": services.order_sync.get_stats(),
+            "context_pool": services.context_pool.get_stats(),
+            "quote_mux": services.quote_mux.get_stats(),
+            "quote_snapshot": services.quote_snapshot.get_stats(),
+            "connection": services.connection_supervisor.get_stats(),
+            "symbol_registry": services.symbol_registry.get_stats(),
+            "startup": services.get_stats()
+        }
+
+    # ---------- 行情 ----------
+
+    async def market_snapshot(self, since: Optional[int] = None, etag: Optional[str] = None) -> dict:
+        """
+        股票池行情（按分组，含加速度）
+        - 返回 seq/etag；etag 与传入值相同时只返回 not_modified
+        - 传入 since 时尽量只返回该序号之后变化的股票（delta=True）
+        """
+        sdk = self.services.sdk
+        snapshot = self.services.market_snapshot
+        shared = self.services.quote_snapshot  # 未启动时发布为空操作
+        conn = get_db_connection()
+        cursor = conn.cursor(pymysql.cursors.DictCursor)
+
+        try:
+            # 获取自选股/股票池
+            cursor.execute("""
+                SELECT symbol, name, stock_type, group_name, group_order
+                FROM stocks WHERE is_active = 1
+                ORDER BY group_order ASC, id DESC
+            """)
+            stocks = cursor.fetchall()
+
+            if not stocks and not is_test_mode():
+                # 真实模式：如果本地股票池为空，尝试从长桥自选股同步
+                lb_watchlist = await sdk.get_watchlist()
+                if lb_watchlist:
+                    for item in lb_watchlist:
+                        try:
+                            cursor.execute("""
+                                INSERT IGNORE INTO stocks (symbol, name, group_name)
+                                VALUES (%s, %s, %s)
+                            """, (item['symbol'], item['name'], item['group']))
+                        except Exception:
+                            pass
+                    conn.commit()
+                    # 重新查询
+                    cursor.execute("""
+                        SELECT symbol, name, stock_type, group_name, group_order
+                        FROM stocks WHERE is_active = 1
+                        ORDER BY group_order ASC, id DESC
+                    """)
+                    stocks = cursor.fetchall()
+        finally:
+            cursor.close()
+            conn.close()
+
+        if not stocks:
+            seq = snapshot.update({})
+            return {"seq": seq, "etag": snapshot.etag, "data": {}}
+
+        quotes = await sdk.get_realtime_quote([s['symbol'] for s in stocks])
+        quotes_map = {q['symbol']: q for q in quotes}
+
+        # 按分组组织数据
+        grouped_data = {}
+        for stock in stocks:
+            group = stock.get('group_name') or '默认分组'
+            if group not in grouped_data:
+                grouped_data[group] = {
+                    "group_name": group,
+                    "group_order": stock.get('group_order', 0),
+                    "stocks": []
+                }
+
+            symbol = stock['symbol']
+            quote = quotes_map.get(symbol, {})
+
+            # 真实模式下，如果行情获取失败且非测试模式，价格显示为0或上一次价格
+            price = quote.get('price', 0)
+            change_pct = quote.get('change_pct', 0)
+
+            acceleration = acceleration_calculator.update(symbol, price, change_pct)
+            if price > 0:
+                shared.publish(sdk._normalize_symbol(symbol), price, change_pct, quote.get('volume', 0), acceleration)
+
+            grouped_data[group]["stocks"].append({
+                'symbol': symbol,
+                'name': stock['name'],
+                'stock_type': stock.get('stock_type', 'STOCK'),
+                'price': price,
+                'change_pct': change_pct,
+                'volume': quote.get('volume', 0),
+                'acceleration': acceleration
+            })
+
+        seq = snapshot.update(grouped_data)
+        if etag is not None and etag == snapshot.etag:
+            return {"seq": seq, "etag": etag, "not_modified": True}
+        if since is not None:
+            delta = snapshot.changes_since(since)
+            if delta is not None:
+                return {"seq": seq, "etag": snapshot.etag, "delta": True, "data": delta}
+        return {"seq": seq, "etag": snapshot.etag, "data": grouped_data}
+
+    async def quotes(self, symbols: List[str]) -> list:
+        return await self.services.sdk.get_realtime_quote(symbols)
+
+    async def klines(self, symbol: str, period: str = 'day', count: int = 30) -> list:
+        return await self.services.sdk.get_stock_history(symbol, period, count)
+
+    async def events(self, symbols: Optional[List[str]] = None) -> AsyncIterator[str]:
+        """SSE 事件（已序列化的 JSON 文本）；指定 symbols 时同时推送这些股票的实时行情，空闲时发送心跳"""
+        queue = asyncio.Queue()
+        sse_clients.add(queue)
+        consumer = f"sse:{id(queue)}"
+        if symbols:
+            self.services.quote_mux.subscribe(
+                consumer, symbols,
+                lambda quote: queue.put_nowait(dumps_text({'type': 'quote', 'data': quote}))
+            )
+        try:
+            while True:
+                try:
+                    yield await asyncio.wait_for(queue.get(), timeout=EVENT_HEARTBEAT_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield dumps_text({'type': 'heartbeat'})
+        finally:
+            sse_clients.discard(queue)
+            self.services.quote_mux.unsubscribe(consumer)
+
+    # ---------- 配置 ----------
+
+    async def reload_config(self, smart: bool = False):
+        """系统配置变更后重新加载交易策略配置（smart 为真时同时重新加载智能交易配置）"""
+        invalidate_test_mode_cache()
+        await self.services.trading_strategy.load_config()
+        if smart:
+            await self.services.smart_trader.load_config()
+
+    # ---------- 智能交易 ----------
+
+    def smart_status(self) -> dict:
+        from .prediction_index import prediction_index
+        return {
+            "status": self.services.smart_trader.get_status(),
+            "today_predictions": prediction_index.top_rows(10),
+            "today_stats": prediction_index.trade_stats()
+        }
+
+    async def prediction_history(self, days: int = 7) -> list:
+        """预测历史（预测在引擎进程中更新，查询缓存随之失效）"""
+        from .prediction_index import prediction_index
+        return await asyncio.to_thread(prediction_index.history, days)
+
+    async def prediction_accuracy(self, days: int = 30) -> Optional[dict]:
+        from .prediction_index import prediction_index
+        return await asyncio.to_thread(prediction_index.accuracy, days)
+
+    async def reload_smart_config(self):
+        await self.services.smart_trader.load_config()
+
+    async def run_prediction(self) -> list:
+        smart_trader = self.services.smart_trader
+        await smart_trader.load_config()
+        return await smart_trader.run_daily_prediction()
+
+    async def execute_smart_buy(self, limit: int = 1) -> dict:
+        """按智能推荐并发买入，返回 {code, message, data}"""
+        recommendations = await self.services.smart_trader.get_top_recommendations(limit=limit)
+        if not recommendations:
+            return {"code": 1, "message": "当前没有合适的买入推荐"}
+
+        intents = [
+            {
+                'symbol': pick.get('symbol'),
+                'side': 'BUY',
+                'price': pick.get('price', 0),
+                'acceleration': pick.get('acceleration', 0)
+            }
+            for pick in recommendations
+            if pick.get('symbol') and pick.get('price', 0) > 0
+        ]
+        if not intents:
+            return {"code": 1, "message": "推荐股票数据无效"}
+
+        result = await self.services.trading_strategy.execute_batch(intents)
+        if result.get('success'):
+            symbols = ', '.join(o['symbol'] for o in result['orders'] if o.get('success'))
+            return {"code": 0, "message": f"智能买入已执行: {symbols}", "data": result}
+        message = result.get('message') or next(
+            (o.get('message') for o in result['orders'] if not o.get('success')), '买入失败'
+        )
+        return {"code": 1, "message": message, "data": result}
+
+    async def execute_batch(self, intents: List[dict]) -> dict:
+        strategy = self.services.trading_strategy
+        await strategy.load_config()
+        return await strategy.execute_batch(intents)
+
+    # ---------- 订单、调度、账户 ----------
+
+    def order_book(self, active_only: bool = False) -> dict:
+        order_manager = self.services.order_manager
+        return {"data": order_manager.list_orders(active_only=active_only), "stats": order_manager.get_stats()}
+
+    def schedule(self, limit: int = 20) -> dict:
+        trade_scheduler = self.services.trade_scheduler
+        return {"scheduler": trade_scheduler.get_stats(), "tasks": trade_scheduler.list_tasks(limit)}
+
+    async def portfolio(self, test_mode: int) -> dict:
+        return await self.services.portfolio.get_portfolio(test_mode)
+
+    def connection_status(self) -> dict:
+        return self.services.connection_supervisor.get_stats()
+
+    # ---------- 用户长桥账户（连接池只在引擎进程中，API worker 不各自建连） ----------
+
+    async def account_status(self, user_id: int) -> dict:
+        """用户连接状态（不新建连接）"""
+        return await self.services.context_pool.status(user_id)
+
+    async def connect_account(self, user_id: int) -> dict:
+        """用户凭证变更或登录后重新加载凭证并建立连接"""
+        context_pool = self.services.context_pool
+        context_pool.invalidate_user(user_id)
+        return await self._with_account(user_id, lambda sdk: {
+            'use_real_sdk': sdk.use_real_sdk, 'is_connected': sdk.is_connected
+        })
+
+    async def account_positions(self, user_id: int) -> dict:
+        """用户长桥账户的股票持仓，返回 {code, message, data}"""
+        return await self._with_account(user_id, lambda sdk: sdk.get_stock_positions())
+
+    async def account_watchlist(self, user_id: int) -> dict:
+        """用户长桥账户的自选股，返回 {code, message, data}"""
+        return await self._with_account(user_id, lambda sdk: sdk.get_watchlist())
+
+    async def _with_account(self, user_id: int, fetch) -> dict:
+        """在持有用户连接期间执行 fetch(sdk)；用户和系统都未配置凭证、或连接数已满时返回 code=1"""
+        from .context_pool import LongBridgeNotConfigured, LongBridgePoolExhausted
+
+        try:
+            async with self.services.context_pool.use(user_id) as sdk:
+                result = fetch(sdk)
+                if asyncio.iscoroutine(result):
+                    result = await result
+        except (LongBridgeNotConfigured, LongBridgePoolExhausted) as e:
+            return {"code": 1, "message": str(e), "data": []}
+        return {"code": 0, "data": result}
+
+
+# 全局实例
+trading_engine = TradingEngine()
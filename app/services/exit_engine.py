@@ -0,0 +1,273 @@
+"""
+止盈止损引擎（智能交易卖出）
+- 跟踪每个持仓的最高价，每次行情更新时检查退出条件：
+  * 固定止盈：收益达到 base_profit_target（未开启动态止盈时）
+  * 移动止盈：收益达到 base_profit_target 后开始跟踪，从最高点回撤 trailing_stop 时卖出
+  * 最长持有：持有天数达到 max_hold_days
+- 每只股票的状态使用 __slots__ 紧凑存储，单次检查 O(1)，可支撑数千持仓逐笔检查
+- 最高价写入持仓账本（positions.peak_price），重启后恢复移动止盈线
+- 真实模式持仓通过行情多路复用订阅推送，逐笔检查；定期轮询兜底
+- 触发卖出后暂停检查该持仓，卖单结束（撤单/拒绝/过期/部分成交后结束）时由订单管理器回调恢复跟踪，
+  剩余持仓继续检查；长时间收不到回报时超时恢复
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+SECONDS_PER_DAY = 86400
+EXIT_ORDER_TIMEOUT = 300.0  # 卖单提交后未收到结束回报的最长等待（秒），超时恢复跟踪
+
+
+class ExitState:
+    """单个持仓的跟踪状态"""
+
+    __slots__ = ('entry_price', 'peak_price', 'opened_at', 'quantity', 'exiting', 'exiting_at')
+
+    def __init__(self, entry_price: float, peak_price: float, opened_at: float, quantity: int):
+        self.entry_price = entry_price
+        self.peak_price = peak_price
+        self.opened_at = opened_at
+        self.quantity = quantity
+        self.exiting = False
+        self.exiting_at = 0.0
+
+
+class ExitEngine:
+    """止盈止损引擎"""
+
+    def __init__(self, interval: float = 2.0):
+        self.interval = interval
+        self.base_profit_target = 1.0
+        self.trailing_stop = 0.5
+        self.dynamic_stop_profit = True
+        self.max_hold_days = 5
+
+        self._states: Dict[int, Dict[str, ExitState]] = {0: {}, 1: {}}
+        self._ledger = None
+        self._quote_mux = None
+        self._task: Optional[asyncio.Task] = None
+
+        # 统计
+        self.ticks = 0
+        self.exits = {'profit_target': 0, 'trailing_stop': 0, 'max_hold_days': 0}
+        self.released = 0  # 卖单结束或超时后恢复跟踪的次数
+
+    def configure(self, base_profit_target: float, trailing_stop: float,
+                  dynamic_stop_profit: bool, max_hold_days: int):
+        """更新退出参数（百分比 / 天）"""
+        self.base_profit_target = base_profit_target
+        self.trailing_stop = trailing_stop
+        self.dynamic_stop_profit = dynamic_stop_profit
+        self.max_hold_days = max_hold_days
+
+    # ---------- 持仓同步 ----------
+
+    def attach(self, ledger):
+        """从持仓账本加载当前持仓并订阅后续变化"""
+        self._ledger = ledger
+        ledger.add_listener(self.on_position_changed)
+        try:
+            for mode in (0, 1):
+                for position in ledger.holdings(mode):
+                    self.on_position_changed(mode, position['symbol'], position)
+        except Exception as e:
+            logger.warning(f"止盈止损引擎加载持仓失败: {e}")
+
+    def attach_quotes(self, quote_mux):
+        """订阅真实模式持仓的行情推送"""
+        self._quote_mux = quote_mux
+        quote_mux.set_symbols('exit_engine', self.tracked_symbols(0), self.on_quote)
+
+    def attach_orders(self, order_manager):
+        """订阅订单结束回报（卖单结束时恢复跟踪）"""
+        order_manager.add_finish_listener(self.on_order_finished)
+
+    def on_position_changed(self, test_mode: int, symbol: str, position: dict):
+        """持仓账本回调：开仓/加仓时建立或更新状态，清仓时移除"""
+        states = self._states.setdefault(test_mode, {})
+        if position['quantity'] <= 0:
+            if states.pop(symbol, None) is not None and test_mode == 0 and self._quote_mux is not None:
+                self._quote_mux.unsubscribe('exit_engine', [symbol])
+            return
+
+        entry_price = position['buy_price']
+        peak_price = max(position.get('peak_price') or entry_price, entry_price)
+        buy_time = position.get('buy_time')
+        opened_at = buy_time.timestamp() if isinstance(buy_time, datetime) else time.time()
+
+        state = states.get(symbol)
+        if state is None:
+            states[symbol] = ExitState(entry_price, peak_price, opened_at, position['quantity'])
+            if test_mode == 0 and self._quote_mux is not None:
+                self._quote_mux.subscribe('exit_engine', [symbol], self.on_quote)
+        else:
+            state.entry_price = entry_price
+            state.peak_price = max(state.peak_price, peak_price)
+            state.quantity = position['quantity']
+
+    def tracked_symbols(self, test_mode: int) -> List[str]:
+        return list(self._states.get(test_mode, {}))
+
+    # ---------- 行情检查 ----------
+
+    def on_tick(self, test_mode: int, symbol: str, price: float, now: Optional[float] = None) -> Optional[str]:
+        """
+        处理一笔行情，返回触发的退出原因（profit_target / trailing_stop / max_hold_days）或 None
+        """
+        state = self._states.get(test_mode, {}).get(symbol)
+        if state is None or price <= 0:
+            return None
+        now = now if now is not None else time.time()
+        if state.exiting:
+            if now - state.exiting_at < EXIT_ORDER_TIMEOUT:
+                return None
+            logger.warning(f"卖单 {symbol} 超过 {EXIT_ORDER_TIMEOUT:.0f} 秒未收到结束回报，恢复跟踪")
+            self._release_state(state)
+        self.ticks += 1
+
+        if price > state.peak_price:
+            state.peak_price = price
+            if self._ledger is not None:
+                self._ledger.update_peak(test_mode, symbol, price)
+
+        entry = state.entry_price
+        target_price = entry * (1 + self.base_profit_target / 100)
+
+        if self.dynamic_stop_profit:
+            # 最高价达到止盈线后开始移动止盈
+            if state.peak_price >= target_price and price <= state.peak_price * (1 - self.trailing_stop / 100):
+                return self._trigger(state, 'trailing_stop', now)
+        elif price >= target_price:
+            return self._trigger(state, 'profit_target', now)
+
+        if self.max_hold_days > 0:
+            if now - state.opened_at >= self.max_hold_days * SECONDS_PER_DAY:
+                return self._trigger(state, 'max_hold_days', now)
+        return None
+
+    def _trigger(self, state: ExitState, reason: str, now: float) -> str:
+        state.exiting = True
+        state.exiting_at = now
+        self.exits[reason] += 1
+        return reason
+
+    def _release_state(self, state: ExitState):
+        state.exiting = False
+        self.released += 1
+
+    def evaluate(self, test_mode: int, quotes: List[dict]) -> List[dict]:
+        """批量检查行情，返回需要卖出的持仓 [{'symbol', 'price', 'quantity', 'reason'}]"""
+        now = time.time()
+        exits = []
+        for quote in quotes:
+            symbol = quote.get('symbol')
+            price = quote.get('price') or 0
+            reason = self.on_tick(test_mode, symbol, price, now)
+            if reason:
+                state = self._states[test_mode][symbol]
+                exits.append({'symbol': symbol, 'price': price, 'quantity': state.quantity, 'reason': reason})
+        return exits
+
+    def on_quote(self, quote: dict):
+        """行情推送（真实模式持仓）：逐笔检查，触发时提交卖单"""
+        from app.auth.utils import is_test_mode
+        from .smart_trader import smart_trader
+
+        if not smart_trader.is_enabled or is_test_mode():
+            return None
+        exits = self.evaluate(0, [quote])
+        if exits:
+            return self._submit_exits(0, exits)
+        return None
+
+    def release(self, test_mode: int, symbol: str):
+        """卖单未成功提交或已结束时恢复跟踪"""
+        state = self._states.get(test_mode, {}).get(symbol)
+        if state is not None and state.exiting:
+            self._release_state(state)
+
+    def on_order_finished(self, order):
+        """订单结束回报：卖单撤单/拒绝/过期或部分成交后结束时，剩余持仓恢复跟踪（全部成交时持仓已移除）"""
+        if order.side == 'SELL':
+            self.release(order.test_mode, order.symbol)
+
+    # ---------- 后台检查 ----------
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        """智能交易开启时定期拉取持仓行情并执行卖出"""
+        from app.auth.utils import is_test_mode
+        from .smart_trader import smart_trader
+
+        while True:
+            try:
+                await asyncio.sleep(self.interval)
+                test_mode = 1 if is_test_mode() else 0
+                symbols = self.tracked_symbols(test_mode)
+                if not smart_trader.is_enabled or not symbols:
+                    continue
+                self.configure(smart_trader.base_profit_target, smart_trader.trailing_stop,
+                               smart_trader.dynamic_stop_profit, smart_trader.max_hold_days)
+                await self.check_and_exit(test_mode, symbols)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"止盈止损检查失败: {e}")
+
+    async def check_and_exit(self, test_mode: int, symbols: List[str]) -> List[dict]:
+        """获取行情、检查退出条件并批量提交卖单"""
+        from .longbridge_sdk import longbridge_sdk
+
+        quotes = await longbridge_sdk.get_realtime_quote(symbols)
+        exits = self.evaluate(test_mode, quotes)
+        if not exits:
+            return []
+        return await self._submit_exits(test_mode, exits)
+
+    async def _submit_exits(self, test_mode: int, exits: List[dict]) -> List[dict]:
+        """批量提交卖单，未成功提交的持仓恢复跟踪"""
+        from .trading_strategy import trading_strategy
+
+        for e in exits:
+            logger.info(f"触发卖出 {e['symbol']}: {e['reason']} @ ${e['price']:.2f}")
+        result = await trading_strategy.execute_batch([
+            {'symbol': e['symbol'], 'side': 'SELL', 'price': e['price'], 'quantity': e['quantity']}
+            for e in exits
+        ])
+        if not result.get('orders'):
+            for e in exits:
+                self.release(test_mode, e['symbol'])
+        for order in result.get('orders', []):
+            if not order.get('success'):
+                self.release(test_mode, order.get('symbol'))
+        return exits
+
+    def get_stats(self) -> dict:
+        return {
+            'tracking': {mode: len(states) for mode, states in self._states.items()},
+            'ticks': self.ticks,
+            'exits': dict(self.exits),
+            'exiting': sum(1 for states in self._states.values() for s in states.values() if s.exiting),
+            'released': self.released,
+            'running': self._task is not None
+        }
+
+
+# 全局实例
+exit_engine = ExitEngine()
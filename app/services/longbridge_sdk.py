@@ -1,81 +1,81 @@
 """
 长桥SDK封装服务
 """
+import functools
+import importlib.util
 import random
 import logging
 import asyncio
 import time
 from datetime import datetime, timedelta
 from typing import List, Optional
-from threading import Lock
 
-from app.config.settings import LONGBRIDGE_CONFIG
+from app.config.settings import LONGBRIDGE_CONFIG, QUOTE_CACHE_TTL, QUOTE_COALESCE_WINDOW_MS, QUOTE_MAX_CONCURRENT_BATCHES
 from app.auth.utils import is_test_mode
+from .rate_limiter import rate_limiters, is_rate_limit_error
+from .quote_coalescer import QuoteCoalescer
+from .symbol_registry import symbol_registry
+from app.models.quote import Quote
 
 logger = logging.getLogger(__name__)
 
 
-class RateLimiter:
-    """请求限流器，防止触发API频率限制"""
-    
-    def __init__(self, max_requests: int = 10, time_window: float = 1.0):
-        """
-        初始化限流器
-        :param max_requests: 时间窗口内最大请求数
-        :param time_window: 时间窗口（秒）
-        """
-        self.max_requests = max_requests
-        self.time_window = time_window
-        self.requests = []
-        self.lock = Lock()
-    
-    def acquire(self) -> float:
-        """
-        获取请求许可，返回需要等待的时间（秒）
-        """
-        with self.lock:
-            now = time.time()
-            # 清理过期的请求记录
-            self.requests = [t for t in self.requests if now - t < self.time_window]
-            
-            if len(self.requests) < self.max_requests:
-                self.requests.append(now)
-                return 0
-            
-            # 需要等待，计算等待时间
-            oldest = self.requests[0]
-            wait_time = self.time_window - (now - oldest) + 0.1  # 额外等待0.1秒
-            return max(0, wait_time)
-    
-    async def wait(self):
-        """异步等待直到可以发送请求"""
-        wait_time = self.acquire()
-        if wait_time > 0:
-            logger.debug(f"限流等待 {wait_time:.2f} 秒")
-            await asyncio.sleep(wait_time)
-            # 重新获取许可
-            with self.lock:
-                self.requests.append(time.time())
-
-
-# 全局限流器：长桥API限制约为每秒10次请求，我们保守设置为每秒5次
-quote_rate_limiter = RateLimiter(max_requests=5, time_window=1.0)
-
-# 长桥SDK导入
-try:
-    from longbridge.openapi import (
-        QuoteContext, TradeContext, Config as LBConfig, 
-        Market, OrderSide, OrderType, TimeInForceType, SubType, PushQuote
-    )
-    LONGBRIDGE_AVAILABLE = True
+# 长桥SDK（原生扩展导入较慢，只检查是否安装，首次建连时再加载）
+LONGBRIDGE_AVAILABLE = importlib.util.find_spec('longbridge') is not None
+if not LONGBRIDGE_AVAILABLE:
+    logger.warning("长桥SDK未安装")
+
+
+@functools.lru_cache(maxsize=None)
+def openapi():
+    """加载 longbridge.openapi 模块（只加载一次）"""
+    import longbridge.openapi
     logger.info("长桥SDK已加载")
-except ImportError as e:
-    LONGBRIDGE_AVAILABLE = False
-    logger.warning(f"长桥SDK未安装: {e}")
-    
-    class PushQuote:
-        """模拟PushQuote类型"""
-        pass
+    return longbridge.openapi
+
+
+def _enum_to_str(value, default="Unknown") -> str:
+    """SDK 枚举转字符串（OrderSide.Buy → Buy）"""
+    if value is None:
+        return default
+    value_str = str(value)
+    if '.' in value_str:
+        value_str = value_str.split('.')[-1]
+    return value_str or default
+
+
+def _safe_float(val) -> float:
+    try:
+        return float(val)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _safe_int(val) -> int:
+    try:
+        return int(val)
+    except (TypeError, ValueError):
+        return 0
+
+
+def order_to_dict(order) -> dict:
+    """SDK 订单对象（历史订单 / 当日订单 / 订单推送）转为字典，updated_at 为本地时间"""
+    updated_at = getattr(order, 'updated_at', None) or datetime.now()
+    if updated_at.tzinfo is not None:
+        updated_at = updated_at.astimezone().replace(tzinfo=None)
+    return {
+        'order_id': str(getattr(order, 'order_id', '')),
+        'symbol': getattr(order, 'symbol', ''),
+        'side': _enum_to_str(getattr(order, 'side', None)),
+        'order_type': _enum_to_str(getattr(order, 'order_type', None)),
+        'status': _enum_to_str(getattr(order, 'status', None)),
+        'submitted_price': _safe_float(getattr(order, 'submitted_price', None)),
+        'executed_price': _safe_float(getattr(order, 'executed_price', None)),
+        'submitted_quantity': _safe_int(getattr(order, 'submitted_quantity', None)),
+        'executed_quantity': _safe_int(getattr(order, 'executed_quantity', None)),
+        'updated_at': updated_at.isoformat(),
+        'currency': _enum_to_str(getattr(order, 'currency', 'USD'), default='USD'),
+    }
 
 
 class LongBridgeSDK:
@@ -89,6 +89,19 @@ class LongBridgeSDK:
         self._connect_lock = asyncio.Lock()
         self._last_connect_at = 0.0
         self._connect_cooldown = 10.0
+        self.last_error: Optional[str] = None
+        self._order_changed_callback = None
+        self._quote_push_callback = None
+        self._quote_subscriptions = set()  # 已订阅推送的标准化代码，重连后重新订阅
+        self._quote_coalescer = QuoteCoalescer(
+            self._fetch_quote_batch,
+            batch_size=20,
+            window=QUOTE_COALESCE_WINDOW_MS / 1000,
+            ttl=QUOTE_CACHE_TTL,
+            should_retry=is_rate_limit_error
+        )
+        # 同时在途的行情批次上限（发送速率仍由 quote 限流器控制）
+        self._quote_semaphore = asyncio.Semaphore(QUOTE_MAX_CONCURRENT_BATCHES)
         self.use_real_sdk = (
             LONGBRIDGE_AVAILABLE and 
             config.get('app_key') and 
@@ -101,18 +114,21 @@ class LongBridgeSDK:
         else:
             logger.info("使用模拟模式（长桥SDK未配置或未安装）")
 
-    async def connect(self):
-        """连接到长桥"""
+    async def connect(self) -> bool:
+        """
+        连接到长桥，返回是否连接成功
+        真实模式连接失败时保持真实模式（不切换到模拟数据），由连接守护进程退避重连
+        """
         now = time.time()
         if self.is_connected and (now - self._last_connect_at) < self._connect_cooldown:
             logger.info("长桥SDK已连接，跳过重复连接")
-            return
+            return True
 
         async with self._connect_lock:
             now = time.time()
             if self.is_connected and (now - self._last_connect_at) < self._connect_cooldown:
                 logger.info("长桥SDK已连接，跳过重复连接")
-                return
+                return True
 
             logger.info("正在连接长桥SDK...")
 
@@ -131,7 +147,8 @@ class LongBridgeSDK:
                     logger.warning(f"清理旧连接失败: {e}")
 
                 try:
-                    lb_config = LBConfig(
+                    lb = await asyncio.to_thread(openapi)
+                    lb_config = lb.Config(
                         app_key=self.config['app_key'],
                         app_secret=self.config['app_secret'],
                         access_token=self.config['access_token'],
@@ -140,161 +157,198 @@ class LongBridgeSDK:
                         trade_ws_url=self.config.get('trade_ws_url', 'wss://openapi-trade.longbridgeapp.com')
                     )
 
-                    self.quote_ctx = QuoteContext(lb_config)
-                    self.trade_ctx = TradeContext(lb_config)
+                    # SDK 建连是阻塞调用，放到线程中执行
+                    self.quote_ctx, self.trade_ctx = await asyncio.to_thread(
+                        lambda: (lb.QuoteContext(lb_config), lb.TradeContext(lb_config))
+                    )
+                    self._quote_coalescer.invalidate()
+                    if self._order_changed_callback is not None:
+                        self._subscribe_private_topic()
+                    if self._quote_push_callback is not None and self._quote_subscriptions:
+                        self._subscribe_quotes(sorted(self._quote_subscriptions))
                     self.is_connected = True
+                    self.last_error = None
                     self._last_connect_at = time.time()
                     logger.info("长桥SDK连接成功（真实模式）")
+                    return True
                 except Exception as e:
                     error_msg = str(e)
                     if 'connections limitation is hit' in error_msg or '(403)' in error_msg:
-                        logger.info(f"长桥SDK连接受限: {error_msg}")
+                        logger.warning(f"长桥SDK连接受限: {error_msg}")
                     else:
-                        logger.info(f"长桥SDK连接失败: {error_msg}")
-                    logger.info("切换到模拟模式")
-                    self.use_real_sdk = False
-                    self.is_connected = True
-                    self._last_connect_at = time.time()
+                        logger.warning(f"长桥SDK连接失败: {error_msg}")
+                    self.quote_ctx = None
+                    self.trade_ctx = None
+                    self.is_connected = False
+                    self.last_error = error_msg
+                    return False
             else:
                 self.is_connected = True
                 self._last_connect_at = time.time()
                 logger.info("长桥SDK连接成功（模拟模式）")
+                return True
+
+    def mark_disconnected(self, reason: str):
+        """心跳失败：标记为断开，等待重连（旧连接在重连时关闭）"""
+        self.is_connected = False
+        self.last_error = reason
+
+    async def heartbeat(self, timeout: float = 5.0) -> bool:
+        """轻量心跳：行情连接查询交易时段，交易连接查询当日成交"""
+        if not (self.quote_ctx and self.trade_ctx):
+            return False
+        try:
+            await asyncio.wait_for(asyncio.to_thread(self.quote_ctx.trading_session), timeout)
+            await rate_limiters['trade'].acquire()
+            await asyncio.wait_for(asyncio.to_thread(self.trade_ctx.today_executions), timeout)
+            return True
+        except Exception as e:
+            if is_rate_limit_error(e):
+                # 被限流说明连接仍然可用
+                return True
+            self.last_error = str(e) or type(e).__name__
+            return False
+
+    def close(self):
+        """关闭行情/交易连接（连接池淘汰时调用）"""
+        for ctx in (self.quote_ctx, self.trade_ctx):
+            close_fn = getattr(ctx, 'close', None)
+            if callable(close_fn):
+                try:
+                    close_fn()
+                except Exception as e:
+                    logger.warning(f"关闭长桥连接失败: {e}")
+        self.quote_ctx = None
+        self.trade_ctx = None
+        self.is_connected = False
 
     def subscribe_realtime_quotes(self, symbols: List[str], callback):
-        """订阅实时行情推送"""
+        """订阅实时行情推送（symbols 为标准化代码），重连后自动重新订阅"""
+        self._quote_push_callback = callback
         if self.use_real_sdk and self.quote_ctx:
-            try:
-                self.quote_ctx.set_on_quote(callback)
-                self.quote_ctx.subscribe(symbols, [SubType.Quote], is_first_push=False)
-                logger.info(f"已订阅实时行情: {symbols}")
+            if self._subscribe_quotes(symbols):
+                self._quote_subscriptions.update(symbols)
                 return True
-            except Exception as e:
-                logger.error(f"订阅实时行情失败: {str(e)}")
-                return False
         return False
 
+    def _subscribe_quotes(self, symbols: List[str]) -> bool:
+        try:
+            self.quote_ctx.set_on_quote(self._quote_push_callback)
+            self.quote_ctx.subscribe(symbols, [openapi().SubType.Quote], is_first_push=False)
+            logger.info(f"已订阅实时行情: {symbols}")
+            return True
+        except Exception as e:
+            logger.error(f"订阅实时行情失败: {str(e)}")
+            return False
+
+    def subscribe_order_changes(self, callback) -> bool:
+        """订阅交易推送（订单状态变更、成交回报），重连后自动重新订阅"""
+        self._order_changed_callback = callback
+        if self.use_real_sdk and self.trade_ctx:
+            return self._subscribe_private_topic()
+        return False
+
+    def _subscribe_private_topic(self) -> bool:
+        try:
+            self.trade_ctx.set_on_order_changed(self._order_changed_callback)
+            self.trade_ctx.subscribe([openapi().TopicType.Private])
+            logger.info("已订阅交易推送")
+            return True
+        except Exception as e:
+            logger.error(f"订阅交易推送失败: {str(e)}")
+            return False
+
     def unsubscribe_realtime_quotes(self, symbols: List[str]):
         """取消订阅实时行情推送"""
+        self._quote_subscriptions.difference_update(symbols)
         if self.use_real_sdk and self.quote_ctx:
             try:
-                self.quote_ctx.unsubscribe(symbols, [SubType.Quote])
+                self.quote_ctx.unsubscribe(symbols, [openapi().SubType.Quote])
                 logger.info(f"已取消订阅实时行情: {symbols}")
             except Exception as e:
                 logger.error(f"取消订阅实时行情失败: {str(e)}")
 
-    async def get_realtime_quote(self, symbols: List[str]) -> List[dict]:
-        """获取实时行情（带限流）"""
-        from .test_mode import test_mode_price_manager
-        
+    def cache_pushed_quote(self, symbol: str, quote: Quote):
+        """推送行情写入行情缓存，轮询请求直接命中"""
+        self._quote_coalescer.put(symbol, quote)
+
+    def get_cached_quote(self, symbol: str) -> Optional[Quote]:
+        """读取缓存中的行情（标准化代码），不触发请求"""
+        return self._quote_coalescer.get_cached(symbol)
+
+    async def get_realtime_quote(self, symbols: List[str]) -> List[Quote]:
+        """获取实时行情（带限流，并发请求合并，批次并发发送）"""
         if is_test_mode():
             return self._get_mock_quotes(symbols)
 
         if self.use_real_sdk and self.quote_ctx:
-            try:
-                batch_size = 20
-                all_results = []
-                
-                # 标准化所有symbol
-                normalized_symbols = [self._normalize_symbol(s) for s in symbols]
-                # 建立标准化symbol到原始symbol的映射
-                # 注意：标准化后可能出现重复（如 700 和 00700 都变成 00700.HK）
-                symbol_map = {self._normalize_symbol(s): s for s in symbols}
-
-                logger.info(f"请求实时行情: {normalized_symbols}")
-                for i in range(0, len(normalized_symbols), batch_size):
-                    batch_symbols = normalized_symbols[i:i + batch_size]
-                    
-                    # 等待限流器许可
-                    await quote_rate_limiter.wait()
-                    
-                    quotes = self.quote_ctx.quote(batch_symbols)
-
-                    if not quotes:
-                        logger.warning(f"SDK返回空行情数据: {batch_symbols}")
+            # 建立标准化symbol到原始symbol的映射
+            # 注意：标准化后可能出现重复（如 700 和 00700 都变成 00700.HK）
+            symbol_map = {}
+            for s in symbols:
+                symbol_map[self._normalize_symbol(s)] = s
 
-                    for quote in quotes:
-                        current_price = float(quote.last_done)
-                        prev_close = float(quote.prev_close) if hasattr(quote, 'prev_close') and quote.prev_close else current_price
-                        change_pct = ((current_price - prev_close) / prev_close) * 100 if prev_close > 0 else 0.0
-                        
-                        # 返回原始symbol格式
-                        original_symbol = symbol_map.get(quote.symbol, quote.symbol)
-
-                        all_results.append({
-                            'symbol': original_symbol,
-                            'price': current_price,
-                            'change_pct': change_pct,
-                            'volume': int(quote.volume),
-                            'timestamp': datetime.now().isoformat()
-                        })
-
-                return all_results
+            try:
+                quotes = await self._quote_coalescer.get(list(symbol_map))
+                # 返回原始symbol格式（复制一份，避免修改共享缓存）
+                return [
+                    quote.with_symbol(symbol_map.get(normalized, normalized))
+                    for normalized, quote in quotes.items()
+                ]
             except Exception as e:
-                error_msg = str(e)
-                logger.error(f"获取行情失败: {error_msg}")
-                
-                # 如果是频率限制错误，等待后重试一次
-                if 'rate limit' in error_msg.lower() or '301606' in error_msg:
-                    logger.warning("触发API频率限制，等待2秒后重试...")
-                    await asyncio.sleep(2)
-                    try:
-                        # 使用更小的批次重试
-                        return await self._get_quotes_with_retry(symbols, symbol_map, batch_size=10)
-                    except Exception as retry_e:
-                        logger.error(f"重试仍失败: {str(retry_e)}")
-                
-                # 真实模式下，如果失败了，我们记录错误但尝试返回已有的部分数据
-                if 'all_results' in locals() and all_results:
-                    return all_results
+                # 频率限制已在批次级别退避重试，这里仅在全部批次失败时到达
+                logger.error(f"获取行情失败: {str(e)}")
                 return self._get_mock_quotes(symbols)
         
         logger.warning("SDK未连接或未配置，无法获取真实行情")
         return self._get_mock_quotes(symbols)
-    
-    async def _get_quotes_with_retry(self, symbols: List[str], symbol_map: dict, batch_size: int = 10) -> List[dict]:
-        """带重试机制的行情获取"""
-        all_results = []
-        normalized_symbols = [self._normalize_symbol(s) for s in symbols]
-        
-        for i in range(0, len(normalized_symbols), batch_size):
-            batch_symbols = normalized_symbols[i:i + batch_size]
-            
-            # 更保守的限流：每批次之间等待更长时间
-            await asyncio.sleep(0.5)
-            await quote_rate_limiter.wait()
-            
+
+    async def _fetch_quote_batch(self, batch_symbols: List[str]) -> dict:
+        """请求一个批次的行情（供请求合并器调用），返回 {标准化代码: 行情}"""
+        # 先占并发槽位再取限流许可（在槽位外排队的批次不预先持有令牌，槽位空出时不会突发超额），
+        # SDK 同步调用放到线程中执行，多个批次可同时在途
+        async with self._quote_semaphore:
+            await rate_limiters['quote'].acquire()
             try:
-                quotes = self.quote_ctx.quote(batch_symbols)
-                
-                for quote in quotes:
-                    current_price = float(quote.last_done)
-                    prev_close = float(quote.prev_close) if hasattr(quote, 'prev_close') and quote.prev_close else current_price
-                    change_pct = ((current_price - prev_close) / prev_close) * 100 if prev_close > 0 else 0.0
-                    original_symbol = symbol_map.get(quote.symbol, quote.symbol)
-                    
-                    all_results.append({
-                        'symbol': original_symbol,
-                        'price': current_price,
-                        'change_pct': change_pct,
-                        'volume': int(quote.volume),
-                        'timestamp': datetime.now().isoformat()
-                    })
+                quotes = await asyncio.to_thread(self.quote_ctx.quote, batch_symbols)
             except Exception as e:
-                logger.error(f"批次获取行情失败: {batch_symbols}, 错误: {str(e)}")
-                # 继续处理下一批次
-                continue
-        
-        return all_results
+                if is_rate_limit_error(e):
+                    rate_limiters['quote'].on_rate_limited()
+                raise
+
+        if not quotes:
+            logger.warning(f"SDK返回空行情数据: {batch_symbols}")
+
+        # 长桥返回的代码可能不带前导零（如 700.HK），映射回请求时使用的代码
+        requested = set(batch_symbols)
+        stripped = {s.lstrip('0'): s for s in batch_symbols}
+        result = {}
+        for quote in quotes:
+            key = quote.symbol if quote.symbol in requested else stripped.get(quote.symbol.lstrip('0'), quote.symbol)
+            result[key] = self._to_quote(quote, key)
+        return result
 
+    @staticmethod
+    def _to_quote(quote, symbol: str) -> Quote:
+        """把SDK行情对象转换为紧凑行情记录（按键读取与字典兼容）"""
+        current_price = float(quote.last_done)
+        prev_close = float(quote.prev_close) if hasattr(quote, 'prev_close') and quote.prev_close else current_price
+        return Quote.from_price(symbol, current_price, prev_close, int(quote.volume))
+    
     async def get_history_orders(self, symbol: Optional[str] = None, status_filter: Optional[List] = None,
-                                 days: int = 90, limit: int = 1000) -> List[dict]:
-        """获取历史订单"""
+                                 days: int = 90, limit: Optional[int] = 1000,
+                                 start_at: Optional[datetime] = None,
+                                 end_at: Optional[datetime] = None, raise_errors: bool = False) -> List[dict]:
+        """
+        获取历史订单（start_at 优先于 days，end_at 默认当前时间；limit=None 不截断）
+        查询失败或未连接时返回空列表；raise_errors=True 时抛出异常（增量同步据此不推进高水位）
+        """
         if self.use_real_sdk and self.trade_ctx:
             try:
                 from longbridge.openapi import OrderStatus
 
-                end_at = datetime.now()
-                start_at = end_at - timedelta(days=days)
+                end_at = end_at or datetime.now()
+                start_at = start_at or end_at - timedelta(days=days)
 
                 if status_filter is None:
                     status_filter = [
@@ -306,87 +360,57 @@ class LongBridgeSDK:
                 # 标准化symbol
                 normalized_symbol = self._normalize_symbol(symbol) if symbol else None
 
-                orders = self.trade_ctx.history_orders(
+                await rate_limiters['trade'].acquire()
+                orders = await asyncio.to_thread(
+                    self.trade_ctx.history_orders,
                     symbol=normalized_symbol, status=status_filter,
                     start_at=start_at, end_at=end_at
                 )
 
-                def enum_to_str(value, default="Unknown"):
-                    if value is None:
-                        return default
-                    value_str = str(value)
-                    if '.' in value_str:
-                        value_str = value_str.split('.')[-1]
-                    return value_str or default
-
-                def safe_float(val):
-                    try:
-                        return float(val)
-                    except:
-                        return 0.0
-
-                def safe_int(val):
-                    try:
-                        return int(val)
-                    except:
-                        return 0
-
-                result = []
-                for order in orders:
-                    result.append({
-                        'order_id': getattr(order, 'order_id', ''),
-                        'symbol': getattr(order, 'symbol', ''),
-                        'side': enum_to_str(getattr(order, 'side', None)),
-                        'order_type': enum_to_str(getattr(order, 'order_type', None)),
-                        'status': enum_to_str(getattr(order, 'status', None)),
-                        'submitted_price': safe_float(getattr(order, 'submitted_price', None)),
-                        'executed_price': safe_float(getattr(order, 'executed_price', None)),
-                        'submitted_quantity': safe_int(getattr(order, 'submitted_quantity', None)),
-                        'executed_quantity': safe_int(getattr(order, 'executed_quantity', None)),
-                        'updated_at': getattr(order, 'updated_at', datetime.now()).isoformat(),
-                        'currency': enum_to_str(getattr(order, 'currency', 'USD'), default='USD'),
-                    })
-
+                result = [order_to_dict(order) for order in orders]
                 result.sort(key=lambda x: x['updated_at'], reverse=True)
                 return result[:limit]
             except Exception as e:
+                if is_rate_limit_error(e):
+                    rate_limiters['trade'].on_rate_limited()
                 logger.error(f"获取历史订单失败: {str(e)}")
+                if raise_errors:
+                    raise
+                return []
+        if raise_errors:
+            raise RuntimeError("长桥交易连接不可用")
+        return []
+
+    async def get_today_orders(self) -> List[dict]:
+        """获取当日订单（含未成交订单）"""
+        if self.use_real_sdk and self.trade_ctx:
+            try:
+                await rate_limiters['trade'].acquire()
+                orders = await asyncio.to_thread(self.trade_ctx.today_orders)
+                return [order_to_dict(order) for order in orders]
+            except Exception as e:
+                if is_rate_limit_error(e):
+                    rate_limiters['trade'].on_rate_limited()
+                logger.error(f"获取当日订单失败: {str(e)}")
                 return []
         return []
 
     def _normalize_symbol(self, symbol: str) -> str:
-        """标准化股票代码为长桥API格式，优先处理A股/港股数字代码"""
-        if not symbol:
-            return symbol
-        
-        symbol = symbol.strip().upper()
-        
-        # 已经包含有效的市场后缀，直接返回
-        valid_suffixes = ['.US', '.HK', '.SH', '.SZ', '.SG']
-        for suffix in valid_suffixes:
-            if symbol.endswith(suffix):
-                return symbol
-        
-        # 移除可能存在的无效后缀（如 .NASDAQ, .NYSE 等）
-        if '.' in symbol:
-            symbol = symbol.split('.')[0]
-        
-        # 先判断A股 6 位数字
-        if len(symbol) == 6 and symbol.isdigit():
-            if symbol.startswith('6'):
-                return f"{symbol}.SH"
-            if symbol.startswith(('0', '3')):
-                return f"{symbol}.SZ"
-            # 其他 6 位数字视为港股（少见）
-            return f"{symbol}.HK"
-        
-        # 纯数字 -> 港股，左侧补零到 5 位（长桥常用 5 位格式）
-        if symbol.isdigit():
-            hk_code = symbol.zfill(5)
-            return f"{hk_code}.HK"
-        
-        # 其他情况默认为美股
-        return f"{symbol}.US"
+        """标准化股票代码为长桥API格式（注册表缓存，同一代码只计算一次）"""
+        return symbol_registry.normalize(symbol)
+
+    async def get_static_info(self, symbols: List[str]) -> list:
+        """批量获取标准化代码的静态信息（每手股数、币种、板块），未连接真实SDK时返回空"""
+        if not (self.use_real_sdk and self.quote_ctx) or not symbols:
+            return []
+        try:
+            await rate_limiters['quote'].acquire()
+            return await asyncio.to_thread(self.quote_ctx.static_info, symbols)
+        except Exception as e:
+            if is_rate_limit_error(e):
+                rate_limiters['quote'].on_rate_limited()
+            logger.warning(f"获取静态信息失败: {e}")
+            return []
 
     async def get_stock_history(self, symbol: str, period: str = 'day', count: int = 30) -> List[dict]:
         """获取股票历史K线（带限流）"""
@@ -395,7 +419,7 @@ class LongBridgeSDK:
                 from longbridge.openapi import Period, AdjustType
                 
                 # 等待限流器许可
-                await quote_rate_limiter.wait()
+                await rate_limiters['candlestick'].acquire()
                 
                 # 标准化symbol格式
                 normalized_symbol = self._normalize_symbol(symbol)
@@ -439,9 +463,11 @@ class LongBridgeSDK:
                 return result
             except Exception as e:
                 error_msg = str(e)
+                if is_rate_limit_error(e):
+                    rate_limiters['candlestick'].on_rate_limited()
                 if 'no quote access' in error_msg or '(301604)' in error_msg:
                     logger.info(f"获取K线无权限: {error_msg}")
-                    return self._get_mock_klines(symbol, count)
+                    return self._fallback_klines(symbol, count)
                 
                 logger.info(f"获取K线数据失败: {error_msg}")
                 
@@ -451,6 +477,7 @@ class LongBridgeSDK:
                         alt_symbol = normalized_symbol.replace('.HK', '').zfill(5) + '.HK'
                         if alt_symbol != normalized_symbol:
                             logger.info(f"尝试使用补零后的港股代码重试: {alt_symbol}")
+                            await rate_limiters['candlestick'].acquire()
                             candlesticks = self.quote_ctx.candlesticks(
                                 alt_symbol, lb_period, count, AdjustType.NoAdjust
                             )
@@ -474,8 +501,14 @@ class LongBridgeSDK:
                 except Exception as e2:
                     logger.info(f"补零后仍失败: {str(e2)}")
                 
-                return self._get_mock_klines(symbol, count)
+                return self._fallback_klines(symbol, count)
         
+        return self._fallback_klines(symbol, count)
+
+    def _fallback_klines(self, symbol: str, count: int) -> List[dict]:
+        """真实K线不可用时：测试模式或未配置SDK返回模拟K线，真实模式返回空（不使用模拟数据）"""
+        if self.use_real_sdk and not is_test_mode():
+            return []
         return self._get_mock_klines(symbol, count)
 
     async def submit_order(self, symbol: str, side: str, quantity: int, 
@@ -483,8 +516,9 @@ class LongBridgeSDK:
         """提交订单"""
         if self.use_real_sdk and self.trade_ctx:
             try:
-                lb_side = OrderSide.Buy if side.upper() == 'BUY' else OrderSide.Sell
-                lb_order_type = OrderType.MO if order_type.upper() == 'MARKET' else OrderType.LO
+                lb = openapi()
+                lb_side = lb.OrderSide.Buy if side.upper() == 'BUY' else lb.OrderSide.Sell
+                lb_order_type = lb.OrderType.MO if order_type.upper() == 'MARKET' else lb.OrderType.LO
                 
                 # 标准化symbol
                 normalized_symbol = self._normalize_symbol(symbol)
@@ -494,13 +528,15 @@ class LongBridgeSDK:
                     'order_type': lb_order_type,
                     'side': lb_side,
                     'submitted_quantity': quantity,
-                    'time_in_force': TimeInForceType.Day,
+                    'time_in_force': lb.TimeInForceType.Day,
                 }
                 
-                if lb_order_type == OrderType.LO and price:
+                if lb_order_type == lb.OrderType.LO and price:
                     order_params['submitted_price'] = price
 
-                response = self.trade_ctx.submit_order(**order_params)
+                # SDK 同步调用放到线程中执行，批量下单时多个订单可同时在途
+                await rate_limiters['trade'].acquire()
+                response = await asyncio.to_thread(self.trade_ctx.submit_order, **order_params)
                 
                 return {
                     'success': True,
@@ -508,9 +544,15 @@ class LongBridgeSDK:
                     'message': '订单提交成功'
                 }
             except Exception as e:
+                if is_rate_limit_error(e):
+                    rate_limiters['trade'].on_rate_limited()
                 logger.error(f"提交订单失败: {str(e)}")
                 return {'success': False, 'message': str(e)}
         
+        if self.use_real_sdk:
+            # 真实模式连接不可用时拒绝下单，不生成模拟订单
+            return {'success': False, 'message': f'长桥交易连接不可用: {self.last_error or "未连接"}'}
+        
         # 模拟订单
         return {
             'success': True,
@@ -522,6 +564,7 @@ class LongBridgeSDK:
         """获取账户余额，支持多币种汇总"""
         if self.use_real_sdk and self.trade_ctx:
             try:
+                await rate_limiters['account'].acquire()
                 balances = self.trade_ctx.account_balance()
                 logger.info(f"获取到账户余额数据: {balances}")
                 
@@ -559,15 +602,20 @@ class LongBridgeSDK:
                     'currency': main_currency
                 }
             except Exception as e:
+                if is_rate_limit_error(e):
+                    rate_limiters['account'].on_rate_limited()
                 logger.error(f"获取账户余额失败: {str(e)}")
-                return {'total_cash': 1000000, 'available_cash': 1000000, 'net_assets': 1000000, 'currency': 'USD'}
+                raise
         
+        if self.use_real_sdk:
+            raise ConnectionError(f"长桥交易连接不可用: {self.last_error or '未连接'}")
         return {'total_cash': 1000000, 'available_cash': 1000000, 'net_assets': 1000000, 'currency': 'USD'}
 
     async def get_stock_positions(self) -> List[dict]:
         """获取股票持仓"""
         if self.use_real_sdk and self.trade_ctx:
             try:
+                await rate_limiters['account'].acquire()
                 positions = self.trade_ctx.stock_positions()
                 result = []
                 
@@ -583,6 +631,8 @@ class LongBridgeSDK:
                 
                 return result
             except Exception as e:
+                if is_rate_limit_error(e):
+                    rate_limiters['account'].on_rate_limited()
                 logger.error(f"获取持仓失败: {str(e)}")
                 return []
         return []
@@ -591,6 +641,7 @@ class LongBridgeSDK:
         """获取自选股列表"""
         if self.use_real_sdk and self.quote_ctx:
             try:
+                await rate_limiters['quote'].acquire()
                 watchlist = self.quote_ctx.watchlist()
                 logger.info(f"长桥SDK获取到自选股原始数据: {watchlist}")
                 result = []
@@ -654,7 +705,7 @@ class LongBridgeSDK:
         logger.warning("SDK未连接或模拟模式，无法获取真实自选股")
         return []
 
-    def _get_mock_quotes(self, symbols: List[str]) -> List[dict]:
+    def _get_mock_quotes(self, symbols: List[str]) -> List[Quote]:
         """生成模拟行情数据"""
         from .test_mode import test_mode_price_manager
         
@@ -670,13 +721,13 @@ class LongBridgeSDK:
                 price = 0
                 change_pct = 0
 
-            result.append({
-                'symbol': symbol,
-                'price': round(price, 2),
-                'change_pct': round(change_pct, 2),
-                'volume': random.randint(1000000, 10000000) if is_test else 0,
-                'timestamp': datetime.now().isoformat()
-            })
+            result.append(Quote(
+                symbol,
+                round(price, 2),
+                round(price / (1 + change_pct / 100), 2) if price else 0,
+                round(change_pct, 2),
+                random.randint(1000000, 10000000) if is_test else 0
+            ))
         return result
 
     def _get_mock_klines(self, symbol: str, count: int) -> List[dict]:
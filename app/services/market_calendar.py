@@ -0,0 +1,121 @@
+"""
+美股交易日历（NYSE / NASDAQ）
+- 周末与交易所休市日（含复活节推算的耶稣受难日、节假日逢周末的调休规则）
+- 开盘 09:30、收盘 16:00（美东时间，自动处理夏令时）
+- 半日市（13:00 收盘）：独立日前一天、感恩节次日、平安夜
+"""
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+from typing import FrozenSet, Optional
+from zoneinfo import ZoneInfo
+
+MARKET_TZ = ZoneInfo('America/New_York')
+MARKET_OPEN = time(9, 30)
+MARKET_CLOSE = time(16, 0)
+EARLY_CLOSE = time(13, 0)
+
+
+def _easter(year: int) -> date:
+    """复活节日期（公历，匿名格里高利算法）"""
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def _nth_weekday(year: int, month: int, weekday: int, n: int) -> date:
+    """某月第 n 个星期几（weekday: 周一=0）；n=-1 表示最后一个"""
+    if n > 0:
+        first = date(year, month, 1)
+        return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+    last = date(year + (month == 12), month % 12 + 1, 1) - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+
+def _observed(day: date) -> date:
+    """节假日逢周六提前到周五，逢周日顺延到周一"""
+    if day.weekday() == 5:
+        return day - timedelta(days=1)
+    if day.weekday() == 6:
+        return day + timedelta(days=1)
+    return day
+
+
+@lru_cache(maxsize=32)
+def market_holidays(year: int) -> FrozenSet[date]:
+    """某年的全天休市日"""
+    holidays = {
+        _nth_weekday(year, 1, 0, 3),       # 马丁·路德·金纪念日
+        _nth_weekday(year, 2, 0, 3),       # 总统日
+        _easter(year) - timedelta(days=2),  # 耶稣受难日
+        _nth_weekday(year, 5, 0, -1),      # 阵亡将士纪念日
+        _observed(date(year, 7, 4)),       # 独立日
+        _nth_weekday(year, 9, 0, 1),       # 劳动节
+        _nth_weekday(year, 11, 3, 4),      # 感恩节
+        _observed(date(year, 12, 25)),     # 圣诞节
+    }
+    # 元旦逢周六时不调休到前一年的 12 月 31 日
+    new_year = date(year, 1, 1)
+    if new_year.weekday() != 5:
+        holidays.add(_observed(new_year))
+    if year >= 2022:
+        holidays.add(_observed(date(year, 6, 19)))  # 六月节
+    return frozenset(holidays)
+
+
+def is_trading_day(day: date) -> bool:
+    return day.weekday() < 5 and day not in market_holidays(day.year)
+
+
+def next_trading_day(day: date, include_today: bool = False) -> date:
+    """下一个交易日（include_today 为 True 时当天是交易日则返回当天）"""
+    if not include_today:
+        day += timedelta(days=1)
+    while not is_trading_day(day):
+        day += timedelta(days=1)
+    return day
+
+
+def close_time(day: date) -> time:
+    """当天收盘时间（美东）"""
+    thanksgiving = _nth_weekday(day.year, 11, 3, 4)
+    early_closes = {date(day.year, 7, 3), thanksgiving + timedelta(days=1), date(day.year, 12, 24)}
+    if day in early_closes and is_trading_day(day):
+        return EARLY_CLOSE
+    return MARKET_CLOSE
+
+
+def market_open(day: date) -> datetime:
+    """交易日开盘时间（带时区）"""
+    return datetime.combine(day, MARKET_OPEN, tzinfo=MARKET_TZ)
+
+
+def market_close(day: date) -> datetime:
+    """交易日收盘时间（带时区）"""
+    return datetime.combine(day, close_time(day), tzinfo=MARKET_TZ)
+
+
+def next_open(after: Optional[datetime] = None) -> datetime:
+    """after 之后（含）的下一次开盘时间"""
+    after = (after or datetime.now(MARKET_TZ)).astimezone(MARKET_TZ)
+    day = next_trading_day(after.date(), include_today=True)
+    if day == after.date() and after > market_open(day):
+        day = next_trading_day(day)
+    return market_open(day)
+
+
+def is_market_open(at: Optional[datetime] = None) -> bool:
+    at = (at or datetime.now(MARKET_TZ)).astimezone(MARKET_TZ)
+    return is_trading_day(at.date()) and market_open(at.date()) <= at < market_close(at.date())
+
+
+def to_local(moment: datetime) -> datetime:
+    """转换为服务器本地时间（naive，与数据库 DATETIME 字段一致）"""
+    return moment.astimezone().replace(tzinfo=None)
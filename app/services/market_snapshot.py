@@ -0,0 +1,90 @@
+"""
+市场数据版本化快照
+"""
+import logging
+from threading import Lock
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class MarketSnapshot:
+    """
+    市场数据快照，为 /api/market-data 提供版本号与增量查询
+    - 每次行情或加速度发生变化时序号单调递增
+    - 记录每只股票最后变化时的序号，支持按序号返回增量
+    - 分组/股票列表变化时记录布局序号，早于该序号的增量请求需返回全量
+    """
+
+    def __init__(self):
+        self.seq = 0
+        self.layout_seq = 0
+        self._rows = {}  # {symbol: (seq, group_name, row)}
+        self._layout = ()
+        self._lock = Lock()
+
+    @property
+    def etag(self) -> str:
+        """当前快照对应的 ETag"""
+        return f'"md-{self.seq}"'
+
+    def update(self, grouped_data: dict) -> int:
+        """用最新的分组数据更新快照，返回当前序号"""
+        layout = tuple(
+            (group_name, group.get('group_order', 0), tuple(s['symbol'] for s in group['stocks']))
+            for group_name, group in grouped_data.items()
+        )
+
+        with self._lock:
+            next_seq = self.seq + 1
+            changed = False
+
+            if layout != self._layout:
+                # 股票增删或分组调整：旧序号的客户端需全量刷新
+                self._layout = layout
+                self.layout_seq = next_seq
+                self._rows = {}
+                changed = True
+
+            for group_name, group in grouped_data.items():
+                for row in group['stocks']:
+                    previous = self._rows.get(row['symbol'])
+                    if previous is None or previous[2] != row:
+                        self._rows[row['symbol']] = (next_seq, group_name, dict(row))
+                        changed = True
+
+            if changed:
+                self.seq = next_seq
+            return self.seq
+
+    def changes_since(self, since: int) -> Optional[dict]:
+        """
+        获取指定序号之后的增量数据
+        :return: 增量数据；若无法基于该序号计算增量（布局变化或序号无效）则返回 None
+        """
+        with self._lock:
+            if since < self.layout_seq or since > self.seq or since < 0:
+                return None
+
+            changed: Dict[str, List[dict]] = {}
+            for seq, group_name, row in self._rows.values():
+                if seq > since:
+                    changed.setdefault(group_name, []).append(row)
+
+            return {
+                'since': since,
+                'seq': self.seq,
+                'changed': changed
+            }
+
+    def reset(self):
+        """清空快照（序号保持递增）"""
+        with self._lock:
+            self._rows = {}
+            self._layout = ()
+            self.seq += 1
+            self.layout_seq = self.seq
+
+
+# 全局实例
+market_snapshot = MarketSnapshot()
@@ -0,0 +1,528 @@
+"""
+订单管理服务
+- 内存订单簿（按 order_id 索引），跟踪订单从提交到成交的完整生命周期
+- 订阅长桥交易推送（订单变更），按实际成交价记录部分成交与全部成交
+- 成交后更新 trades 和内存持仓账本，而不是在提交成功时就按报价记为已成交
+- 逐单统计延迟：提交 → 确认（submit_order 返回）→ 首次成交 → 全部成交
+- 订单进入终态（成交/撤单/拒绝/过期）时通知结束回调
+- 成交落库失败时提交高优先级持久化任务重试（按订单号 upsert，交易记录缺失时补插），进程重启后仍会补写
+- 批量下单：多只股票并发提交，交易记录在同一事务中写入；事务提交后才更新订单簿与持仓账本
+"""
+import asyncio
+import logging
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Set
+
+import pymysql
+
+from app.config.database import get_db_connection
+from app.auth.utils import is_test_mode
+from .position_ledger import position_ledger
+from .prediction_index import prediction_index
+from .task_queue import PRIORITY_HIGH
+
+logger = logging.getLogger(__name__)
+
+# 成交落库重试任务名称（持久化任务按名称重新绑定处理函数）
+PERSIST_FILL_TASK = 'order_manager.persist_fill'
+
+# 订单终态
+TERMINAL_STATUSES = {'FILLED', 'CANCELED', 'REJECTED', 'EXPIRED'}
+
+# 长桥 OrderStatus → 本地状态
+_STATUS_MAP = {
+    'Filled': 'FILLED',
+    'PartialFilled': 'PARTIAL_FILLED',
+    'Canceled': 'CANCELED',
+    'Rejected': 'REJECTED',
+    'Expired': 'EXPIRED',
+}
+
+
+def _enum_to_str(value) -> str:
+    """SDK 枚举转字符串（OrderStatus.Filled → Filled）"""
+    value_str = str(value) if value is not None else ''
+    return value_str.split('.')[-1]
+
+
+def _to_float(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _to_int(value) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _write_fill(cursor, order_id: str, test_mode: int, symbol: str, action: str, acceleration: float,
+                price: float, quantity: int, amount: float, status: str, message: Optional[str] = None) -> int:
+    """
+    按累计成交写入交易记录（按 order_id + test_mode 唯一键 upsert，提交时的记录写入失败也能补插）；
+    已记录的累计成交不小于 quantity 时不覆盖（重试晚于后续成交到达）
+    """
+    # quantity 最后赋值，前面的条件比较的是更新前的累计成交
+    cursor.execute("""
+        INSERT INTO trades (symbol, action, price, quantity, amount, acceleration,
+                            status, message, order_id, test_mode)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            price = IF(VALUES(quantity) > quantity, VALUES(price), price),
+            amount = IF(VALUES(quantity) > quantity, VALUES(amount), amount),
+            status = IF(VALUES(quantity) > quantity, VALUES(status), status),
+            message = IF(VALUES(quantity) > quantity, COALESCE(VALUES(message), message), message),
+            quantity = GREATEST(quantity, VALUES(quantity))
+    """, (symbol, action, price, quantity, amount, acceleration, status, message, order_id, test_mode))
+    return cursor.rowcount
+
+
+def persist_fill_retry(order_id: str, test_mode: int, symbol: str, action: str, acceleration: float,
+                       price: float, quantity: int, amount: float, status: str, message: Optional[str] = None):
+    """成交落库重试（任务队列持久化任务，参数为落库失败时的累计成交）"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        updated = _write_fill(cursor, order_id, test_mode, symbol, action, acceleration,
+                              price, quantity, amount, status, message)
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+    logger.info(f"成交落库重试: {order_id} 累计 {quantity} @ ${price:.4f}"
+                + ("" if updated else "（已有更新的成交记录，跳过）"))
+
+
+class ManagedOrder:
+    """订单簿中的一个订单"""
+
+    def __init__(self, order_id: str, symbol: str, side: str, quantity: int,
+                 quote_price: float, test_mode: int, acceleration: float = 0):
+        self.order_id = order_id
+        self.symbol = symbol
+        self.side = side
+        self.quantity = quantity
+        self.quote_price = quote_price
+        self.test_mode = test_mode
+        self.acceleration = acceleration
+
+        self.status = 'SUBMITTED'
+        self.filled_quantity = 0
+        self.avg_price = 0.0
+        self.realized_pnl = 0.0
+        self.entry_price = 0.0  # 卖出时的持仓均价
+        self.trade_id = None
+        self.message = ''
+
+        self.submitted_at = time.monotonic()
+        self.acked_at = None
+        self.first_fill_at = None
+        self.filled_at = None
+        self.created_at = datetime.now()
+
+    @property
+    def is_done(self) -> bool:
+        return self.status in TERMINAL_STATUSES
+
+    def latency_ms(self) -> dict:
+        """提交 → 确认 / 首次成交 / 全部成交 的耗时（毫秒）"""
+        def since_submit(ts):
+            return round((ts - self.submitted_at) * 1000, 2) if ts is not None else None
+
+        return {
+            'ack': since_submit(self.acked_at),
+            'first_fill': since_submit(self.first_fill_at),
+            'fill': since_submit(self.filled_at)
+        }
+
+    def to_dict(self) -> dict:
+        return {
+            'order_id': self.order_id,
+            'symbol': self.symbol,
+            'side': self.side,
+            'status': self.status,
+            'quantity': self.quantity,
+            'filled_quantity': self.filled_quantity,
+            'quote_price': self.quote_price,
+            'executed_price': round(self.avg_price, 4),
+            'realized_pnl': round(self.realized_pnl, 2),
+            'test_mode': self.test_mode,
+            'trade_id': self.trade_id,
+            'message': self.message,
+            'created_at': self.created_at.isoformat(),
+            'latency_ms': self.latency_ms()
+        }
+
+
+class OrderManager:
+    """订单管理器"""
+
+    def __init__(self, max_finished_orders: int = 500):
+        self._orders: Dict[str, ManagedOrder] = {}
+        self._early_events: Dict[str, object] = {}  # 订单注册前到达的推送
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.max_finished_orders = max_finished_orders
+        self.push_subscribed = False
+        self._fill_listeners: List[Callable[[ManagedOrder, int, float], None]] = []
+        self._change_listeners: List[Callable[[object], None]] = []
+        self._finish_listeners: List[Callable[[ManagedOrder], None]] = []
+        self._task_queue = None
+        self._retries = set()
+
+        # 统计
+        self.submitted = 0
+        self.rejected = 0
+        self.fills = 0
+        self._ack_total = 0.0
+        self._ack_count = 0
+        self._fill_total = 0.0
+        self._fill_count = 0
+
+    def attach(self, sdk) -> bool:
+        """绑定事件循环并订阅交易推送（在启动连接长桥后调用）"""
+        self._loop = asyncio.get_running_loop()
+        self.push_subscribed = sdk.subscribe_order_changes(self._on_order_changed)
+        return self.push_subscribed
+
+    def attach_queue(self, task_queue):
+        """绑定任务队列并注册成交落库重试任务（须在任务队列启动前调用，以便恢复上次未完成的重试）"""
+        self._task_queue = task_queue
+        task_queue.register(PERSIST_FILL_TASK, persist_fill_retry)
+
+    def add_fill_listener(self, callback: Callable[[ManagedOrder, int, float], None]):
+        """注册成交回调 callback(order, 本次成交数量, 成交价)，在持仓账本更新后调用"""
+        self._fill_listeners.append(callback)
+
+    def add_change_listener(self, callback: Callable[[object], None]):
+        """注册订单推送回调 callback(event)，每条推送（含其他渠道下的单）都会调用"""
+        self._change_listeners.append(callback)
+
+    def add_finish_listener(self, callback: Callable[[ManagedOrder], None]):
+        """注册订单结束回调 callback(order)，订单进入终态（含部分成交后撤单/过期）时调用一次"""
+        self._finish_listeners.append(callback)
+
+    def _notify_finished(self, order: ManagedOrder):
+        for callback in self._finish_listeners:
+            try:
+                callback(order)
+            except Exception as e:
+                logger.error(f"订单结束回调失败 {order.order_id}: {e}")
+
+    async def submit(self, symbol: str, side: str, quantity: int, price: float,
+                     acceleration: float = 0) -> dict:
+        """提交单个市价单（见 submit_batch）"""
+        results = await self.submit_batch([{
+            'symbol': symbol, 'side': side, 'quantity': quantity,
+            'price': price, 'acceleration': acceleration
+        }])
+        return results[0]
+
+    async def submit_batch(self, intents: List[dict]) -> List[dict]:
+        """
+        并发提交一批市价单并登记到订单簿，结果顺序与 intents 一致
+        intent: {'symbol', 'side', 'quantity', 'price'（报价）, 'acceleration'（可选）}
+        各订单经 trade 限流预算并发提交，所有交易记录在同一事务中写入，写入失败时提交重试任务补写；
+        测试模式或模拟SDK的订单在交易记录提交后按报价成交（此时才更新订单簿与持仓账本），
+        真实订单等待交易推送回报成交
+        """
+        from .longbridge_sdk import longbridge_sdk
+
+        test_mode = 1 if is_test_mode() else 0
+        simulated = test_mode or not (longbridge_sdk.use_real_sdk and longbridge_sdk.trade_ctx)
+        started = time.monotonic()
+
+        async def place(index: int, intent: dict) -> dict:
+            if test_mode:
+                stamp = datetime.now().strftime("%Y%m%d%H%M%S%f")
+                order_result = {'success': True, 'order_id': f'TEST_{stamp}_{index}'}
+            else:
+                order_result = await longbridge_sdk.submit_order(
+                    intent['symbol'], intent['side'].upper(), intent['quantity'], 'MARKET'
+                )
+            order_result['acked_at'] = time.monotonic()
+            return order_result
+
+        order_results = await asyncio.gather(
+            *(place(i, intent) for i, intent in enumerate(intents)), return_exceptions=True
+        )
+
+        results = []
+        accepted = []
+        for intent, order_result in zip(intents, order_results):
+            if isinstance(order_result, Exception):
+                order_result = {'success': False, 'message': str(order_result)}
+            if not order_result.get('success'):
+                self.rejected += 1
+                results.append({'success': False, 'symbol': intent['symbol'],
+                                'message': order_result.get('message', '订单提交失败')})
+                continue
+
+            order = ManagedOrder(str(order_result['order_id']), intent['symbol'], intent['side'].upper(),
+                                 intent['quantity'], intent['price'], test_mode, intent.get('acceleration', 0))
+            order.submitted_at = started
+            order.acked_at = order_result['acked_at']
+            self._record_ack(order)
+            self._orders[order.order_id] = order
+            self.submitted += 1
+            accepted.append(order)
+            results.append(order)
+
+        if accepted:
+            try:
+                with self._transaction() as cursor:
+                    for order in accepted:
+                        order.trade_id = self._persist_submitted(order, cursor)
+            except Exception as e:
+                logger.error(f"交易记录写入失败（{len(accepted)} 笔订单），提交重试: {e}")
+                for order in accepted:
+                    self._schedule_fill_retry(order)
+            for order in accepted:
+                prediction_index.record_trade(order.side)
+
+        if accepted and simulated:
+            for order in accepted:
+                self._record_fill(order, order.quantity, order.quote_price, final_status='FILLED')
+            try:
+                with self._transaction() as cursor:
+                    for order in accepted:
+                        self._persist_fill(order, order.quantity, order.quote_price, cursor)
+            except Exception as e:
+                logger.error(f"成交落库失败（{len(accepted)} 笔订单），提交重试: {e}")
+                for order in accepted:
+                    self._schedule_fill_retry(order)
+
+        for order in accepted:
+            early = self._early_events.pop(order.order_id, None)
+            if early is not None:
+                self._handle_order_changed(early)
+            logger.info(f"订单已提交: {order.order_id} {order.side} {order.symbol} x {order.quantity}, "
+                        f"状态: {order.status}")
+        self._evict_finished()
+
+        return [{'success': True, **r.to_dict()} if isinstance(r, ManagedOrder) else r for r in results]
+
+    def _on_order_changed(self, event):
+        """长桥推送回调（在 SDK 线程中执行），转交到事件循环处理"""
+        if self._loop is None or self._loop.is_closed():
+            logger.warning(f"订单推送无法处理（事件循环未就绪）: {getattr(event, 'order_id', '')}")
+            return
+        self._loop.call_soon_threadsafe(self._handle_order_changed, event)
+
+    def _handle_order_changed(self, event):
+        """处理订单变更推送：计算新增成交并落库"""
+        for callback in self._change_listeners:
+            try:
+                callback(event)
+            except Exception as e:
+                logger.error(f"订单推送回调失败: {e}")
+
+        order_id = str(getattr(event, 'order_id', ''))
+        order = self._orders.get(order_id)
+        if order is None:
+            # submit_order 返回前推送可能已到达（也可能是其他渠道下的单，只保留最近的）
+            self._early_events[order_id] = event
+            if len(self._early_events) > self.max_finished_orders:
+                self._early_events.pop(next(iter(self._early_events)))
+            return
+        if order.is_done:
+            return
+
+        status = _STATUS_MAP.get(_enum_to_str(getattr(event, 'status', None)))
+        executed_qty = _to_int(getattr(event, 'executed_quantity', None))
+        delta = executed_qty - order.filled_quantity
+
+        if delta > 0:
+            last_share = _to_int(getattr(event, 'last_share', None))
+            last_price = _to_float(getattr(event, 'last_price', None))
+            if last_share == delta and last_price > 0:
+                fill_price = last_price
+            else:
+                # 由累计成交均价反推本次成交价（合并了多笔推送时）
+                executed_price = _to_float(getattr(event, 'executed_price', None))
+                fill_price = (executed_price * executed_qty - order.avg_price * order.filled_quantity) / delta
+            final_status = status if status in TERMINAL_STATUSES else None
+            self._apply_fill(order, delta, fill_price, final_status=final_status)
+        elif status in TERMINAL_STATUSES:
+            order.status = status
+            order.message = str(getattr(event, 'msg', '') or '')
+            try:
+                self._persist_status(order)
+            except Exception as e:
+                logger.error(f"订单状态落库失败 {order.order_id}: {e}")
+            self._evict_finished()
+            logger.info(f"订单结束: {order.order_id} {order.symbol} 状态: {status}")
+            self._notify_finished(order)
+
+    def _apply_fill(self, order: ManagedOrder, quantity: int, price: float,
+                    final_status: Optional[str] = None):
+        """登记一笔成交并更新 trades / positions"""
+        self._record_fill(order, quantity, price, final_status)
+        try:
+            self._persist_fill(order, quantity, price)
+        except Exception as e:
+            logger.error(f"成交落库失败 {order.order_id}: {e}")
+            self._schedule_fill_retry(order)
+
+        logger.info(
+            f"订单成交: {order.order_id} {order.side} {order.symbol} +{quantity} @ ${price:.2f}, "
+            f"累计 {order.filled_quantity}/{order.quantity}, 状态: {order.status}"
+        )
+        if order.is_done:
+            self._evict_finished()
+
+    def _schedule_fill_retry(self, order: ManagedOrder):
+        """把当前累计成交作为高优先级持久化任务提交重试"""
+        if self._task_queue is None or not self._task_queue.is_running:
+            return
+        task = asyncio.get_running_loop().create_task(self._task_queue.enqueue(
+            persist_fill_retry, kwargs=self._fill_values(order), priority=PRIORITY_HIGH,
+            name=PERSIST_FILL_TASK, durable=True
+        ))
+        self._retries.add(task)
+        task.add_done_callback(self._retries.discard)
+
+    def _record_fill(self, order: ManagedOrder, quantity: int, price: float,
+                     final_status: Optional[str] = None):
+        """更新内存中的成交进度、均价与延迟"""
+        now = time.monotonic()
+        if order.first_fill_at is None:
+            order.first_fill_at = now
+
+        total_qty = order.filled_quantity + quantity
+        order.avg_price = (order.avg_price * order.filled_quantity + price * quantity) / total_qty
+        order.filled_quantity = total_qty
+        self.fills += 1
+
+        if final_status is None:
+            final_status = 'FILLED' if total_qty >= order.quantity else 'PARTIAL_FILLED'
+        order.status = final_status
+        if order.status == 'FILLED':
+            order.filled_at = now
+            self._fill_total += now - order.submitted_at
+            self._fill_count += 1
+
+        # 持仓以内存账本为准，数据库由账本异步回写
+        try:
+            realized, entry_price = position_ledger.apply_fill(
+                order.test_mode, order.symbol, order.side, quantity, price, order.acceleration
+            )
+        except Exception as e:
+            logger.error(f"持仓账本更新失败 {order.order_id}: {e}")
+            return
+        if order.side == 'SELL':
+            order.realized_pnl += realized
+            order.entry_price = entry_price
+
+        for callback in self._fill_listeners:
+            try:
+                callback(order, quantity, price)
+            except Exception as e:
+                logger.error(f"成交回调失败 {order.order_id}: {e}")
+        if order.is_done:
+            self._notify_finished(order)
+
+    def _record_ack(self, order: ManagedOrder):
+        self._ack_total += order.acked_at - order.submitted_at
+        self._ack_count += 1
+
+    def _evict_finished(self):
+        """只保留最近的已结束订单"""
+        finished = [oid for oid, o in self._orders.items() if o.is_done]
+        for order_id in finished[:max(0, len(finished) - self.max_finished_orders)]:
+            del self._orders[order_id]
+
+    @contextmanager
+    def _transaction(self, cursor=None):
+        """提供游标；传入已有游标时复用调用方的事务"""
+        if cursor is not None:
+            yield cursor
+            return
+        conn = get_db_connection()
+        cursor = conn.cursor(pymysql.cursors.DictCursor)
+        try:
+            yield cursor
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+            conn.close()
+
+    def _persist_submitted(self, order: ManagedOrder, cursor=None) -> Optional[int]:
+        """写入已提交的交易记录，返回 trades.id"""
+        with self._transaction(cursor) as cursor:
+            cursor.execute("""
+                INSERT INTO trades (symbol, action, price, quantity, amount, acceleration,
+                                    status, order_id, test_mode)
+                VALUES (%s, %s, %s, 0, 0, %s, 'SUBMITTED', %s, %s)
+            """, (order.symbol, order.side, order.quote_price, order.acceleration,
+                  order.order_id, order.test_mode))
+            return cursor.lastrowid
+
+    def _persist_status(self, order: ManagedOrder, cursor=None):
+        """更新交易记录状态（撤单/拒绝/过期）"""
+        with self._transaction(cursor) as cursor:
+            cursor.execute(
+                "UPDATE trades SET status = %s, message = %s WHERE order_id = %s AND test_mode = %s",
+                (order.status, order.message, order.order_id, order.test_mode)
+            )
+
+    @staticmethod
+    def _fill_values(order: ManagedOrder) -> dict:
+        """交易记录的累计成交字段（可 JSON 序列化，供落库与重试任务共用）"""
+        message = None
+        if order.side == 'SELL' and order.entry_price:
+            pnl_pct = (order.avg_price - order.entry_price) / order.entry_price * 100
+            message = f'盈亏: ${order.realized_pnl:.2f} ({pnl_pct:.2f}%)'
+        return {
+            'order_id': order.order_id,
+            'test_mode': order.test_mode,
+            'symbol': order.symbol,
+            'action': order.side,
+            'acceleration': order.acceleration,
+            'price': round(order.avg_price, 4),
+            'quantity': order.filled_quantity,
+            'amount': round(order.avg_price * order.filled_quantity, 2),
+            'status': order.status,
+            'message': message
+        }
+
+    def _persist_fill(self, order: ManagedOrder, quantity: int, price: float, cursor=None):
+        """按累计成交更新交易记录（持仓由账本回写）"""
+        with self._transaction(cursor) as cursor:
+            _write_fill(cursor, **self._fill_values(order))
+
+    def active_symbols(self, side: str, test_mode: int) -> Set[str]:
+        """未结束（已提交或部分成交）订单的股票，风控据此把在途买单计为已占用的持仓名额"""
+        return {o.symbol for o in self._orders.values()
+                if not o.is_done and o.side == side and o.test_mode == test_mode}
+
+    def get_order(self, order_id: str) -> Optional[dict]:
+        order = self._orders.get(order_id)
+        return order.to_dict() if order else None
+
+    def list_orders(self, active_only: bool = False) -> List[dict]:
+        orders = [o for o in self._orders.values() if not (active_only and o.is_done)]
+        return [o.to_dict() for o in reversed(orders)]
+
+    def get_stats(self) -> dict:
+        """获取订单统计（延迟为毫秒均值）"""
+        return {
+            'submitted': self.submitted,
+            'rejected': self.rejected,
+            'fills': self.fills,
+            'active_orders': sum(1 for o in self._orders.values() if not o.is_done),
+            'avg_ack_ms': round(self._ack_total / self._ack_count * 1000, 2) if self._ack_count else 0,
+            'avg_fill_ms': round(self._fill_total / self._fill_count * 1000, 2) if self._fill_count else 0,
+            'push_subscribed': self.push_subscribed
+        }
+
+
+# 全局实例
+order_manager = OrderManager()
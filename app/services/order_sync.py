@@ -0,0 +1,238 @@
+"""
+长桥订单历史增量同步
+- 本地 orders 表保存券商订单：首次启动回填最近 90 天，之后只拉取高水位之后的订单
+- 按时间窗口分页拉取并逐窗口写入，不受单次查询条数上限影响；高水位只在窗口完整拉取并写入后推进，
+  拉取失败（限流、断线）时停止本轮同步，下轮从失败的窗口重新开始
+- 交易推送到达时立即写入单条订单（不推进高水位），定期同步兜底补齐
+- 进程启动时以 orders 表最新 updated_at 作为初始高水位
+- 订单历史、当日成交统计、按股票过滤均走 orders 表索引查询，不再每次请求调用 history_orders
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+import pymysql
+
+from app.config.database import get_db_connection
+from app.config.settings import ORDER_SYNC_INTERVAL
+from .longbridge_sdk import order_to_dict
+
+logger = logging.getLogger(__name__)
+
+_ORDER_COLUMNS = ('order_id', 'symbol', 'side', 'order_type', 'status', 'submitted_price', 'executed_price',
+                  'submitted_quantity', 'executed_quantity', 'currency', 'updated_at')
+
+
+class OrderHistorySync:
+    """订单历史同步器"""
+
+    def __init__(self, interval: float = ORDER_SYNC_INTERVAL, backfill_days: int = 90,
+                 overlap: timedelta = timedelta(days=1), page_window: timedelta = timedelta(days=7)):
+        self.interval = interval
+        self.backfill_days = backfill_days
+        self.overlap = overlap  # 高水位回看窗口，覆盖提交后才更新状态的订单
+        self.page_window = page_window  # 单次查询的时间窗口
+        self.high_water: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+        self._pending_writes = set()
+
+        # 统计
+        self.syncs = 0
+        self.synced_rows = 0
+        self.push_rows = 0
+        self.errors = 0
+
+    # ---------- 写入 ----------
+
+    @staticmethod
+    def _row(order: dict) -> tuple:
+        updated_at = order['updated_at']
+        if isinstance(updated_at, str):
+            updated_at = datetime.fromisoformat(updated_at)
+        return (str(order['order_id']), str(order['symbol'])[:30], order['side'], order['order_type'],
+                order['status'], order['submitted_price'], order['executed_price'],
+                order['submitted_quantity'], order['executed_quantity'], order['currency'], updated_at)
+
+    def upsert(self, orders: List[dict]) -> int:
+        """写入订单；同一订单只接受 updated_at 不早于已有记录的版本（推送与同步乱序时不回退）"""
+        rows = [self._row(o) for o in orders if o.get('order_id')]
+        if not rows:
+            return 0
+        # updated_at 必须最后更新，前面的 IF 比较的是旧值
+        updates = ', '.join(
+            f"{col} = IF(VALUES(updated_at) >= updated_at, VALUES({col}), {col})"
+            for col in _ORDER_COLUMNS[1:-1]
+        )
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.executemany(f"""
+                INSERT INTO orders ({', '.join(_ORDER_COLUMNS)})
+                VALUES ({', '.join(['%s'] * len(_ORDER_COLUMNS))})
+                ON DUPLICATE KEY UPDATE {updates},
+                    updated_at = GREATEST(updated_at, VALUES(updated_at))
+            """, rows)
+            conn.commit()
+        finally:
+            cursor.close()
+            conn.close()
+
+        return len(rows)
+
+    def _load_high_water(self) -> Optional[datetime]:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT MAX(updated_at) FROM orders")
+            row = cursor.fetchone()
+            return row[0] if row else None
+        finally:
+            cursor.close()
+            conn.close()
+
+    async def sync(self, now: Optional[datetime] = None) -> int:
+        """增量同步：首次回填，之后从高水位（减回看窗口）开始，按时间窗口分页拉取，并合并当日订单"""
+        from .longbridge_sdk import longbridge_sdk
+
+        if not (longbridge_sdk.use_real_sdk and longbridge_sdk.trade_ctx):
+            return 0  # 未连接真实交易账户时没有可同步的订单
+        if self.high_water is None:
+            self.high_water = await asyncio.to_thread(self._load_high_water)
+
+        now = now or datetime.now()
+        if self.high_water is None:
+            logger.info(f"订单历史回填最近 {self.backfill_days} 天")
+            start_at = now - timedelta(days=self.backfill_days)
+        else:
+            start_at = self.high_water - self.overlap
+
+        written = 0
+        while start_at < now:
+            end_at = min(start_at + self.page_window, now)
+            # 拉取失败时抛出，高水位停在上一个完整窗口
+            orders = await longbridge_sdk.get_history_orders(start_at=start_at, end_at=end_at, limit=None,
+                                                             raise_errors=True)
+            written += await asyncio.to_thread(self.upsert, orders)
+            self.high_water = end_at
+            start_at = end_at
+        written += await asyncio.to_thread(self.upsert, await longbridge_sdk.get_today_orders())
+        self.syncs += 1
+        self.synced_rows += written
+        return written
+
+    def on_order_changed(self, event):
+        """交易推送（在事件循环中调用）：异步写入单条订单"""
+        try:
+            order = order_to_dict(event)
+        except Exception as e:
+            logger.warning(f"订单推送解析失败: {e}")
+            return
+        task = asyncio.get_running_loop().create_task(asyncio.to_thread(self.upsert, [order]))
+        self._pending_writes.add(task)
+        task.add_done_callback(self._on_write_done)
+
+    def _on_write_done(self, task: asyncio.Task):
+        self._pending_writes.discard(task)
+        if task.cancelled():
+            return
+        if task.exception() is not None:
+            self.errors += 1
+            logger.error(f"订单推送写入失败: {task.exception()}")
+        else:
+            self.push_rows += task.result()
+
+    # ---------- 查询 ----------
+
+    def list_orders(self, symbol: Optional[str] = None, status: Optional[str] = None,
+                    limit: int = 100) -> List[dict]:
+        """订单历史（按 updated_at 倒序，走索引）"""
+        conditions, params = [], []
+        if symbol:
+            conditions.append("symbol = %s")
+            params.append(symbol)
+        if status:
+            conditions.append("status = %s")
+            params.append(status)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        conn = get_db_connection()
+        cursor = conn.cursor(pymysql.cursors.DictCursor)
+        try:
+            cursor.execute(f"""
+                SELECT {', '.join(_ORDER_COLUMNS)} FROM orders {where}
+                ORDER BY updated_at DESC LIMIT %s
+            """, (*params, limit))
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+            conn.close()
+
+    def today_stats(self) -> dict:
+        """当日已成交订单统计"""
+        conn = get_db_connection()
+        cursor = conn.cursor(pymysql.cursors.DictCursor)
+        try:
+            cursor.execute("""
+                SELECT
+                    COUNT(*) as total,
+                    SUM(CASE WHEN side = 'Buy' THEN 1 ELSE 0 END) as buy_count,
+                    SUM(CASE WHEN side = 'Sell' THEN 1 ELSE 0 END) as sell_count,
+                    SUM(executed_price * executed_quantity) as volume
+                FROM orders
+                WHERE status = 'Filled' AND updated_at >= CURDATE()
+            """)
+            row = cursor.fetchone() or {}
+        finally:
+            cursor.close()
+            conn.close()
+        return {
+            "count": int(row.get('total') or 0),
+            "buy_count": int(row.get('buy_count') or 0),
+            "sell_count": int(row.get('sell_count') or 0),
+            "volume": float(row.get('volume') or 0)
+        }
+
+    # ---------- 后台同步 ----------
+
+    def attach(self, order_manager):
+        order_manager.add_change_listener(self.on_order_changed)
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._pending_writes:
+            await asyncio.gather(*self._pending_writes, return_exceptions=True)
+
+    async def _run(self):
+        while True:
+            try:
+                await self.sync()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"订单历史同步失败: {e}")
+            await asyncio.sleep(self.interval)
+
+    def get_stats(self) -> dict:
+        return {
+            'running': self._task is not None,
+            'high_water': self.high_water.isoformat(sep=' ') if self.high_water else None,
+            'syncs': self.syncs,
+            'synced_rows': self.synced_rows,
+            'push_rows': self.push_rows,
+            'errors': self.errors
+        }
+
+
+# 全局实例
+order_sync = OrderHistorySync()
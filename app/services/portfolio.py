@@ -0,0 +1,304 @@
+"""
+账户估值服务
+- 余额、持仓常驻内存：真实模式按成交回报增量更新现金和持仓，定期与长桥账户对账
+- 测试模式持仓直接读取内存持仓账本
+- 后台按行情簿（合并/缓存后的实时行情）对持仓逐只估值，并按昨收计算当日盈亏
+- /api/portfolio 只读取内存快照
+"""
+import asyncio
+import logging
+import time
+from datetime import date, datetime
+from typing import Dict, Optional
+
+import pymysql
+
+from app.config.database import get_db_connection
+from app.config.settings import PORTFOLIO_MARK_INTERVAL, PORTFOLIO_RECONCILE_INTERVAL
+from app.auth.utils import is_test_mode
+
+logger = logging.getLogger(__name__)
+
+
+def _empty_today() -> dict:
+    return {"count": 0, "buy_count": 0, "sell_count": 0, "volume": 0.0}
+
+
+class AccountBook:
+    """单个模式（真实 / 测试）的账户状态"""
+
+    def __init__(self):
+        self.cash = 0.0
+        self.currency = 'USD'
+        self.assets_offset = 0.0  # 对账时 net_assets 与 现金+市值 的差（其他币种、费用等）
+        self.positions: Dict[str, dict] = {}  # 真实模式: {symbol: {'quantity', 'cost_price', 'opened_today'}}
+        self.quotes: Dict[str, tuple] = {}  # {symbol: (price, prev_close)}
+        self.today = _empty_today()
+        self.today_date: Optional[date] = None
+        self.reconciled_at = 0.0
+        self.marked_at = 0.0
+
+
+class PortfolioService:
+    """账户估值服务"""
+
+    def __init__(self, mark_interval: float = PORTFOLIO_MARK_INTERVAL,
+                 reconcile_interval: float = PORTFOLIO_RECONCILE_INTERVAL):
+        self.mark_interval = mark_interval
+        self.reconcile_interval = reconcile_interval
+        self._books = {0: AccountBook(), 1: AccountBook()}
+        self._ledger = None
+        self._task: Optional[asyncio.Task] = None
+
+        # 统计
+        self.reconciles = 0
+        self.reconcile_errors = 0
+        self.fills = 0
+
+    # ---------- 数据来源 ----------
+
+    def attach(self, order_manager, ledger):
+        """订阅成交回报；测试模式持仓读取持仓账本"""
+        self._ledger = ledger
+        order_manager.add_fill_listener(self.on_fill)
+
+    def on_fill(self, order, quantity: int, price: float):
+        """成交回报：真实模式增量更新现金和持仓；订单全部成交后计入当日交易统计"""
+        book = self._books[order.test_mode]
+        self.fills += 1
+        if not order.test_mode:
+            amount = quantity * price
+            position = book.positions.get(order.symbol)
+            if order.side == 'BUY':
+                book.cash -= amount
+                if position and position['quantity'] > 0:
+                    total = position['quantity'] + quantity
+                    position['cost_price'] = (position['cost_price'] * position['quantity'] + amount) / total
+                    position['quantity'] = total
+                else:
+                    book.positions[order.symbol] = {'quantity': quantity, 'cost_price': price, 'opened_today': True}
+            else:
+                book.cash += amount
+                if position:
+                    position['quantity'] -= quantity
+                    if position['quantity'] <= 0:
+                        del book.positions[order.symbol]
+
+        if order.status == 'FILLED' and book.today_date == date.today():
+            book.today['count'] += 1
+            book.today['buy_count' if order.side == 'BUY' else 'sell_count'] += 1
+            book.today['volume'] += order.avg_price * order.filled_quantity
+
+    async def reconcile(self, test_mode: int):
+        """与长桥账户对账：余额、（真实模式）持仓和当日交易统计"""
+        from .longbridge_sdk import longbridge_sdk
+
+        book = self._books[test_mode]
+        new_day = book.today_date != date.today()
+        try:
+            balance = await longbridge_sdk.get_account_balance()
+            if not test_mode:
+                lb_positions = await longbridge_sdk.get_stock_positions()
+                # 跨日后所有持仓都以昨收为当日盈亏基准
+                book.positions = {
+                    p['symbol']: {'quantity': p['quantity'], 'cost_price': p['cost_price'],
+                                  'opened_today': not new_day and bool(
+                                      book.positions.get(p['symbol'], {}).get('opened_today'))}
+                    for p in lb_positions if p['quantity'] > 0
+                }
+            if new_day:
+                book.today = await self._load_today_trades(test_mode)
+                book.today_date = date.today()
+
+            book.cash = float(balance.get('available_cash', 0))
+            book.currency = balance.get('currency', 'USD')
+            await self.mark_to_market(test_mode)
+            net_assets = float(balance.get('net_assets', 0))
+            # 真实模式下优先使用 SDK 返回的 net_assets
+            market_value = sum(p['quantity'] * p['current_price'] for p in self._positions(test_mode))
+            book.assets_offset = net_assets - book.cash - market_value if not test_mode and net_assets > 0 else 0.0
+            book.reconciled_at = time.time()
+            self.reconciles += 1
+        except Exception as e:
+            self.reconcile_errors += 1
+            logger.error(f"账户对账失败: {e}")
+
+    async def _load_today_trades(self, test_mode: int) -> dict:
+        """当天首次对账时汇总今日交易"""
+        if test_mode:
+            conn = get_db_connection()
+            cursor = conn.cursor(pymysql.cursors.DictCursor)
+            try:
+                cursor.execute("""
+                    SELECT
+                        COUNT(*) as total_trades,
+                        SUM(CASE WHEN action = 'BUY' THEN 1 ELSE 0 END) as buy_count,
+                        SUM(CASE WHEN action = 'SELL' THEN 1 ELSE 0 END) as sell_count,
+                        SUM(amount) as total_volume
+                    FROM trades
+                    WHERE DATE(trade_time) = CURDATE() AND test_mode = 1
+                """)
+                row = cursor.fetchone() or {}
+            finally:
+                cursor.close()
+                conn.close()
+            return {
+                "count": int(row.get('total_trades') or 0),
+                "buy_count": int(row.get('buy_count') or 0),
+                "sell_count": int(row.get('sell_count') or 0),
+                "volume": float(row.get('total_volume') or 0)
+            }
+
+        # 真实模式：本地 orders 表（订单历史同步）
+        from .order_sync import order_sync
+        return await asyncio.to_thread(order_sync.today_stats)
+
+    async def mark_to_market(self, test_mode: int):
+        """用行情簿中的最新价和昨收更新持仓估值"""
+        from .longbridge_sdk import longbridge_sdk
+
+        book = self._books[test_mode]
+        symbols = [p['symbol'] for p in self._raw_positions(test_mode)]
+        if not symbols:
+            return
+        quotes = await longbridge_sdk.get_realtime_quote(symbols)
+        for quote in quotes:
+            price = quote.get('price') or 0
+            if price <= 0:
+                continue
+            prev_close = quote.get('prev_close')
+            if not prev_close:
+                change_pct = quote.get('change_pct') or 0
+                prev_close = price / (1 + change_pct / 100) if change_pct > -100 else price
+            book.quotes[quote['symbol']] = (price, prev_close)
+        book.marked_at = time.time()
+
+    # ---------- 估值 ----------
+
+    def _raw_positions(self, test_mode: int) -> list:
+        """[{'symbol', 'quantity', 'cost_price', 'opened_today'}]"""
+        if test_mode:
+            if self._ledger is None:
+                return []
+            today = date.today()
+            return [
+                {'symbol': p['symbol'], 'quantity': p['quantity'], 'cost_price': p['buy_price'],
+                 'opened_today': isinstance(p.get('buy_time'), datetime) and p['buy_time'].date() == today}
+                for p in self._ledger.holdings(1)
+            ]
+        return [{'symbol': symbol, **p} for symbol, p in self._books[0].positions.items()]
+
+    def _positions(self, test_mode: int) -> list:
+        """按最新价估值后的持仓（无行情时按成本价）"""
+        book = self._books[test_mode]
+        result = []
+        for p in self._raw_positions(test_mode):
+            cost_price = p['cost_price']
+            price, prev_close = book.quotes.get(p['symbol'], (cost_price, cost_price))
+            market_value = price * p['quantity']
+            cost = cost_price * p['quantity']
+            # 当天开仓的持仓以成本价作为当日盈亏基准
+            reference = cost_price if p['opened_today'] else prev_close
+            result.append({
+                'symbol': p['symbol'],
+                'quantity': p['quantity'],
+                'buy_price': cost_price,
+                'current_price': price,
+                'prev_close': prev_close,
+                'market_value': market_value,
+                'cost': cost,
+                'profit_loss': market_value - cost if cost > 0 else 0,
+                'profit_loss_pct': ((market_value - cost) / cost * 100) if cost > 0 else 0,
+                'daily_profit_loss': (price - reference) * p['quantity'],
+                'test_mode': test_mode
+            })
+        return result
+
+    def snapshot(self, test_mode: int) -> dict:
+        """账户总览（内存计算）"""
+        book = self._books[test_mode]
+        positions = self._positions(test_mode)
+        total_market_value = sum(p['market_value'] for p in positions)
+        total_cost = sum(p['cost'] for p in positions)
+        total_assets = book.cash + total_market_value + book.assets_offset
+
+        position_profit_loss = total_market_value - total_cost if total_cost > 0 else 0
+        position_profit_loss_pct = (position_profit_loss / total_cost * 100) if total_cost > 0 else 0
+        daily_profit_loss = sum(p['daily_profit_loss'] for p in positions)
+        base = total_assets - daily_profit_loss
+        daily_profit_loss_pct = (daily_profit_loss / base * 100) if base > 0 else 0
+
+        # 构造多币种数据
+        multi_currency = {
+            "USD": {"total_assets": 0},
+            "CNY": {"total_assets": 0},
+            "HKD": {"total_assets": 0}
+        }
+        multi_currency[book.currency if book.currency in multi_currency else "USD"]["total_assets"] = total_assets
+
+        return {
+            "total_assets": total_assets,
+            "available_cash": book.cash,
+            "position_market_value": total_market_value,
+            "total_cost": total_cost,
+            "position_profit_loss": position_profit_loss,
+            "position_profit_loss_pct": position_profit_loss_pct,
+            "daily_profit_loss": daily_profit_loss,
+            "daily_profit_loss_pct": daily_profit_loss_pct,
+            "positions": positions,
+            "today_trades": dict(book.today),
+            "is_test_mode": bool(test_mode),
+            "currency": book.currency,
+            "multi_currency": multi_currency,
+            "valued_at": book.marked_at
+        }
+
+    async def get_portfolio(self, test_mode: int) -> dict:
+        """账户总览；首次请求（尚未对账）时先同步一次"""
+        if not self._books[test_mode].reconciled_at:
+            await self.reconcile(test_mode)
+        return self.snapshot(test_mode)
+
+    # ---------- 后台刷新 ----------
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        """定期估值；对账间隔到期或跨日时重新对账"""
+        while True:
+            try:
+                test_mode = 1 if is_test_mode() else 0
+                book = self._books[test_mode]
+                if time.time() - book.reconciled_at >= self.reconcile_interval or book.today_date != date.today():
+                    await self.reconcile(test_mode)
+                else:
+                    await self.mark_to_market(test_mode)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"账户估值失败: {e}")
+            await asyncio.sleep(self.mark_interval)
+
+    def get_stats(self) -> dict:
+        return {
+            'running': self._task is not None,
+            'reconciles': self.reconciles,
+            'reconcile_errors': self.reconcile_errors,
+            'fills': self.fills,
+            'positions': {mode: len(self._raw_positions(mode)) for mode in (0, 1)}
+        }
+
+
+# 全局实例
+portfolio_service = PortfolioService()
@@ -0,0 +1,305 @@
+"""
+内存持仓账本
+- 启动时从 positions 表加载，之后以内存为准（信号检查不再查询数据库）
+- 持仓数量、单只股票持仓均为 O(1) 查询
+- 成交时在锁内原子更新，变更异步回写（write-behind）到 positions 表
+- 持仓变化时通知监听者（如止盈止损引擎）
+"""
+import asyncio
+import logging
+from datetime import datetime
+from threading import Lock
+from typing import Callable, Dict, List, Optional, Tuple
+
+import pymysql
+
+from app.config.database import get_db_connection
+
+logger = logging.getLogger(__name__)
+
+
+class PositionLedger:
+    """持仓账本，按 (test_mode, symbol) 索引"""
+
+    def __init__(self, flush_interval: float = 0.5):
+        self.flush_interval = flush_interval
+        self._positions: Dict[int, Dict[str, dict]] = {0: {}, 1: {}}
+        self._holding_counts = {0: 0, 1: 0}
+        self._dirty = set()  # {(test_mode, symbol)}
+        self._lock = Lock()
+        self._loaded = False
+        self._flush_task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._listeners: List[Callable[[int, str, dict], None]] = []
+
+        # 统计
+        self.fills = 0
+        self.flushes = 0
+        self.flushed_rows = 0
+        self.flush_errors = 0
+
+    def load(self):
+        """从 positions 表加载全部持仓（覆盖内存状态）"""
+        conn = get_db_connection()
+        cursor = conn.cursor(pymysql.cursors.DictCursor)
+        try:
+            cursor.execute("SELECT * FROM positions")
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+            conn.close()
+
+        positions = {0: {}, 1: {}}
+        for row in rows:
+            mode = int(row.get('test_mode') or 0)
+            positions.setdefault(mode, {})[row['symbol']] = self._normalize_row(row)
+
+        with self._lock:
+            self._positions = positions
+            self._holding_counts = {
+                mode: sum(1 for p in rows_by_symbol.values() if p['quantity'] > 0)
+                for mode, rows_by_symbol in positions.items()
+            }
+            self._dirty.clear()
+            self._loaded = True
+        logger.info(f"持仓账本已加载: {len(rows)} 条记录")
+
+    def ensure_loaded(self):
+        """首次使用时加载（启动加载失败时的兜底）"""
+        if not self._loaded:
+            self.load()
+
+    @staticmethod
+    def _normalize_row(row: dict) -> dict:
+        """数据库行转为内存记录（Decimal → float）"""
+        def to_float(value):
+            return float(value) if value is not None else None
+
+        return {
+            'symbol': row['symbol'],
+            'quantity': int(row.get('quantity') or 0),
+            'buy_price': to_float(row.get('buy_price')) or 0.0,
+            'cost': to_float(row.get('cost')) or 0.0,
+            'buy_time': row.get('buy_time'),
+            'buy_acceleration': to_float(row.get('buy_acceleration')),
+            'status': row.get('status') or 'HOLDING',
+            'current_price': to_float(row.get('current_price')),
+            'profit_loss': to_float(row.get('profit_loss')),
+            'profit_loss_pct': to_float(row.get('profit_loss_pct')),
+            'peak_price': to_float(row.get('peak_price')),
+            'test_mode': int(row.get('test_mode') or 0)
+        }
+
+    # ---------- 查询（O(1)） ----------
+
+    def get(self, symbol: str, test_mode: int) -> Optional[dict]:
+        """获取持仓记录副本（含已清仓记录）"""
+        self.ensure_loaded()
+        position = self._positions.get(test_mode, {}).get(symbol)
+        return dict(position) if position else None
+
+    def is_holding(self, symbol: str, test_mode: int) -> bool:
+        self.ensure_loaded()
+        position = self._positions.get(test_mode, {}).get(symbol)
+        return bool(position and position['quantity'] > 0)
+
+    def holding_count(self, test_mode: int) -> int:
+        self.ensure_loaded()
+        return self._holding_counts.get(test_mode, 0)
+
+    def holdings(self, test_mode: int) -> List[dict]:
+        """当前持仓（quantity > 0）"""
+        self.ensure_loaded()
+        with self._lock:
+            return [dict(p) for p in self._positions.get(test_mode, {}).values() if p['quantity'] > 0]
+
+    # ---------- 成交更新 ----------
+
+    def apply_fill(self, test_mode: int, symbol: str, side: str, quantity: int, price: float,
+                   acceleration: float = 0) -> Tuple[float, float]:
+        """
+        按成交原子更新持仓，返回 (本次已实现盈亏, 持仓均价)
+        买入：加仓并重新计算均价（已清仓的记录重新开仓）；卖出：减仓，清仓时标记 SOLD
+        """
+        self.ensure_loaded()
+        with self._lock:
+            book = self._positions.setdefault(test_mode, {})
+            position = book.get(symbol)
+            was_holding = bool(position and position['quantity'] > 0)
+            realized = 0.0
+
+            if side == 'BUY':
+                cost = price * quantity
+                if was_holding:
+                    position['quantity'] += quantity
+                    position['cost'] += cost
+                    position['buy_price'] = position['cost'] / position['quantity']
+                    position['buy_acceleration'] = acceleration
+                    position['status'] = 'HOLDING'
+                    position['peak_price'] = max(position['peak_price'] or price, price)
+                else:
+                    position = {
+                        'symbol': symbol, 'quantity': quantity, 'buy_price': price, 'cost': cost,
+                        'buy_time': datetime.now(), 'buy_acceleration': acceleration,
+                        'status': 'HOLDING', 'current_price': None,
+                        'profit_loss': None, 'profit_loss_pct': None,
+                        'peak_price': price, 'test_mode': test_mode
+                    }
+                    book[symbol] = position
+            else:
+                if not was_holding:
+                    logger.warning(f"卖出成交但账本中无持仓: {symbol}")
+                    return 0.0, 0.0
+                buy_price = position['buy_price']
+                realized = (price - buy_price) * quantity
+                remaining = max(0, position['quantity'] - quantity)
+                # 同一轮清仓的盈亏累加（新开仓时重置）
+                position['profit_loss'] = (position['profit_loss'] or 0.0) + realized
+                position['profit_loss_pct'] = (price - buy_price) / buy_price * 100 if buy_price > 0 else 0
+                position['quantity'] = remaining
+                position['cost'] = buy_price * remaining
+                position['current_price'] = price
+                position['status'] = 'HOLDING' if remaining > 0 else 'SOLD'
+                if remaining == 0:
+                    position['peak_price'] = None
+
+            is_holding = position['quantity'] > 0
+            if is_holding != was_holding:
+                self._holding_counts[test_mode] = self._holding_counts.get(test_mode, 0) + (1 if is_holding else -1)
+            self._dirty.add((test_mode, symbol))
+            self.fills += 1
+            avg_price = position['buy_price']
+            snapshot = dict(position)
+
+        self._request_flush()
+        self._notify(test_mode, symbol, snapshot)
+        return realized, avg_price
+
+    def update_peak(self, test_mode: int, symbol: str, peak_price: float) -> bool:
+        """记录持仓期间的最高价（只升不降），用于重启后恢复移动止盈线"""
+        with self._lock:
+            position = self._positions.get(test_mode, {}).get(symbol)
+            if not position or position['quantity'] <= 0:
+                return False
+            if position['peak_price'] is not None and peak_price <= position['peak_price']:
+                return False
+            position['peak_price'] = peak_price
+            self._dirty.add((test_mode, symbol))
+        self._request_flush()
+        return True
+
+    # ---------- 监听 ----------
+
+    def add_listener(self, callback: Callable[[int, str, dict], None]):
+        """注册持仓变化回调 callback(test_mode, symbol, position)"""
+        self._listeners.append(callback)
+
+    def _notify(self, test_mode: int, symbol: str, position: dict):
+        for callback in self._listeners:
+            try:
+                callback(test_mode, symbol, position)
+            except Exception as e:
+                logger.error(f"持仓变化回调失败 {symbol}: {e}")
+
+    # ---------- 异步回写 ----------
+
+    def _request_flush(self):
+        if self._wakeup is not None and self._flush_task is not None:
+            try:
+                loop = self._flush_task.get_loop()
+                loop.call_soon_threadsafe(self._wakeup.set)
+            except RuntimeError:
+                pass
+
+    async def start(self):
+        """加载持仓并启动回写任务"""
+        try:
+            await asyncio.to_thread(self.load)
+        except Exception as e:
+            logger.warning(f"持仓账本加载失败，将在首次使用时重试: {e}")
+        if self._flush_task is None:
+            self._wakeup = asyncio.Event()
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        """停止回写任务并写入剩余变更"""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+            self._wakeup = None
+        await asyncio.to_thread(self.flush)
+
+    async def _flush_loop(self):
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            # 合并短时间内的多次成交，一次写入
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await asyncio.to_thread(self.flush)
+            except Exception as e:
+                logger.error(f"持仓回写失败: {e}")
+
+    def flush(self) -> int:
+        """把变更的持仓写入数据库（单个事务），返回写入行数"""
+        with self._lock:
+            if not self._dirty:
+                return 0
+            dirty = self._dirty
+            self._dirty = set()
+            rows = [dict(self._positions[mode][symbol]) for mode, symbol in dirty]
+
+        conn = None
+        try:
+            conn = get_db_connection()
+            cursor = conn.cursor()
+            cursor.executemany("""
+                INSERT INTO positions (symbol, quantity, buy_price, cost, buy_time, buy_acceleration,
+                                       status, current_price, profit_loss, profit_loss_pct, peak_price, test_mode)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE
+                    quantity = VALUES(quantity), buy_price = VALUES(buy_price), cost = VALUES(cost),
+                    buy_time = VALUES(buy_time), buy_acceleration = VALUES(buy_acceleration),
+                    status = VALUES(status), current_price = VALUES(current_price),
+                    profit_loss = VALUES(profit_loss), profit_loss_pct = VALUES(profit_loss_pct),
+                    peak_price = VALUES(peak_price)
+            """, [
+                (r['symbol'], r['quantity'], r['buy_price'], r['cost'], r['buy_time'], r['buy_acceleration'],
+                 r['status'], r['current_price'], r['profit_loss'], r['profit_loss_pct'], r['peak_price'],
+                 r['test_mode'])
+                for r in rows
+            ])
+            conn.commit()
+            cursor.close()
+        except Exception:
+            self.flush_errors += 1
+            # 写入失败时重新标记，等待下次回写
+            with self._lock:
+                self._dirty.update(dirty)
+            raise
+        finally:
+            if conn is not None:
+                conn.close()
+
+        self.flushes += 1
+        self.flushed_rows += len(rows)
+        return len(rows)
+
+    def get_stats(self) -> dict:
+        return {
+            'loaded': self._loaded,
+            'holdings': dict(self._holding_counts),
+            'pending_writes': len(self._dirty),
+            'fills': self.fills,
+            'flushes': self.flushes,
+            'flushed_rows': self.flushed_rows,
+            'flush_errors': self.flush_errors
+        }
+
+
+# 全局实例
+position_ledger = PositionLedger()
@@ -0,0 +1,263 @@
+"""
+当日预测排名索引
+- 每日预测完成后写入，按混合得分（hybrid_score）降序排列
+- 进程启动或跨日后首次使用时从 stock_predictions 表加载当天记录，加载失败时退避后重试
+- 推荐买入直接读取排名，没有当天预测的股票视为过期，由调用方异步补充预测
+- 同时维护当天交易统计（下单时累加）和历史/准确率查询缓存，状态接口不再每次查库；
+  查询缓存在预测更新、跨日或 QUERY_CACHE_TTL 秒后失效（actual_return 由外部回填）
+"""
+import logging
+import time
+from datetime import date
+from threading import Lock
+from typing import Callable, Dict, Iterable, List, Optional
+
+import pymysql
+
+from app.config.database import get_db_connection
+
+logger = logging.getLogger(__name__)
+
+LOAD_RETRY_SECONDS = 30.0  # 加载失败后的重试间隔（秒）
+QUERY_CACHE_TTL = 60.0  # 历史/准确率查询缓存时长（秒）
+
+
+class PredictionIndex:
+    """当天预测结果，按 symbol 索引并维护得分排名"""
+
+    def __init__(self):
+        self._date: Optional[date] = None
+        self._by_symbol: Dict[str, dict] = {}
+        self._ranked: List[dict] = []
+        self._trade_stats: Optional[Dict[str, int]] = None
+        self._query_cache: Dict[tuple, tuple] = {}  # {查询键: (过期时间, 结果)}
+        self._lock = Lock()
+        self._retry_at = 0.0  # 加载失败后下次重试的时间（monotonic）
+
+        # 统计
+        self.loads = 0
+        self.updates = 0
+
+    @staticmethod
+    def _normalize(prediction: dict) -> dict:
+        """预测结果 / 数据库行转为索引记录"""
+        def to_float(value):
+            return float(value) if value is not None else None
+
+        score = prediction.get('hybrid_score', prediction.get('score'))
+        if score is None:
+            score = prediction.get('technical_score')
+        return {
+            'symbol': prediction['symbol'],
+            'score': to_float(score) or 0.0,
+            'predicted_return': to_float(prediction.get('predicted_return')) or 0.0,
+            'confidence': to_float(prediction.get('confidence', prediction.get('confidence_score'))) or 0.0,
+            'technical_score': to_float(prediction.get('technical_score', prediction.get('score'))),
+            'llm_score': to_float(prediction.get('llm_score')),
+            'llm_recommendation': prediction.get('llm_recommendation'),
+            'llm_analysis': (prediction.get('llm_analysis') or '')[:500],
+            'actual_return': to_float(prediction.get('actual_return')),
+            'source': prediction.get('source', 'stored')
+        }
+
+    def _rerank(self):
+        self._ranked = sorted(self._by_symbol.values(), key=lambda p: p['score'], reverse=True)
+
+    def load(self, day: Optional[date] = None):
+        """从 stock_predictions 表加载某天（默认今天）的预测"""
+        day = day or date.today()
+        conn = get_db_connection()
+        cursor = conn.cursor(pymysql.cursors.DictCursor)
+        try:
+            cursor.execute("""
+                SELECT symbol, predicted_return, confidence_score, technical_score,
+                       llm_score, llm_recommendation, llm_analysis, actual_return, hybrid_score
+                FROM stock_predictions WHERE prediction_date = %s
+            """, (day,))
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+            conn.close()
+
+        with self._lock:
+            self._date = day
+            self._by_symbol = {row['symbol']: self._normalize(row) for row in rows}
+            self._rerank()
+            self._trade_stats = None
+            self._query_cache.clear()
+            self.loads += 1
+        logger.info(f"预测索引已加载: {day} 共 {len(rows)} 只股票")
+
+    def ensure_current(self):
+        """跨日或尚未加载时重新加载当天数据；失败时清空并保持未加载，LOAD_RETRY_SECONDS 后再次加载"""
+        today = date.today()
+        if self._date == today or time.monotonic() < self._retry_at:
+            return
+        try:
+            self.load(today)
+        except Exception as e:
+            logger.warning(f"加载预测索引失败，{LOAD_RETRY_SECONDS:.0f} 秒后重试: {e}")
+            with self._lock:
+                self._retry_at = time.monotonic() + LOAD_RETRY_SECONDS
+                self._date, self._by_symbol, self._ranked = None, {}, []
+                self._trade_stats = None
+                self._query_cache.clear()
+
+    def update(self, predictions: Iterable[dict]):
+        """写入新的预测结果（同一股票覆盖旧值）并重新排名"""
+        self.ensure_current()
+        with self._lock:
+            for prediction in predictions:
+                if prediction.get('symbol'):
+                    self._by_symbol[prediction['symbol']] = self._normalize(prediction)
+            self._rerank()
+            self._query_cache.clear()
+            self.updates += 1
+
+    def get(self, symbol: str) -> Optional[dict]:
+        self.ensure_current()
+        prediction = self._by_symbol.get(symbol)
+        return dict(prediction) if prediction else None
+
+    def top(self, k: int, min_score: float = 0) -> List[dict]:
+        """得分最高的 k 条（不低于 min_score）"""
+        self.ensure_current()
+        result = []
+        for prediction in self._ranked:
+            if len(result) >= k or prediction['score'] < min_score:
+                break
+            result.append(dict(prediction))
+        return result
+
+    def top_rows(self, k: int = 10) -> List[dict]:
+        """状态接口使用的排名前 k 条（字段与 stock_predictions 表一致）"""
+        return [
+            {
+                'symbol': p['symbol'],
+                'hybrid_score': p['score'],
+                'predicted_return': p['predicted_return'],
+                'confidence_score': p['confidence'],
+                'technical_score': p['technical_score'],
+                'llm_score': p['llm_score'],
+                'llm_recommendation': p['llm_recommendation'],
+                'llm_analysis': p['llm_analysis'],
+                'actual_return': p['actual_return']
+            }
+            for p in self.top(k)
+        ]
+
+    def stale_symbols(self, symbols: Iterable[str]) -> List[str]:
+        """没有当天预测的股票"""
+        self.ensure_current()
+        return [s for s in symbols if s not in self._by_symbol]
+
+    # ---------- 当天交易统计 ----------
+
+    @staticmethod
+    def _load_trade_stats() -> Dict[str, int]:
+        conn = get_db_connection()
+        cursor = conn.cursor(pymysql.cursors.DictCursor)
+        try:
+            cursor.execute("""
+                SELECT 
+                    COUNT(*) as total_trades,
+                    SUM(CASE WHEN action = 'BUY' THEN 1 ELSE 0 END) as buy_count,
+                    SUM(CASE WHEN action = 'SELL' THEN 1 ELSE 0 END) as sell_count
+                FROM trades
+                WHERE DATE(trade_time) = CURDATE()
+            """)
+            row = cursor.fetchone() or {}
+        finally:
+            cursor.close()
+            conn.close()
+        return {key: int(row.get(key) or 0) for key in ('total_trades', 'buy_count', 'sell_count')}
+
+    def _ensure_trade_stats(self) -> Dict[str, int]:
+        """当天首次使用时从 trades 表汇总一次，之后随下单累加"""
+        self.ensure_current()
+        if self._trade_stats is None:
+            try:
+                stats = self._load_trade_stats()
+            except Exception as e:
+                logger.warning(f"加载当天交易统计失败: {e}")
+                return {'total_trades': 0, 'buy_count': 0, 'sell_count': 0}
+            with self._lock:
+                if self._trade_stats is None:
+                    self._trade_stats = stats
+        return self._trade_stats
+
+    def record_trade(self, action: str):
+        """新增一条交易记录时累加当天统计（尚未汇总时跳过，首次汇总已包含该记录）"""
+        self.ensure_current()
+        with self._lock:
+            stats = self._trade_stats
+            if stats is None:
+                return
+            stats['total_trades'] += 1
+            if action == 'BUY':
+                stats['buy_count'] += 1
+            elif action == 'SELL':
+                stats['sell_count'] += 1
+
+    def trade_stats(self) -> Dict[str, int]:
+        return dict(self._ensure_trade_stats())
+
+    # ---------- 查询缓存 ----------
+
+    def cached(self, key: tuple, loader: Callable[[], object]):
+        """缓存历史/准确率等查询结果，跨日、预测更新或超过 QUERY_CACHE_TTL 秒时失效"""
+        self.ensure_current()
+        now = time.monotonic()
+        entry = self._query_cache.get(key)
+        if entry is None or entry[0] <= now:
+            entry = self._query_cache[key] = (now + QUERY_CACHE_TTL, loader())
+        return entry[1]
+
+    @staticmethod
+    def _query_all(sql: str, params: tuple = ()) -> list:
+        conn = get_db_connection()
+        cursor = conn.cursor(pymysql.cursors.DictCursor)
+        try:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+            conn.close()
+
+    def history(self, days: int = 7) -> List[dict]:
+        """最近 days 天的预测记录（按日期、得分倒序，最多 100 条）"""
+        return self.cached(('history', days), lambda: self._query_all("""
+            SELECT * FROM stock_predictions 
+            WHERE prediction_date >= DATE_SUB(CURDATE(), INTERVAL %s DAY)
+            ORDER BY prediction_date DESC, COALESCE(hybrid_score, technical_score) DESC
+            LIMIT 100
+        """, (days,)))
+
+    def accuracy(self, days: int = 30) -> Optional[dict]:
+        """最近 days 天已回填实际收益的预测的方向准确率汇总"""
+        rows = self.cached(('accuracy', days), lambda: self._query_all("""
+            SELECT 
+                COUNT(*) as total,
+                SUM(CASE WHEN predicted_return > 0 AND actual_return > 0 THEN 1
+                         WHEN predicted_return < 0 AND actual_return < 0 THEN 1
+                         ELSE 0 END) as correct,
+                AVG(predicted_return) as avg_predicted,
+                AVG(actual_return) as avg_actual
+            FROM stock_predictions
+            WHERE actual_return IS NOT NULL
+            AND prediction_date >= DATE_SUB(CURDATE(), INTERVAL %s DAY)
+        """, (days,)))
+        return rows[0] if rows else None
+
+    def get_stats(self) -> dict:
+        return {
+            'date': self._date.isoformat() if self._date else None,
+            'symbols': len(self._by_symbol),
+            'trade_stats_loaded': self._trade_stats is not None,
+            'loads': self.loads,
+            'updates': self.updates
+        }
+
+
+# 全局实例
+prediction_index = PredictionIndex()
@@ -0,0 +1,214 @@
+"""
+实时行情请求合并（single-flight）
+- 并发请求相同股票时共享同一个进行中的券商调用
+- 数毫秒内到达的小请求合并为完整批次（长桥单次最多20只）
+- 按股票缓存行情结果，TTL 可配置
+- 多个批次并发发送（速率由调用方的限流器控制），只重试失败的批次
+"""
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class QuoteCoalescer:
+    """行情请求合并器"""
+
+    def __init__(self, fetch_batch: Callable[[List[str]], Awaitable[Dict[str, dict]]],
+                 batch_size: int = 20, window: float = 0.005, ttl: float = 1.0,
+                 max_cache_size: int = 5000,
+                 should_retry: Optional[Callable[[Exception], bool]] = None,
+                 max_retries: int = 3, retry_backoff: float = 0.5):
+        """
+        :param fetch_batch: 批量获取行情的协程函数，入参为标准化代码列表，返回 {标准化代码: 行情}
+        :param batch_size: 单批次最大股票数
+        :param window: 合并窗口（秒），窗口内到达的请求合并发送
+        :param ttl: 单只股票行情缓存时间（秒），为0时不缓存
+        :param max_cache_size: 缓存条目超过该数量时清理过期项
+        :param should_retry: 判断批次异常是否可重试，为空时不重试
+        :param max_retries: 单个批次最大重试次数
+        :param retry_backoff: 首次重试前的等待时间（秒），之后按指数翻倍
+        """
+        self._fetch_batch = fetch_batch
+        self.batch_size = batch_size
+        self.window = window
+        self.ttl = ttl
+        self.max_cache_size = max_cache_size
+        self.should_retry = should_retry
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+
+        self._cache = {}  # {symbol: (expires_at, quote)}
+        self._inflight = {}  # {symbol: Future}
+        self._pending = {}  # 等待发送的股票（dict 保持插入顺序）
+        self._flush_handle = None
+
+        # 统计
+        self.cache_hits = 0
+        self.shared_hits = 0
+        self.fetched_symbols = 0
+        self.batches = 0
+        self.retries = 0
+        self.failed_batches = 0
+
+    async def get(self, symbols: List[str]) -> Dict[str, dict]:
+        """
+        获取行情，返回 {标准化代码: 行情}
+        全部失败时抛出第一个异常；部分失败时返回成功的部分
+        """
+        loop = asyncio.get_running_loop()
+        now = time.monotonic()
+        result = {}
+        waiting = {}
+
+        for symbol in dict.fromkeys(symbols):
+            cached = self._cache.get(symbol)
+            if cached is not None and cached[0] > now:
+                result[symbol] = cached[1]
+                self.cache_hits += 1
+                continue
+
+            future = self._inflight.get(symbol)
+            if future is not None:
+                self.shared_hits += 1
+            else:
+                future = loop.create_future()
+                self._inflight[symbol] = future
+                self._pending[symbol] = None
+            waiting[symbol] = future
+
+        if self._pending:
+            self._schedule_flush(loop)
+
+        if not waiting:
+            return result
+
+        # shield：单个请求被取消时不影响共享同一 Future 的其他请求
+        values = await asyncio.gather(
+            *(asyncio.shield(future) for future in waiting.values()), return_exceptions=True
+        )
+        errors = []
+        for symbol, value in zip(waiting, values):
+            if isinstance(value, BaseException):
+                errors.append(value)
+            elif value is not None:
+                result[symbol] = value
+
+        if errors:
+            if not result:
+                raise errors[0]
+            logger.warning(f"部分行情获取失败: {len(errors)}/{len(waiting)}, 错误: {errors[0]}")
+        return result
+
+    def _schedule_flush(self, loop: asyncio.AbstractEventLoop):
+        """凑满一个批次立即发送，否则等待合并窗口结束"""
+        if len(self._pending) >= self.batch_size:
+            if self._flush_handle is not None:
+                self._flush_handle.cancel()
+                self._flush_handle = None
+            self._flush(full_batches_only=True)
+            if not self._pending:
+                return
+        if self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.window, self._flush)
+
+    def _flush(self, full_batches_only: bool = False):
+        """把待发送股票切分为批次并发起请求"""
+        if not full_batches_only:
+            self._flush_handle = None
+
+        pending = list(self._pending)
+        count = len(pending)
+        if full_batches_only:
+            count -= count % self.batch_size
+        if count <= 0:
+            return
+
+        for symbol in pending[:count]:
+            del self._pending[symbol]
+        batches = [pending[i:i + self.batch_size] for i in range(0, count, self.batch_size)]
+        asyncio.ensure_future(self._run_batches(batches))
+
+    async def _run_batches(self, batches: List[List[str]]):
+        """并发执行各批次，单个批次失败不影响其他批次"""
+        await asyncio.gather(*(self._run_batch(batch) for batch in batches), return_exceptions=True)
+
+    async def _fetch_with_retry(self, batch: List[str]) -> Dict[str, dict]:
+        """请求单个批次，可重试的错误按指数退避重试"""
+        attempt = 0
+        while True:
+            try:
+                return await self._fetch_batch(batch)
+            except Exception as e:
+                if attempt >= self.max_retries or not (self.should_retry and self.should_retry(e)):
+                    raise
+                delay = self.retry_backoff * (2 ** attempt)
+                attempt += 1
+                self.retries += 1
+                logger.warning(f"批次行情获取失败，{delay:.2f} 秒后第 {attempt} 次重试: {e}")
+                await asyncio.sleep(delay)
+
+    async def _run_batch(self, batch: List[str]):
+        """执行单个批次并把结果分发给等待者"""
+        self.batches += 1
+        self.fetched_symbols += len(batch)
+        try:
+            quotes = await self._fetch_with_retry(batch)
+        except BaseException as e:
+            self.failed_batches += 1
+            error = e if isinstance(e, Exception) else RuntimeError("行情请求已取消")
+            for symbol in batch:
+                future = self._inflight.pop(symbol, None)
+                if future is not None and not future.done():
+                    future.set_exception(error)
+            if not isinstance(e, Exception):
+                raise
+            return
+
+        expires_at = time.monotonic() + self.ttl
+        for symbol in batch:
+            quote = quotes.get(symbol)
+            if quote is not None and self.ttl > 0:
+                self._cache[symbol] = (expires_at, quote)
+            future = self._inflight.pop(symbol, None)
+            if future is not None and not future.done():
+                future.set_result(quote)
+
+        if len(self._cache) > self.max_cache_size:
+            self._prune_cache()
+
+    def _prune_cache(self):
+        """清理过期缓存"""
+        now = time.monotonic()
+        self._cache = {s: entry for s, entry in self._cache.items() if entry[0] > now}
+
+    def get_cached(self, symbol: str):
+        """读取未过期的缓存行情（不触发请求）"""
+        cached = self._cache.get(symbol)
+        if cached is not None and cached[0] > time.monotonic():
+            return cached[1]
+        return None
+
+    def put(self, symbol: str, quote: dict):
+        """写入外部来源（行情推送）的最新行情"""
+        if self.ttl > 0:
+            self._cache[symbol] = (time.monotonic() + self.ttl, quote)
+
+    def invalidate(self):
+        """清空缓存（重连或切换账户后调用）"""
+        self._cache.clear()
+
+    def get_stats(self) -> dict:
+        """获取合并统计"""
+        return {
+            'cache_hits': self.cache_hits,
+            'shared_hits': self.shared_hits,
+            'fetched_symbols': self.fetched_symbols,
+            'batches': self.batches,
+            'retries': self.retries,
+            'failed_batches': self.failed_batches,
+            'cached_symbols': len(self._cache),
+            'inflight_symbols': len(self._inflight)
+        }
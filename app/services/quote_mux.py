@@ -0,0 +1,216 @@
+"""
+行情推送多路复用
+- 全局长桥连接的一个 QuoteContext 订阅所有消费者（止盈止损引擎、监控、SSE 客户端）所需股票的并集
+- 每只股票按订阅的消费者计数，计数从 0 变为 1 时向券商订阅，降为 0 时取消订阅，订阅名额只占用一份
+- 推送在 SDK 线程到达，切回事件循环后分发给关注该股票的消费者，并写入行情缓存供轮询请求命中；
+  绑定共享内存快照时同时发布给本机其他进程
+- 订阅变更先记录期望集合，再由单个后台协程与券商已订阅集合对齐（多次变更合并为一次调用）
+"""
+import asyncio
+import inspect
+import logging
+from typing import Callable, Dict, Iterable, Optional, Set
+
+from app.models.quote import Quote
+
+logger = logging.getLogger(__name__)
+
+
+class QuoteMultiplexer:
+    """行情推送订阅计数与分发"""
+
+    def __init__(self):
+        self._callbacks: Dict[str, Optional[Callable]] = {}  # {消费者: 回调(quote)}
+        self._consumer_symbols: Dict[str, Dict[str, str]] = {}  # {消费者: {标准化代码: 消费者使用的代码}}
+        self._subscribers: Dict[str, Set[str]] = {}  # {标准化代码: 消费者集合}，集合大小即引用计数
+        self._active: Set[str] = set()  # 已向券商订阅的代码
+        self._prev_close: Dict[str, float] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._flush_lock = asyncio.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._dirty = False
+        self._snapshot = None  # 共享内存行情快照写入方
+
+        # 统计
+        self.pushes = 0
+        self.deliveries = 0
+        self.errors = 0
+        self.broker_subscribes = 0
+        self.broker_unsubscribes = 0
+
+    @staticmethod
+    def _sdk():
+        from .longbridge_sdk import longbridge_sdk
+        return longbridge_sdk
+
+    # ---------- 订阅管理 ----------
+
+    def subscribe(self, consumer: str, symbols: Iterable[str], callback: Optional[Callable] = None):
+        """消费者增加订阅；callback 为空时只保持行情缓存新鲜"""
+        if callback is not None or consumer not in self._callbacks:
+            self._callbacks[consumer] = callback
+        mapping = self._consumer_symbols.setdefault(consumer, {})
+        sdk = self._sdk()
+        for symbol in symbols:
+            normalized = sdk._normalize_symbol(symbol)
+            mapping[normalized] = symbol
+            self._subscribers.setdefault(normalized, set()).add(consumer)
+        self._schedule_flush()
+
+    def unsubscribe(self, consumer: str, symbols: Optional[Iterable[str]] = None):
+        """消费者取消订阅（symbols 为空时取消全部并注销）"""
+        mapping = self._consumer_symbols.get(consumer)
+        if mapping is None:
+            return
+        if symbols is None:
+            normalized_symbols = list(mapping)
+        else:
+            sdk = self._sdk()
+            normalized_symbols = [sdk._normalize_symbol(s) for s in symbols]
+        for normalized in normalized_symbols:
+            mapping.pop(normalized, None)
+            consumers = self._subscribers.get(normalized)
+            if consumers is not None:
+                consumers.discard(consumer)
+                if not consumers:
+                    del self._subscribers[normalized]
+        if symbols is None:
+            self._consumer_symbols.pop(consumer, None)
+            self._callbacks.pop(consumer, None)
+        self._schedule_flush()
+
+    def set_symbols(self, consumer: str, symbols: Iterable[str], callback: Optional[Callable] = None):
+        """把消费者的订阅替换为 symbols（只增删差异部分）"""
+        symbols = list(symbols)
+        sdk = self._sdk()
+        wanted = {sdk._normalize_symbol(s) for s in symbols}
+        current = self._consumer_symbols.get(consumer, {})
+        removed = [original for normalized, original in current.items() if normalized not in wanted]
+        if removed:
+            self.unsubscribe(consumer, removed)
+        self.subscribe(consumer, symbols, callback)
+
+    def attach_snapshot(self, snapshot):
+        """绑定共享内存行情快照（None 解除绑定）"""
+        self._snapshot = snapshot
+
+    def refcount(self, symbol: str) -> int:
+        return len(self._subscribers.get(self._sdk()._normalize_symbol(symbol), ()))
+
+    # ---------- 与券商订阅对齐 ----------
+
+    def _schedule_flush(self):
+        self._dirty = True
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return  # 尚无事件循环，start() 时统一对齐
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = loop.create_task(self.flush())
+
+    async def flush(self):
+        """把券商订阅与期望集合对齐（对齐期间又有变更时继续对齐）"""
+        async with self._flush_lock:
+            self._dirty = True
+            while self._dirty:
+                self._dirty = False
+                sdk = self._sdk()
+                desired = set(self._subscribers)
+                removed = sorted(self._active - desired)
+                added = sorted(desired - self._active)
+                if removed:
+                    await asyncio.to_thread(sdk.unsubscribe_realtime_quotes, removed)
+                    self._active.difference_update(removed)
+                    self.broker_unsubscribes += 1
+                    for symbol in removed:
+                        self._prev_close.pop(symbol, None)
+                if added and await asyncio.to_thread(sdk.subscribe_realtime_quotes, added, self._on_push):
+                    self._active.update(added)
+                    self.broker_subscribes += 1
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        await self.flush()
+
+    async def stop(self):
+        for consumer in list(self._consumer_symbols):
+            self.unsubscribe(consumer)
+        if self._flush_task is not None:
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+            self._flush_task = None
+        self._loop = None
+
+    # ---------- 推送分发 ----------
+
+    def _on_push(self, symbol: str, push):
+        """SDK 线程回调：切回事件循环分发"""
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        try:
+            price = float(push.last_done)
+            volume = int(push.volume)
+        except (AttributeError, TypeError, ValueError):
+            return
+        loop.call_soon_threadsafe(self.dispatch, symbol, price, volume)
+
+    def _reference_close(self, symbol: str) -> Optional[float]:
+        """推送不含昨收，取最近一次完整行情中的昨收"""
+        prev_close = self._prev_close.get(symbol)
+        if prev_close is None:
+            cached = self._sdk().get_cached_quote(symbol)
+            if cached and cached.get('prev_close'):
+                prev_close = self._prev_close[symbol] = cached['prev_close']
+        return prev_close
+
+    def dispatch(self, symbol: str, price: float, volume: int):
+        """在事件循环中把推送行情分发给订阅了该股票的消费者"""
+        if symbol not in self._subscribers:
+            # 推送代码可能不带前导零（如 700.HK）
+            stripped = symbol.lstrip('0')
+            symbol = next((s for s in self._subscribers if s.lstrip('0') == stripped), symbol)
+        consumers = self._subscribers.get(symbol)
+        if not consumers or price <= 0:
+            return
+        self.pushes += 1
+        prev_close = self._reference_close(symbol)
+        quote = Quote.from_price(symbol, price, prev_close or price, volume)
+        if prev_close:
+            self._sdk().cache_pushed_quote(symbol, quote)
+            if self._snapshot is not None:
+                self._snapshot.publish_quote(quote)
+
+        for consumer in list(consumers):
+            callback = self._callbacks.get(consumer)
+            if callback is None:
+                continue
+            original = self._consumer_symbols.get(consumer, {}).get(symbol, symbol)
+            try:
+                result = callback(quote.with_symbol(original))
+                if inspect.isawaitable(result):
+                    asyncio.ensure_future(result).add_done_callback(self._on_callback_done)
+                self.deliveries += 1
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"行情推送分发失败 {consumer}: {e}")
+
+    def _on_callback_done(self, task: asyncio.Future):
+        if not task.cancelled() and task.exception() is not None:
+            self.errors += 1
+            logger.error(f"行情推送处理失败: {task.exception()}")
+
+    def get_stats(self) -> dict:
+        return {
+            'consumers': len(self._consumer_symbols),
+            'symbols': len(self._subscribers),
+            'broker_subscribed': len(self._active),
+            'pushes': self.pushes,
+            'deliveries': self.deliveries,
+            'errors': self.errors,
+            'broker_subscribes': self.broker_subscribes,
+            'broker_unsubscribes': self.broker_unsubscribes
+        }
+
+
+# 全局实例
+quote_mux = QuoteMultiplexer()
@@ -0,0 +1,156 @@
+"""
+长桥API限流器
+- 令牌桶算法，asyncio 原生等待
+- 预约式分配令牌：请求按到达顺序排队（FIFO），并发等待者不会突破限额
+- 行情、K线、交易、账户分别使用独立的预算
+- 遇到 301606 频率限制时自适应降速，之后逐步恢复
+"""
+import asyncio
+import logging
+import time
+from threading import Lock
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+# 长桥频率限制错误码
+RATE_LIMIT_ERROR_CODE = '301606'
+
+
+def is_rate_limit_error(error) -> bool:
+    """判断异常是否为长桥频率限制错误"""
+    error_msg = str(error)
+    return RATE_LIMIT_ERROR_CODE in error_msg or 'rate limit' in error_msg.lower()
+
+
+class TokenBucketLimiter:
+    """令牌桶限流器"""
+
+    def __init__(self, name: str, rate: float, capacity: float,
+                 min_rate: float = None, recover_interval: float = 10.0):
+        """
+        初始化限流器
+        :param name: 预算名称
+        :param rate: 每秒补充的令牌数
+        :param capacity: 桶容量（允许的突发请求数）
+        :param min_rate: 自适应降速的下限，默认为 rate 的 1/8
+        :param recover_interval: 未再触发限流时，每隔多少秒恢复一次速率
+        """
+        self.name = name
+        self.base_rate = float(rate)
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.min_rate = float(min_rate) if min_rate else self.base_rate / 8
+        self.recover_interval = recover_interval
+
+        self._tokens = float(capacity)
+        self._updated_at = time.monotonic()
+        self._last_penalty_at = 0.0
+        self._lock = Lock()
+
+        # 统计
+        self.acquired = 0
+        self.waited = 0
+        self.total_wait = 0.0
+        self.rate_limit_hits = 0
+
+    def _refill(self, now: float):
+        """按流逝时间补充令牌，并在冷却后逐步恢复速率（调用方持有锁）"""
+        if self.rate < self.base_rate and self._last_penalty_at:
+            steps = int((now - self._last_penalty_at) / self.recover_interval)
+            if steps > 0:
+                self.rate = min(self.base_rate, self.rate + self.base_rate * 0.1 * steps)
+                self._last_penalty_at = now if self.rate < self.base_rate else 0.0
+
+        elapsed = now - self._updated_at
+        if elapsed > 0:
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+            self._updated_at = now
+
+    def reserve(self) -> float:
+        """
+        预约一个令牌，返回需要等待的时间（秒）
+        令牌不足时记为欠账，后到的请求排在欠账之后，保证先到先得
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens -= 1
+            self.acquired += 1
+            if self._tokens >= 0:
+                return 0.0
+            wait_time = -self._tokens / self.rate
+            self.waited += 1
+            self.total_wait += wait_time
+            return wait_time
+
+    def _cancel_reservation(self):
+        """归还未使用的令牌（等待被取消时）"""
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens + 1)
+            self.acquired -= 1
+
+    async def acquire(self):
+        """异步等待直到可以发送请求"""
+        wait_time = self.reserve()
+        if wait_time > 0:
+            logger.debug(f"[{self.name}] 限流等待 {wait_time:.3f} 秒")
+            try:
+                await asyncio.sleep(wait_time)
+            except asyncio.CancelledError:
+                self._cancel_reservation()
+                raise
+
+    def on_rate_limited(self):
+        """收到 301606 频率限制响应：速率减半并清空突发额度"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.rate_limit_hits += 1
+            self.rate = max(self.min_rate, self.rate / 2)
+            self._tokens = min(self._tokens, 0.0)
+            self._last_penalty_at = now
+        logger.warning(f"[{self.name}] 触发API频率限制，速率降至 {self.rate:.2f} 次/秒")
+
+    def get_stats(self) -> dict:
+        """获取限流统计"""
+        with self._lock:
+            self._refill(time.monotonic())
+            return {
+                'name': self.name,
+                'rate': round(self.rate, 3),
+                'base_rate': self.base_rate,
+                'capacity': self.capacity,
+                'tokens': round(self._tokens, 3),
+                'acquired': self.acquired,
+                'waited': self.waited,
+                'avg_wait_ms': round(self.total_wait / self.waited * 1000, 2) if self.waited else 0,
+                'rate_limit_hits': self.rate_limit_hits
+            }
+
+
+class RateLimiterRegistry:
+    """按接口类别管理限流预算"""
+
+    def __init__(self, budgets: Dict[str, dict]):
+        self._limiters = {
+            name: TokenBucketLimiter(name, **budget) for name, budget in budgets.items()
+        }
+
+    def __getitem__(self, name: str) -> TokenBucketLimiter:
+        return self._limiters[name]
+
+    def get_stats(self) -> Dict[str, dict]:
+        return {name: limiter.get_stats() for name, limiter in self._limiters.items()}
+
+
+# 长桥OpenAPI限制：行情类接口每秒不超过10次；交易类接口30秒内不超过30次
+# 同一上下文的预算之和控制在官方限额以内（任意窗口内最大请求数 = 容量 + 速率 × 窗口）
+RATE_LIMIT_BUDGETS = {
+    'quote': {'rate': 6.0, 'capacity': 2},          # 1秒内最多 8 次
+    'candlestick': {'rate': 1.0, 'capacity': 1},    # 1秒内最多 2 次
+    'trade': {'rate': 0.5, 'capacity': 7},          # 30秒内最多 22 次
+    'account': {'rate': 0.2, 'capacity': 2},        # 30秒内最多 8 次
+}
+
+# 全局实例
+rate_limiters = RateLimiterRegistry(RATE_LIMIT_BUDGETS)
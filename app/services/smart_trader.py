@@ -5,13 +5,14 @@ import json
 import logging
 import re
 import asyncio
-import httpx
 import pymysql
 from datetime import datetime
 from typing import List
 
 from app.config.database import get_db_connection
 from app.auth.utils import is_test_mode
+from .exit_engine import exit_engine
+from .prediction_index import prediction_index
 
 logger = logging.getLogger(__name__)
 
@@ -21,7 +22,7 @@ class SmartPredictionTrader:
     智能预测交易系统
     - 每天开盘前预测收益最好的股票
     - 开盘时自动买入预测收益最高的股票
-    - 实时监控，在收益最高点自动卖出
+    - 实时监控，在收益最高点自动卖出（见 exit_engine）
     - 支持大模型辅助预测
     """
     
@@ -34,7 +35,6 @@ class SmartPredictionTrader:
         self.base_profit_target = 1.0
         self.trailing_stop = 0.5
         self.max_hold_days = 5
-        self.peak_prices = {}
         
         # LLM配置
         self.llm_enabled = False
@@ -44,6 +44,7 @@ class SmartPredictionTrader:
         self.llm_model = 'gpt-4o-mini'
         self.llm_weight = 0.3
         self.llm_cache = {}
+        self._repredicting = set()  # 正在后台补充预测的股票
 
     async def load_config(self):
         """从数据库加载配置"""
@@ -413,6 +414,7 @@ class SmartPredictionTrader:
             else:
                 timeout = 30.0
 
+            import httpx
             async with httpx.AsyncClient(timeout=timeout) as client:
                 # Ollama 不需要 Authorization header
                 headers = {'Content-Type': 'application/json'}
@@ -552,8 +554,49 @@ class SmartPredictionTrader:
             logger.info(f"混合预测失败 {symbol}: {e}")
             return await self.predict_stock_return(symbol)
 
+    async def _save_prediction(self, conn, cursor, prediction: dict):
+        """保存预测结果（带重试，避免锁等待超时）"""
+        symbol = prediction['symbol']
+        
+        for attempt in range(3):
+            try:
+                cursor.execute("""
+                    INSERT INTO stock_predictions 
+                    (symbol, prediction_date, predicted_return, confidence_score, technical_score, 
+                     llm_score, llm_recommendation, llm_analysis, hybrid_score)
+                    VALUES (%s, CURDATE(), %s, %s, %s, %s, %s, %s, %s)
+                    ON DUPLICATE KEY UPDATE
+                    predicted_return = VALUES(predicted_return),
+                    confidence_score = VALUES(confidence_score),
+                    technical_score = VALUES(technical_score),
+                    llm_score = VALUES(llm_score),
+                    llm_recommendation = VALUES(llm_recommendation),
+                    llm_analysis = VALUES(llm_analysis),
+                    hybrid_score = VALUES(hybrid_score)
+                """, (
+                    symbol, 
+                    prediction.get('predicted_return', 0), 
+                    prediction.get('confidence', 0), 
+                    prediction.get('technical_score', prediction.get('score', 0)),
+                    prediction.get('llm_score'),
+                    prediction.get('llm_recommendation'),
+                    prediction.get('llm_analysis', '')[:500],
+                    prediction.get('score', 0)
+                ))
+                conn.commit()
+                return
+            except pymysql.err.OperationalError as e:
+                if e.args and e.args[0] in (1205, 1213) and attempt < 2:
+                    await asyncio.sleep(0.2 * (attempt + 1))
+                    continue
+                logger.info(f"保存预测结果失败 {symbol}: {e}")
+                return
+            except Exception as e:
+                logger.info(f"保存预测结果失败 {symbol}: {e}")
+                return
+
     async def run_daily_prediction(self) -> list:
-        """运行每日预测"""
+        """运行每日预测（结果写入预测索引）"""
         try:
             conn = get_db_connection()
             cursor = conn.cursor(pymysql.cursors.DictCursor)
@@ -568,54 +611,15 @@ class SmartPredictionTrader:
             logger.info(f"开始每日预测，共{len(stocks)}只股票，LLM辅助: {llm_status}")
             
             for stock in stocks:
-                symbol = stock['symbol']
-                prediction = await self.hybrid_predict(symbol)
+                prediction = await self.hybrid_predict(stock['symbol'])
                 predictions.append(prediction)
-                
-                db_symbol = str(symbol)[:10]
-                if db_symbol != symbol:
-                    logger.info(f"预测结果symbol过长，已截断: {symbol} -> {db_symbol}")
-                
-                # 保存结果（带重试，避免锁等待超时）
-                for attempt in range(3):
-                    try:
-                        cursor.execute("""
-                            INSERT INTO stock_predictions 
-                            (symbol, prediction_date, predicted_return, confidence_score, technical_score, 
-                             llm_score, llm_recommendation, llm_analysis)
-                            VALUES (%s, CURDATE(), %s, %s, %s, %s, %s, %s)
-                            ON DUPLICATE KEY UPDATE
-                            predicted_return = VALUES(predicted_return),
-                            confidence_score = VALUES(confidence_score),
-                            technical_score = VALUES(technical_score),
-                            llm_score = VALUES(llm_score),
-                            llm_recommendation = VALUES(llm_recommendation),
-                            llm_analysis = VALUES(llm_analysis)
-                        """, (
-                            db_symbol, 
-                            prediction.get('predicted_return', 0), 
-                            prediction.get('confidence', 0), 
-                            prediction.get('technical_score', prediction.get('score', 0)),
-                            prediction.get('llm_score'),
-                            prediction.get('llm_recommendation'),
-                            prediction.get('llm_analysis', '')[:500]
-                        ))
-                        conn.commit()
-                        break
-                    except pymysql.err.OperationalError as e:
-                        if e.args and e.args[0] in (1205, 1213) and attempt < 2:
-                            await asyncio.sleep(0.2 * (attempt + 1))
-                            continue
-                        logger.info(f"保存预测结果失败 {symbol}: {e}")
-                        break
-                    except Exception as e:
-                        logger.info(f"保存预测结果失败 {symbol}: {e}")
-                        break
+                await self._save_prediction(conn, cursor, prediction)
             
             conn.commit()
             cursor.close()
             conn.close()
             
+            prediction_index.update(predictions)
             predictions.sort(key=lambda x: x['score'], reverse=True)
             logger.info(f"每日预测完成，共预测{len(predictions)}只股票")
             return predictions
@@ -623,55 +627,99 @@ class SmartPredictionTrader:
             logger.info(f"运行每日预测失败: {e}")
             return []
 
+    async def refresh_predictions(self, symbols: List[str]) -> int:
+        """补充预测过期（没有当天预测）的股票，返回完成数量"""
+        self._repredicting.update(symbols)
+        try:
+            conn = get_db_connection()
+            cursor = conn.cursor()
+            try:
+                predictions = []
+                for symbol in symbols:
+                    prediction = await self.hybrid_predict(symbol)
+                    await self._save_prediction(conn, cursor, prediction)
+                    predictions.append(prediction)
+            finally:
+                cursor.close()
+                conn.close()
+            prediction_index.update(predictions)
+            logger.info(f"已补充预测 {len(predictions)} 只股票")
+            return len(predictions)
+        finally:
+            self._repredicting.difference_update(symbols)
+
+    async def _schedule_refresh(self, symbols: List[str]):
+        """把过期股票的补充预测放入低优先级任务队列，不阻塞当前请求"""
+        from .task_queue import task_queue, PRIORITY_LOW
+        
+        if not task_queue.is_running:
+            # 队列停止时任务不会执行（停止时未处理的任务也已丢弃），清除标记以便队列恢复后重新提交
+            self._repredicting.difference_update(symbols)
+            logger.info(f"任务队列未运行，跳过补充预测 {len(symbols)} 只股票")
+            return
+        pending = [s for s in symbols if s not in self._repredicting]
+        if not pending:
+            return
+        # 入队即标记，避免并发请求重复提交同一批股票
+        self._repredicting.update(pending)
+        try:
+            await task_queue.enqueue(self.refresh_predictions, (pending,), priority=PRIORITY_LOW,
+                                     name='smart_trader.refresh_predictions', timeout=0.1)
+        except asyncio.QueueFull:
+            self._repredicting.difference_update(pending)
+            logger.warning(f"任务队列已满，跳过补充预测 {len(pending)} 只股票")
+
     async def get_top_recommendations(self, limit: int = 3) -> list:
-        """获取最佳买入推荐股票"""
+        """
+        获取最佳买入推荐股票
+        读取当天预测排名并与实时行情合并；没有当天预测的股票在后台补充预测，不阻塞下单
+        """
         from .longbridge_sdk import longbridge_sdk
         
         try:
             conn = get_db_connection()
             cursor = conn.cursor(pymysql.cursors.DictCursor)
+            try:
+                cursor.execute("SELECT symbol FROM stocks WHERE is_active = 1 AND stock_type = 'STOCK'")
+                active = [row['symbol'] for row in cursor.fetchall()]
+            finally:
+                cursor.close()
+                conn.close()
             
-            # 获取活跃股票列表
-            cursor.execute("SELECT symbol FROM stocks WHERE is_active = 1 LIMIT 20")
-            stocks = cursor.fetchall()
-            cursor.close()
-            conn.close()
-            
-            if not stocks:
+            stale = prediction_index.stale_symbols(active)
+            if stale:
+                await self._schedule_refresh(stale)
+            
+            # 多取一些候选，过滤掉停牌等无有效报价的股票
+            active_set = set(active)
+            candidates = [
+                p for p in prediction_index.top(limit * 3 + len(stale), self.min_prediction_score)
+                if p['symbol'] in active_set
+            ][:limit * 3]
+            if not candidates:
                 return []
             
-            symbols = [s['symbol'] for s in stocks]
-            recommendations = []
-            
-            # 获取实时行情
-            quotes = await longbridge_sdk.get_realtime_quote(symbols)
+            quotes = await longbridge_sdk.get_realtime_quote([p['symbol'] for p in candidates])
+            quote_map = {q.get('symbol'): q for q in quotes}
             
-            for quote in quotes:
-                symbol = quote.get('symbol', '')
-                price = quote.get('price', 0)
-                change_pct = quote.get('change_pct', 0)
-                
-                if price <= 0:
+            recommendations = []
+            for prediction in candidates:
+                quote = quote_map.get(prediction['symbol'])
+                if not quote or quote.get('price', 0) <= 0:
                     continue
-                
-                # 获取预测数据
-                prediction = await self.hybrid_predict(symbol)
-                
-                if prediction.get('final_score', 0) >= self.min_prediction_score:
-                    recommendations.append({
-                        'symbol': symbol,
-                        'price': price,
-                        'change_pct': change_pct,
-                        'score': prediction.get('final_score', 0),
-                        'predicted_return': prediction.get('predicted_return', 0),
-                        'recommendation': prediction.get('recommendation', 'hold'),
-                        'acceleration': 0
-                    })
-            
-            # 按评分排序
-            recommendations.sort(key=lambda x: x['score'], reverse=True)
-            
-            return recommendations[:limit]
+                recommendations.append({
+                    'symbol': prediction['symbol'],
+                    'price': quote['price'],
+                    'change_pct': quote.get('change_pct', 0),
+                    'score': prediction['score'],
+                    'predicted_return': prediction['predicted_return'],
+                    'recommendation': prediction.get('llm_recommendation') or 'hold',
+                    'acceleration': 0
+                })
+                if len(recommendations) >= limit:
+                    break
+            
+            return recommendations
         except Exception as e:
             logger.info(f"获取买入推荐失败: {e}")
             return []
@@ -689,7 +737,8 @@ class SmartPredictionTrader:
             'base_profit_target': self.base_profit_target,
             'trailing_stop': self.trailing_stop,
             'max_hold_days': self.max_hold_days,
-            'tracking_positions': list(self.peak_prices.keys()),
+            'tracking_positions': exit_engine.tracked_symbols(1 if is_test_mode() else 0),
+            'exit_engine': exit_engine.get_stats(),
             'llm_enabled': self.llm_enabled,
             'llm_provider': self.llm_provider,
             'llm_api_base': self.llm_api_base,
@@ -1,10 +1,10 @@
 """
 SSE (Server-Sent Events) 管理
 """
-import asyncio
-import json
 import logging
 
+from app.core.serialization import dumps_text
+
 logger = logging.getLogger(__name__)
 
 # SSE连接管理
@@ -16,10 +16,10 @@ async def notify_sse_clients(event_type: str, data: dict):
     if not sse_clients:
         return
     
-    message = json.dumps({
+    message = dumps_text({
         'type': event_type,
         'data': data
-    }, ensure_ascii=False, default=str)
+    })
     
     dead_clients = set()
     for client in sse_clients:
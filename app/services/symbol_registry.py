@@ -0,0 +1,210 @@
+"""
+股票代码注册表
+- 缓存每只股票的标准化代码、市场、每手股数、币种和类型，原始代码 ↔ 标准化代码双向 O(1) 查找
+- 启动时从 stocks 表加载一次，连接长桥后批量补充静态信息（每手股数、币种、板块类型）
+- 未登记的代码首次出现时计算并登记，之后行情、K线、下单不再重复做字符串处理
+"""
+import asyncio
+import logging
+from threading import Lock
+from typing import Dict, Iterable, List, Optional
+
+import pymysql
+
+from app.config.database import get_db_connection
+from app.config.settings import classify_symbol_type
+
+logger = logging.getLogger(__name__)
+
+MARKET_CURRENCY = {'US': 'USD', 'HK': 'HKD', 'SH': 'CNY', 'SZ': 'CNY', 'SG': 'SGD'}
+_VALID_SUFFIXES = tuple(f'.{market}' for market in MARKET_CURRENCY)
+
+
+def normalize_symbol(symbol: str) -> str:
+    """标准化股票代码为长桥API格式，优先处理A股/港股数字代码"""
+    if not symbol:
+        return symbol
+
+    symbol = symbol.strip().upper()
+
+    # 已经包含有效的市场后缀，直接返回
+    if symbol.endswith(_VALID_SUFFIXES):
+        return symbol
+
+    # 移除可能存在的无效后缀（如 .NASDAQ, .NYSE 等）
+    if '.' in symbol:
+        symbol = symbol.split('.')[0]
+
+    # 先判断A股 6 位数字
+    if len(symbol) == 6 and symbol.isdigit():
+        if symbol.startswith('6'):
+            return f"{symbol}.SH"
+        if symbol.startswith(('0', '3')):
+            return f"{symbol}.SZ"
+        # 其他 6 位数字视为港股（少见）
+        return f"{symbol}.HK"
+
+    # 纯数字 -> 港股，左侧补零到 5 位（长桥常用 5 位格式）
+    if symbol.isdigit():
+        return f"{symbol.zfill(5)}.HK"
+
+    # 其他情况默认为美股
+    return f"{symbol}.US"
+
+
+class SymbolInfo:
+    """单只股票的元数据"""
+
+    __slots__ = ('symbol', 'normalized', 'market', 'currency', 'lot_size', 'stock_type', 'name')
+
+    def __init__(self, symbol: str, normalized: str, stock_type: Optional[str] = None, name: Optional[str] = None):
+        self.symbol = symbol
+        self.normalized = normalized
+        self.market = normalized.rsplit('.', 1)[-1] if '.' in normalized else 'US'
+        self.currency = MARKET_CURRENCY.get(self.market, 'USD')
+        self.lot_size = 1
+        self.stock_type = stock_type or classify_symbol_type(symbol)
+        self.name = name or symbol
+
+    def to_dict(self) -> dict:
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+
+class SymbolRegistry:
+    """股票代码与元数据缓存"""
+
+    def __init__(self, max_size: int = 20000, static_batch_size: int = 500):
+        self.max_size = max_size
+        self.static_batch_size = static_batch_size  # 长桥静态信息单次最多 500 只
+        self._by_symbol: Dict[str, SymbolInfo] = {}  # 原始代码（含各种写法） -> 元数据
+        self._by_normalized: Dict[str, SymbolInfo] = {}
+        self._lock = Lock()
+
+        # 统计
+        self.hits = 0
+        self.misses = 0
+        self.static_loaded = 0
+
+    # ---------- 登记 ----------
+
+    def register(self, symbol: str, stock_type: Optional[str] = None, name: Optional[str] = None,
+                 normalized: Optional[str] = None) -> SymbolInfo:
+        """登记股票（stocks 表中的写法优先作为反查结果）"""
+        normalized = normalized or normalize_symbol(symbol)
+        with self._lock:
+            info = self._by_normalized.get(normalized)
+            if info is None:
+                info = SymbolInfo(symbol, normalized, stock_type, name)
+                self._by_normalized[normalized] = info
+            else:
+                if stock_type:
+                    info.stock_type = stock_type
+                if name:
+                    info.name = name
+            if len(self._by_symbol) < self.max_size:
+                self._by_symbol[symbol] = info
+                self._by_symbol[normalized] = info
+        return info
+
+    def get(self, symbol: str) -> Optional[SymbolInfo]:
+        """按原始代码或标准化代码查找，未登记时计算并登记"""
+        if not symbol:
+            return None
+        info = self._by_symbol.get(symbol)
+        if info is not None:
+            self.hits += 1
+            return info
+        self.misses += 1
+        normalized = normalize_symbol(symbol)
+        info = self._by_normalized.get(normalized)
+        if info is not None:
+            if len(self._by_symbol) < self.max_size:
+                self._by_symbol[symbol] = info
+            return info
+        return self.register(symbol, normalized=normalized)
+
+    def normalize(self, symbol: str) -> str:
+        info = self.get(symbol)
+        return info.normalized if info is not None else symbol
+
+    def original(self, normalized: str) -> str:
+        """标准化代码反查登记时的原始写法"""
+        info = self._by_normalized.get(normalized)
+        return info.symbol if info is not None else normalized
+
+    def classify(self, symbol: str) -> str:
+        info = self.get(symbol)
+        return info.stock_type if info is not None else 'UNKNOWN'
+
+    def lot_size(self, symbol: str) -> int:
+        info = self.get(symbol)
+        return info.lot_size if info is not None else 1
+
+    # ---------- 加载 ----------
+
+    def load(self) -> int:
+        """从 stocks 表加载全部股票"""
+        conn = get_db_connection()
+        cursor = conn.cursor(pymysql.cursors.DictCursor)
+        try:
+            cursor.execute("SELECT symbol, name, stock_type FROM stocks")
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+            conn.close()
+        for row in rows:
+            self.register(row['symbol'], row.get('stock_type'), row.get('name'))
+        logger.info(f"股票代码注册表已加载: {len(rows)} 只")
+        return len(rows)
+
+    def apply_static_info(self, infos: Iterable) -> int:
+        """写入长桥静态信息（symbol / lot_size / currency / board）"""
+        applied = 0
+        for static in infos:
+            info = self._by_normalized.get(getattr(static, 'symbol', ''))
+            if info is None:
+                continue
+            lot_size = getattr(static, 'lot_size', None)
+            if lot_size:
+                info.lot_size = int(lot_size)
+            currency = getattr(static, 'currency', None)
+            if currency:
+                info.currency = str(currency)
+            board = getattr(static, 'board', None)
+            if board is not None:
+                info.stock_type = classify_symbol_type(info.symbol, board)
+            applied += 1
+        self.static_loaded += applied
+        return applied
+
+    async def load_static_info(self, symbols: Optional[List[str]] = None) -> int:
+        """批量获取长桥静态信息（未连接真实SDK时跳过）"""
+        from .longbridge_sdk import longbridge_sdk
+
+        normalized = sorted({self.normalize(s) for s in symbols} if symbols else set(self._by_normalized))
+        applied = 0
+        for i in range(0, len(normalized), self.static_batch_size):
+            infos = await longbridge_sdk.get_static_info(normalized[i:i + self.static_batch_size])
+            applied += self.apply_static_info(infos)
+        return applied
+
+    async def warm_up(self):
+        """启动时加载 stocks 表和静态信息"""
+        try:
+            await asyncio.to_thread(self.load)
+            await self.load_static_info()
+        except Exception as e:
+            logger.warning(f"加载股票代码注册表失败: {e}")
+
+    def get_stats(self) -> dict:
+        return {
+            'symbols': len(self._by_normalized),
+            'aliases': len(self._by_symbol),
+            'hits': self.hits,
+            'misses': self.misses,
+            'static_loaded': self.static_loaded
+        }
+
+
+# 全局实例
+symbol_registry = SymbolRegistry()
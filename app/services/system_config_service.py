@@ -6,6 +6,7 @@ import pymysql
 
 from app.core.config import CONFIG_DEFINITIONS, DEFAULT_SYSTEM_CONFIGS, ensure_default_system_configs
 from app.db.session import get_db_connection
+from app.auth.utils import invalidate_test_mode_cache
 
 
 class SystemConfigService:
@@ -51,6 +52,8 @@ class SystemConfigService:
                     (config_key, config_value, description or '')
                 )
             conn.commit()
+            if config_key == 'test_mode':
+                invalidate_test_mode_cache()
         finally:
             cursor.close()
             conn.close()
@@ -1,88 +1,321 @@
 """
 异步任务队列
+- 三条优先级通道：HIGH（成交落库重试等交易任务）> NORMAL > LOW（预测刷新、统计），工作协程总是先取高优先级任务
+- N 个工作协程并发处理；同步函数放到线程池执行，不阻塞事件循环
+- 每条通道有容量上限，队列满时提交方等待（背压），可设置等待超时
+- 已注册名称的任务可选持久化到 async_tasks 表，停止或重启后重新加载执行
+- 按任务名称统计排队等待、执行耗时与失败次数
 """
 import asyncio
+import json
 import logging
-from datetime import datetime
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+import pymysql
+
+from app.config.database import get_db_connection
+from app.config.settings import TASK_QUEUE_WORKERS, TASK_QUEUE_THREADS, TASK_QUEUE_MAXSIZE
+from app.core.serialization import dumps_text
 
 logger = logging.getLogger(__name__)
 
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+PRIORITY_NAMES = ('high', 'normal', 'low')
+
+
+class QueuedTask:
+    """队列中的任务"""
+
+    __slots__ = ('func', 'args', 'kwargs', 'name', 'priority', 'durable_id', 'enqueued_at')
+
+    def __init__(self, func: Callable, args: tuple, kwargs: dict, name: str,
+                 priority: int, durable_id: Optional[int] = None):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.name = name
+        self.priority = priority
+        self.durable_id = durable_id
+        self.enqueued_at = time.monotonic()
+
+
+class TaskMetrics:
+    """单类任务的统计"""
+
+    __slots__ = ('completed', 'failed', 'total_ms', 'max_ms', 'total_wait_ms', 'last_error')
+
+    def __init__(self):
+        self.completed = 0
+        self.failed = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.total_wait_ms = 0.0
+        self.last_error: Optional[str] = None
+
+    def to_dict(self) -> dict:
+        runs = self.completed + self.failed
+        return {
+            'completed': self.completed,
+            'failed': self.failed,
+            'avg_ms': round(self.total_ms / runs, 2) if runs else 0,
+            'max_ms': round(self.max_ms, 2),
+            'avg_wait_ms': round(self.total_wait_ms / runs, 2) if runs else 0,
+            'last_error': self.last_error
+        }
+
 
 class AsyncTaskQueue:
     """异步任务队列，用于分离监控任务和API请求"""
-    
-    def __init__(self):
-        self.queue = None
+
+    def __init__(self, workers: int = TASK_QUEUE_WORKERS, threads: int = TASK_QUEUE_THREADS,
+                 maxsize: int = TASK_QUEUE_MAXSIZE):
+        self.workers = workers
+        self.threads = threads
+        self.maxsize = maxsize
         self.is_running = False
-        self.worker_task = None
+        self._lanes = None
+        self._available: Optional[asyncio.Semaphore] = None
+        self._worker_tasks = []
+        self._executor: Optional[ThreadPoolExecutor] = None
         self._loop = None
-    
+        self._handlers: Dict[str, Callable] = {}
+
+        # 统计
+        self.metrics: Dict[str, TaskMetrics] = {}
+        self.rejected = 0
+
+    # ---------- 生命周期 ----------
+
+    def _ensure_lanes(self):
+        if self._lanes is None:
+            self._lanes = [asyncio.Queue(maxsize=self.maxsize) for _ in PRIORITY_NAMES]
+            self._available = asyncio.Semaphore(0)
+
     async def start(self):
-        """启动任务队列"""
+        """启动工作协程并重新加载持久化任务"""
         if self.is_running:
             return
         self.is_running = True
         self._loop = asyncio.get_running_loop()
-        self.queue = asyncio.Queue()
-        self.worker_task = asyncio.create_task(self._worker())
-        logger.info("异步任务队列已启动")
-    
-    async def stop(self):
-        """停止任务队列"""
+        self._ensure_lanes()
+        self._executor = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix='task-queue')
+        self._worker_tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        restored = await self._restore_durable()
+        logger.info(f"异步任务队列已启动: {self.workers} 个工作协程, {self.threads} 个线程"
+                    + (f", 恢复 {restored} 个持久化任务" if restored else ""))
+
+    async def stop(self, drain_timeout: float = 5.0):
+        """停止任务队列：先在超时内处理完已排队任务，未完成的持久化任务留待下次启动"""
         self.is_running = False
-        if self.worker_task:
+        if self._worker_tasks:
             try:
                 current_loop = asyncio.get_running_loop()
             except RuntimeError:
                 current_loop = None
             task_loop = None
             try:
-                task_loop = self.worker_task.get_loop()
+                task_loop = self._worker_tasks[0].get_loop()
             except Exception:
                 task_loop = None
 
             if current_loop is not None and task_loop is not None and current_loop is not task_loop:
                 logger.info("任务队列停止跳过：事件循环不一致")
-                self.worker_task = None
-                self.queue = None
+                self._reset()
                 return
 
-            self.worker_task.cancel()
             try:
-                await self.worker_task
-            except asyncio.CancelledError:
-                pass
+                await asyncio.wait_for(asyncio.gather(*(lane.join() for lane in self._lanes)), drain_timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"任务队列停止时仍有 {self.pending_count()} 个任务未处理")
 
-        self.worker_task = None
-        self.queue = None
+            for worker in self._worker_tasks:
+                worker.cancel()
+            await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+        self._reset()
         logger.info("异步任务队列已停止")
-    
+
+    def _reset(self):
+        self._worker_tasks = []
+        self._executor = None
+        self._lanes = None
+        self._available = None
+
+    # ---------- 提交 ----------
+
+    def register(self, name: str, func: Callable):
+        """注册可持久化的任务处理函数（持久化任务按名称重新绑定）"""
+        self._handlers[name] = func
+
     async def add_task(self, task_func, *args, **kwargs):
-        """添加任务到队列"""
-        if self.queue is None:
-            self.queue = asyncio.Queue()
-        await self.queue.put((task_func, args, kwargs))
-    
+        """添加任务到队列（普通优先级）"""
+        await self.enqueue(task_func, args, kwargs)
+
+    async def enqueue(self, task_func: Callable, args: tuple = (), kwargs: Optional[dict] = None,
+                      priority: int = PRIORITY_NORMAL, name: Optional[str] = None,
+                      durable: bool = False, timeout: Optional[float] = None) -> bool:
+        """
+        提交任务；通道已满时等待空位（背压），超过 timeout 抛出 asyncio.QueueFull
+        durable=True 时任务需先通过 register 注册名称，参数须可 JSON 序列化
+        """
+        self._ensure_lanes()
+        kwargs = kwargs or {}
+        name = name or getattr(task_func, '__qualname__', repr(task_func))
+        priority = min(max(priority, PRIORITY_HIGH), PRIORITY_LOW)
+
+        durable_id = None
+        if durable:
+            if self._handlers.get(name) is not task_func:
+                raise ValueError(f"持久化任务需先注册: {name}")
+            try:
+                durable_id = await asyncio.to_thread(self._persist, name, priority, args, kwargs)
+            except Exception as e:
+                logger.warning(f"任务持久化失败，仅保存在内存 {name}: {e}")
+
+        await self._put(QueuedTask(task_func, tuple(args), kwargs, name, priority, durable_id), timeout)
+        return durable_id is not None
+
+    async def _put(self, task: QueuedTask, timeout: Optional[float] = None):
+        lane = self._lanes[task.priority]
+        try:
+            if timeout is None:
+                await lane.put(task)
+            else:
+                await asyncio.wait_for(lane.put(task), timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise asyncio.QueueFull(f"{PRIORITY_NAMES[task.priority]} 通道已满")
+        self._available.release()
+
+    # ---------- 执行 ----------
+
     async def _worker(self):
-        """任务处理工作器"""
-        while self.is_running:
+        """任务处理工作器：每次取优先级最高的任务"""
+        while True:
+            await self._available.acquire()
+            lane = next(q for q in self._lanes if not q.empty())
+            task = lane.get_nowait()
             try:
-                task_func, args, kwargs = await asyncio.wait_for(
-                    self.queue.get(), timeout=1.0
+                await self._execute(task)
+            finally:
+                lane.task_done()
+
+    async def _execute(self, task: QueuedTask):
+        metrics = self.metrics.setdefault(task.name, TaskMetrics())
+        started = time.monotonic()
+        metrics.total_wait_ms += (started - task.enqueued_at) * 1000
+        try:
+            if asyncio.iscoroutinefunction(task.func):
+                await task.func(*task.args, **task.kwargs)
+            else:
+                loop = asyncio.get_running_loop()
+                await loop.run_in_executor(self._executor, lambda: task.func(*task.args, **task.kwargs))
+            metrics.completed += 1
+            error = None
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            metrics.failed += 1
+            metrics.last_error = error = str(e)
+            logger.error(f"任务执行失败 {task.name}: {e}")
+        finally:
+            elapsed_ms = (time.monotonic() - started) * 1000
+            metrics.total_ms += elapsed_ms
+            metrics.max_ms = max(metrics.max_ms, elapsed_ms)
+
+        if task.durable_id is not None:
+            try:
+                await asyncio.to_thread(self._complete_durable, task.durable_id, error)
+            except Exception as e:
+                logger.warning(f"更新持久化任务状态失败 #{task.durable_id}: {e}")
+
+    # ---------- 持久化 ----------
+
+    def _persist(self, name: str, priority: int, args: tuple, kwargs: dict) -> int:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                "INSERT INTO async_tasks (name, priority, payload, status) VALUES (%s, %s, %s, 'PENDING')",
+                (name, priority, dumps_text({'args': list(args), 'kwargs': kwargs}))
+            )
+            conn.commit()
+            return cursor.lastrowid
+        finally:
+            cursor.close()
+            conn.close()
+
+    def _complete_durable(self, task_id: int, error: Optional[str]):
+        """成功的任务直接删除；失败的保留记录便于排查"""
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        try:
+            if error is None:
+                cursor.execute("DELETE FROM async_tasks WHERE id = %s", (task_id,))
+            else:
+                cursor.execute(
+                    "UPDATE async_tasks SET status = 'FAILED', error = %s WHERE id = %s",
+                    (error[:1000], task_id)
                 )
-                try:
-                    if asyncio.iscoroutinefunction(task_func):
-                        await task_func(*args, **kwargs)
-                    else:
-                        task_func(*args, **kwargs)
-                except Exception as e:
-                    logger.error(f"任务执行失败: {e}")
-                finally:
-                    self.queue.task_done()
-            except asyncio.TimeoutError:
+            conn.commit()
+        finally:
+            cursor.close()
+            conn.close()
+
+    def _load_durable(self) -> list:
+        conn = get_db_connection()
+        cursor = conn.cursor(pymysql.cursors.DictCursor)
+        try:
+            cursor.execute("SELECT id, name, priority, payload FROM async_tasks WHERE status = 'PENDING' ORDER BY id")
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+            conn.close()
+
+    async def _restore_durable(self) -> int:
+        """重新加载上次未执行完的持久化任务（至少执行一次语义）"""
+        try:
+            rows = await asyncio.to_thread(self._load_durable)
+        except Exception as e:
+            logger.warning(f"加载持久化任务失败: {e}")
+            return 0
+
+        restored = 0
+        for row in rows:
+            handler = self._handlers.get(row['name'])
+            if handler is None:
+                logger.warning(f"持久化任务没有注册处理函数，跳过: {row['name']}#{row['id']}")
                 continue
-            except asyncio.CancelledError:
-                break
+            payload = json.loads(row['payload'] or '{}')
+            await self._put(QueuedTask(handler, tuple(payload.get('args', ())), payload.get('kwargs', {}),
+                                       row['name'], int(row['priority']), row['id']))
+            restored += 1
+        return restored
+
+    # ---------- 统计 ----------
+
+    def pending_count(self) -> int:
+        return sum(lane.qsize() for lane in self._lanes) if self._lanes else 0
+
+    def get_stats(self) -> dict:
+        return {
+            'running': self.is_running,
+            'workers': len(self._worker_tasks),
+            'threads': self.threads,
+            'maxsize': self.maxsize,
+            'pending': {
+                name: (self._lanes[i].qsize() if self._lanes else 0)
+                for i, name in enumerate(PRIORITY_NAMES)
+            },
+            'rejected': self.rejected,
+            'tasks': {name: m.to_dict() for name, m in self.metrics.items()}
+        }
 
 
 # 全局实例
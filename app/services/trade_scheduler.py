@@ -0,0 +1,484 @@
+"""
+自动交易任务调度（基于 auto_trade_tasks 表）
+- 按美股交易日历为每个交易日生成任务：开盘前运行每日预测（PREDICT），开盘时执行智能买入（OPEN_BUY）
+- 任务持久化在数据库中，执行前以条件更新抢占（PENDING → RUNNING）并记录执行实例和租约心跳，
+  多实例部署时不会重复执行
+- 中断恢复：只处理租约已过期（执行实例停止续约）的 RUNNING 任务
+  * PREDICT：重新排队
+  * OPEN_BUY：提交订单前把计划买入的股票和测试模式写入任务行，提交后写入本任务的订单ID，恢复时按此对账：
+    未开始提交的重新排队；已记录订单ID的按结果结束；提交中断的按本任务的股票和测试模式查找 trades，
+    全部找到标记为 COMPLETED，否则标记为 NEEDS_REVIEW 由人工确认
+- 任务结果只由仍持有租约的实例写入，租约过期后被其他实例恢复的任务不会被覆盖
+- 过期的待执行任务按类型决定补跑还是标记为 MISSED
+  * PREDICT：当天收盘前仍可补跑
+  * OPEN_BUY：只在开盘后的宽限时间内补跑，避免在远离开盘价的位置追单
+- 记录每个任务实际执行时间相对计划时间的延迟（delay_ms）
+"""
+import asyncio
+import json
+import logging
+import os
+import socket
+import uuid
+from datetime import date, datetime, timedelta
+from typing import List, Optional
+
+import pymysql
+
+from app.config.database import get_db_connection
+from app.auth.utils import is_test_mode
+from app.config.settings import PREDICTION_LEAD_MINUTES, OPEN_BUY_GRACE_MINUTES, TASK_LEASE_SECONDS
+from app.core.serialization import dumps_text
+from . import market_calendar
+
+logger = logging.getLogger(__name__)
+
+TASK_PREDICT = 'PREDICT'
+TASK_OPEN_BUY = 'OPEN_BUY'
+SCHEDULED_TASK_TYPES = (TASK_PREDICT, TASK_OPEN_BUY)
+
+
+def plan_tasks(day: date, lead_minutes: int = PREDICTION_LEAD_MINUTES) -> List[tuple]:
+    """某交易日的计划任务 [(task_type, scheduled_time)]，时间为服务器本地时间"""
+    open_at = market_calendar.to_local(market_calendar.market_open(day))
+    return [
+        (TASK_PREDICT, open_at - timedelta(minutes=lead_minutes)),
+        (TASK_OPEN_BUY, open_at),
+    ]
+
+
+def task_deadline(task_type: str, scheduled_time: datetime,
+                  grace_minutes: int = OPEN_BUY_GRACE_MINUTES) -> datetime:
+    """任务最晚可执行时间（本地时间），超过后标记为 MISSED"""
+    if task_type == TASK_OPEN_BUY:
+        return scheduled_time + timedelta(minutes=grace_minutes)
+    # 预测对当天交易有效：截止到其服务的交易日收盘
+    market_day = scheduled_time.astimezone(market_calendar.MARKET_TZ).date()
+    trading_day = market_calendar.next_trading_day(market_day, include_today=True)
+    return market_calendar.to_local(market_calendar.market_close(trading_day))
+
+
+class TradeScheduler:
+    """自动交易任务调度器"""
+
+    def __init__(self, lead_minutes: int = PREDICTION_LEAD_MINUTES,
+                 grace_minutes: int = OPEN_BUY_GRACE_MINUTES, max_sleep: float = 60.0,
+                 lease_seconds: int = TASK_LEASE_SECONDS):
+        self.lead_minutes = lead_minutes
+        self.grace_minutes = grace_minutes
+        self.max_sleep = max_sleep
+        self.lease_seconds = lease_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._task: Optional[asyncio.Task] = None
+
+        # 统计
+        self.executed = {'COMPLETED': 0, 'FAILED': 0, 'SKIPPED': 0, 'MISSED': 0, 'NEEDS_REVIEW': 0}
+        self.recovered = 0
+        self.last_delay_ms: Optional[int] = None
+        self.max_delay_ms = 0
+
+    # ---------- 任务生成与恢复 ----------
+
+    def ensure_scheduled(self, now: Optional[datetime] = None) -> int:
+        """为当天（收盘前）和下一个交易日补齐缺失的任务，返回新增数量"""
+        now = now or datetime.now()
+        market_now = now.astimezone(market_calendar.MARKET_TZ)
+        first_day = market_calendar.next_trading_day(market_now.date(), include_today=True)
+        if market_now >= market_calendar.market_close(first_day):
+            first_day = market_calendar.next_trading_day(first_day)
+        planned = plan_tasks(first_day, self.lead_minutes) + \
+            plan_tasks(market_calendar.next_trading_day(first_day), self.lead_minutes)
+
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                f"SELECT task_type, scheduled_time FROM auto_trade_tasks "
+                f"WHERE scheduled_time IN ({', '.join(['%s'] * len(planned))})",
+                [scheduled for _, scheduled in planned]
+            )
+            existing = {(row[0], row[1]) for row in cursor.fetchall()}
+            missing = [(t, s) for t, s in planned if (t, s) not in existing]
+            if missing:
+                cursor.executemany(
+                    "INSERT INTO auto_trade_tasks (task_type, status, scheduled_time) VALUES (%s, 'PENDING', %s)",
+                    missing
+                )
+                conn.commit()
+                logger.info(f"已生成自动交易任务: {', '.join(f'{t}@{s:%Y-%m-%d %H:%M}' for t, s in missing)}")
+            return len(missing)
+        finally:
+            cursor.close()
+            conn.close()
+
+    def recover(self) -> int:
+        """处理租约已过期的 RUNNING 任务（PREDICT 重新排队，OPEN_BUY 对账），返回处理数量"""
+        recovered = 0
+        for task in self._expired_tasks():
+            task_type, task_id = task['task_type'], task['id']
+            if task_type == TASK_PREDICT:
+                if not self._requeue(task):
+                    continue
+                logger.warning(f"自动交易任务 {task_type}#{task_id} 执行中断（{task['claimed_by']}），重新排队")
+            else:
+                progress = json.loads(task['result']) if task.get('result') else None
+                if progress is None:
+                    # 尚未开始提交订单，重新排队（超过宽限时间时由执行流程标记为 MISSED）
+                    if not self._requeue(task):
+                        continue
+                    logger.warning(f"自动交易任务 {task_type}#{task_id} 在提交订单前中断（{task['claimed_by']}），重新排队")
+                    recovered += 1
+                    continue
+                status, result = self._reconcile_open_buy(task, progress)
+                if not self._close_interrupted(task, status, result):
+                    continue
+                logger.warning(f"自动交易任务 {task_type}#{task_id} 执行中断（{task['claimed_by']}），"
+                               f"对账后标记为 {status}: {len(result['order_ids'])} 个订单")
+            recovered += 1
+        self.recovered += recovered
+        return recovered
+
+    def _expired_tasks(self) -> List[dict]:
+        """租约已过期（超过 lease_seconds 未续约或没有心跳）的 RUNNING 任务，按数据库时间判断"""
+        conn = get_db_connection()
+        cursor = conn.cursor(pymysql.cursors.DictCursor)
+        try:
+            cursor.execute("""
+                SELECT id, task_type, scheduled_time, claimed_by, claimed_at, result FROM auto_trade_tasks
+                WHERE status = 'RUNNING' AND task_type IN (%s, %s)
+                  AND (heartbeat_at IS NULL OR heartbeat_at < NOW() - INTERVAL %s SECOND)
+            """, (*SCHEDULED_TASK_TYPES, self.lease_seconds))
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+            conn.close()
+
+    def _requeue(self, task: dict) -> bool:
+        """把中断的任务放回 PENDING（仅当仍由原实例持有，避免与其他实例的恢复冲突）"""
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("""
+                UPDATE auto_trade_tasks SET status = 'PENDING', claimed_by = NULL, claimed_at = NULL, heartbeat_at = NULL
+                WHERE id = %s AND status = 'RUNNING' AND claimed_by <=> %s
+            """, (task['id'], task['claimed_by']))
+            conn.commit()
+            return cursor.rowcount == 1
+        finally:
+            cursor.close()
+            conn.close()
+
+    def _reconcile_open_buy(self, task: dict, progress: dict) -> tuple:
+        """按任务行记录的提交进度对账中断的 OPEN_BUY，返回 (状态, 结果)"""
+        result = {'interrupted': True, 'claimed_by': task['claimed_by'], 'test_mode': progress.get('test_mode')}
+        if 'order_ids' in progress:
+            # 提交已完成，只是结果未写入
+            result['order_ids'] = progress['order_ids']
+            return ('COMPLETED' if progress['order_ids'] else 'FAILED'), result
+
+        symbols = progress.get('symbols') or []
+        since = task['claimed_at'] or task['scheduled_time']
+        found = self._task_orders(progress.get('test_mode', 0), symbols, since) if symbols else []
+        result['order_ids'] = [order_id for _, order_id in found]
+        if symbols and {symbol for symbol, _ in found} >= set(symbols):
+            return 'COMPLETED', result
+        result['message'] = '提交订单时中断，部分股票未找到本任务的买入订单，请人工确认'
+        return 'NEEDS_REVIEW', result
+
+    def _task_orders(self, test_mode: int, symbols: List[str], since: datetime) -> List[tuple]:
+        """本任务计划买入的股票在 since 之后当天的买入订单 [(symbol, order_id)]（限定测试模式）"""
+        day_end = datetime.combine(since.date(), datetime.max.time())
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f"""
+                SELECT symbol, order_id FROM trades
+                WHERE action = 'BUY' AND test_mode = %s AND order_id IS NOT NULL
+                  AND trade_time >= %s AND trade_time <= %s
+                  AND symbol IN ({', '.join(['%s'] * len(symbols))})
+                ORDER BY trade_time
+            """, (test_mode, since, day_end, *symbols))
+            return [(row[0], row[1]) for row in cursor.fetchall()]
+        finally:
+            cursor.close()
+            conn.close()
+
+    def due_tasks(self, now: Optional[datetime] = None) -> List[dict]:
+        """到期待执行的任务（按计划时间排序）"""
+        conn = get_db_connection()
+        cursor = conn.cursor(pymysql.cursors.DictCursor)
+        try:
+            cursor.execute("""
+                SELECT id, task_type, scheduled_time FROM auto_trade_tasks
+                WHERE status = 'PENDING' AND task_type IN (%s, %s) AND scheduled_time <= %s
+                ORDER BY scheduled_time, id
+            """, (*SCHEDULED_TASK_TYPES, now or datetime.now()))
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+            conn.close()
+
+    def seconds_until_next(self, now: Optional[datetime] = None) -> float:
+        """距离下一个待执行任务的秒数（不超过 max_sleep）"""
+        now = now or datetime.now()
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                "SELECT MIN(scheduled_time) FROM auto_trade_tasks WHERE status = 'PENDING' AND task_type IN (%s, %s)",
+                SCHEDULED_TASK_TYPES
+            )
+            row = cursor.fetchone()
+        finally:
+            cursor.close()
+            conn.close()
+        if not row or row[0] is None:
+            return self.max_sleep
+        return min(max((row[0] - now).total_seconds(), 0.0), self.max_sleep)
+
+    def _claim(self, task_id: int) -> bool:
+        """抢占任务（PENDING → RUNNING）并记录执行实例和心跳，已被其他实例抢占时返回 False"""
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("""
+                UPDATE auto_trade_tasks SET status = 'RUNNING', claimed_by = %s, claimed_at = NOW(), heartbeat_at = NOW()
+                WHERE id = %s AND status = 'PENDING'
+            """, (self.owner, task_id))
+            conn.commit()
+            return cursor.rowcount == 1
+        finally:
+            cursor.close()
+            conn.close()
+
+    def _heartbeat(self, task_id: int) -> bool:
+        """续约正在执行的任务，任务已不属于本实例时返回 False"""
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                "UPDATE auto_trade_tasks SET heartbeat_at = NOW() WHERE id = %s AND status = 'RUNNING' AND claimed_by = %s",
+                (task_id, self.owner)
+            )
+            conn.commit()
+            return cursor.rowcount == 1
+        finally:
+            cursor.close()
+            conn.close()
+
+    async def _keep_alive(self, task_id: int):
+        """任务执行期间定期续约（租约的 1/3）"""
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                if not await asyncio.to_thread(self._heartbeat, task_id):
+                    logger.warning(f"自动交易任务 #{task_id} 租约已失效")
+            except Exception as e:
+                logger.warning(f"自动交易任务 #{task_id} 续约失败: {e}")
+
+    def _record_progress(self, task_id: int, progress: dict) -> bool:
+        """把执行进度写入任务结果并续约（仅当任务仍由本实例持有），返回是否写入"""
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("""
+                UPDATE auto_trade_tasks SET result = %s, heartbeat_at = NOW()
+                WHERE id = %s AND status = 'RUNNING' AND claimed_by = %s
+            """, (dumps_text(progress), task_id, self.owner))
+            conn.commit()
+            return cursor.rowcount == 1
+        finally:
+            cursor.close()
+            conn.close()
+
+    def _finish(self, task_id: int, status: str, result: dict,
+                executed_time: Optional[datetime] = None, delay_ms: Optional[int] = None) -> bool:
+        """写入任务最终状态（仅当任务仍由本实例持有），返回是否写入"""
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("""
+                UPDATE auto_trade_tasks SET status = %s, executed_time = %s, delay_ms = %s, result = %s
+                WHERE id = %s AND status = 'RUNNING' AND claimed_by = %s
+            """, (status, executed_time, delay_ms, dumps_text(result), task_id, self.owner))
+            conn.commit()
+            if cursor.rowcount != 1:
+                logger.warning(f"自动交易任务 #{task_id} 租约已失效（已被其他实例恢复），未写入结果 {status}")
+                return False
+        finally:
+            cursor.close()
+            conn.close()
+        self.executed[status] = self.executed.get(status, 0) + 1
+        return True
+
+    def _close_interrupted(self, task: dict, status: str, result: dict) -> bool:
+        """记录中断任务的对账结果（仅当仍由原实例持有，避免与其他实例的恢复冲突）"""
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("""
+                UPDATE auto_trade_tasks SET status = %s, result = %s
+                WHERE id = %s AND status = 'RUNNING' AND claimed_by <=> %s
+            """, (status, dumps_text(result), task['id'], task['claimed_by']))
+            conn.commit()
+            if cursor.rowcount != 1:
+                return False
+        finally:
+            cursor.close()
+            conn.close()
+        self.executed[status] = self.executed.get(status, 0) + 1
+        return True
+
+    # ---------- 任务执行 ----------
+
+    async def run_task(self, task: dict, now: Optional[datetime] = None) -> Optional[str]:
+        """执行单个任务，返回最终状态；任务已被其他实例抢占时返回 None"""
+        task_id, task_type, scheduled = task['id'], task['task_type'], task['scheduled_time']
+        if not await asyncio.to_thread(self._claim, task_id):
+            return None
+
+        now = now or datetime.now()
+        deadline = task_deadline(task_type, scheduled, self.grace_minutes)
+        if now > deadline:
+            logger.warning(f"自动交易任务已错过: {task_type} 计划 {scheduled:%Y-%m-%d %H:%M}")
+            await asyncio.to_thread(self._finish, task_id, 'MISSED',
+                                    {'deadline': deadline.isoformat(sep=' ')})
+            return 'MISSED'
+
+        delay_ms = int((now - scheduled).total_seconds() * 1000)
+        self.last_delay_ms = delay_ms
+        self.max_delay_ms = max(self.max_delay_ms, delay_ms)
+        keep_alive = asyncio.create_task(self._keep_alive(task_id))
+        try:
+            if task_type == TASK_PREDICT:
+                status, result = await self._run_prediction()
+            else:
+                status, result = await self._run_open_buy(task_id)
+        except Exception as e:
+            logger.error(f"自动交易任务失败 {task_type}#{task_id}: {e}")
+            status, result = 'FAILED', {'message': str(e)}
+        finally:
+            keep_alive.cancel()
+
+        logger.info(f"自动交易任务 {task_type}#{task_id}: {status}，延迟 {delay_ms}ms")
+        await asyncio.to_thread(self._finish, task_id, status, result, now, delay_ms)
+        return status
+
+    async def _run_prediction(self) -> tuple:
+        from .smart_trader import smart_trader
+
+        await smart_trader.load_config()
+        predictions = await smart_trader.run_daily_prediction()
+        if not predictions:
+            return 'FAILED', {'message': '没有生成预测结果'}
+        return 'COMPLETED', {
+            'predicted': len(predictions),
+            'top': [p.get('symbol') for p in predictions[:5]]
+        }
+
+    async def _run_open_buy(self, task_id: int) -> tuple:
+        from .smart_trader import smart_trader
+        from .trading_strategy import trading_strategy
+
+        await smart_trader.load_config()
+        if not smart_trader.is_enabled:
+            return 'SKIPPED', {'message': '智能交易未开启'}
+
+        await trading_strategy.load_config()
+        recommendations = await smart_trader.get_top_recommendations(limit=smart_trader.max_daily_trades)
+        intents = [
+            {
+                'symbol': pick['symbol'],
+                'side': 'BUY',
+                'price': pick['price'],
+                'quantity': int(smart_trader.buy_amount / pick['price']),
+                'acceleration': pick.get('acceleration', 0)
+            }
+            for pick in recommendations
+            if pick.get('symbol') and pick.get('price', 0) > 0
+        ]
+        if not intents:
+            return 'SKIPPED', {'message': '当前没有合适的买入推荐'}
+
+        # 先记录本任务要买入的股票，中断恢复时只按这些股票对账
+        test_mode = 1 if is_test_mode() else 0
+        progress = {'test_mode': test_mode, 'symbols': [i['symbol'] for i in intents]}
+        if not await asyncio.to_thread(self._record_progress, task_id, progress):
+            return 'FAILED', {'message': '任务租约已失效，未提交订单'}
+
+        result = await trading_strategy.execute_batch(intents)
+        order_ids = [o['order_id'] for o in result.get('orders', []) if o.get('success') and o.get('order_id')]
+        try:
+            await asyncio.to_thread(self._record_progress, task_id, {**progress, 'order_ids': order_ids})
+        except Exception as e:
+            logger.warning(f"自动交易任务 #{task_id} 记录订单ID失败: {e}")
+        return ('COMPLETED' if result.get('success') else 'FAILED'), {
+            'test_mode': test_mode,
+            'order_ids': order_ids,
+            'submitted': result.get('submitted', 0),
+            'orders': [
+                {'symbol': o.get('symbol'), 'success': o.get('success'), 'message': o.get('message')}
+                for o in result.get('orders', [])
+            ]
+        }
+
+    # ---------- 后台调度 ----------
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        """恢复中断任务 → 补齐任务 → 执行到期任务 → 休眠到下一个任务（最长 max_sleep 秒）"""
+        while True:
+            wait = self.max_sleep
+            try:
+                await asyncio.to_thread(self.recover)
+                await asyncio.to_thread(self.ensure_scheduled)
+                for task in await asyncio.to_thread(self.due_tasks):
+                    await self.run_task(task)
+                wait = await asyncio.to_thread(self.seconds_until_next)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"自动交易调度失败: {e}")
+            await asyncio.sleep(wait)
+
+    def list_tasks(self, limit: int = 20) -> List[dict]:
+        """最近的调度任务（按计划时间倒序）"""
+        conn = get_db_connection()
+        cursor = conn.cursor(pymysql.cursors.DictCursor)
+        try:
+            cursor.execute("""
+                SELECT id, task_type, status, scheduled_time, executed_time, delay_ms, result
+                FROM auto_trade_tasks WHERE task_type IN (%s, %s)
+                ORDER BY scheduled_time DESC, id DESC LIMIT %s
+            """, (*SCHEDULED_TASK_TYPES, limit))
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+            conn.close()
+
+    def get_stats(self) -> dict:
+        return {
+            'running': self._task is not None,
+            'next_open': market_calendar.to_local(market_calendar.next_open()).isoformat(sep=' '),
+            'owner': self.owner,
+            'executed': dict(self.executed),
+            'recovered': self.recovered,
+            'last_delay_ms': self.last_delay_ms,
+            'max_delay_ms': self.max_delay_ms
+        }
+
+
+# 全局实例
+trade_scheduler = TradeScheduler()
@@ -3,12 +3,11 @@
 """
 import logging
 import pymysql
-from datetime import datetime
-from typing import Optional
 
 from app.config.database import get_db_connection
 from app.config.settings import ensure_default_system_configs
 from app.auth.utils import is_test_mode
+from .position_ledger import position_ledger
 
 logger = logging.getLogger(__name__)
 
@@ -20,7 +19,6 @@ class TradingStrategy:
         self.profit_target = 1.0
         self.buy_amount = 200000.0
         self.max_concurrent_positions = 1
-        self.positions_cache = {}
         self.market_data_cache = {}
 
     async def load_config(self):
@@ -50,28 +48,19 @@ class TradingStrategy:
             logger.warning(f"加载交易策略配置失败: {e}")
 
     async def check_buy_signal(self, symbol: str, price: float, change_pct: float, acceleration: float) -> bool:
-        """检查买入信号"""
-        # 检查当前持仓数量
-        conn = get_db_connection()
-        cursor = conn.cursor(pymysql.cursors.DictCursor)
+        """检查买入信号（持仓检查走内存账本，未成交的买单也计为持仓）"""
+        from .order_manager import order_manager
         
         test_mode = 1 if is_test_mode() else 0
-        cursor.execute("SELECT COUNT(*) as cnt FROM positions WHERE quantity > 0 AND test_mode = %s", (test_mode,))
-        current_positions = cursor.fetchone()['cnt']
+        pending_buys = order_manager.active_symbols('BUY', test_mode)
         
-        if current_positions >= self.max_concurrent_positions:
-            cursor.close()
-            conn.close()
+        # 检查是否已持有该股票或买单尚未成交
+        if symbol in pending_buys or position_ledger.is_holding(symbol, test_mode):
             return False
         
-        # 检查是否已持有该股票
-        cursor.execute("SELECT quantity FROM positions WHERE symbol = %s AND test_mode = %s", (symbol, test_mode))
-        position = cursor.fetchone()
-        
-        cursor.close()
-        conn.close()
-        
-        if position and position['quantity'] > 0:
+        # 检查当前持仓数量（含在途买单）
+        pending = sum(1 for s in pending_buys if not position_ledger.is_holding(s, test_mode))
+        if position_ledger.holding_count(test_mode) + pending >= self.max_concurrent_positions:
             return False
         
         # 买入条件：加速度 > 0.5 且涨幅 > 1%
@@ -99,8 +88,8 @@ class TradingStrategy:
         return False
 
     async def execute_buy(self, symbol: str, price: float, acceleration: float = 0) -> dict:
-        """执行买入"""
-        from .longbridge_sdk import longbridge_sdk
+        """执行买入（持仓在成交回报到达后由订单管理器更新）"""
+        from .order_manager import order_manager
         from .test_mode import test_mode_price_manager
         
         try:
@@ -108,128 +97,129 @@ class TradingStrategy:
             if quantity <= 0:
                 return {'success': False, 'message': '买入数量不足'}
             
-            cost = price * quantity
-            test_mode = 1 if is_test_mode() else 0
-            
             if is_test_mode():
                 test_mode_price_manager.set_price(symbol, price)
-                order_result = {'success': True, 'order_id': f'TEST_{datetime.now().strftime("%Y%m%d%H%M%S")}'}
-            else:
-                order_result = await longbridge_sdk.submit_order(symbol, 'BUY', quantity, 'MARKET')
             
-            if order_result.get('success'):
-                conn = get_db_connection()
-                cursor = conn.cursor(pymysql.cursors.DictCursor)
-                
-                # 记录交易
-                cursor.execute("""
-                    INSERT INTO trades (symbol, action, price, quantity, amount, acceleration, status, test_mode)
-                    VALUES (%s, 'BUY', %s, %s, %s, %s, 'FILLED', %s)
-                """, (symbol, price, quantity, cost, acceleration, test_mode))
-                
-                # 查询现有持仓计算新的平均价
-                cursor.execute(
-                    "SELECT quantity, cost, buy_price FROM positions WHERE symbol = %s AND test_mode = %s",
-                    (symbol, test_mode)
-                )
-                existing = cursor.fetchone()
-                
-                if existing and existing['quantity'] > 0:
-                    # 加仓：计算新的平均买入价
-                    old_qty = existing['quantity']
-                    old_cost = float(existing['cost'])
-                    new_total_qty = old_qty + quantity
-                    new_total_cost = old_cost + cost
-                    new_avg_price = new_total_cost / new_total_qty
-                    
-                    cursor.execute("""
-                        UPDATE positions SET 
-                            quantity = %s, cost = %s, buy_price = %s, 
-                            buy_acceleration = %s, status = 'HOLDING'
-                        WHERE symbol = %s AND test_mode = %s
-                    """, (new_total_qty, new_total_cost, new_avg_price, acceleration, symbol, test_mode))
-                else:
-                    # 新建持仓
-                    cursor.execute("""
-                        INSERT INTO positions (symbol, quantity, buy_price, cost, buy_acceleration, status, test_mode)
-                        VALUES (%s, %s, %s, %s, %s, 'HOLDING', %s)
-                    """, (symbol, quantity, price, cost, acceleration, test_mode))
-                
-                conn.commit()
-                cursor.close()
-                conn.close()
-                
-                logger.info(f"买入成功: {symbol} x {quantity} @ ${price:.2f}")
-                return {'success': True, 'quantity': quantity, 'price': price, 'cost': cost}
+            result = await order_manager.submit(symbol, 'BUY', quantity, price, acceleration=acceleration)
+            if not result.get('success'):
+                return result
             
-            return {'success': False, 'message': order_result.get('message', '订单提交失败')}
+            logger.info(f"买入订单已提交: {symbol} x {quantity} @ ${price:.2f}, 状态: {result['status']}")
+            return {**result, 'price': price, 'cost': price * quantity}
         except Exception as e:
             logger.error(f"执行买入失败 {symbol}: {e}")
             return {'success': False, 'message': str(e)}
 
     async def execute_sell(self, symbol: str, price: float, position: dict) -> dict:
-        """执行卖出"""
-        from .longbridge_sdk import longbridge_sdk
+        """执行卖出（盈亏按实际成交价在成交回报到达后计算）"""
+        from .order_manager import order_manager
         
         try:
             quantity = position.get('quantity', 0)
             if quantity <= 0:
                 return {'success': False, 'message': '无持仓可卖'}
             
-            amount = price * quantity
-            buy_price = float(position.get('buy_price', price))
-            profit_loss = (price - buy_price) * quantity
-            profit_pct = ((price - buy_price) / buy_price) * 100 if buy_price > 0 else 0
-            test_mode = 1 if is_test_mode() else 0
-            
-            if is_test_mode():
-                order_result = {'success': True, 'order_id': f'TEST_{datetime.now().strftime("%Y%m%d%H%M%S")}'}
-            else:
-                order_result = await longbridge_sdk.submit_order(symbol, 'SELL', quantity, 'MARKET')
+            result = await order_manager.submit(symbol, 'SELL', quantity, price)
+            if not result.get('success'):
+                return result
             
-            if order_result.get('success'):
-                conn = get_db_connection()
-                cursor = conn.cursor()
-                
-                cursor.execute("""
-                    INSERT INTO trades (symbol, action, price, quantity, amount, status, message, test_mode)
-                    VALUES (%s, 'SELL', %s, %s, %s, 'FILLED', %s, %s)
-                """, (symbol, price, quantity, amount, f'盈亏: ${profit_loss:.2f} ({profit_pct:.2f}%)', test_mode))
-                
-                cursor.execute("""
-                    UPDATE positions SET quantity = 0, status = 'SOLD', 
-                    current_price = %s, profit_loss = %s, profit_loss_pct = %s
-                    WHERE symbol = %s AND test_mode = %s
-                """, (price, profit_loss, profit_pct, symbol, test_mode))
-                
-                conn.commit()
-                cursor.close()
-                conn.close()
-                
-                logger.info(f"卖出成功: {symbol} x {quantity} @ ${price:.2f}, 盈亏: ${profit_loss:.2f}")
-                return {'success': True, 'quantity': quantity, 'price': price, 'profit_loss': profit_loss}
-            
-            return {'success': False, 'message': order_result.get('message', '订单提交失败')}
+            logger.info(f"卖出订单已提交: {symbol} x {quantity} @ ${price:.2f}, 状态: {result['status']}")
+            return {**result, 'price': price, 'profit_loss': result['realized_pnl']}
         except Exception as e:
             logger.error(f"执行卖出失败 {symbol}: {e}")
             return {'success': False, 'message': str(e)}
 
+    def check_batch_risk(self, intents: list) -> tuple:
+        """
+        批量下单前统一做风控检查（基于内存持仓账本和订单簿中未成交的买单）
+        返回 (通过的订单列表, 拒绝列表)，拒绝项为 {'symbol', 'message'}
+        - 同一批次内每只股票只能出现一次
+        - 买入：报价有效、未持有该股票且无未成交买单、新开仓后持仓数（含未成交买单）不超过
+          max_concurrent_positions；未指定数量时按 buy_amount 计算
+        - 卖出：必须有持仓且数量不超过持仓；未指定数量时全部卖出
+        - 清仓卖单成交后持仓账本才释放名额，同一批次内的卖出不为买入腾出名额
+        """
+        from .order_manager import order_manager
+
+        test_mode = 1 if is_test_mode() else 0
+        holdings = {row['symbol']: row for row in position_ledger.holdings(test_mode)}
+        occupied = set(holdings) | order_manager.active_symbols('BUY', test_mode)
+        open_slots = self.max_concurrent_positions - len(occupied)
+
+        approved, rejected, seen = [], [], set()
+        for intent in intents:
+            symbol = intent.get('symbol')
+            side = str(intent.get('side', '')).upper()
+            price = float(intent.get('price') or 0)
+            quantity = int(intent.get('quantity') or 0)
+
+            def reject(message):
+                rejected.append({'success': False, 'symbol': symbol, 'message': message})
+
+            if not symbol or side not in ('BUY', 'SELL'):
+                reject('无效的下单意图')
+            elif symbol in seen:
+                reject('同一批次内重复的股票')
+            elif price <= 0:
+                reject('报价无效')
+            elif side == 'BUY':
+                quantity = quantity or int(self.buy_amount / price)
+                if quantity <= 0:
+                    reject('买入数量不足')
+                elif symbol in holdings:
+                    reject('已持有该股票')
+                elif symbol in occupied:
+                    reject('该股票的买单尚未成交')
+                elif open_slots <= 0:
+                    reject(f'持仓数已达上限 {self.max_concurrent_positions}')
+                else:
+                    open_slots -= 1
+                    approved.append({**intent, 'side': side, 'quantity': quantity, 'price': price})
+            else:
+                held = holdings.get(symbol)
+                if not held:
+                    reject('无持仓可卖')
+                elif quantity > held['quantity']:
+                    reject(f"卖出数量超过持仓 {held['quantity']}")
+                else:
+                    approved.append({**intent, 'side': side, 'quantity': quantity or held['quantity'],
+                                     'price': price})
+            seen.add(symbol)
+
+        return approved, rejected
+
+    async def execute_batch(self, intents: list) -> dict:
+        """批量执行买入/卖出：统一风控后并发提交，交易记录一次写入"""
+        from .order_manager import order_manager
+        from .test_mode import test_mode_price_manager
+
+        try:
+            approved, rejected = self.check_batch_risk(intents)
+            results = []
+            if approved:
+                if is_test_mode():
+                    for intent in approved:
+                        if intent['side'] == 'BUY':
+                            test_mode_price_manager.set_price(intent['symbol'], intent['price'])
+                results = await order_manager.submit_batch(approved)
+
+            submitted = sum(1 for r in results if r.get('success'))
+            logger.info(f"批量下单: 提交 {submitted}/{len(intents)}, 风控拒绝 {len(rejected)}")
+            return {
+                'success': submitted > 0,
+                'submitted': submitted,
+                'rejected': len(intents) - submitted,
+                'orders': results + rejected
+            }
+        except Exception as e:
+            logger.error(f"批量下单失败: {e}")
+            return {'success': False, 'submitted': 0, 'rejected': len(intents), 'orders': [], 'message': str(e)}
+
     def get_positions(self) -> list:
         """获取当前持仓"""
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor(pymysql.cursors.DictCursor)
-            
             test_mode = 1 if is_test_mode() else 0
-            cursor.execute("""
-                SELECT * FROM positions WHERE quantity > 0 AND test_mode = %s
-            """, (test_mode,))
-            positions = cursor.fetchall()
-            
-            cursor.close()
-            conn.close()
-            
-            return positions
+            return position_ledger.holdings(test_mode)
         except Exception as e:
             logger.error(f"获取持仓失败: {e}")
             return []
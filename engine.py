@@ -0,0 +1,35 @@
+"""
+美股量化交易系统 - 交易引擎进程入口（多 worker 部署）
+引擎进程持有长桥连接、行情推送、监控、订单与调度等全部实时状态，通过 Unix socket 为 API worker 提供调用：
+    ENGINE_ROLE=engine python engine.py
+    ENGINE_ROLE=api uvicorn main:app --workers 4
+"""
+import asyncio
+import logging
+import signal
+
+# 配置日志
+logging.basicConfig(level=logging.INFO)
+
+from app.core.container import ROLE_ENGINE, ServiceContainer
+
+logger = logging.getLogger(__name__)
+
+
+async def main():
+    services = ServiceContainer(role=ROLE_ENGINE)
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stopping.set)
+
+    logger.info("交易引擎启动中...")
+    services.start()
+    await stopping.wait()
+
+    logger.info("交易引擎正在关闭...")
+    await services.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
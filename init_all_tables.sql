@@ -12,6 +12,15 @@ CREATE TABLE IF NOT EXISTS users (
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8 COLLATE=utf8_unicode_ci;
 
+-- 已注销的访问令牌（登出后在令牌过期前拒绝）
+CREATE TABLE IF NOT EXISTS revoked_tokens (
+    jti VARCHAR(32) PRIMARY KEY,
+    user_id INT,
+    expires_at DATETIME NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_expires_at (expires_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8 COLLATE=utf8_unicode_ci;
+
 -- 刷新令牌表
 CREATE TABLE IF NOT EXISTS refresh_tokens (
     id INT AUTO_INCREMENT PRIMARY KEY,
@@ -64,8 +73,10 @@ CREATE TABLE IF NOT EXISTS trades (
     trade_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     status VARCHAR(20) DEFAULT 'PENDING',
     message TEXT,
+    order_id VARCHAR(64) COMMENT '长桥订单ID',
     test_mode TINYINT DEFAULT 0 COMMENT '0=真实环境, 1=测试模式',
     INDEX idx_symbol (symbol),
+    UNIQUE KEY uk_order_id (order_id, test_mode),
     INDEX idx_test_mode (test_mode)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8 COLLATE=utf8_unicode_ci;
 
@@ -83,6 +94,7 @@ CREATE TABLE IF NOT EXISTS positions (
     current_price DECIMAL(10, 2),
     profit_loss DECIMAL(12, 2),
     profit_loss_pct DECIMAL(10, 2),
+    peak_price DECIMAL(10, 2) COMMENT '持仓期间最高价（移动止盈）',
     test_mode TINYINT DEFAULT 0 COMMENT '0=真实环境, 1=测试模式',
     UNIQUE KEY unique_symbol_mode (symbol, test_mode),
     INDEX idx_test_mode (test_mode)
@@ -100,7 +112,7 @@ CREATE TABLE IF NOT EXISTS system_config (
 -- 股票预测记录表
 CREATE TABLE IF NOT EXISTS stock_predictions (
     id INT AUTO_INCREMENT PRIMARY KEY,
-    symbol VARCHAR(10) NOT NULL,
+    symbol VARCHAR(30) NOT NULL,
     prediction_date DATE NOT NULL,
     predicted_return DECIMAL(10, 4) COMMENT '预测收益率(%)',
     confidence_score DECIMAL(5, 4) COMMENT '置信度(0-1)',
@@ -110,6 +122,7 @@ CREATE TABLE IF NOT EXISTS stock_predictions (
     llm_score DECIMAL(5, 2) COMMENT 'LLM预测得分',
     llm_recommendation VARCHAR(20) COMMENT 'LLM建议(buy/hold/sell)',
     llm_analysis TEXT COMMENT 'LLM分析内容',
+    hybrid_score DECIMAL(5, 2) COMMENT '混合得分（技术指标 + LLM，推荐排名依据）',
     actual_return DECIMAL(10, 4) COMMENT '实际收益率(%)',
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     UNIQUE KEY unique_prediction (symbol, prediction_date),
@@ -120,17 +133,52 @@ CREATE TABLE IF NOT EXISTS stock_predictions (
 -- 自动交易任务表
 CREATE TABLE IF NOT EXISTS auto_trade_tasks (
     id INT AUTO_INCREMENT PRIMARY KEY,
-    task_type VARCHAR(20) NOT NULL COMMENT 'OPEN_BUY=开盘买入, SMART_SELL=智能卖出',
+    task_type VARCHAR(20) NOT NULL COMMENT 'PREDICT=盘前预测, OPEN_BUY=开盘买入, SMART_SELL=智能卖出',
     symbol VARCHAR(10),
-    status VARCHAR(20) DEFAULT 'PENDING' COMMENT 'PENDING/RUNNING/COMPLETED/FAILED',
+    status VARCHAR(20) DEFAULT 'PENDING' COMMENT 'PENDING/RUNNING/COMPLETED/FAILED/SKIPPED/MISSED/NEEDS_REVIEW',
     scheduled_time DATETIME NOT NULL,
+    claimed_by VARCHAR(100) COMMENT '执行实例（主机:进程:随机后缀）',
+    claimed_at DATETIME COMMENT '抢占时间',
+    heartbeat_at DATETIME COMMENT '最后续约时间（租约过期视为执行中断）',
     executed_time DATETIME,
+    delay_ms INT COMMENT '实际执行时间相对计划时间的延迟（毫秒）',
     result TEXT,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     INDEX idx_status (status),
     INDEX idx_scheduled_time (scheduled_time)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8 COLLATE=utf8_unicode_ci;
 
+-- 长桥订单历史表（增量同步）
+CREATE TABLE IF NOT EXISTS orders (
+    order_id VARCHAR(40) PRIMARY KEY,
+    symbol VARCHAR(30) NOT NULL,
+    side VARCHAR(10) COMMENT 'Buy/Sell',
+    order_type VARCHAR(20),
+    status VARCHAR(20) COMMENT '长桥订单状态(Filled/Canceled/...)',
+    submitted_price DECIMAL(10, 4),
+    executed_price DECIMAL(10, 4),
+    submitted_quantity INT,
+    executed_quantity INT,
+    currency VARCHAR(10),
+    updated_at DATETIME NOT NULL COMMENT '订单最后更新时间（同步高水位）',
+    synced_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    INDEX idx_updated_at (updated_at),
+    INDEX idx_symbol_updated (symbol, updated_at),
+    INDEX idx_status_updated (status, updated_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8 COLLATE=utf8_unicode_ci;
+
+-- 持久化异步任务表（任务队列重启后恢复）
+CREATE TABLE IF NOT EXISTS async_tasks (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    name VARCHAR(100) NOT NULL COMMENT '注册的任务名称',
+    priority TINYINT DEFAULT 1 COMMENT '0=高, 1=普通, 2=低',
+    payload TEXT COMMENT '任务参数(JSON)',
+    status VARCHAR(20) DEFAULT 'PENDING' COMMENT 'PENDING/FAILED（成功后删除）',
+    error VARCHAR(1000),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_status (status)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8 COLLATE=utf8_unicode_ci;
+
 -- 历史K线数据缓存表
 CREATE TABLE IF NOT EXISTS stock_kline_cache (
     id INT AUTO_INCREMENT PRIMARY KEY,
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+认证开销基准测试
+对比每个已认证请求在 get_current_user 上的耗时：
+- JWT 解码（python-jose，每次校验签名）
+- 无缓存：解码 + 查询 users 表（每次请求）
+- 已认证用户缓存命中：令牌解码结果与用户记录均来自内存
+
+数据库默认用模拟连接，每次查询固定延迟 --db-latency-ms（本机 MySQL 通常 0.3~1ms，远程更高）；
+--real-db 时使用配置的 MySQL，--username 指定已存在的用户
+
+用法:
+    python scripts/benchmark_auth.py [--repeat 2000] [--db-latency-ms 0.5]
+    python scripts/benchmark_auth.py --real-db --username admin
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+# 添加项目路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from jose import jwt
+from starlette.requests import Request
+
+from app.auth import utils
+from app.config.settings import ALGORITHM, SECRET_KEY
+
+
+class SimulatedConnection:
+    """固定延迟的模拟数据库连接（users 查询返回一条用户记录）"""
+
+    def __init__(self, latency: float, username: str):
+        self.latency = latency
+        self.username = username
+        self.row = None
+
+    def cursor(self, *args):
+        return self
+
+    def execute(self, sql, params=()):
+        time.sleep(self.latency)
+        self.row = {'id': 1, 'username': self.username, 'password': 'x', 'is_active': 1} if 'FROM users' in sql else None
+
+    def fetchone(self):
+        return self.row
+
+    def fetchall(self):
+        return []
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def request_with(token: str) -> Request:
+    return Request({'type': 'http', 'headers': [(b'authorization', f'Bearer {token}'.encode())]})
+
+
+def reset_caches():
+    utils._token_cache.clear()
+    utils._user_cache.clear()
+
+
+async def bench(label: str, func, repeat: int) -> float:
+    """执行基准测试，返回每次耗时（微秒）"""
+    await func()
+    started = time.perf_counter()
+    for _ in range(repeat):
+        await func()
+    elapsed_us = (time.perf_counter() - started) * 1_000_000 / repeat
+    print(f"{label:<40} {elapsed_us:>12.1f} us/请求")
+    return elapsed_us
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="认证开销基准测试")
+    parser.add_argument('--repeat', type=int, default=2000, help='重复次数')
+    parser.add_argument('--db-latency-ms', type=float, default=0.5, help='模拟数据库单次查询延迟（毫秒）')
+    parser.add_argument('--real-db', action='store_true', help='使用配置的 MySQL')
+    parser.add_argument('--username', default='admin', help='令牌中的用户名（--real-db 时须已存在）')
+    parser.add_argument('--user-id', type=int, default=1, help='令牌中的用户ID')
+    args = parser.parse_args()
+
+    if not args.real_db:
+        latency = args.db_latency_ms / 1000
+        utils.get_db_connection = lambda: SimulatedConnection(latency, args.username)
+
+    token = utils.create_access_token({'sub': args.username, 'user_id': args.user_id})
+    request = request_with(token)
+
+    print("=" * 70)
+    print(f"认证开销基准测试: 重复 {args.repeat} 次, "
+          f"数据库: {'MySQL' if args.real_db else f'模拟（{args.db_latency_ms}ms/查询）'}")
+    print("=" * 70)
+
+    async def decode_only():
+        jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+
+    async def uncached():
+        reset_caches()
+        await utils.get_current_user(request, None)
+
+    async def cached():
+        await utils.get_current_user(request, None)
+
+    await bench("JWT 解码", decode_only, args.repeat)
+    uncached_us = await bench("无缓存（解码 + 查询用户）", uncached, args.repeat)
+    reset_caches()
+    cached_us = await bench("已认证用户缓存命中", cached, args.repeat)
+
+    print("-" * 70)
+    print(f"缓存命中加速: {uncached_us / cached_us:.0f}x")
+    print(f"仪表盘每标签页每 5 秒约 6 次认证请求，缓存时长 {utils.AUTH_USER_CACHE_TTL:.0f}s 内"
+          f"数据库查询由 {6 * utils.AUTH_USER_CACHE_TTL / 5:.0f} 次降为 1 次")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
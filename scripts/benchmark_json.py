@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+JSON 序列化基准测试
+对比 FastAPI 默认路径（jsonable_encoder + json.dumps）与 FastJSONResponse 在
+1000 行交易历史（DictCursor 行：Decimal/datetime）上的编码耗时与响应体大小
+
+用法:
+    python scripts/benchmark_json.py [--rows 1000] [--repeat 200]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+# 添加项目路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.core.serialization import FastJSONResponse, ORJSON_AVAILABLE
+
+
+def build_trade_rows(count: int) -> list:
+    """构造与 trades 表 DictCursor 结果一致的交易记录"""
+    symbols = ['AAPL', 'MSFT', 'GOOGL', 'AMZN', 'NVDA', 'META', 'TSLA', '00700.HK', '600519.SH']
+    start = datetime(2026, 1, 2, 9, 30)
+    rows = []
+    for i in range(count):
+        price = Decimal(f"{random.uniform(10, 1000):.2f}")
+        quantity = random.randint(1, 2000)
+        rows.append({
+            'id': i + 1,
+            'symbol': random.choice(symbols),
+            'action': random.choice(['BUY', 'SELL']),
+            'price': price,
+            'quantity': quantity,
+            'amount': (price * quantity).quantize(Decimal('0.01')),
+            'acceleration': Decimal(f"{random.uniform(-2, 2):.4f}"),
+            'trade_time': start + timedelta(minutes=i),
+            'status': 'FILLED',
+            'message': f'盈亏: ${random.uniform(-500, 500):.2f}',
+            'test_mode': 0,
+        })
+    return rows
+
+
+def bench(label: str, func, repeat: int) -> tuple:
+    """执行基准测试，返回 (每次耗时ms, 响应体字节数)"""
+    body = func()
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    elapsed_ms = (time.perf_counter() - started) * 1000 / repeat
+    print(f"{label:<40} {elapsed_ms:>10.3f} ms {len(body):>12,} bytes")
+    return elapsed_ms, len(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="JSON 序列化基准测试")
+    parser.add_argument('--rows', type=int, default=1000, help='交易记录行数')
+    parser.add_argument('--repeat', type=int, default=200, help='重复次数')
+    args = parser.parse_args()
+
+    random.seed(42)
+    payload = {"code": 0, "data": build_trade_rows(args.rows)}
+
+    print("=" * 70)
+    print(f"JSON 序列化基准测试: {args.rows} 行交易记录, 重复 {args.repeat} 次")
+    print(f"orjson 可用: {ORJSON_AVAILABLE}")
+    print("=" * 70)
+
+    baseline_ms, baseline_size = bench(
+        "jsonable_encoder + JSONResponse",
+        lambda: JSONResponse(jsonable_encoder(payload)).body,
+        args.repeat
+    )
+    bench(
+        "json.dumps(default=str)",
+        lambda: json.dumps(payload, ensure_ascii=False, default=str).encode('utf-8'),
+        args.repeat
+    )
+    fast_ms, fast_size = bench(
+        "FastJSONResponse",
+        lambda: FastJSONResponse(payload).body,
+        args.repeat
+    )
+
+    print("-" * 70)
+    print(f"编码加速: {baseline_ms / fast_ms:.1f}x, 响应体大小: {fast_size / baseline_size * 100:.1f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -56,7 +56,9 @@ def create_tables(cursor):
             trade_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             status VARCHAR(20) DEFAULT 'PENDING',
             message TEXT,
-            test_mode TINYINT DEFAULT 0 COMMENT '0=真实环境, 1=测试模式'
+            order_id VARCHAR(64) COMMENT '长桥订单ID',
+            test_mode TINYINT DEFAULT 0 COMMENT '0=真实环境, 1=测试模式',
+            UNIQUE KEY uk_order_id (order_id, test_mode)
         ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
     """)
 
@@ -74,6 +76,7 @@ def create_tables(cursor):
             current_price DECIMAL(10, 2),
             profit_loss DECIMAL(12, 2),
             profit_loss_pct DECIMAL(10, 2),
+            peak_price DECIMAL(10, 2) COMMENT '持仓期间最高价（移动止盈）',
             test_mode TINYINT DEFAULT 0 COMMENT '0=真实环境, 1=测试模式'
         ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
     """)
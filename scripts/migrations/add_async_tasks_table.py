@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+新建 async_tasks 表
+任务队列中注册为持久化的任务写入该表，停止或重启后重新加载执行
+"""
+
+import pymysql
+import os
+
+# 数据库配置
+DB_CONFIG = {
+    'host': os.getenv('MYSQL_HOST', '127.0.0.1'),
+    'port': int(os.getenv('MYSQL_PORT', 3306)),
+    'user': os.getenv('MYSQL_USER', 'root'),
+    'password': os.getenv('MYSQL_PASSWORD', '123456'),
+    'database': os.getenv('MYSQL_DB', 'quant_system'),
+    'charset': 'utf8mb4'
+}
+
+def add_async_tasks_table():
+    """新建async_tasks表"""
+    try:
+        conn = pymysql.connect(**DB_CONFIG)
+        cursor = conn.cursor()
+        
+        print("新建async_tasks表...")
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS async_tasks (
+                id BIGINT AUTO_INCREMENT PRIMARY KEY,
+                name VARCHAR(100) NOT NULL COMMENT '注册的任务名称',
+                priority TINYINT DEFAULT 1 COMMENT '0=高, 1=普通, 2=低',
+                payload TEXT COMMENT '任务参数(JSON)',
+                status VARCHAR(20) DEFAULT 'PENDING' COMMENT 'PENDING/FAILED（成功后删除）',
+                error VARCHAR(1000),
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                INDEX idx_status (status)
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8 COLLATE=utf8_unicode_ci
+        """)
+        conn.commit()
+        print("   ✓ async_tasks表创建成功")
+        
+        cursor.close()
+        conn.close()
+        
+    except pymysql.Error as e:
+        print(f"❌ 数据库错误: {e}")
+    except Exception as e:
+        print(f"❌ 错误: {e}")
+
+if __name__ == "__main__":
+    add_async_tasks_table()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+新建 orders 表
+保存长桥订单历史：首次启动回填最近 90 天，之后按 updated_at 高水位增量同步
+"""
+
+import pymysql
+import os
+
+# 数据库配置
+DB_CONFIG = {
+    'host': os.getenv('MYSQL_HOST', '127.0.0.1'),
+    'port': int(os.getenv('MYSQL_PORT', 3306)),
+    'user': os.getenv('MYSQL_USER', 'root'),
+    'password': os.getenv('MYSQL_PASSWORD', '123456'),
+    'database': os.getenv('MYSQL_DB', 'quant_system'),
+    'charset': 'utf8mb4'
+}
+
+def add_orders_table():
+    """新建orders表"""
+    try:
+        conn = pymysql.connect(**DB_CONFIG)
+        cursor = conn.cursor()
+        
+        print("新建orders表...")
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS orders (
+                order_id VARCHAR(40) PRIMARY KEY,
+                symbol VARCHAR(30) NOT NULL,
+                side VARCHAR(10) COMMENT 'Buy/Sell',
+                order_type VARCHAR(20),
+                status VARCHAR(20) COMMENT '长桥订单状态(Filled/Canceled/...)',
+                submitted_price DECIMAL(10, 4),
+                executed_price DECIMAL(10, 4),
+                submitted_quantity INT,
+                executed_quantity INT,
+                currency VARCHAR(10),
+                updated_at DATETIME NOT NULL COMMENT '订单最后更新时间（同步高水位）',
+                synced_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+                INDEX idx_updated_at (updated_at),
+                INDEX idx_symbol_updated (symbol, updated_at),
+                INDEX idx_status_updated (status, updated_at)
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8 COLLATE=utf8_unicode_ci
+        """)
+        conn.commit()
+        print("   ✓ orders表创建成功")
+        
+        cursor.close()
+        conn.close()
+        
+    except pymysql.Error as e:
+        print(f"❌ 数据库错误: {e}")
+    except Exception as e:
+        print(f"❌ 错误: {e}")
+
+if __name__ == "__main__":
+    add_orders_table()
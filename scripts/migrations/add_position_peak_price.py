@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+为 positions 表添加 peak_price 字段
+止盈止损引擎记录持仓期间最高价，重启后恢复移动止盈线
+"""
+
+import pymysql
+import os
+
+# 数据库配置
+DB_CONFIG = {
+    'host': os.getenv('MYSQL_HOST', '127.0.0.1'),
+    'port': int(os.getenv('MYSQL_PORT', 3306)),
+    'user': os.getenv('MYSQL_USER', 'root'),
+    'password': os.getenv('MYSQL_PASSWORD', '123456'),
+    'database': os.getenv('MYSQL_DB', 'quant_system'),
+    'charset': 'utf8mb4'
+}
+
+def add_position_peak_price():
+    """为positions表添加peak_price字段"""
+    try:
+        conn = pymysql.connect(**DB_CONFIG)
+        cursor = conn.cursor()
+        
+        print("为positions表添加peak_price字段...")
+        cursor.execute("""
+            ALTER TABLE positions 
+            ADD COLUMN peak_price DECIMAL(10, 2) COMMENT '持仓期间最高价（移动止盈）' AFTER profit_loss_pct
+        """)
+        conn.commit()
+        print("   ✓ positions表字段添加成功")
+        
+        cursor.close()
+        conn.close()
+        
+    except pymysql.Error as e:
+        if "Duplicate column name" in str(e):
+            print("⚠️  字段已存在，无需重复添加")
+        else:
+            print(f"❌ 数据库错误: {e}")
+    except Exception as e:
+        print(f"❌ 错误: {e}")
+
+if __name__ == "__main__":
+    add_position_peak_price()
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+为 stock_predictions 表添加 hybrid_score 字段
+保存技术指标与 LLM 加权后的混合得分，推荐买入按该得分排名
+"""
+
+import pymysql
+import os
+
+# 数据库配置
+DB_CONFIG = {
+    'host': os.getenv('MYSQL_HOST', '127.0.0.1'),
+    'port': int(os.getenv('MYSQL_PORT', 3306)),
+    'user': os.getenv('MYSQL_USER', 'root'),
+    'password': os.getenv('MYSQL_PASSWORD', '123456'),
+    'database': os.getenv('MYSQL_DB', 'quant_system'),
+    'charset': 'utf8mb4'
+}
+
+def add_prediction_hybrid_score():
+    """为stock_predictions表添加hybrid_score字段"""
+    try:
+        conn = pymysql.connect(**DB_CONFIG)
+        cursor = conn.cursor()
+        
+        print("为stock_predictions表添加hybrid_score字段...")
+        cursor.execute("""
+            ALTER TABLE stock_predictions 
+            ADD COLUMN hybrid_score DECIMAL(5, 2) COMMENT '混合得分（技术指标 + LLM，推荐排名依据）' AFTER llm_analysis
+        """)
+        conn.commit()
+        print("   ✓ stock_predictions表字段添加成功")
+        
+        cursor.close()
+        conn.close()
+        
+    except pymysql.Error as e:
+        if "Duplicate column name" in str(e):
+            print("⚠️  字段已存在，无需重复添加")
+        else:
+            print(f"❌ 数据库错误: {e}")
+    except Exception as e:
+        print(f"❌ 错误: {e}")
+
+if __name__ == "__main__":
+    add_prediction_hybrid_score()
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+新建 revoked_tokens 表
+记录登出时注销的访问令牌（jti），各进程在已认证用户缓存过期后据此拒绝该令牌
+"""
+
+import pymysql
+import os
+
+# 数据库配置
+DB_CONFIG = {
+    'host': os.getenv('MYSQL_HOST', '127.0.0.1'),
+    'port': int(os.getenv('MYSQL_PORT', 3306)),
+    'user': os.getenv('MYSQL_USER', 'root'),
+    'password': os.getenv('MYSQL_PASSWORD', '123456'),
+    'database': os.getenv('MYSQL_DB', 'quant_system'),
+    'charset': 'utf8mb4'
+}
+
+def add_revoked_tokens_table():
+    """新建revoked_tokens表"""
+    try:
+        conn = pymysql.connect(**DB_CONFIG)
+        cursor = conn.cursor()
+        
+        print("新建revoked_tokens表...")
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS revoked_tokens (
+                jti VARCHAR(32) PRIMARY KEY,
+                user_id INT,
+                expires_at DATETIME NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                INDEX idx_expires_at (expires_at)
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8 COLLATE=utf8_unicode_ci
+        """)
+        conn.commit()
+        print("   ✓ revoked_tokens表创建成功")
+        
+        cursor.close()
+        conn.close()
+        
+    except pymysql.Error as e:
+        print(f"❌ 数据库错误: {e}")
+    except Exception as e:
+        print(f"❌ 错误: {e}")
+
+if __name__ == "__main__":
+    add_revoked_tokens_table()
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+为 auto_trade_tasks 表添加 delay_ms 字段
+记录盘前预测、开盘买入等任务实际执行时间相对计划时间的延迟
+"""
+
+import pymysql
+import os
+
+# 数据库配置
+DB_CONFIG = {
+    'host': os.getenv('MYSQL_HOST', '127.0.0.1'),
+    'port': int(os.getenv('MYSQL_PORT', 3306)),
+    'user': os.getenv('MYSQL_USER', 'root'),
+    'password': os.getenv('MYSQL_PASSWORD', '123456'),
+    'database': os.getenv('MYSQL_DB', 'quant_system'),
+    'charset': 'utf8mb4'
+}
+
+def add_task_delay_ms():
+    """为auto_trade_tasks表添加delay_ms字段"""
+    try:
+        conn = pymysql.connect(**DB_CONFIG)
+        cursor = conn.cursor()
+        
+        print("为auto_trade_tasks表添加delay_ms字段...")
+        cursor.execute("""
+            ALTER TABLE auto_trade_tasks 
+            ADD COLUMN delay_ms INT COMMENT '实际执行时间相对计划时间的延迟（毫秒）' AFTER executed_time
+        """)
+        conn.commit()
+        print("   ✓ auto_trade_tasks表字段添加成功")
+        
+        cursor.close()
+        conn.close()
+        
+    except pymysql.Error as e:
+        if "Duplicate column name" in str(e):
+            print("⚠️  字段已存在，无需重复添加")
+        else:
+            print(f"❌ 数据库错误: {e}")
+    except Exception as e:
+        print(f"❌ 错误: {e}")
+
+if __name__ == "__main__":
+    add_task_delay_ms()
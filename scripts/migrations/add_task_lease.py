@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+为 auto_trade_tasks 表添加 claimed_by / claimed_at / heartbeat_at 字段
+记录抢占任务的执行实例和租约心跳，只恢复租约已过期的中断任务
+"""
+
+import pymysql
+import os
+
+# 数据库配置
+DB_CONFIG = {
+    'host': os.getenv('MYSQL_HOST', '127.0.0.1'),
+    'port': int(os.getenv('MYSQL_PORT', 3306)),
+    'user': os.getenv('MYSQL_USER', 'root'),
+    'password': os.getenv('MYSQL_PASSWORD', '123456'),
+    'database': os.getenv('MYSQL_DB', 'quant_system'),
+    'charset': 'utf8mb4'
+}
+
+def add_task_lease():
+    """为auto_trade_tasks表添加任务租约字段"""
+    try:
+        conn = pymysql.connect(**DB_CONFIG)
+        cursor = conn.cursor()
+        
+        print("为auto_trade_tasks表添加任务租约字段...")
+        cursor.execute("""
+            ALTER TABLE auto_trade_tasks 
+            ADD COLUMN claimed_by VARCHAR(100) COMMENT '执行实例（主机:进程:随机后缀）' AFTER scheduled_time,
+            ADD COLUMN claimed_at DATETIME COMMENT '抢占时间' AFTER claimed_by,
+            ADD COLUMN heartbeat_at DATETIME COMMENT '最后续约时间（租约过期视为执行中断）' AFTER claimed_at
+        """)
+        conn.commit()
+        print("   ✓ auto_trade_tasks表字段添加成功")
+        
+        cursor.close()
+        conn.close()
+        
+    except pymysql.Error as e:
+        if "Duplicate column name" in str(e):
+            print("⚠️  字段已存在，无需重复添加")
+        else:
+            print(f"❌ 数据库错误: {e}")
+    except Exception as e:
+        print(f"❌ 错误: {e}")
+
+if __name__ == "__main__":
+    add_task_lease()
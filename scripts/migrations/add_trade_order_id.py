@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+为 trades 表添加 order_id 字段
+订单管理器按长桥订单ID把成交回报（部分成交/全部成交）更新到对应的交易记录
+"""
+
+import pymysql
+import os
+
+# 数据库配置
+DB_CONFIG = {
+    'host': os.getenv('MYSQL_HOST', '127.0.0.1'),
+    'port': int(os.getenv('MYSQL_PORT', 3306)),
+    'user': os.getenv('MYSQL_USER', 'root'),
+    'password': os.getenv('MYSQL_PASSWORD', '123456'),
+    'database': os.getenv('MYSQL_DB', 'quant_system'),
+    'charset': 'utf8mb4'
+}
+
+def add_trade_order_id():
+    """为trades表添加order_id字段和索引"""
+    try:
+        conn = pymysql.connect(**DB_CONFIG)
+        cursor = conn.cursor()
+        
+        print("为trades表添加order_id字段...")
+        cursor.execute("""
+            ALTER TABLE trades 
+            ADD COLUMN order_id VARCHAR(64) COMMENT '长桥订单ID' AFTER message,
+            ADD INDEX idx_order_id (order_id)
+        """)
+        conn.commit()
+        print("   ✓ trades表字段添加成功")
+        
+        cursor.close()
+        conn.close()
+        
+    except pymysql.Error as e:
+        if "Duplicate column name" in str(e):
+            print("⚠️  字段已存在，无需重复添加")
+        else:
+            print(f"❌ 数据库错误: {e}")
+    except Exception as e:
+        print(f"❌ 错误: {e}")
+
+if __name__ == "__main__":
+    add_trade_order_id()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+trades 表的 order_id 普通索引改为 (order_id, test_mode) 唯一键
+成交落库与重试按订单号 upsert：提交时的交易记录写入失败时由重试补插，不会重复插入
+"""
+
+import pymysql
+import os
+
+# 数据库配置
+DB_CONFIG = {
+    'host': os.getenv('MYSQL_HOST', '127.0.0.1'),
+    'port': int(os.getenv('MYSQL_PORT', 3306)),
+    'user': os.getenv('MYSQL_USER', 'root'),
+    'password': os.getenv('MYSQL_PASSWORD', '123456'),
+    'database': os.getenv('MYSQL_DB', 'quant_system'),
+    'charset': 'utf8mb4'
+}
+
+def add_trade_order_unique():
+    """为trades表添加订单号唯一键"""
+    try:
+        conn = pymysql.connect(**DB_CONFIG)
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            SELECT order_id, test_mode, COUNT(*) AS n FROM trades
+            WHERE order_id IS NOT NULL GROUP BY order_id, test_mode HAVING n > 1
+        """)
+        duplicates = cursor.fetchall()
+        if duplicates:
+            print(f"❌ 存在 {len(duplicates)} 个重复的订单号，请先人工合并后再执行: {duplicates[:5]}")
+            cursor.close()
+            conn.close()
+            return
+        
+        print("为trades表添加订单号唯一键...")
+        cursor.execute("""
+            ALTER TABLE trades 
+            DROP INDEX idx_order_id,
+            ADD UNIQUE KEY uk_order_id (order_id, test_mode)
+        """)
+        conn.commit()
+        print("   ✓ trades表唯一键添加成功")
+        
+        cursor.close()
+        conn.close()
+        
+    except pymysql.Error as e:
+        if "Duplicate key name" in str(e):
+            print("⚠️  唯一键已存在，无需重复添加")
+        else:
+            print(f"❌ 数据库错误: {e}")
+    except Exception as e:
+        print(f"❌ 错误: {e}")
+
+if __name__ == "__main__":
+    add_trade_order_unique()
@@ -3,6 +3,7 @@
 """
 import pytest
 import sys
+from datetime import datetime, timedelta
 from pathlib import Path
 
 # 添加项目根目录到Python路径
@@ -78,3 +79,180 @@ class TestAuthUtils:
         
         # 算法应该是有效的JWT算法
         assert ALGORITHM in ['HS256', 'HS384', 'HS512', 'RS256', 'RS384', 'RS512']
+
+
+class FakeUserDB:
+    """记录查询次数的模拟 users / revoked_tokens 表"""
+
+    def __init__(self):
+        self.users = {(1, 'alice'): {'id': 1, 'username': 'alice', 'password': 'hash', 'is_active': 1}}
+        self.revoked = {}  # {jti: 过期时间（UTC）}
+        self.connections = 0
+        self.closed = 0
+        self.inserted = []
+        self.purged = 0
+        self.fail = False
+
+    def __call__(self):
+        self.connections += 1
+        return FakeConnection(self)
+
+
+class FakeConnection:
+    def __init__(self, db):
+        self.db = db
+
+    def cursor(self, *args):
+        return FakeCursor(self.db)
+
+    def commit(self):
+        pass
+
+    def close(self):
+        self.db.closed += 1
+
+
+class FakeCursor:
+    def __init__(self, db):
+        self.db = db
+        self.row = None
+        self.rows = []
+
+    def execute(self, sql, params=()):
+        if self.db.fail:
+            raise RuntimeError('db down')
+        if 'FROM users' in sql:
+            user = self.db.users.get(tuple(params))
+            self.row = dict(user) if user else None
+        elif 'SELECT jti, expires_at FROM revoked_tokens' in sql:
+            self.rows = [{'jti': jti, 'expires_at': exp} for jti, exp in self.db.revoked.items() if exp > params[0]]
+        elif 'INSERT IGNORE INTO revoked_tokens' in sql:
+            self.db.inserted.append(params[0])
+        elif 'DELETE FROM revoked_tokens' in sql:
+            self.db.purged += 1
+
+    def fetchone(self):
+        return self.row
+
+    def fetchall(self):
+        return self.rows
+
+    def close(self):
+        pass
+
+
+class TestPrincipalCache:
+    """已认证用户缓存与令牌注销"""
+
+    @pytest.fixture
+    def auth(self, monkeypatch):
+        from app.auth import utils
+
+        db = FakeUserDB()
+        monkeypatch.setattr(utils, 'get_db_connection', db)
+        monkeypatch.setattr(utils, '_token_cache', {})
+        monkeypatch.setattr(utils, '_user_cache', {})
+        monkeypatch.setattr(utils, '_revoked_tokens', {})
+        monkeypatch.setattr(utils, '_revoked_refresh', {'next_at': float('inf')})  # 需要时由测试触发刷新
+        return utils, db
+
+    @staticmethod
+    def _request(token):
+        from starlette.requests import Request
+        return Request({'type': 'http', 'headers': [(b'authorization', f'Bearer {token}'.encode())]})
+
+    @pytest.mark.asyncio
+    async def test_cached_user_skips_database(self, auth):
+        utils, db = auth
+        token = utils.create_access_token({'sub': 'alice', 'user_id': 1})
+
+        first = await utils.get_current_user(self._request(token), None)
+        second = await utils.get_current_user(self._request(token), None)
+
+        assert first == second == {'id': 1, 'username': 'alice', 'is_active': 1}
+        assert db.connections == 1
+        second['username'] = 'changed'  # 调用方修改不影响缓存
+        assert (await utils.get_current_user(self._request(token), None))['username'] == 'alice'
+        assert utils.get_auth_cache_stats()['users'] == 1
+
+    @pytest.mark.asyncio
+    async def test_invalidate_and_ttl(self, auth, monkeypatch):
+        utils, db = auth
+        token = utils.create_access_token({'sub': 'alice', 'user_id': 1})
+        await utils.get_current_user(self._request(token), None)
+
+        utils.invalidate_user_cache(1)
+        await utils.get_current_user(self._request(token), None)
+        assert db.connections == 2
+
+        monkeypatch.setattr(utils, 'AUTH_USER_CACHE_TTL', 0.0)
+        utils.invalidate_user_cache()
+        await utils.get_current_user(self._request(token), None)
+        await utils.get_current_user(self._request(token), None)
+        assert db.connections == 4
+
+    @pytest.mark.asyncio
+    async def test_revoked_token_rejected_despite_cache(self, auth):
+        from fastapi import HTTPException
+
+        utils, db = auth
+        token = utils.create_access_token({'sub': 'alice', 'user_id': 1})
+        other = utils.create_access_token({'sub': 'alice', 'user_id': 1})
+        await utils.get_current_user(self._request(token), None)
+
+        await utils.revoke_token(token)
+        assert len(db.inserted) == 1
+        assert db.purged == 1  # 顺带清理已过期的注销记录
+        with pytest.raises(HTTPException):
+            await utils.get_current_user(self._request(token), None)
+        # 同一用户的其他令牌不受影响
+        assert (await utils.get_current_user(self._request(other), None))['id'] == 1
+
+    @pytest.mark.asyncio
+    async def test_token_revoked_by_another_process(self, auth):
+        from fastapi import HTTPException
+        from jose import jwt
+
+        utils, db = auth
+        token = utils.create_access_token({'sub': 'alice', 'user_id': 1})
+        other = utils.create_access_token({'sub': 'alice', 'user_id': 1})
+        await utils.get_current_user(self._request(token), None)
+
+        # 其他进程注销该令牌；同一用户的另一会话持续刷新用户缓存
+        db.revoked[jwt.get_unverified_claims(token)['jti']] = datetime.utcnow() + timedelta(minutes=5)
+        db.revoked['expired'] = datetime.utcnow() - timedelta(minutes=5)
+        utils._revoked_refresh['next_at'] = 0.0
+        hits = utils.get_auth_cache_stats()['hits']
+        await utils.get_current_user(self._request(other), None)
+
+        with pytest.raises(HTTPException):
+            await utils.get_current_user(self._request(token), None)
+        assert set(utils._revoked_tokens) == {jwt.get_unverified_claims(token)['jti']}
+        assert db.connections == 2  # 一次用户查询 + 一次注销列表刷新
+        assert utils.get_auth_cache_stats()['hits'] == hits + 1  # 另一会话命中用户缓存
+
+    @pytest.mark.asyncio
+    async def test_revoke_write_failure_closes_connection(self, auth):
+        from fastapi import HTTPException
+
+        utils, db = auth
+        token = utils.create_access_token({'sub': 'alice', 'user_id': 1})
+        db.fail = True
+
+        await utils.revoke_token(token)
+        assert db.closed == db.connections == 1
+        db.fail = False
+        with pytest.raises(HTTPException):
+            await utils.get_current_user(self._request(token), None)  # 本进程仍拒绝
+
+    @pytest.mark.asyncio
+    async def test_unknown_user_and_bad_token(self, auth):
+        from fastapi import HTTPException
+
+        utils, db = auth
+        with pytest.raises(HTTPException):
+            await utils.get_current_user(self._request('not-a-jwt'), None)
+        token = utils.create_access_token({'sub': 'bob', 'user_id': 2})
+        with pytest.raises(HTTPException):
+            await utils.get_current_user(self._request(token), None)
+        assert utils.get_auth_cache_stats()['users'] == 0
@@ -0,0 +1,143 @@
+"""
+长桥连接守护单元测试
+"""
+import pytest
+import sys
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from app.services.connection_supervisor import ConnectionSupervisor, STATE_CONNECTED, STATE_MOCK
+from app.services.longbridge_sdk import LongBridgeSDK
+
+supervisor_module = sys.modules['app.services.connection_supervisor']
+sdk_module = sys.modules['app.services.longbridge_sdk']
+
+
+class FlakySDK:
+    """前 failures 次连接失败的模拟 SDK"""
+
+    def __init__(self, failures=0, healthy=True):
+        self.use_real_sdk = True
+        self.is_connected = False
+        self.last_error = None
+        self.failures = failures
+        self.healthy = healthy
+        self.connects = 0
+
+    async def connect(self):
+        self.connects += 1
+        if self.connects <= self.failures:
+            self.last_error = 'network down'
+            return False
+        self.is_connected = True
+        self.last_error = None
+        return True
+
+    async def heartbeat(self, timeout=5.0):
+        if not self.healthy:
+            self.last_error = 'timeout'
+        return self.healthy
+
+    def mark_disconnected(self, reason):
+        self.is_connected = False
+
+
+@pytest.fixture
+def no_sleep(monkeypatch):
+    delays = []
+
+    async def fake_sleep(delay):
+        delays.append(delay)
+
+    monkeypatch.setattr(supervisor_module.asyncio, 'sleep', fake_sleep)
+    return delays
+
+
+@pytest.fixture
+def quiet_mux(monkeypatch):
+    async def flush():
+        pass
+
+    monkeypatch.setattr(sys.modules['app.services.quote_mux'].quote_mux, 'flush', flush)
+
+
+class TestConnectionSupervisor:
+    """退避重连与心跳"""
+
+    def test_backoff_grows_and_is_capped(self):
+        supervisor = ConnectionSupervisor(backoff_base=1.0, backoff_max=8.0)
+        for attempt, ceiling in [(0, 1.0), (2, 4.0), (10, 8.0)]:
+            delay = supervisor.backoff_delay(attempt)
+            assert ceiling * 0.5 <= delay <= ceiling
+
+    @pytest.mark.asyncio
+    async def test_retries_until_connected(self, monkeypatch, no_sleep, quiet_mux):
+        sdk = FlakySDK(failures=3)
+        monkeypatch.setattr(sdk_module, 'longbridge_sdk', sdk)
+        supervisor = ConnectionSupervisor(backoff_base=1.0, backoff_max=60.0)
+
+        await supervisor.check()
+
+        assert sdk.connects == 4
+        assert len(no_sleep) == 3
+        assert supervisor.state == STATE_CONNECTED
+        assert sdk.use_real_sdk  # 不切换到模拟模式
+        stats = supervisor.get_stats()
+        assert stats['reconnects'] == 1
+        assert stats['reconnect_ms']['last'] is not None
+        assert [t['to'] for t in stats['transitions']] == ['RECONNECTING', 'CONNECTED']
+
+    @pytest.mark.asyncio
+    async def test_failed_heartbeat_triggers_reconnect(self, monkeypatch, no_sleep, quiet_mux):
+        sdk = FlakySDK(healthy=False)
+        sdk.is_connected = True
+        monkeypatch.setattr(sdk_module, 'longbridge_sdk', sdk)
+        supervisor = ConnectionSupervisor()
+
+        await supervisor.check()
+
+        assert supervisor.heartbeat_failures == 1
+        assert sdk.connects == 1
+        assert supervisor.state == STATE_CONNECTED
+
+    @pytest.mark.asyncio
+    async def test_mock_mode_not_supervised(self, monkeypatch):
+        sdk = FlakySDK()
+        sdk.use_real_sdk = False
+        monkeypatch.setattr(sdk_module, 'longbridge_sdk', sdk)
+        supervisor = ConnectionSupervisor()
+
+        await supervisor.check()
+
+        assert supervisor.state == STATE_MOCK
+        assert sdk.connects == 0
+
+
+class TestNoMockDowngrade:
+    """真实模式断线时不返回模拟数据"""
+
+    @pytest.fixture
+    def disconnected_sdk(self, monkeypatch):
+        monkeypatch.setattr(sdk_module, 'is_test_mode', lambda: False)
+        sdk = LongBridgeSDK({})
+        sdk.use_real_sdk = True
+        sdk.last_error = 'network down'
+        return sdk
+
+    @pytest.mark.asyncio
+    async def test_order_rejected(self, disconnected_sdk):
+        result = await disconnected_sdk.submit_order('AAPL', 'BUY', 10)
+        assert result['success'] is False
+        assert 'network down' in result['message']
+
+    @pytest.mark.asyncio
+    async def test_balance_raises(self, disconnected_sdk):
+        with pytest.raises(ConnectionError):
+            await disconnected_sdk.get_account_balance()
+
+    @pytest.mark.asyncio
+    async def test_klines_empty(self, disconnected_sdk):
+        assert await disconnected_sdk.get_stock_history('AAPL') == []
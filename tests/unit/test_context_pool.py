@@ -0,0 +1,185 @@
+"""
+多用户长桥连接池单元测试
+"""
+import asyncio
+import pytest
+import sys
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from app.services.context_pool import (LongBridgeContextPool, LongBridgeNotConfigured, LongBridgePoolExhausted,
+                                      credential_key)
+
+pool_module = sys.modules['app.services.context_pool']
+sdk_module = sys.modules['app.services.longbridge_sdk']
+
+
+class FakeSDK:
+    """记录连接/关闭的模拟 SDK；gates 中对应凭证的连接在放行前一直等待"""
+
+    gates = {}
+
+    def __init__(self, config):
+        self.config = config
+        self.connects = 0
+        self.closed = False
+        self.is_connected = False
+
+    async def connect(self):
+        self.connects += 1
+        gate = self.gates.get(self.config['app_key'])
+        if gate is not None:
+            await gate.wait()
+        self.is_connected = True
+        return True
+
+    def close(self):
+        self.closed = True
+        self.is_connected = False
+
+
+USER_CONFIGS = {
+    1: {'app_key': 'k1', 'app_secret': 's1', 'access_token': 't1'},
+    2: {'app_key': 'k1', 'app_secret': 's1', 'access_token': 't1'},  # 与用户 1 凭证相同
+    3: {'app_key': 'k3', 'app_secret': 's3', 'access_token': 't3'},
+    4: {'app_key': '', 'app_secret': '', 'access_token': ''},
+}
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setattr(pool_module, 'load_user_longbridge_config', lambda user_id: dict(USER_CONFIGS[user_id]))
+    monkeypatch.setattr(pool_module, 'LONGBRIDGE_CONFIG', {'app_key': '', 'app_secret': '', 'access_token': ''})
+    monkeypatch.setattr(sdk_module, 'longbridge_sdk', 'default-sdk')
+    monkeypatch.setattr(FakeSDK, 'gates', {})
+    return LongBridgeContextPool(max_contexts=1, idle_timeout=60, sdk_factory=FakeSDK, wait_timeout=0.05)
+
+
+class TestContextPool:
+    """按凭证共享、淘汰"""
+
+    def test_credential_key_requires_full_credentials(self):
+        assert credential_key({'app_key': 'k', 'app_secret': 's'}) is None
+        assert credential_key(USER_CONFIGS[1]) == credential_key(USER_CONFIGS[2])
+
+    @pytest.mark.asyncio
+    async def test_shared_by_matching_credentials(self, pool):
+        sdk1 = await pool.get(1)
+        sdk2 = await pool.get(2)
+        assert sdk1 is sdk2
+        assert sdk1.connects == 1
+        assert pool.get_stats()['users'] == 2
+
+    @pytest.mark.asyncio
+    async def test_unconfigured_user_uses_default(self, pool, monkeypatch):
+        monkeypatch.setattr(pool_module, 'LONGBRIDGE_CONFIG', {'app_key': 'ks', 'app_secret': 'ss', 'access_token': 'ts'})
+        assert await pool.get(4) == 'default-sdk'
+        assert pool.get_stats()['contexts'] == 0
+
+    @pytest.mark.asyncio
+    async def test_unconfigured_without_system_credentials(self, pool):
+        """测试用户和系统都未配置凭证时返回未配置，不借用其他用户的凭证"""
+        await pool.get(1)
+        with pytest.raises(LongBridgeNotConfigured):
+            await pool.get(4)
+        assert (await pool.status(4))['configured'] is False
+
+    @pytest.mark.asyncio
+    async def test_lru_eviction_at_limit(self, pool):
+        sdk1 = await pool.get(1)
+        sdk3 = await pool.get(3)
+        assert sdk1.closed and not sdk3.closed
+        assert pool.evictions == 1
+        # 被淘汰的凭证再次使用时重新创建
+        assert (await pool.get(1)) is not sdk1
+
+    @pytest.mark.asyncio
+    async def test_idle_contexts_closed(self, pool):
+        sdk1 = await pool.get(1)
+        pool.idle_timeout = 0
+        assert pool._evict_idle() == 1
+        assert sdk1.closed
+
+    @pytest.mark.asyncio
+    async def test_stop_closes_all(self, pool):
+        sdk1 = await pool.get(1)
+        await pool.stop()
+        assert sdk1.closed
+        assert pool.get_stats()['contexts'] == 0
+
+    @pytest.mark.asyncio
+    async def test_in_use_context_not_evicted(self, pool):
+        """测试全部连接都在使用时不超出上限：等待超时返回连接池已满，使用中的连接不受影响"""
+        async with pool.use(1) as sdk1:
+            with pytest.raises(LongBridgePoolExhausted):
+                await pool.get(3)
+            assert not sdk1.closed and sdk1.is_connected
+            assert pool.get_stats()['contexts'] == 1
+        assert pool.exhausted == 1
+        assert pool.evictions == 0
+
+    @pytest.mark.asyncio
+    async def test_waits_for_released_context(self, pool):
+        """测试等待中的请求在连接释放后淘汰该连接并新建自己的连接"""
+        pool.wait_timeout = 5
+        await pool.status(3)  # 预先加载凭证，下面的请求直接进入等待
+        async with pool.use(1) as sdk1:
+            waiter = asyncio.create_task(pool.get(3))
+            await asyncio.sleep(0)
+            assert not waiter.done()
+        sdk3 = await waiter
+        assert sdk1.closed and sdk3.is_connected
+        assert pool.get_stats()['contexts'] == 1
+        assert pool.waits == 1
+
+    @pytest.mark.asyncio
+    async def test_slow_connect_does_not_block_other_credentials(self, pool):
+        """测试连接在锁外进行：一个凭证连接慢时其他凭证照常新建，连接中的名额也计入上限"""
+        pool.max_contexts = 2
+        gate = asyncio.Event()
+        FakeSDK.gates['k1'] = gate
+        await pool.status(1)
+        slow = asyncio.create_task(pool.get(1))
+        await asyncio.sleep(0)
+        sdk3 = await pool.get(3)
+        assert sdk3.is_connected and not slow.done()
+        assert pool.get_stats()['connecting'] == 1
+        gate.set()
+        sdk1 = await slow
+        assert sdk1.is_connected
+        assert pool.get_stats()['contexts'] == 2
+
+    @pytest.mark.asyncio
+    async def test_concurrent_requests_share_one_connect(self, pool):
+        """测试同一凭证的并发请求共享同一次连接"""
+        gate = asyncio.Event()
+        FakeSDK.gates['k1'] = gate
+        await pool.status(1)
+        await pool.status(2)
+        first = asyncio.create_task(pool.get(1))
+        second = asyncio.create_task(pool.get(2))
+        await asyncio.sleep(0)
+        gate.set()
+        sdk1, sdk2 = await asyncio.gather(first, second)
+        assert sdk1 is sdk2
+        assert sdk1.connects == 1
+        assert pool.misses == 1 and pool.hits == 1
+
+    @pytest.mark.asyncio
+    async def test_idle_eviction_skips_in_use(self, pool):
+        pool.idle_timeout = 0
+        async with pool.use(1) as sdk1:
+            assert pool._evict_idle() == 0
+            assert pool.get_stats()['in_use'] == 1
+        assert pool._evict_idle() == 1
+        assert sdk1.closed
+
+    @pytest.mark.asyncio
+    async def test_status_does_not_connect(self, pool):
+        assert await pool.status(1) == {'configured': True, 'is_connected': False,
+                                         'use_real_sdk': pool_module.LONGBRIDGE_AVAILABLE}
+        assert pool.get_stats()['contexts'] == 0
+        assert pool.misses == 0
@@ -0,0 +1,170 @@
+"""
+引擎进程 IPC 单元测试
+"""
+import asyncio
+import pytest
+import pytest_asyncio
+import sys
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from app.core.engine_ipc import EngineClient, EngineError, EngineServer
+from app.services.engine import TradingEngine
+
+
+class FakeEngine:
+    """按方法名返回结果的假引擎"""
+
+    def __init__(self):
+        self.calls = []
+        self.unsubscribed = asyncio.Event()
+
+    async def call(self, method, **params):
+        self.calls.append((method, params))
+        if method == 'fail':
+            raise ValueError('boom')
+        if method == 'slow':
+            await asyncio.sleep(params.get('delay', 0))
+            return params.get('value')
+        return {'method': method, 'params': params}
+
+    async def events(self, symbols=None):
+        try:
+            yield f"hello {','.join(symbols or [])}"
+            while True:
+                await asyncio.sleep(0.01)
+                yield 'tick'
+        finally:
+            self.unsubscribed.set()
+
+
+@pytest_asyncio.fixture
+async def ipc(tmp_path):
+    engine = FakeEngine()
+    server = EngineServer(engine, str(tmp_path / 'engine.sock'))
+    await server.start()
+    client = EngineClient(server.path, timeout=1.0)
+    yield engine, server, client
+    await client.close()
+    await server.stop()
+
+
+class TestEngineIPC:
+    """请求响应、错误传递与事件流"""
+
+    @pytest.mark.asyncio
+    async def test_call_returns_result(self, ipc):
+        engine, server, client = ipc
+        result = await client.call('market.quotes', symbols=['AAPL.US'])
+        assert result == {'method': 'market.quotes', 'params': {'symbols': ['AAPL.US']}}
+        assert engine.calls == [('market.quotes', {'symbols': ['AAPL.US']})]
+        assert server.get_stats()['requests'] == 1
+
+    @pytest.mark.asyncio
+    async def test_concurrent_calls_share_connection(self, ipc):
+        engine, server, client = ipc
+        results = await asyncio.gather(
+            client.call('slow', delay=0.05, value='a'),
+            client.call('slow', delay=0.0, value='b'),
+        )
+        assert results == ['a', 'b']
+        assert client.get_stats()['connects'] == 1
+
+    @pytest.mark.asyncio
+    async def test_engine_error_is_raised(self, ipc):
+        engine, server, client = ipc
+        with pytest.raises(EngineError, match='boom'):
+            await client.call('fail')
+        assert client.get_stats()['failures'] == 1
+        assert server.get_stats()['errors'] == 1
+        # 出错后连接仍可继续使用
+        assert (await client.call('ok'))['method'] == 'ok'
+
+    @pytest.mark.asyncio
+    async def test_timeout(self, ipc):
+        engine, server, client = ipc
+        client.timeout = 0.05
+        with pytest.raises(EngineError, match='超时'):
+            await client.call('slow', delay=1.0)
+
+    @pytest.mark.asyncio
+    async def test_events_stream_and_unsubscribe(self, ipc):
+        engine, server, client = ipc
+        stream = client.events(['AAPL.US'])
+        assert await stream.__anext__() == 'hello AAPL.US'
+        assert await stream.__anext__() == 'tick'
+        await stream.aclose()
+        await asyncio.wait_for(engine.unsubscribed.wait(), 1.0)
+
+    @pytest.mark.asyncio
+    async def test_unreachable_engine(self, tmp_path):
+        client = EngineClient(str(tmp_path / 'missing.sock'))
+        with pytest.raises(EngineError):
+            await client.call('connection.status')
+
+
+class TestTradingEngine:
+    """方法白名单"""
+
+    @pytest.mark.asyncio
+    async def test_unknown_method_rejected(self):
+        with pytest.raises(ValueError):
+            await TradingEngine().call('__init__')
+
+    @pytest.mark.asyncio
+    async def test_dispatches_whitelisted_method(self):
+        class Supervisor:
+            def get_stats(self):
+                return {'state': 'CONNECTED'}
+
+        class Services:
+            connection_supervisor = Supervisor()
+
+        engine = TradingEngine()
+        engine.attach(Services())
+        assert await engine.call('connection.status') == {'state': 'CONNECTED'}
+
+    @pytest.mark.asyncio
+    async def test_account_methods_use_engine_pool(self):
+        """测试用户账户调用在引擎进程的连接池中执行，未配置凭证时返回 code=1"""
+        from contextlib import asynccontextmanager
+        from app.services.context_pool import LongBridgeNotConfigured
+
+        class SDK:
+            async def get_stock_positions(self):
+                return [{'symbol': 'AAPL.US', 'quantity': 10}]
+
+        class Pool:
+            def __init__(self):
+                self.leased = []
+
+            @asynccontextmanager
+            async def use(self, user_id):
+                if user_id == 2:
+                    raise LongBridgeNotConfigured('未配置长桥凭证')
+                self.leased.append(user_id)
+                yield SDK()
+
+        class Services:
+            context_pool = Pool()
+
+        engine = TradingEngine()
+        engine.attach(Services())
+        result = await engine.call('account.positions', user_id=1)
+        assert result == {'code': 0, 'data': [{'symbol': 'AAPL.US', 'quantity': 10}]}
+        assert Services.context_pool.leased == [1]
+        assert (await engine.call('account.positions', user_id=2))['code'] == 1
+
+    @pytest.mark.asyncio
+    async def test_prediction_queries_served_by_engine(self, monkeypatch):
+        """测试预测历史与准确率由引擎进程的预测索引提供（API worker 不使用本进程缓存）"""
+        index = sys.modules['app.services.prediction_index'].prediction_index
+        monkeypatch.setattr(index, 'history', lambda days: [{'symbol': 'AAPL.US', 'days': days}])
+        monkeypatch.setattr(index, 'accuracy', lambda days: {'total': 3, 'correct': 2})
+
+        engine = TradingEngine()
+        assert await engine.call('smart.predictions', days=3) == [{'symbol': 'AAPL.US', 'days': 3}]
+        assert await engine.call('smart.prediction_accuracy', days=30) == {'total': 3, 'correct': 2}
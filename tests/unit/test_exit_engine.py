@@ -0,0 +1,113 @@
+"""
+止盈止损引擎单元测试
+"""
+import pytest
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from app.services.exit_engine import EXIT_ORDER_TIMEOUT, ExitEngine, ExitState
+from app.services.position_ledger import PositionLedger
+
+
+@pytest.fixture
+def ledger():
+    ledger = PositionLedger()
+    ledger._loaded = True
+    return ledger
+
+
+@pytest.fixture
+def engine(ledger):
+    engine = ExitEngine()
+    engine.configure(base_profit_target=1.0, trailing_stop=0.5, dynamic_stop_profit=True, max_hold_days=5)
+    engine.attach(ledger)
+    ledger.apply_fill(0, 'AAPL', 'BUY', 10, 100.0)
+    return engine
+
+
+class TestExitEngine:
+    """测试退出条件"""
+
+    def test_state_is_slotted(self):
+        """测试状态对象无 __dict__"""
+        assert not hasattr(ExitState(1.0, 1.0, 0.0, 1), '__dict__')
+
+    def test_trailing_stop_after_target(self, engine, ledger):
+        """测试达到止盈线后从最高点回撤触发卖出"""
+        assert engine.on_tick(0, 'AAPL', 100.9) is None
+        assert engine.on_tick(0, 'AAPL', 102.0) is None
+        assert engine.on_tick(0, 'AAPL', 101.6) is None
+        assert engine.on_tick(0, 'AAPL', 101.4) == 'trailing_stop'
+        # 已触发的持仓不重复触发
+        assert engine.on_tick(0, 'AAPL', 90.0) is None
+        # 最高价写入账本
+        assert ledger.get('AAPL', 0)['peak_price'] == 102.0
+
+    def test_no_trailing_before_target(self, engine):
+        """测试未达止盈线时回撤不触发"""
+        engine.on_tick(0, 'AAPL', 100.8)
+        assert engine.on_tick(0, 'AAPL', 99.0) is None
+
+    def test_fixed_profit_target(self, engine):
+        """测试关闭动态止盈时按固定止盈卖出"""
+        engine.dynamic_stop_profit = False
+        assert engine.on_tick(0, 'AAPL', 100.5) is None
+        assert engine.on_tick(0, 'AAPL', 101.0) == 'profit_target'
+
+    def test_max_hold_days(self, engine):
+        """测试持有超过最长天数时卖出"""
+        now = time.time() + 5 * 86400 + 1
+        assert engine.on_tick(0, 'AAPL', 100.0, now=now) == 'max_hold_days'
+
+    def test_peak_restored_from_ledger(self, ledger):
+        """测试重启后从账本恢复最高价"""
+        ledger.apply_fill(0, 'MSFT', 'BUY', 10, 100.0)
+        ledger.update_peak(0, 'MSFT', 110.0)
+
+        engine = ExitEngine()
+        engine.attach(ledger)
+
+        assert engine.on_tick(0, 'MSFT', 109.0) == 'trailing_stop'
+
+    def test_position_closed_stops_tracking(self, engine, ledger):
+        """测试清仓后不再跟踪"""
+        ledger.apply_fill(0, 'AAPL', 'SELL', 10, 101.0)
+
+        assert engine.tracked_symbols(0) == []
+
+    def test_evaluate_batch(self, engine, ledger):
+        """测试批量检查只返回触发的持仓"""
+        ledger.apply_fill(0, 'MSFT', 'BUY', 5, 100.0)
+        engine.on_tick(0, 'MSFT', 105.0)
+
+        exits = engine.evaluate(0, [{'symbol': 'AAPL', 'price': 100.2}, {'symbol': 'MSFT', 'price': 104.0}])
+
+        assert exits == [{'symbol': 'MSFT', 'price': 104.0, 'quantity': 5, 'reason': 'trailing_stop'}]
+
+    def test_sell_order_finished_resumes_tracking(self, engine, ledger):
+        """测试卖单部分成交后撤单，剩余持仓恢复跟踪"""
+        engine.on_tick(0, 'AAPL', 102.0)
+        assert engine.on_tick(0, 'AAPL', 101.4) == 'trailing_stop'
+
+        ledger.apply_fill(0, 'AAPL', 'SELL', 4, 101.4)
+        engine.on_order_finished(SimpleNamespace(side='SELL', test_mode=0, symbol='AAPL', status='CANCELED'))
+
+        assert engine.evaluate(0, [{'symbol': 'AAPL', 'price': 101.3}]) == [
+            {'symbol': 'AAPL', 'price': 101.3, 'quantity': 6, 'reason': 'trailing_stop'}
+        ]
+        assert engine.get_stats()['released'] == 1
+
+    def test_exiting_released_after_timeout(self, engine):
+        """测试长时间未收到卖单结束回报时超时恢复跟踪"""
+        now = time.time()
+        engine.on_tick(0, 'AAPL', 102.0, now=now)
+        assert engine.on_tick(0, 'AAPL', 101.4, now=now) == 'trailing_stop'
+
+        assert engine.on_tick(0, 'AAPL', 101.0, now=now + EXIT_ORDER_TIMEOUT - 1) is None
+        assert engine.on_tick(0, 'AAPL', 101.0, now=now + EXIT_ORDER_TIMEOUT) == 'trailing_stop'
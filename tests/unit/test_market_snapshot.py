@@ -0,0 +1,67 @@
+"""
+市场数据快照单元测试
+"""
+import sys
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from app.services.market_snapshot import MarketSnapshot
+
+
+def _grouped(prices: dict, group: str = 'Tech') -> dict:
+    return {
+        group: {
+            'group_name': group,
+            'group_order': 0,
+            'stocks': [
+                {'symbol': symbol, 'name': symbol, 'price': price, 'change_pct': 0.0,
+                 'volume': 0, 'acceleration': 0.0}
+                for symbol, price in prices.items()
+            ]
+        }
+    }
+
+
+class TestMarketSnapshot:
+    """测试市场数据快照"""
+
+    def test_seq_unchanged_when_data_unchanged(self):
+        """测试数据未变化时序号与ETag不变"""
+        snapshot = MarketSnapshot()
+        seq1 = snapshot.update(_grouped({'AAPL': 150.0, 'MSFT': 300.0}))
+        etag1 = snapshot.etag
+        seq2 = snapshot.update(_grouped({'AAPL': 150.0, 'MSFT': 300.0}))
+
+        assert seq1 == seq2
+        assert snapshot.etag == etag1
+
+    def test_changes_since_returns_only_changed_symbols(self):
+        """测试增量只包含变化的股票"""
+        snapshot = MarketSnapshot()
+        seq1 = snapshot.update(_grouped({'AAPL': 150.0, 'MSFT': 300.0}))
+        seq2 = snapshot.update(_grouped({'AAPL': 151.0, 'MSFT': 300.0}))
+
+        assert seq2 > seq1
+        delta = snapshot.changes_since(seq1)
+        assert delta['seq'] == seq2
+        assert [row['symbol'] for row in delta['changed']['Tech']] == ['AAPL']
+
+        assert snapshot.changes_since(seq2)['changed'] == {}
+
+    def test_layout_change_requires_full_refresh(self):
+        """测试股票列表变化后旧序号无法取增量"""
+        snapshot = MarketSnapshot()
+        seq1 = snapshot.update(_grouped({'AAPL': 150.0, 'MSFT': 300.0}))
+        snapshot.update(_grouped({'AAPL': 150.0}))
+
+        assert snapshot.changes_since(seq1) is None
+
+    def test_invalid_since_requires_full_refresh(self):
+        """测试未来序号返回None"""
+        snapshot = MarketSnapshot()
+        seq = snapshot.update(_grouped({'AAPL': 150.0}))
+
+        assert snapshot.changes_since(seq + 10) is None
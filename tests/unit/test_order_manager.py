@@ -0,0 +1,337 @@
+"""
+订单管理单元测试
+"""
+import asyncio
+import pytest
+import sys
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from types import SimpleNamespace
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from app.services.order_manager import OrderManager
+from app.services.position_ledger import PositionLedger
+
+# app.services 包属性 order_manager / longbridge_sdk 是全局实例，需从 sys.modules 取模块本身
+order_manager_module = sys.modules['app.services.order_manager']
+
+
+class FakeSDK:
+    """模拟真实模式下的长桥SDK"""
+
+    def __init__(self, order_id='ORD1'):
+        self.use_real_sdk = True
+        self.trade_ctx = object()
+        self.order_id = order_id
+        self.callback = None
+
+    async def submit_order(self, symbol, side, quantity, order_type='MARKET', price=None):
+        return {'success': True, 'order_id': self.order_id}
+
+    def subscribe_order_changes(self, callback):
+        self.callback = callback
+        return True
+
+
+def push(order_id, status, executed_quantity, last_share=0, last_price=0, executed_price=0):
+    return SimpleNamespace(
+        order_id=order_id, status=f'OrderStatus.{status}', executed_quantity=executed_quantity,
+        last_share=last_share, last_price=last_price, executed_price=executed_price, msg=''
+    )
+
+
+@pytest.fixture
+def ledger(monkeypatch):
+    """空的内存持仓账本（不从数据库加载）"""
+    ledger = PositionLedger()
+    ledger._loaded = True
+    monkeypatch.setattr(order_manager_module, 'position_ledger', ledger)
+    return ledger
+
+
+@pytest.fixture
+def manager(monkeypatch, ledger):
+    """不落库的订单管理器，记录成交调用"""
+    manager = OrderManager()
+    manager.persisted_fills = []
+    monkeypatch.setattr(manager, '_transaction', contextmanager(lambda cursor=None: (yield None)))
+    monkeypatch.setattr(manager, '_persist_submitted', lambda order, cursor=None: 1)
+    monkeypatch.setattr(manager, '_persist_status', lambda order, cursor=None: None)
+    monkeypatch.setattr(manager, '_persist_fill',
+                        lambda order, qty, price, cursor=None: manager.persisted_fills.append((qty, price)))
+    return manager
+
+
+@pytest.fixture
+def real_mode(monkeypatch):
+    sdk = FakeSDK()
+    monkeypatch.setattr(sys.modules['app.services.longbridge_sdk'], 'longbridge_sdk', sdk)
+    monkeypatch.setattr(order_manager_module, 'is_test_mode', lambda: False)
+    return sdk
+
+
+class TestOrderManager:
+    """测试订单生命周期与成交回报"""
+
+    @pytest.mark.asyncio
+    async def test_test_mode_fills_immediately(self, manager, monkeypatch):
+        """测试测试模式订单按报价立即成交"""
+        monkeypatch.setattr(order_manager_module, 'is_test_mode', lambda: True)
+
+        result = await manager.submit('AAPL', 'BUY', 10, 150.0)
+
+        assert result['success'] is True
+        assert result['status'] == 'FILLED'
+        assert manager.persisted_fills == [(10, 150.0)]
+
+    @pytest.mark.asyncio
+    async def test_partial_then_full_fill_from_push(self, manager, real_mode):
+        """测试按推送的实际成交价记录部分成交和全部成交"""
+        result = await manager.submit('AAPL', 'BUY', 100, 150.0)
+        assert result['status'] == 'SUBMITTED'
+        assert result['latency_ms']['ack'] is not None
+
+        manager._handle_order_changed(push('ORD1', 'PartialFilled', 40, last_share=40, last_price=10.0))
+        assert manager.get_order('ORD1')['status'] == 'PARTIAL_FILLED'
+
+        manager._handle_order_changed(push('ORD1', 'Filled', 100, last_share=60, last_price=10.5))
+        order = manager.get_order('ORD1')
+
+        assert order['status'] == 'FILLED'
+        assert order['executed_price'] == pytest.approx(10.3)
+        assert order['latency_ms']['fill'] is not None
+        assert manager.persisted_fills == [(40, 10.0), (60, 10.5)]
+
+    @pytest.mark.asyncio
+    async def test_fill_price_derived_from_cumulative_average(self, manager, real_mode):
+        """测试多笔成交合并推送时由累计均价反推本次成交价"""
+        await manager.submit('AAPL', 'BUY', 100, 150.0)
+
+        manager._handle_order_changed(push('ORD1', 'PartialFilled', 50, executed_price=10.0))
+        manager._handle_order_changed(push('ORD1', 'Filled', 100, last_share=20, last_price=11.0,
+                                           executed_price=10.5))
+
+        assert manager.persisted_fills == [(50, 10.0), (50, pytest.approx(11.0))]
+
+    @pytest.mark.asyncio
+    async def test_push_before_ack_is_applied(self, manager, real_mode):
+        """测试 submit_order 返回前到达的推送在登记订单后补处理"""
+        manager._handle_order_changed(push('ORD1', 'Filled', 10, last_share=10, last_price=20.0))
+
+        result = await manager.submit('AAPL', 'BUY', 10, 19.0)
+
+        assert result['status'] == 'FILLED'
+        assert manager.persisted_fills == [(10, 20.0)]
+
+    @pytest.mark.asyncio
+    async def test_push_from_sdk_thread(self, manager, real_mode):
+        """测试SDK线程中的推送被转交到事件循环处理"""
+        manager.attach(real_mode)
+        await manager.submit('AAPL', 'SELL', 5, 100.0)
+
+        thread = threading.Thread(
+            target=real_mode.callback,
+            args=(push('ORD1', 'Filled', 5, last_share=5, last_price=101.0),)
+        )
+        thread.start()
+        thread.join()
+        await asyncio.sleep(0.01)
+
+        assert manager.get_order('ORD1')['status'] == 'FILLED'
+        assert manager.get_stats()['push_subscribed'] is True
+
+    @pytest.mark.asyncio
+    async def test_finish_listener_on_cancel_after_partial_fill(self, manager, real_mode):
+        """测试部分成交后撤单时通知结束回调一次"""
+        finished = []
+        manager.add_finish_listener(lambda order: finished.append((order.order_id, order.status)))
+        await manager.submit('AAPL', 'SELL', 10, 100.0)
+
+        manager._handle_order_changed(push('ORD1', 'PartialFilled', 4, last_share=4, last_price=100.0))
+        assert finished == []
+
+        manager._handle_order_changed(push('ORD1', 'Canceled', 4))
+        manager._handle_order_changed(push('ORD1', 'Canceled', 4))
+        assert finished == [('ORD1', 'CANCELED')]
+
+    @pytest.mark.asyncio
+    async def test_failed_fill_persist_is_retried_as_durable_task(self, manager, real_mode, monkeypatch):
+        """测试推送成交落库失败时提交高优先级持久化重试任务"""
+        queue = FakeQueue()
+        manager.attach_queue(queue)
+        await manager.submit('AAPL', 'BUY', 10, 150.0)
+
+        def fail(order, qty, price, cursor=None):
+            raise RuntimeError('Lock wait timeout')
+        monkeypatch.setattr(manager, '_persist_fill', fail)
+        manager._handle_order_changed(push('ORD1', 'Filled', 10, last_share=10, last_price=151.0))
+        await asyncio.sleep(0)
+
+        assert queue.handlers == {order_manager_module.PERSIST_FILL_TASK: order_manager_module.persist_fill_retry}
+        name, priority, durable, kwargs = queue.enqueued[0]
+        assert (name, priority, durable) == (order_manager_module.PERSIST_FILL_TASK, 0, True)
+        assert kwargs == {'order_id': 'ORD1', 'test_mode': 0, 'symbol': 'AAPL', 'action': 'BUY',
+                          'acceleration': 0, 'price': 151.0, 'quantity': 10,
+                          'amount': 1510.0, 'status': 'FILLED', 'message': None}
+
+    @pytest.mark.asyncio
+    async def test_failed_batch_write_fills_after_commit_and_retries(self, manager, ledger, monkeypatch):
+        """测试交易记录事务失败时持仓账本不先于落库更新，且提交 upsert 重试而不是只记日志"""
+        monkeypatch.setattr(order_manager_module, 'is_test_mode', lambda: True)
+        queue = FakeQueue()
+        manager.attach_queue(queue)
+        holding_during_write = []
+
+        @contextmanager
+        def failing_transaction(cursor=None):
+            holding_during_write.append(ledger.is_holding('AAPL', 1))
+            yield None
+            raise RuntimeError('Deadlock found')
+
+        monkeypatch.setattr(manager, '_transaction', failing_transaction)
+        result = await manager.submit('AAPL', 'BUY', 10, 150.0)
+        await asyncio.sleep(0)
+
+        assert holding_during_write == [False, True]  # 提交记录的事务在成交登记之前
+        assert result['status'] == 'FILLED'
+        assert [kwargs['status'] for _, _, _, kwargs in queue.enqueued] == ['SUBMITTED', 'FILLED']
+        assert queue.enqueued[-1][3]['quantity'] == 10
+
+
+class FakeQueue:
+    """记录提交的任务队列"""
+
+    is_running = True
+
+    def __init__(self):
+        self.handlers = {}
+        self.enqueued = []
+
+    def register(self, name, func):
+        self.handlers[name] = func
+
+    async def enqueue(self, task_func, args=(), kwargs=None, priority=1, name=None, durable=False, timeout=None):
+        self.enqueued.append((name, priority, durable, kwargs))
+        return durable
+
+
+class SlowSDK(FakeSDK):
+    """每笔订单有固定往返延迟的模拟SDK"""
+
+    def __init__(self, delay=0.05):
+        super().__init__()
+        self.delay = delay
+        self.count = 0
+
+    async def submit_order(self, symbol, side, quantity, order_type='MARKET', price=None):
+        self.count += 1
+        await asyncio.sleep(self.delay)
+        if symbol == 'BAD':
+            return {'success': False, 'message': 'rejected'}
+        return {'success': True, 'order_id': f'ORD_{symbol}'}
+
+
+class TestBatchOrders:
+    """测试批量下单"""
+
+    @pytest.mark.asyncio
+    async def test_batch_submitted_concurrently_in_one_transaction(self, manager, monkeypatch):
+        """测试批量订单并发提交，交易记录只开一次事务"""
+        sdk = SlowSDK(delay=0.05)
+        monkeypatch.setattr(sys.modules['app.services.longbridge_sdk'], 'longbridge_sdk', sdk)
+        monkeypatch.setattr(order_manager_module, 'is_test_mode', lambda: False)
+        transactions = []
+
+        @contextmanager
+        def transaction(cursor=None):
+            transactions.append(cursor)
+            yield None
+
+        monkeypatch.setattr(manager, '_transaction', transaction)
+        intents = [{'symbol': s, 'side': 'BUY', 'quantity': 10, 'price': 10.0}
+                   for s in ('AAPL', 'BAD', 'MSFT', 'NVDA')]
+
+        started = asyncio.get_running_loop().time()
+        results = await manager.submit_batch(intents)
+        elapsed = asyncio.get_running_loop().time() - started
+
+        assert elapsed < 0.15
+        assert [r['success'] for r in results] == [True, False, True, True]
+        assert results[2]['order_id'] == 'ORD_MSFT'
+        assert len(transactions) == 1
+
+
+class TestBatchRisk:
+    """测试批量下单风控"""
+
+    @pytest.fixture
+    def strategy(self, monkeypatch):
+        from app.services.trading_strategy import TradingStrategy
+        module = sys.modules['app.services.trading_strategy']
+        ledger = PositionLedger()
+        ledger._loaded = True
+        ledger.apply_fill(1, 'TSLA', 'BUY', 100, 200.0)
+        monkeypatch.setattr(module, 'position_ledger', ledger)
+        monkeypatch.setattr(module, 'is_test_mode', lambda: True)
+        monkeypatch.setattr(order_manager_module, 'order_manager', OrderManager())
+        strategy = TradingStrategy()
+        strategy.buy_amount = 1000.0
+        strategy.max_concurrent_positions = 2
+        return strategy
+
+    def test_checks_all_intents_up_front(self, strategy):
+        """测试持仓上限、重复股票、超额卖出等规则"""
+        approved, rejected = strategy.check_batch_risk([
+            {'symbol': 'AAPL', 'side': 'BUY', 'price': 100.0},
+            {'symbol': 'MSFT', 'side': 'BUY', 'price': 100.0},
+            {'symbol': 'AAPL', 'side': 'SELL', 'price': 100.0},
+            {'symbol': 'TSLA', 'side': 'SELL', 'price': 210.0, 'quantity': 500},
+        ])
+
+        assert [(a['symbol'], a['quantity']) for a in approved] == [('AAPL', 10)]
+        assert [r['symbol'] for r in rejected] == ['MSFT', 'AAPL', 'TSLA']
+
+    def test_unfilled_sell_does_not_free_slot(self, strategy):
+        """测试同批次清仓卖出未成交前不释放持仓名额"""
+        approved, rejected = strategy.check_batch_risk([
+            {'symbol': 'TSLA', 'side': 'SELL', 'price': 210.0},
+            {'symbol': 'AAPL', 'side': 'BUY', 'price': 100.0},
+            {'symbol': 'MSFT', 'side': 'BUY', 'price': 100.0},
+        ])
+
+        assert [(a['symbol'], a['side'], a['quantity']) for a in approved] == [
+            ('TSLA', 'SELL', 100), ('AAPL', 'BUY', 10)
+        ]
+        assert [r['symbol'] for r in rejected] == ['MSFT']
+
+    def test_working_buy_orders_hold_slots(self, strategy):
+        """测试未成交的买单占用持仓名额，且不能再次买入同一股票"""
+        pending = order_manager_module.ManagedOrder('ORD1', 'AAPL', 'BUY', 10, 100.0, 1)
+        order_manager_module.order_manager._orders['ORD1'] = pending
+
+        approved, rejected = strategy.check_batch_risk([
+            {'symbol': 'AAPL', 'side': 'BUY', 'price': 100.0},
+            {'symbol': 'MSFT', 'side': 'BUY', 'price': 100.0},
+        ])
+        assert approved == []
+        assert [r['message'] for r in rejected] == ['该股票的买单尚未成交', '持仓数已达上限 2']
+
+    def test_signal_check_uses_ledger(self, strategy):
+        """测试买入信号检查只读内存账本"""
+        assert asyncio.run(strategy.check_buy_signal('TSLA', 210.0, 2.0, 1.0)) is False
+        assert asyncio.run(strategy.check_buy_signal('AAPL', 100.0, 2.0, 1.0)) is True
+
+    def test_working_buy_order_blocks_signal(self, strategy):
+        """测试未成交的买单计为持仓：不重复买入同一股票，且占用持仓名额"""
+        pending = order_manager_module.ManagedOrder('ORD1', 'AAPL', 'BUY', 10, 100.0, 1)
+        order_manager_module.order_manager._orders['ORD1'] = pending
+
+        assert asyncio.run(strategy.check_buy_signal('AAPL', 100.0, 2.0, 1.0)) is False
+        assert asyncio.run(strategy.check_buy_signal('MSFT', 100.0, 2.0, 1.0)) is False
+
+        pending.status = 'CANCELED'
+        assert asyncio.run(strategy.check_buy_signal('MSFT', 100.0, 2.0, 1.0)) is True
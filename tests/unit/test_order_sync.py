@@ -0,0 +1,173 @@
+"""
+订单历史增量同步单元测试
+"""
+import pytest
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from types import SimpleNamespace
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from app.services.longbridge_sdk import order_to_dict
+from app.services.order_sync import OrderHistorySync
+
+order_sync_module = sys.modules['app.services.order_sync']
+sdk_module = sys.modules['app.services.longbridge_sdk']
+
+
+class RecordingConnection:
+    """记录 SQL 的模拟连接"""
+
+    def __init__(self, fetchone=None):
+        self.executed = []
+        self._fetchone = fetchone
+
+    def cursor(self, *args):
+        return self
+
+    def execute(self, sql, params=None):
+        self.executed.append((sql, params))
+
+    def executemany(self, sql, rows):
+        self.executed.append((sql, list(rows)))
+
+    def fetchone(self):
+        return self._fetchone
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def make_order(order_id, updated_at, status='Filled'):
+    return {
+        'order_id': order_id, 'symbol': 'AAPL.US', 'side': 'Buy', 'order_type': 'LO', 'status': status,
+        'submitted_price': 100.0, 'executed_price': 100.0, 'submitted_quantity': 10,
+        'executed_quantity': 10, 'currency': 'USD', 'updated_at': updated_at
+    }
+
+
+class TestUpsert:
+    """写入与高水位"""
+
+    def test_upsert_does_not_move_high_water(self, monkeypatch):
+        conn = RecordingConnection()
+        monkeypatch.setattr(order_sync_module, 'get_db_connection', lambda: conn)
+
+        sync = OrderHistorySync()
+        written = sync.upsert([
+            make_order('1', '2026-01-05T10:00:00'),
+            make_order('2', '2026-01-06T09:30:00'),
+        ])
+
+        assert written == 2
+        assert sync.high_water is None  # 推送写入不推进同步高水位
+        sql, rows = conn.executed[0]
+        assert 'ON DUPLICATE KEY UPDATE' in sql
+        # updated_at 最后更新，保证前面的条件比较使用旧值
+        assert sql.rstrip().endswith('updated_at = GREATEST(updated_at, VALUES(updated_at))')
+        assert rows[0][-1] == datetime(2026, 1, 5, 10, 0)
+
+    def test_empty_upsert_skips_database(self, monkeypatch):
+        monkeypatch.setattr(order_sync_module, 'get_db_connection', lambda: pytest.fail('不应访问数据库'))
+        assert OrderHistorySync().upsert([]) == 0
+
+
+class TestSync:
+    """回填与增量窗口"""
+
+    @pytest.mark.asyncio
+    async def test_backfill_then_incremental(self, monkeypatch):
+        calls = []
+
+        class FakeSDK:
+            use_real_sdk = True
+            trade_ctx = object()
+
+            async def get_history_orders(self, days=90, limit=1000, start_at=None, end_at=None, raise_errors=False):
+                assert raise_errors
+                calls.append((start_at, end_at, limit))
+                return [make_order('1', '2026-01-06T09:30:00')]
+
+            async def get_today_orders(self):
+                return []
+
+        monkeypatch.setattr(sdk_module, 'longbridge_sdk', FakeSDK())
+        monkeypatch.setattr(order_sync_module, 'get_db_connection',
+                            lambda: RecordingConnection(fetchone=(None,)))
+
+        sync = OrderHistorySync(backfill_days=90, overlap=timedelta(days=1), page_window=timedelta(days=7))
+        now = datetime(2026, 1, 7, 16, 0)
+        await sync.sync(now)
+
+        # 回填按 7 天窗口分页，首尾相接覆盖 90 天，每页不截断
+        assert len(calls) == 13
+        assert calls[0] == (now - timedelta(days=90), now - timedelta(days=83), None)
+        assert all(calls[i][1] == calls[i + 1][0] for i in range(len(calls) - 1))
+        assert calls[-1][1] == now
+
+        calls.clear()
+        later = now + timedelta(hours=2)
+        await sync.sync(later)
+        assert calls == [(now - timedelta(days=1), later, None)]
+        assert sync.syncs == 2
+
+    @pytest.mark.asyncio
+    async def test_failed_window_retried_next_sync(self, monkeypatch):
+        """测试拉取失败时停止同步、高水位不越过失败窗口，推送写入也不推进高水位"""
+        calls = []
+        failing = {'value': True}
+
+        class FakeSDK:
+            use_real_sdk = True
+            trade_ctx = object()
+
+            async def get_history_orders(self, days=90, limit=1000, start_at=None, end_at=None, raise_errors=False):
+                calls.append((start_at, end_at))
+                if failing['value'] and len(calls) == 2:
+                    raise RuntimeError('rate limited')
+                return []
+
+            async def get_today_orders(self):
+                return []
+
+        monkeypatch.setattr(sdk_module, 'longbridge_sdk', FakeSDK())
+        monkeypatch.setattr(order_sync_module, 'get_db_connection', lambda: RecordingConnection())
+
+        now = datetime(2026, 1, 20, 16, 0)
+        sync = OrderHistorySync(overlap=timedelta(0), page_window=timedelta(days=7))
+        sync.high_water = now - timedelta(days=21)
+        with pytest.raises(RuntimeError):
+            await sync.sync(now)
+        assert sync.high_water == now - timedelta(days=14)
+
+        sync.upsert([make_order('1', now.isoformat())])
+        assert sync.high_water == now - timedelta(days=14)
+
+        failing['value'] = False
+        calls.clear()
+        await sync.sync(now)
+        assert calls[0] == (now - timedelta(days=14), now - timedelta(days=7))
+        assert sync.high_water == now
+
+
+class TestOrderToDict:
+    """SDK 订单对象转换"""
+
+    def test_aware_time_converted_to_local(self):
+        updated_at = datetime(2026, 1, 6, 14, 30, tzinfo=timezone.utc)
+        order = SimpleNamespace(order_id=123, symbol='AAPL.US', side='OrderSide.Buy', status='OrderStatus.Filled',
+                                executed_price='101.5', executed_quantity='10', updated_at=updated_at)
+
+        data = order_to_dict(order)
+
+        assert data['order_id'] == '123'
+        assert data['side'] == 'Buy'
+        assert data['status'] == 'Filled'
+        assert data['executed_price'] == 101.5
+        assert datetime.fromisoformat(data['updated_at']) == updated_at.astimezone().replace(tzinfo=None)
@@ -0,0 +1,84 @@
+"""
+账户估值服务单元测试
+"""
+import pytest
+import sys
+from datetime import date
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from app.services.order_manager import ManagedOrder
+from app.services.portfolio import PortfolioService
+
+
+def filled_order(symbol, side, quantity, price, test_mode=0):
+    order = ManagedOrder(f'O-{symbol}-{side}', symbol, side, quantity, price, test_mode)
+    order.status = 'FILLED'
+    order.filled_quantity = quantity
+    order.avg_price = price
+    return order
+
+
+@pytest.fixture
+def service():
+    service = PortfolioService()
+    book = service._books[0]
+    book.cash = 10000.0
+    book.today_date = date.today()
+    book.positions = {'AAPL': {'quantity': 10, 'cost_price': 100.0, 'opened_today': False}}
+    book.quotes = {'AAPL': (110.0, 105.0)}
+    return service
+
+
+class TestPortfolioService:
+    """成交增量更新与估值"""
+
+    def test_snapshot_marks_to_market(self, service):
+        data = service.snapshot(0)
+        assert data['position_market_value'] == pytest.approx(1100.0)
+        assert data['position_profit_loss'] == pytest.approx(100.0)
+        assert data['total_assets'] == pytest.approx(11100.0)
+        # 当日盈亏按昨收 105 计算
+        assert data['daily_profit_loss'] == pytest.approx(50.0)
+
+    def test_buy_fill_updates_cash_and_position(self, service):
+        service.on_fill(filled_order('MSFT', 'BUY', 5, 200.0), 5, 200.0)
+        service._books[0].quotes['MSFT'] = (210.0, 190.0)
+
+        data = service.snapshot(0)
+        assert data['available_cash'] == pytest.approx(9000.0)
+        msft = next(p for p in data['positions'] if p['symbol'] == 'MSFT')
+        # 当天开仓以成交价为当日盈亏基准
+        assert msft['daily_profit_loss'] == pytest.approx(50.0)
+        assert data['today_trades']['buy_count'] == 1
+        assert data['today_trades']['volume'] == pytest.approx(1000.0)
+
+    def test_sell_fill_closes_position(self, service):
+        service.on_fill(filled_order('AAPL', 'SELL', 10, 110.0), 10, 110.0)
+
+        data = service.snapshot(0)
+        assert data['positions'] == []
+        assert data['available_cash'] == pytest.approx(11100.0)
+        assert data['today_trades']['sell_count'] == 1
+
+    @pytest.mark.asyncio
+    async def test_reconcile_offset_keeps_net_assets(self, service, monkeypatch):
+        class FakeSDK:
+            async def get_account_balance(self):
+                return {'available_cash': 5000.0, 'net_assets': 8000.0, 'currency': 'USD'}
+
+            async def get_stock_positions(self):
+                return [{'symbol': 'AAPL', 'quantity': 20, 'cost_price': 100.0}]
+
+            async def get_realtime_quote(self, symbols):
+                return [{'symbol': 'AAPL', 'price': 120.0, 'prev_close': 118.0}]
+
+        monkeypatch.setattr(sys.modules['app.services.longbridge_sdk'], 'longbridge_sdk', FakeSDK())
+
+        await service.reconcile(0)
+        data = service.snapshot(0)
+        assert data['position_market_value'] == pytest.approx(2400.0)
+        assert data['total_assets'] == pytest.approx(8000.0)
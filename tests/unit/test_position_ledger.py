@@ -0,0 +1,96 @@
+"""
+内存持仓账本单元测试
+"""
+import pytest
+import sys
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from app.services.position_ledger import PositionLedger
+
+ledger_module = sys.modules['app.services.position_ledger']
+
+
+class RecordingConnection:
+    """记录 executemany 写入的模拟连接"""
+
+    def __init__(self, fail=False):
+        self.rows = []
+        self.fail = fail
+        self.committed = False
+
+    def cursor(self, *args):
+        return self
+
+    def executemany(self, sql, rows):
+        if self.fail:
+            raise RuntimeError("db down")
+        self.rows.extend(rows)
+
+    def commit(self):
+        self.committed = True
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def ledger():
+    ledger = PositionLedger()
+    ledger._loaded = True
+    return ledger
+
+
+class TestPositionLedger:
+    """测试持仓账本"""
+
+    def test_buy_add_and_sell(self, ledger):
+        """测试开仓、加仓均价和清仓盈亏"""
+        ledger.apply_fill(0, 'AAPL', 'BUY', 10, 100.0)
+        ledger.apply_fill(0, 'AAPL', 'BUY', 10, 110.0)
+
+        assert ledger.holding_count(0) == 1
+        assert ledger.get('AAPL', 0)['buy_price'] == pytest.approx(105.0)
+
+        realized, entry = ledger.apply_fill(0, 'AAPL', 'SELL', 20, 120.0)
+
+        assert realized == pytest.approx(300.0)
+        assert entry == pytest.approx(105.0)
+        assert ledger.holding_count(0) == 0
+        assert ledger.get('AAPL', 0)['status'] == 'SOLD'
+        assert not ledger.is_holding('AAPL', 0)
+
+    def test_modes_are_isolated(self, ledger):
+        """测试测试模式与真实模式持仓互不影响"""
+        ledger.apply_fill(1, 'AAPL', 'BUY', 10, 100.0)
+
+        assert ledger.is_holding('AAPL', 1)
+        assert not ledger.is_holding('AAPL', 0)
+        assert ledger.holding_count(0) == 0
+
+    def test_write_behind_flush(self, ledger, monkeypatch):
+        """测试变更合并后一次写入数据库"""
+        conn = RecordingConnection()
+        monkeypatch.setattr(ledger_module, 'get_db_connection', lambda: conn)
+
+        ledger.apply_fill(0, 'AAPL', 'BUY', 10, 100.0)
+        ledger.apply_fill(0, 'AAPL', 'BUY', 10, 100.0)
+        ledger.apply_fill(0, 'MSFT', 'BUY', 5, 300.0)
+
+        assert ledger.flush() == 2
+        assert conn.committed
+        assert sorted((r[0], r[1]) for r in conn.rows) == [('AAPL', 20), ('MSFT', 5)]
+        assert ledger.flush() == 0
+
+    def test_failed_flush_is_retried(self, ledger, monkeypatch):
+        """测试回写失败时保留变更"""
+        monkeypatch.setattr(ledger_module, 'get_db_connection', lambda: RecordingConnection(fail=True))
+        ledger.apply_fill(0, 'AAPL', 'BUY', 10, 100.0)
+
+        with pytest.raises(RuntimeError):
+            ledger.flush()
+
+        assert ledger.get_stats()['pending_writes'] == 1
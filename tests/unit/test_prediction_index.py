@@ -0,0 +1,199 @@
+"""
+预测排名索引、状态统计与推荐买入单元测试
+"""
+import pytest
+import sys
+from datetime import date
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from app.services.prediction_index import PredictionIndex
+from app.services.smart_trader import SmartPredictionTrader
+from app.services.longbridge_sdk import LongBridgeSDK  # noqa: F401
+
+smart_trader_module = sys.modules['app.services.smart_trader']
+sdk_module = sys.modules['app.services.longbridge_sdk']
+
+
+class ActiveStocksConnection:
+    """返回固定活跃股票列表的模拟连接"""
+
+    def __init__(self, symbols):
+        self.symbols = symbols
+
+    def cursor(self, *args):
+        return self
+
+    def execute(self, sql, params=None):
+        pass
+
+    def fetchall(self):
+        return [{'symbol': s} for s in self.symbols]
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def index():
+    index = PredictionIndex()
+    index._date = date.today()
+    return index
+
+
+class TestPredictionIndex:
+    """排名与过期判断"""
+
+    def test_ranked_by_hybrid_score(self, index):
+        index.update([
+            {'symbol': 'AAPL', 'score': 70, 'technical_score': 80, 'source': 'hybrid'},
+            {'symbol': 'MSFT', 'score': 85, 'source': 'technical'},
+            {'symbol': 'TSLA', 'score': 40, 'source': 'technical'},
+        ])
+        top = index.top(5, min_score=60)
+        assert [p['symbol'] for p in top] == ['MSFT', 'AAPL']
+        assert top[1]['technical_score'] == 80
+
+    def test_stored_rows_fall_back_to_technical_score(self, index):
+        index.update([{'symbol': 'AAPL', 'hybrid_score': None, 'technical_score': 66, 'confidence_score': 0.5}])
+        assert index.get('AAPL')['score'] == 66
+        assert index.get('AAPL')['confidence'] == 0.5
+
+    def test_failed_load_retried_after_backoff(self, monkeypatch):
+        """测试当天首次加载失败时不把空索引当作当天数据，退避后重新加载"""
+        module = sys.modules['app.services.prediction_index']
+        index = PredictionIndex()
+        attempts = []
+
+        def load(day=None):
+            attempts.append(day)
+            if len(attempts) == 1:
+                raise RuntimeError('db down')
+            index._date = day
+            index._by_symbol = {'AAPL.US': index._normalize({'symbol': 'AAPL.US', 'hybrid_score': 80})}
+            index._rerank()
+
+        monkeypatch.setattr(index, 'load', load)
+        assert index.top(5) == []
+        assert index.top(5) == []  # 退避期间不重复查询
+        assert len(attempts) == 1 and index.get_stats()['date'] is None
+
+        monkeypatch.setattr(module, 'LOAD_RETRY_SECONDS', 0.0)
+        index._retry_at = 0.0
+        assert [p['symbol'] for p in index.top(5)] == ['AAPL.US']
+        assert len(attempts) == 2
+
+    def test_stale_symbols(self, index):
+        index.update([{'symbol': 'AAPL', 'score': 70}])
+        assert index.stale_symbols(['AAPL', 'NVDA']) == ['NVDA']
+
+    def test_trade_stats_accumulate_after_first_load(self, index, monkeypatch):
+        loads = []
+
+        def load():
+            loads.append(1)
+            return {'total_trades': 2, 'buy_count': 2, 'sell_count': 0}
+
+        monkeypatch.setattr(index, '_load_trade_stats', load)
+        index.record_trade('BUY')  # 尚未汇总，首次汇总会包含该记录
+        assert index.trade_stats() == {'total_trades': 2, 'buy_count': 2, 'sell_count': 0}
+        index.record_trade('SELL')
+        assert index.trade_stats() == {'total_trades': 3, 'buy_count': 2, 'sell_count': 1}
+        assert len(loads) == 1
+
+    def test_query_cache_invalidated_by_update(self, index):
+        calls = []
+        loader = lambda: calls.append(1) or len(calls)
+        assert index.cached(('accuracy', 30), loader) == 1
+        assert index.cached(('accuracy', 30), loader) == 1
+        index.update([{'symbol': 'AAPL', 'score': 70}])
+        assert index.cached(('accuracy', 30), loader) == 2
+
+    def test_query_cache_expires(self, index, monkeypatch):
+        """测试查询缓存超时后重新查询（外部回填的 actual_return 可见）"""
+        calls = []
+        loader = lambda: calls.append(1) or len(calls)
+        monkeypatch.setattr(sys.modules['app.services.prediction_index'], 'QUERY_CACHE_TTL', 0.0)
+        assert index.cached(('accuracy', 30), loader) == 1
+        assert index.cached(('accuracy', 30), loader) == 2
+
+    def test_top_rows_use_table_fields(self, index):
+        index.update([{'symbol': 'AAPL', 'score': 70, 'confidence': 0.6, 'llm_analysis': 'x' * 600}])
+        row = index.top_rows(1)[0]
+        assert row['hybrid_score'] == 70
+        assert row['confidence_score'] == 0.6
+        assert len(row['llm_analysis']) == 500
+
+
+class TestTopRecommendations:
+    """推荐买入读取预测索引并合并实时行情"""
+
+    @pytest.mark.asyncio
+    async def test_joins_quotes_and_refreshes_stale(self, index, monkeypatch):
+        index.update([
+            {'symbol': 'AAPL', 'score': 90},
+            {'symbol': 'MSFT', 'score': 80},
+            {'symbol': 'TSLA', 'score': 75},
+        ])
+        monkeypatch.setattr(smart_trader_module, 'prediction_index', index)
+        monkeypatch.setattr(smart_trader_module, 'get_db_connection',
+                            lambda: ActiveStocksConnection(['AAPL', 'MSFT', 'TSLA', 'NVDA']))
+
+        class FakeSDK:
+            async def get_realtime_quote(self, symbols):
+                prices = {'AAPL': 0, 'MSFT': 400.0, 'TSLA': 250.0}
+                return [{'symbol': s, 'price': prices.get(s, 0), 'change_pct': 1.0} for s in symbols]
+
+        monkeypatch.setattr(sdk_module, 'longbridge_sdk', FakeSDK())
+
+        trader = SmartPredictionTrader()
+        trader.min_prediction_score = 60
+        scheduled = []
+
+        async def schedule(symbols):
+            scheduled.extend(symbols)
+
+        monkeypatch.setattr(trader, '_schedule_refresh', schedule)
+
+        recommendations = await trader.get_top_recommendations(limit=2)
+
+        # AAPL 无有效报价被跳过；NVDA 没有当天预测，后台补充
+        assert [r['symbol'] for r in recommendations] == ['MSFT', 'TSLA']
+        assert recommendations[0]['price'] == 400.0
+        assert scheduled == ['NVDA']
+
+    @pytest.mark.asyncio
+    async def test_refresh_not_marked_while_queue_stopped(self, monkeypatch):
+        task_queue_module = sys.modules['app.services.task_queue']
+        queue = task_queue_module.AsyncTaskQueue()
+        monkeypatch.setattr(task_queue_module, 'task_queue', queue)
+        trader = SmartPredictionTrader()
+        trader._repredicting.add('NVDA')  # 停止前入队、随队列停止被丢弃的任务
+
+        await trader._schedule_refresh(['NVDA', 'AMD'])
+
+        assert trader._repredicting == set()
+        assert queue.pending_count() == 0
+
+
+class TestSavePrediction:
+    """预测结果按完整 symbol 保存，与预测索引的键一致"""
+
+    @pytest.mark.asyncio
+    async def test_full_symbol_is_saved(self):
+        executed = []
+
+        class Recorder:
+            def execute(self, sql, params=None):
+                executed.append(params)
+
+            def commit(self):
+                pass
+
+        recorder = Recorder()
+        await SmartPredictionTrader()._save_prediction(recorder, recorder, {'symbol': 'SPY240621C00500000.US', 'score': 70})
+
+        assert executed[0][0] == 'SPY240621C00500000.US'
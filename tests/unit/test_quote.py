@@ -0,0 +1,59 @@
+"""
+紧凑行情记录单元测试
+"""
+import sys
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from app.core.serialization import dumps_text
+from app.models.quote import Quote
+
+
+class TestQuote:
+    """与原字典行情的兼容性"""
+
+    def test_mapping_access(self):
+        quote = Quote.from_price('AAPL', 110.0, 100.0, volume=500)
+        assert quote['price'] == 110.0
+        assert quote.get('change_pct') == 10.0
+        assert quote.get('missing', 'x') == 'x'
+        assert 'volume' in quote
+        assert set(dict(quote)) == {'symbol', 'price', 'prev_close', 'change_pct', 'volume', 'timestamp'}
+
+    def test_zero_prev_close(self):
+        assert Quote.from_price('AAPL', 10.0, 0).change_pct == 0.0
+
+    def test_timestamp_rendered_on_serialization(self):
+        ts = int(datetime(2024, 1, 2, 9, 30).timestamp() * 1000)
+        quote = Quote('700', 300.0, 290.0, 3.45, 100, ts)
+        assert quote['timestamp'] == '2024-01-02T09:30:00'
+        assert '"timestamp":"2024-01-02T09:30:00"' in dumps_text({'data': [quote]}).replace(' ', '')
+
+    def test_with_symbol_copies(self):
+        quote = Quote('00700.HK', 300.0, 290.0, 3.45, 100)
+        renamed = quote.with_symbol('700')
+        assert renamed['symbol'] == '700' and quote.symbol == '00700.HK'
+        assert renamed.ts == quote.ts
+        assert quote.with_symbol('00700.HK') is quote
+
+    def test_smaller_than_dict(self):
+        def measure(build):
+            tracemalloc.start()
+            items = [build(i) for i in range(1000)]
+            size = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            assert len(items) == 1000
+            return size
+
+        now = datetime.now()
+        slotted = measure(lambda i: Quote(f'S{i}', 1.5 + i, 1.0 + i, 0.5, i))
+        as_dict = measure(lambda i: {
+            'symbol': f'S{i}', 'price': 1.5 + i, 'prev_close': 1.0 + i,
+            'change_pct': 0.5, 'volume': i, 'timestamp': now.isoformat()
+        })
+        assert slotted < as_dict
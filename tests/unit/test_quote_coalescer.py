@@ -0,0 +1,131 @@
+"""
+行情请求合并单元测试
+"""
+import asyncio
+import pytest
+import sys
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from app.services.quote_coalescer import QuoteCoalescer
+
+
+class FakeBroker:
+    """记录批次调用的模拟券商接口"""
+
+    def __init__(self, delay: float = 0.01, fail_symbols=()):
+        self.calls = []
+        self.delay = delay
+        self.fail_symbols = set(fail_symbols)
+
+    async def fetch(self, batch):
+        self.calls.append(list(batch))
+        await asyncio.sleep(self.delay)
+        if self.fail_symbols & set(batch):
+            raise RuntimeError("(301606) rate limit")
+        return {s: {'symbol': s, 'price': 100.0} for s in batch}
+
+
+class TestQuoteCoalescer:
+    """测试行情请求合并"""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_requests_share_one_call(self):
+        """测试并发请求相同股票只调用一次券商接口"""
+        broker = FakeBroker()
+        coalescer = QuoteCoalescer(broker.fetch, window=0.002, ttl=0)
+
+        results = await asyncio.gather(*(coalescer.get(['AAPL.US', 'MSFT.US']) for _ in range(5)))
+
+        assert len(broker.calls) == 1
+        assert all(set(r) == {'AAPL.US', 'MSFT.US'} for r in results)
+
+    @pytest.mark.asyncio
+    async def test_small_requests_merged_into_full_batches(self):
+        """测试合并窗口内的小请求合并为完整批次"""
+        broker = FakeBroker()
+        coalescer = QuoteCoalescer(broker.fetch, batch_size=20, window=0.005, ttl=0)
+        symbols = [f"S{i}.US" for i in range(30)]
+
+        await asyncio.gather(*(coalescer.get(symbols[i:i + 3]) for i in range(0, 30, 3)))
+
+        assert sorted(len(call) for call in broker.calls) == [10, 20]
+
+    @pytest.mark.asyncio
+    async def test_ttl_cache_hit(self):
+        """测试TTL内的重复请求直接命中缓存"""
+        broker = FakeBroker()
+        coalescer = QuoteCoalescer(broker.fetch, window=0.001, ttl=5)
+
+        await coalescer.get(['AAPL.US'])
+        result = await coalescer.get(['AAPL.US'])
+
+        assert len(broker.calls) == 1
+        assert result['AAPL.US']['price'] == 100.0
+        assert coalescer.get_stats()['cache_hits'] == 1
+
+    @pytest.mark.asyncio
+    async def test_all_failed_raises(self):
+        """测试全部失败时抛出异常"""
+        broker = FakeBroker(fail_symbols={'AAPL.US'})
+        coalescer = QuoteCoalescer(broker.fetch, window=0.001, ttl=0)
+
+        with pytest.raises(RuntimeError):
+            await coalescer.get(['AAPL.US'])
+
+    @pytest.mark.asyncio
+    async def test_batches_dispatched_concurrently(self):
+        """测试多个批次并发发送"""
+        in_flight = 0
+        peak = 0
+
+        async def fetch(batch):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.02)
+            in_flight -= 1
+            return {s: {'symbol': s} for s in batch}
+
+        coalescer = QuoteCoalescer(fetch, batch_size=20, window=0.001, ttl=0)
+        result = await coalescer.get([f"S{i}.US" for i in range(200)])
+
+        assert len(result) == 200
+        assert peak == 10
+
+    @pytest.mark.asyncio
+    async def test_only_failed_batch_retried(self):
+        """测试只重试失败的批次，成功批次的结果保留"""
+        calls = []
+        failures = {'B0.US': 1}
+
+        async def fetch(batch):
+            calls.append(batch[0])
+            if failures.get(batch[0], 0) > 0:
+                failures[batch[0]] -= 1
+                raise RuntimeError("(301606) rate limit")
+            return {s: {'symbol': s} for s in batch}
+
+        coalescer = QuoteCoalescer(
+            fetch, batch_size=2, window=0.001, ttl=0,
+            should_retry=lambda e: '301606' in str(e), retry_backoff=0.001
+        )
+        result = await coalescer.get(['A0.US', 'A1.US', 'B0.US', 'B1.US'])
+
+        assert len(result) == 4
+        assert calls.count('A0.US') == 1
+        assert calls.count('B0.US') == 2
+        assert coalescer.get_stats()['retries'] == 1
+
+    @pytest.mark.asyncio
+    async def test_partial_failure_keeps_successful_batches(self):
+        """测试不可重试的批次失败时返回其余批次结果"""
+        broker = FakeBroker(fail_symbols={'B0.US'})
+        coalescer = QuoteCoalescer(broker.fetch, batch_size=2, window=0.001, ttl=0)
+
+        result = await coalescer.get(['A0.US', 'A1.US', 'B0.US', 'B1.US'])
+
+        assert set(result) == {'A0.US', 'A1.US'}
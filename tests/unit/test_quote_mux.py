@@ -0,0 +1,115 @@
+"""
+行情推送多路复用单元测试
+"""
+import pytest
+import sys
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from app.services.quote_mux import QuoteMultiplexer
+from app.services.longbridge_sdk import LongBridgeSDK  # noqa: F401
+
+sdk_module = sys.modules['app.services.longbridge_sdk']
+
+
+class FakeSDK:
+    """记录券商订阅调用的模拟 SDK"""
+
+    def __init__(self):
+        self.subscribed = set()
+        self.calls = []
+        self.cache = {}
+
+    def _normalize_symbol(self, symbol):
+        return symbol if '.' in symbol else f'{symbol}.US'
+
+    def subscribe_realtime_quotes(self, symbols, callback):
+        self.calls.append(('subscribe', list(symbols)))
+        self.subscribed.update(symbols)
+        return True
+
+    def unsubscribe_realtime_quotes(self, symbols):
+        self.calls.append(('unsubscribe', list(symbols)))
+        self.subscribed.difference_update(symbols)
+
+    def get_cached_quote(self, symbol):
+        return self.cache.get(symbol)
+
+    def cache_pushed_quote(self, symbol, quote):
+        self.cache[symbol] = quote
+
+
+@pytest.fixture
+def sdk(monkeypatch):
+    sdk = FakeSDK()
+    monkeypatch.setattr(sdk_module, 'longbridge_sdk', sdk)
+    return sdk
+
+
+class TestQuoteMultiplexer:
+    """引用计数与分发"""
+
+    @pytest.mark.asyncio
+    async def test_union_subscribed_once(self, sdk):
+        mux = QuoteMultiplexer()
+        mux.subscribe('a', ['AAPL', 'MSFT'])
+        mux.subscribe('b', ['AAPL'])
+        await mux.flush()
+
+        assert sdk.subscribed == {'AAPL.US', 'MSFT.US'}
+        assert mux.refcount('AAPL') == 2
+        assert len(sdk.calls) == 1
+
+    @pytest.mark.asyncio
+    async def test_unsubscribe_when_count_drops_to_zero(self, sdk):
+        mux = QuoteMultiplexer()
+        mux.subscribe('a', ['AAPL', 'MSFT'])
+        mux.subscribe('b', ['AAPL'])
+        await mux.flush()
+
+        mux.unsubscribe('a')
+        await mux.flush()
+        assert sdk.subscribed == {'AAPL.US'}
+
+        mux.unsubscribe('b', ['AAPL'])
+        await mux.flush()
+        assert sdk.subscribed == set()
+
+    @pytest.mark.asyncio
+    async def test_set_symbols_only_changes_difference(self, sdk):
+        mux = QuoteMultiplexer()
+        mux.set_symbols('engine', ['AAPL', 'MSFT'])
+        await mux.flush()
+        mux.set_symbols('engine', ['MSFT', 'TSLA'])
+        await mux.flush()
+
+        assert sdk.subscribed == {'MSFT.US', 'TSLA.US'}
+        assert sdk.calls[-2:] == [('unsubscribe', ['AAPL.US']), ('subscribe', ['TSLA.US'])]
+
+    def test_dispatch_fans_out_with_consumer_symbols(self, sdk):
+        mux = QuoteMultiplexer()
+        received = {'a': [], 'b': []}
+        mux.subscribe('a', ['AAPL'], received['a'].append)
+        mux.subscribe('b', ['AAPL.US'], received['b'].append)
+        mux.subscribe('c', ['MSFT'], pytest.fail)
+        sdk.cache['AAPL.US'] = {'prev_close': 100.0}
+
+        mux.dispatch('AAPL.US', 102.0, 500)
+
+        assert received['a'][0]['symbol'] == 'AAPL'
+        assert received['b'][0]['symbol'] == 'AAPL.US'
+        assert received['a'][0]['change_pct'] == pytest.approx(2.0)
+        # 推送写入行情缓存
+        assert sdk.cache['AAPL.US']['price'] == 102.0
+
+    def test_push_symbol_without_leading_zero(self, sdk):
+        mux = QuoteMultiplexer()
+        received = []
+        mux.subscribe('a', ['00700.HK'], received.append)
+
+        mux.dispatch('700.HK', 300.0, 100)
+
+        assert received[0]['symbol'] == '00700.HK'
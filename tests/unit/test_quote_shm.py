@@ -0,0 +1,120 @@
+"""
+共享内存行情快照单元测试
+"""
+import multiprocessing
+import sys
+import uuid
+from pathlib import Path
+
+import pytest
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from app.core import quote_shm
+from app.core.quote_shm import HEADER_SIZE, SEQ, QuoteSnapshotReader, QuoteSnapshotWriter
+from app.models.quote import Quote
+
+
+@pytest.fixture
+def writer():
+    writer = QuoteSnapshotWriter(f"test_quotes_{uuid.uuid4().hex[:8]}", capacity=4)
+    writer.start()
+    yield writer
+    writer.stop()
+
+
+def _read_in_child(name, symbol, results):
+    reader = QuoteSnapshotReader(name)
+    results.put(reader.get(symbol))
+    reader.close()
+
+
+class TestQuoteSnapshot:
+    """发布、读取、一致性与重建"""
+
+    def test_publish_and_read(self, writer):
+        reader = QuoteSnapshotReader(writer.name)
+        assert writer.publish('AAPL.US', 190.5, 1.25, 1000, 0.3)
+
+        quote = reader.get('AAPL.US')
+        assert quote['price'] == 190.5
+        assert quote['change_pct'] == 1.25
+        assert quote['volume'] == 1000
+        assert quote['acceleration'] == 0.3
+        assert reader.get('MSFT.US') is None
+
+        # 原地覆盖，槽位不变
+        writer.publish('AAPL.US', 191.0, 1.5, 1200, 0.4)
+        assert reader.get('AAPL.US')['price'] == 191.0
+        assert writer.get_stats()['symbols'] == 1
+        reader.close()
+
+    def test_push_keeps_acceleration(self, writer):
+        reader = QuoteSnapshotReader(writer.name)
+        writer.publish('TSLA.US', 250.0, 2.0, 10, 0.8)
+        writer.publish_quote(Quote.from_price('TSLA.US', 255.0, 245.0, 20))
+
+        quote = reader.get('TSLA.US')
+        assert quote['price'] == 255.0
+        assert quote['acceleration'] == 0.8
+        reader.close()
+
+    def test_capacity_and_max_age(self, writer):
+        reader = QuoteSnapshotReader(writer.name)
+        for i in range(4):
+            assert writer.publish(f"S{i}.US", 10.0 + i, 0.0)
+        assert not writer.publish('EXTRA.US', 1.0, 0.0)
+        assert writer.get_stats()['dropped'] == 1
+
+        writer.publish('S0.US', 10.0, 0.0, ts=1)
+        assert reader.get('S0.US', max_age=5.0) is None
+        assert reader.get('S1.US', max_age=5.0)['price'] == 11.0
+        assert set(reader.get_many(['S1.US', 'S2.US', 'EXTRA.US'])) == {'S1.US', 'S2.US'}
+        reader.close()
+
+    def test_write_in_progress_is_not_returned(self, writer, monkeypatch):
+        monkeypatch.setattr(quote_shm, 'READ_RETRIES', 3)
+        reader = QuoteSnapshotReader(writer.name)
+        writer.publish('AAPL.US', 190.0, 1.0)
+
+        offset = HEADER_SIZE
+        seq = SEQ.unpack_from(writer._shm.buf, offset)[0]
+        SEQ.pack_into(writer._shm.buf, offset, seq + 1)  # 模拟写入中
+        assert reader.get('AAPL.US') is None
+        assert reader.get_stats()['retries'] == 3
+
+        SEQ.pack_into(writer._shm.buf, offset, seq)
+        assert reader.get('AAPL.US')['price'] == 190.0
+        reader.close()
+
+    def test_reader_follows_recreated_segment(self, writer, monkeypatch):
+        monkeypatch.setattr(quote_shm, 'REOPEN_INTERVAL', 0.0)
+        reader = QuoteSnapshotReader(writer.name)
+        writer.publish('AAPL.US', 190.0, 1.0)
+        assert reader.get('AAPL.US')['price'] == 190.0
+
+        writer.stop()
+        assert reader.get('AAPL.US') is None
+        writer.start()
+        writer.publish('MSFT.US', 410.0, 0.5)
+        assert reader.get('AAPL.US') is None
+        assert reader.get('MSFT.US')['price'] == 410.0
+        reader.close()
+
+    def test_read_from_another_process(self, writer):
+        writer.publish('NVDA.US', 880.0, 3.0, 500, 1.2)
+        ctx = multiprocessing.get_context('spawn')
+        results = ctx.Queue()
+        child = ctx.Process(target=_read_in_child, args=(writer.name, 'NVDA.US', results))
+        child.start()
+        quote = results.get(timeout=30)
+        child.join(30)
+
+        assert quote['price'] == 880.0
+        assert quote['acceleration'] == 1.2
+        # 读取进程退出后共享内存仍然存在
+        reader = QuoteSnapshotReader(writer.name)
+        assert reader.get('NVDA.US')['price'] == 880.0
+        reader.close()
@@ -0,0 +1,70 @@
+"""
+限流器单元测试
+"""
+import asyncio
+import pytest
+import sys
+import time
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from app.services.rate_limiter import TokenBucketLimiter, is_rate_limit_error
+
+
+class TestTokenBucketLimiter:
+    """测试令牌桶限流器"""
+
+    def test_burst_within_capacity_does_not_wait(self):
+        """测试容量内的突发请求无需等待"""
+        limiter = TokenBucketLimiter('test', rate=10, capacity=3)
+
+        assert [limiter.reserve() for _ in range(3)] == [0.0, 0.0, 0.0]
+
+    def test_reservations_are_fifo(self):
+        """测试超出容量后等待时间按到达顺序递增"""
+        limiter = TokenBucketLimiter('test', rate=10, capacity=1)
+        limiter.reserve()
+
+        waits = [limiter.reserve() for _ in range(3)]
+
+        assert waits[0] < waits[1] < waits[2]
+        assert waits[2] == pytest.approx(0.3, abs=0.02)
+
+    @pytest.mark.asyncio
+    async def test_concurrent_waiters_do_not_exceed_rate(self):
+        """测试并发等待者不会突破速率限制"""
+        limiter = TokenBucketLimiter('test', rate=50, capacity=1)
+        started = time.monotonic()
+
+        await asyncio.gather(*(limiter.acquire() for _ in range(6)))
+
+        # 1 个突发 + 5 个按 50次/秒 补充 ≈ 0.1 秒
+        assert time.monotonic() - started >= 0.09
+
+    def test_rate_limited_halves_rate(self):
+        """测试收到限流响应后速率减半并计数"""
+        limiter = TokenBucketLimiter('test', rate=8, capacity=2)
+
+        limiter.on_rate_limited()
+
+        stats = limiter.get_stats()
+        assert stats['rate'] == 4
+        assert stats['rate_limit_hits'] == 1
+        assert limiter.reserve() > 0
+
+    def test_rate_recovers_after_interval(self):
+        """测试冷却后速率逐步恢复"""
+        limiter = TokenBucketLimiter('test', rate=8, capacity=2, recover_interval=0.01)
+        limiter.on_rate_limited()
+
+        time.sleep(0.05)
+
+        assert limiter.get_stats()['rate'] > 4
+
+    def test_is_rate_limit_error(self):
+        """测试识别 301606 错误"""
+        assert is_rate_limit_error(Exception("OpenApiException: (301606) request rate limit"))
+        assert not is_rate_limit_error(Exception("(301604) no quote access"))
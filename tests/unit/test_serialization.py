@@ -0,0 +1,56 @@
+"""
+JSON序列化单元测试
+"""
+import json
+import sys
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+
+class TestSerialization:
+    """测试高性能JSON序列化"""
+
+    def test_matches_jsonable_encoder(self):
+        """测试输出与FastAPI默认编码一致"""
+        from fastapi.encoders import jsonable_encoder
+        from app.core.serialization import dumps
+
+        row = {
+            'id': 1,
+            'price': Decimal('150.25'),
+            'amount': Decimal('15025.00'),
+            'trade_time': datetime(2026, 1, 2, 9, 30, 15),
+            'trade_date': date(2026, 1, 2),
+            'message': '盈亏: $12.00',
+            'test_mode': 0
+        }
+
+        assert json.loads(dumps(row)) == jsonable_encoder(row)
+
+    def test_timedelta_and_bytes(self):
+        """测试 timedelta / bytes 编码"""
+        from app.core.serialization import dumps
+
+        result = json.loads(dumps({'elapsed': timedelta(seconds=90), 'raw': b'abc'}))
+
+        assert result == {'elapsed': 90.0, 'raw': 'abc'}
+
+    def test_dumps_text_keeps_unicode(self):
+        """测试文本输出不转义中文"""
+        from app.core.serialization import dumps_text
+
+        assert '默认分组' in dumps_text({'group': '默认分组'})
+
+    def test_fast_json_response_body(self):
+        """测试响应类渲染"""
+        from app.core.serialization import FastJSONResponse
+
+        response = FastJSONResponse({"code": 0, "data": [Decimal('1.50')]})
+
+        assert response.media_type == "application/json"
+        assert json.loads(response.body) == {"code": 0, "data": [1.5]}
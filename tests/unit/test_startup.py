@@ -0,0 +1,197 @@
+"""
+分阶段启动单元测试
+"""
+import asyncio
+import pytest
+import sys
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from app.core.startup import StartupManager, STAGE_DONE, STAGE_FAILED, STAGE_SKIPPED
+
+
+class TestStartupManager:
+    """依赖调度、失败隔离与关闭顺序"""
+
+    @pytest.mark.asyncio
+    async def test_independent_stages_run_concurrently(self):
+        manager = StartupManager()
+        running = set()
+        overlap = []
+
+        def stage(name):
+            async def start():
+                running.add(name)
+                await asyncio.sleep(0.01)
+                overlap.append(set(running))
+                running.discard(name)
+            return start
+
+        manager.add('a', stage('a'))
+        manager.add('b', stage('b'))
+        manager.add('c', stage('c'), after=['a', 'b'])
+
+        manager.start()
+        assert not manager.ready
+        assert await manager.wait_ready(1.0)
+        assert overlap[0] == {'a', 'b'}
+        assert overlap[-1] == {'c'}
+
+    @pytest.mark.asyncio
+    async def test_failure_skips_dependents_only(self):
+        manager = StartupManager()
+
+        async def ok():
+            pass
+
+        async def boom():
+            raise RuntimeError('db down')
+
+        manager.add('config', boom)
+        manager.add('broker', ok, after=['config'])
+        manager.add('queue', ok)
+
+        manager.start()
+        assert not await manager.wait_ready(1.0)
+        stages = manager.get_stats()['stages']
+        assert stages['config']['status'] == STAGE_FAILED
+        assert stages['config']['error'] == 'db down'
+        assert stages['broker']['status'] == STAGE_SKIPPED
+        assert stages['queue']['status'] == STAGE_DONE
+        assert not manager.ready
+
+    @pytest.mark.asyncio
+    async def test_optional_stage_timeout_keeps_ready(self):
+        manager = StartupManager(stage_timeout=0.01)
+
+        async def ok():
+            pass
+
+        async def slow():
+            await asyncio.sleep(1)
+
+        manager.add('core', ok)
+        manager.add('warm_up', slow, required=False)
+        manager.start()
+
+        assert await manager.wait_ready(1.0)
+        await asyncio.sleep(0.05)
+        assert manager.ready
+        assert manager.get_stats()['stages']['warm_up']['status'] == STAGE_FAILED
+
+    @pytest.mark.asyncio
+    async def test_stop_in_reverse_start_order(self):
+        manager = StartupManager()
+        stopped = []
+
+        def stage(name):
+            async def start():
+                pass
+
+            async def stop():
+                stopped.append(name)
+            return start, stop
+
+        manager.add('ledger', *stage('ledger'))
+        manager.add('exit_engine', *stage('exit_engine'), after=['ledger'])
+        manager.start()
+        await manager.wait_ready(1.0)
+        await manager.stop()
+
+        assert stopped == ['exit_engine', 'ledger']
+
+    @pytest.mark.asyncio
+    async def test_live_check_recovers(self):
+        """测试实时检查失败时未就绪，依赖恢复后无需重启即就绪"""
+        manager = StartupManager()
+        engine_up = False
+
+        async def ok():
+            pass
+
+        async def engine_check():
+            if not engine_up:
+                raise ConnectionError('engine down')
+
+        manager.add('core', ok)
+        manager.add_check('engine', engine_check)
+        manager.start()
+        assert await manager.wait_ready(1.0)
+
+        stats = await manager.probe()
+        assert not stats['ready']
+        assert stats['checks']['engine'] == {'ok': False, 'error': 'engine down'}
+
+        engine_up = True
+        assert (await manager.probe())['ready']
+
+    @pytest.mark.asyncio
+    async def test_live_check_timeout(self):
+        manager = StartupManager()
+
+        async def hang():
+            await asyncio.sleep(1)
+
+        manager.add_check('engine', hang)
+        manager.start()
+        await manager.wait_ready(1.0)
+        stats = await manager.probe(timeout=0.01)
+        assert not stats['ready']
+        assert not stats['checks']['engine']['ok']
+
+    def test_unknown_dependency_rejected(self):
+        manager = StartupManager()
+        with pytest.raises(ValueError):
+            manager.add('broker', None, after=['config'])
+
+
+class TestServiceContainer:
+    """应用工厂与服务容器"""
+
+    def test_services_resolved_once(self):
+        from app.core.container import ServiceContainer
+        from app.services.longbridge_sdk import longbridge_sdk
+
+        services = ServiceContainer()
+        assert services.get_stats()['resolved'] == []
+        assert services.sdk is longbridge_sdk
+        assert services.sdk is services.sdk
+        assert services.get_stats()['resolved'] == ['sdk']
+
+    @pytest.mark.asyncio
+    async def test_phase_timings(self):
+        manager = StartupManager()
+
+        async def ok():
+            pass
+
+        async def warm_up():
+            await asyncio.sleep(0.02)
+
+        manager.add('core', ok, ok)
+        manager.add('cache', warm_up, required=False)
+        manager.start()
+
+        assert await manager.wait_ready(1.0)
+        assert manager.get_stats()['timings']['warmup_ms'] is None  # 就绪时预热仍在进行
+        await asyncio.sleep(0.05)
+        await manager.stop()
+
+        timings = manager.get_stats()['timings']
+        assert timings['start_ms'] <= timings['warmup_ms']
+        assert timings['shutdown_ms'] is not None
+        assert manager.get_stats()['stages']['core']['stop_ms'] is not None
+
+    def test_ready_reports_stages(self):
+        from fastapi.testclient import TestClient
+        from app.core.application import create_app
+
+        client = TestClient(create_app())  # 未进入生命周期，启动阶段未执行
+
+        assert client.get('/health').status_code == 200
+        response = client.get('/ready')
+        assert response.status_code == 503
+        assert 'broker' in response.json()['data']['stages']
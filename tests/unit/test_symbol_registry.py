@@ -0,0 +1,86 @@
+"""
+股票代码注册表单元测试
+"""
+import pytest
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from app.services.symbol_registry import SymbolRegistry, normalize_symbol
+
+registry_module = sys.modules['app.services.symbol_registry']
+
+
+class TestNormalizeSymbol:
+    """代码标准化规则"""
+
+    @pytest.mark.parametrize('symbol,expected', [
+        ('aapl', 'AAPL.US'),
+        ('AAPL.NASDAQ', 'AAPL.US'),
+        ('700', '00700.HK'),
+        ('00700.HK', '00700.HK'),
+        ('600519', '600519.SH'),
+        ('000001', '000001.SZ'),
+    ])
+    def test_rules(self, symbol, expected):
+        assert normalize_symbol(symbol) == expected
+
+
+class TestSymbolRegistry:
+    """缓存与双向查找"""
+
+    def test_lookup_cached_after_first_miss(self, monkeypatch):
+        registry = SymbolRegistry()
+        calls = []
+        original = registry_module.normalize_symbol
+        monkeypatch.setattr(registry_module, 'normalize_symbol', lambda s: calls.append(s) or original(s))
+
+        assert registry.normalize('700') == '00700.HK'
+        assert registry.normalize('700') == '00700.HK'
+        assert registry.normalize('00700.HK') == '00700.HK'
+        assert calls == ['700']
+        assert registry.original('00700.HK') == '700'
+
+    def test_aliases_share_metadata(self):
+        registry = SymbolRegistry()
+        info = registry.get('700')
+        assert registry.get('00700') is info
+        assert info.market == 'HK'
+        assert info.currency == 'HKD'
+
+    def test_load_from_stocks_table(self, monkeypatch):
+        class StocksConnection:
+            def cursor(self, *args):
+                return self
+
+            def execute(self, sql, params=None):
+                pass
+
+            def fetchall(self):
+                return [{'symbol': 'SPY', 'name': 'SPDR S&P 500', 'stock_type': 'ETF'}]
+
+            def close(self):
+                pass
+
+        monkeypatch.setattr(registry_module, 'get_db_connection', StocksConnection)
+        registry = SymbolRegistry()
+
+        assert registry.load() == 1
+        assert registry.classify('SPY.US') == 'ETF'
+        assert registry.get('SPY').name == 'SPDR S&P 500'
+
+    def test_static_info_sets_lot_size_and_type(self):
+        registry = SymbolRegistry()
+        registry.register('700')
+        applied = registry.apply_static_info([
+            SimpleNamespace(symbol='00700.HK', lot_size=100, currency='HKD', board='HKEquity'),
+            SimpleNamespace(symbol='UNKNOWN.US', lot_size=1, currency='USD', board='USMain'),
+        ])
+
+        assert applied == 1
+        assert registry.lot_size('700') == 100
+        assert registry.classify('700') == 'STOCK'
@@ -0,0 +1,80 @@
+"""
+异步任务队列单元测试
+"""
+import asyncio
+import pytest
+import sys
+import threading
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from app.services.task_queue import AsyncTaskQueue, PRIORITY_HIGH, PRIORITY_LOW
+
+
+@pytest.fixture
+def queue(monkeypatch):
+    queue = AsyncTaskQueue(workers=1, threads=2, maxsize=2)
+    # 单元测试不连接数据库
+    monkeypatch.setattr(queue, '_load_durable', lambda: [])
+    return queue
+
+
+class TestAsyncTaskQueue:
+    """优先级、线程池、背压与统计"""
+
+    @pytest.mark.asyncio
+    async def test_high_priority_runs_first(self, queue):
+        order = []
+
+        async def record(label):
+            order.append(label)
+
+        # 启动前排队，启动后单个工作协程按优先级取任务
+        await queue.enqueue(record, ('report',), priority=PRIORITY_LOW)
+        await queue.enqueue(record, ('order',), priority=PRIORITY_HIGH)
+        await queue.start()
+        await queue.stop()
+        assert order == ['order', 'report']
+
+    @pytest.mark.asyncio
+    async def test_sync_task_runs_in_thread(self, queue):
+        threads = []
+        await queue.start()
+        await queue.add_task(lambda: threads.append(threading.current_thread().name))
+        await queue.stop()
+        assert threads and threads[0].startswith('task-queue')
+
+    @pytest.mark.asyncio
+    async def test_backpressure_timeout(self, queue):
+        async def noop():
+            pass
+
+        await queue.enqueue(noop)
+        await queue.enqueue(noop)
+        with pytest.raises(asyncio.QueueFull):
+            await queue.enqueue(noop, timeout=0.01)
+        assert queue.rejected == 1
+
+    @pytest.mark.asyncio
+    async def test_metrics_track_failures(self, queue):
+        async def boom():
+            raise RuntimeError('失败')
+
+        await queue.start()
+        await queue.enqueue(boom, name='boom')
+        await queue.enqueue(boom, name='boom')
+        await queue.stop()
+        stats = queue.get_stats()['tasks']['boom']
+        assert stats['failed'] == 2
+        assert stats['last_error'] == '失败'
+
+    @pytest.mark.asyncio
+    async def test_durable_requires_registration(self, queue):
+        async def job():
+            pass
+
+        with pytest.raises(ValueError):
+            await queue.enqueue(job, name='job', durable=True)
@@ -0,0 +1,241 @@
+"""
+交易日历与自动交易调度单元测试
+"""
+import json
+import pytest
+import sys
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from app.services import market_calendar
+from app.services.trade_scheduler import TradeScheduler, plan_tasks, task_deadline
+
+scheduler_module = sys.modules['app.services.trade_scheduler']
+
+
+class RowcountConnection:
+    """记录 SQL、按预设 rowcount 返回的模拟连接"""
+
+    def __init__(self, rowcount=1):
+        self.executed = []
+        self.rowcount = rowcount
+
+    def cursor(self, *args):
+        return self
+
+    def execute(self, sql, params=None):
+        self.executed.append((sql, params))
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class TestMarketCalendar:
+    """美股交易日历"""
+
+    def test_holidays_2026(self):
+        holidays = market_calendar.market_holidays(2026)
+        assert date(2026, 4, 3) in holidays    # 耶稣受难日
+        assert date(2026, 6, 19) in holidays   # 六月节
+        assert date(2026, 7, 3) in holidays    # 独立日逢周六提前
+        assert date(2026, 11, 26) in holidays  # 感恩节
+        assert date(2026, 12, 25) in holidays
+
+    def test_next_trading_day_skips_weekend_and_holiday(self):
+        # 2026-07-02 周四 → 07-03 休市 → 周末 → 07-06 周一
+        assert market_calendar.next_trading_day(date(2026, 7, 2)) == date(2026, 7, 6)
+        assert market_calendar.next_trading_day(date(2026, 7, 6), include_today=True) == date(2026, 7, 6)
+
+    def test_open_follows_daylight_saving(self):
+        summer = market_calendar.market_open(date(2026, 7, 6))
+        winter = market_calendar.market_open(date(2026, 12, 7))
+        assert summer.utcoffset() == timedelta(hours=-4)
+        assert winter.utcoffset() == timedelta(hours=-5)
+        assert market_calendar.close_time(date(2026, 11, 27)) == market_calendar.EARLY_CLOSE
+
+    def test_next_open(self):
+        after_open = datetime(2026, 4, 2, 10, 0, tzinfo=market_calendar.MARKET_TZ)
+        assert market_calendar.next_open(after_open) == market_calendar.market_open(date(2026, 4, 6))
+
+
+class TestTradeScheduler:
+    """任务计划与过期判断"""
+
+    def test_plan_tasks(self):
+        tasks = dict(plan_tasks(date(2026, 7, 6), lead_minutes=30))
+        open_at = market_calendar.to_local(market_calendar.market_open(date(2026, 7, 6)))
+        assert tasks['OPEN_BUY'] == open_at
+        assert tasks['PREDICT'] == open_at - timedelta(minutes=30)
+
+    def test_deadlines(self):
+        open_at = market_calendar.to_local(market_calendar.market_open(date(2026, 7, 6)))
+        assert task_deadline('OPEN_BUY', open_at, grace_minutes=15) == open_at + timedelta(minutes=15)
+        close_at = market_calendar.to_local(market_calendar.market_close(date(2026, 7, 6)))
+        assert task_deadline('PREDICT', open_at - timedelta(minutes=30)) == close_at
+
+    @pytest.fixture
+    def scheduler(self, monkeypatch):
+        scheduler = TradeScheduler(grace_minutes=15)
+        scheduler.finished = []
+        monkeypatch.setattr(scheduler, '_claim', lambda task_id: True)
+        monkeypatch.setattr(scheduler, '_finish',
+                            lambda task_id, status, result, executed_time=None, delay_ms=None:
+                            scheduler.finished.append((task_id, status, delay_ms)))
+
+        async def open_buy(task_id):
+            return 'COMPLETED', {'submitted': 1}
+        monkeypatch.setattr(scheduler, '_run_open_buy', open_buy)
+        return scheduler
+
+    @pytest.mark.asyncio
+    async def test_run_records_delay(self, scheduler):
+        scheduled = datetime(2026, 7, 6, 21, 30)
+        task = {'id': 1, 'task_type': 'OPEN_BUY', 'scheduled_time': scheduled}
+        status = await scheduler.run_task(task, now=scheduled + timedelta(seconds=2))
+        assert status == 'COMPLETED'
+        assert scheduler.finished == [(1, 'COMPLETED', 2000)]
+        assert scheduler.max_delay_ms == 2000
+
+    @pytest.mark.asyncio
+    async def test_stale_open_buy_is_missed(self, scheduler):
+        scheduled = datetime(2026, 7, 6, 21, 30)
+        task = {'id': 2, 'task_type': 'OPEN_BUY', 'scheduled_time': scheduled}
+        status = await scheduler.run_task(task, now=scheduled + timedelta(hours=1))
+        assert status == 'MISSED'
+        assert scheduler.finished == [(2, 'MISSED', None)]
+
+    @pytest.mark.asyncio
+    async def test_claimed_elsewhere(self, scheduler, monkeypatch):
+        monkeypatch.setattr(scheduler, '_claim', lambda task_id: False)
+        task = {'id': 3, 'task_type': 'OPEN_BUY', 'scheduled_time': datetime(2026, 7, 6, 21, 30)}
+        assert await scheduler.run_task(task) is None
+        assert scheduler.finished == []
+
+    def test_finish_requires_lease(self, monkeypatch):
+        """测试租约过期后（任务已被其他实例恢复）不覆盖任务结果"""
+        conn = RowcountConnection(rowcount=0)
+        monkeypatch.setattr(scheduler_module, 'get_db_connection', lambda: conn)
+        scheduler = TradeScheduler()
+
+        assert scheduler._finish(1, 'COMPLETED', {}) is False
+        sql, params = conn.executed[0]
+        assert 'claimed_by = %s' in sql and params[-1] == scheduler.owner
+        assert scheduler.executed['COMPLETED'] == 0
+
+    @pytest.mark.asyncio
+    async def test_open_buy_records_symbols_then_order_ids(self, monkeypatch):
+        """测试提交前记录本任务的股票与测试模式，提交后记录订单ID；租约失效时不提交"""
+        smart_trader = sys.modules['app.services.smart_trader'].smart_trader
+        strategy = sys.modules['app.services.trading_strategy'].trading_strategy
+        submitted = []
+
+        async def noop():
+            pass
+
+        async def recommendations(limit):
+            return [{'symbol': 'AAPL.US', 'price': 100.0}]
+
+        async def execute_batch(intents):
+            submitted.append(intents)
+            return {'success': True, 'submitted': 1,
+                    'orders': [{'success': True, 'symbol': 'AAPL.US', 'order_id': 'ORD1'}]}
+
+        monkeypatch.setattr(smart_trader, 'load_config', noop)
+        monkeypatch.setattr(smart_trader, 'is_enabled', True)
+        monkeypatch.setattr(smart_trader, 'buy_amount', 1000.0)
+        monkeypatch.setattr(smart_trader, 'get_top_recommendations', recommendations)
+        monkeypatch.setattr(strategy, 'load_config', noop)
+        monkeypatch.setattr(strategy, 'execute_batch', execute_batch)
+        monkeypatch.setattr(scheduler_module, 'is_test_mode', lambda: True)
+
+        scheduler = TradeScheduler()
+        progress = []
+        monkeypatch.setattr(scheduler, '_record_progress',
+                            lambda task_id, p: progress.append(dict(p)) or True)
+        status, result = await scheduler._run_open_buy(5)
+
+        assert status == 'COMPLETED'
+        assert progress == [{'test_mode': 1, 'symbols': ['AAPL.US']},
+                            {'test_mode': 1, 'symbols': ['AAPL.US'], 'order_ids': ['ORD1']}]
+        assert result['order_ids'] == ['ORD1']
+
+        monkeypatch.setattr(scheduler, '_record_progress', lambda task_id, p: False)
+        status, _ = await scheduler._run_open_buy(5)
+        assert status == 'FAILED'
+        assert len(submitted) == 1
+
+
+class TestSchedulerRecovery:
+    """租约过期任务的恢复"""
+
+    @pytest.fixture
+    def scheduler(self, monkeypatch):
+        scheduler = TradeScheduler()
+        scheduler.requeued = []
+        scheduler.closed = []
+        scheduler.orders = []
+        scheduler.lookups = []
+        monkeypatch.setattr(scheduler, '_requeue', lambda task: scheduler.requeued.append(task['id']) or True)
+        monkeypatch.setattr(scheduler, '_close_interrupted',
+                            lambda task, status, result: scheduler.closed.append((task['id'], status, result)) or True)
+
+        def task_orders(test_mode, symbols, since):
+            scheduler.lookups.append((test_mode, symbols))
+            return scheduler.orders
+        monkeypatch.setattr(scheduler, '_task_orders', task_orders)
+        return scheduler
+
+    def _expired(self, scheduler, monkeypatch, task_type, progress=None):
+        task = {'id': 7, 'task_type': task_type, 'scheduled_time': datetime(2026, 7, 6, 21, 30),
+                'claimed_by': 'host-a:123:abcd', 'claimed_at': datetime(2026, 7, 6, 21, 30, 1),
+                'result': json.dumps(progress) if progress is not None else None}
+        monkeypatch.setattr(scheduler, '_expired_tasks', lambda: [task])
+
+    def test_interrupted_prediction_is_requeued(self, scheduler, monkeypatch):
+        self._expired(scheduler, monkeypatch, 'PREDICT')
+        assert scheduler.recover() == 1
+        assert scheduler.requeued == [7]
+        assert scheduler.closed == []
+
+    def test_open_buy_interrupted_before_submit_is_requeued(self, scheduler, monkeypatch):
+        self._expired(scheduler, monkeypatch, 'OPEN_BUY')
+        assert scheduler.recover() == 1
+        assert scheduler.requeued == [7]
+        assert scheduler.closed == []
+
+    def test_open_buy_with_recorded_order_ids(self, scheduler, monkeypatch):
+        self._expired(scheduler, monkeypatch, 'OPEN_BUY',
+                      {'test_mode': 0, 'symbols': ['AAPL.US'], 'order_ids': ['ORD1']})
+        assert scheduler.recover() == 1
+        assert scheduler.closed[0][:2] == (7, 'COMPLETED')
+        assert scheduler.closed[0][2]['order_ids'] == ['ORD1']
+        assert scheduler.lookups == []
+
+    def test_open_buy_interrupted_while_submitting(self, scheduler, monkeypatch):
+        """测试提交中断时只按本任务的股票和测试模式对账"""
+        self._expired(scheduler, monkeypatch, 'OPEN_BUY', {'test_mode': 1, 'symbols': ['AAPL.US', 'MSFT.US']})
+        scheduler.orders = [('AAPL.US', 'ORD1'), ('MSFT.US', 'ORD2')]
+        assert scheduler.recover() == 1
+        assert scheduler.lookups == [(1, ['AAPL.US', 'MSFT.US'])]
+        assert scheduler.closed[0][:2] == (7, 'COMPLETED')
+        assert scheduler.closed[0][2]['order_ids'] == ['ORD1', 'ORD2']
+
+    def test_open_buy_missing_orders_needs_review(self, scheduler, monkeypatch):
+        self._expired(scheduler, monkeypatch, 'OPEN_BUY', {'test_mode': 0, 'symbols': ['AAPL.US', 'MSFT.US']})
+        scheduler.orders = [('AAPL.US', 'ORD1')]
+        assert scheduler.recover() == 1
+        assert scheduler.requeued == []
+        assert scheduler.closed[0][:2] == (7, 'NEEDS_REVIEW')
+
+    def test_recovered_elsewhere_is_not_counted(self, scheduler, monkeypatch):
+        self._expired(scheduler, monkeypatch, 'PREDICT')
+        monkeypatch.setattr(scheduler, '_requeue', lambda task: False)
+        assert scheduler.recover() == 0
+        assert scheduler.recovered == 0